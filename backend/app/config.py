@@ -14,6 +14,12 @@ class Settings:
     ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
     OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
+    # Provider endpoints; point them at scripts/fake_llm_server.py for offline
+    # load tests (the Groq SDK reads GROQ_BASE_URL itself)
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com")
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+    OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
     # Music APIs
     SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
     SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
@@ -44,6 +50,16 @@ class Settings:
     except Exception:
         ANALYSIS_MAX_SECONDS = 180
 
+    # Cancel a running analysis nobody has polled or watched (WebSocket) for
+    # this many seconds, e.g. after the tab was closed. 0 disables.
+    try:
+        ANALYSIS_UNWATCHED_CANCEL_SECONDS = int(os.getenv("ANALYSIS_UNWATCHED_CANCEL_SECONDS", "0"))
+    except Exception:
+        ANALYSIS_UNWATCHED_CANCEL_SECONDS = 0
+
+    # Near-duplicate detection: reuse results for re-encoded / re-tagged uploads
+    FINGERPRINT_DEDUPE = os.getenv("FINGERPRINT_DEDUPE", "true").lower() == "true"
+
     # Stripe (credit packs — one-time payments)
     STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
     STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
@@ -1,11 +1,15 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, text, Boolean, ForeignKey, Float
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, text, Boolean, ForeignKey, Float, Index, LargeBinary
 from sqlalchemy.types import JSON
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy import event
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 import os
 import logging
+import time
 import uuid
 from datetime import datetime
 
+from app.utils.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
 # Determine database path
@@ -39,6 +43,65 @@ def get_db():
     finally:
         db.close()
 
+
+def to_async_url(url: str) -> str:
+    """Map a sync SQLAlchemy URL onto its asyncio driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:///"):
+        return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Async engine for read-heavy request handlers (job polling, history, exports).
+# Runs next to the sync engine above — background analysis and the rest of
+# the routes keep using SessionLocal. Optional: without aiosqlite/asyncpg the
+# app still starts, and get_async_db() raises instead.
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        **({"pool_size": 5, "max_overflow": 10} if "postgresql" in ASYNC_DATABASE_URL else {}),
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+except ImportError as e:
+    logger.warning(f"Async database driver not available ({e}). Async read endpoints disabled.")
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database driver not installed (pip install aiosqlite asyncpg)")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Commit latency (flush included) for /api/metrics. Session-level events
+# cover SessionLocal sessions and the sync core of every AsyncSession.
+DB_COMMIT_SECONDS = metrics.histogram("db_commit_seconds", "Session commit latency, flush included")
+
+
+@event.listens_for(Session, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+
+@event.listens_for(Session, "after_rollback")
+def _commit_abandoned(session):
+    session.info.pop("commit_started", None)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -65,6 +128,8 @@ class Job(Base):
     status = Column(String, default="pending", index=True)
     file_name = Column(String, nullable=False)
     result = Column(JSON, nullable=True)
+    # DSP/LLM fields published as each pipeline layer finishes, before `result`
+    partial_result = Column(JSON, nullable=True)
     error = Column(String, nullable=True)
     message = Column(String, nullable=True)
     duration = Column(Float, nullable=True)
@@ -72,6 +137,8 @@ class Job(Base):
     coverArt = Column(String, nullable=True)
     ipfs_hash = Column(String, nullable=True, unique=True)
     ipfs_url = Column(String, nullable=True)
+    # Admin-requested profiling run: summary + artifact names (app.utils.profiler)
+    profile = Column(JSON, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
 class CreditPurchase(Base):
@@ -116,6 +183,78 @@ class AnalysisHistory(Base):
     metadata_json = Column("metadata", JSON, nullable=True)                  # Renamed from result
     result = Column(JSON, nullable=True)                    # Keep for backward compatibility
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Summary columns for the history list, copied out of the result JSON on write
+    main_genre = Column(String, nullable=True)
+    bpm = Column(Float, nullable=True)
+    musical_key = Column(String, nullable=True)
+    mode = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Keyset pagination: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_analysis_history_user_created_id", "user_id", "created_at", "id"),
+    )
+
+class CatalogTrack(Base):
+    """
+    Queryable projection of an AnalysisHistory row (one row each). The JSON
+    result stays the source of truth; these columns exist so catalog search
+    can filter/sort in SQL.
+    """
+    __tablename__ = "catalog_tracks"
+    id = Column(Integer, primary_key=True, index=True)
+    history_id = Column(Integer, ForeignKey("analysis_history.id"), unique=True, nullable=False)
+    job_id = Column(String, nullable=True, index=True)
+    user_id = Column(String, nullable=True)
+    file_name = Column(String)
+    file_hash = Column(String, nullable=True, index=True)
+    bpm = Column(Float, nullable=True)
+    key = Column(String, nullable=True)
+    mode = Column(String, nullable=True)
+    main_genre = Column(String, nullable=True)
+    energy_level = Column(String, nullable=True)
+    duration = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_catalog_tracks_user_key_mode_bpm", "user_id", "key", "mode", "bpm"),
+        Index("ix_catalog_tracks_user_bpm", "user_id", "bpm"),
+        Index("ix_catalog_tracks_user_genre", "user_id", "main_genre"),
+        Index("ix_catalog_tracks_user_created", "user_id", "created_at"),
+    )
+
+class CatalogTrackMood(Base):
+    __tablename__ = "catalog_track_moods"
+    track_id = Column(Integer, ForeignKey("catalog_tracks.id", ondelete="CASCADE"), primary_key=True)
+    mood = Column(String, primary_key=True)  # lower-cased
+
+    __table_args__ = (
+        Index("ix_catalog_track_moods_mood_track", "mood", "track_id"),
+    )
+
+class TrackEmbedding(Base):
+    """Fixed-length timbre/harmony embedding of an analyzed track (float32 bytes)."""
+    __tablename__ = "track_embeddings"
+    id = Column(Integer, primary_key=True, index=True)  # monotonically increasing: index catch-up cursor
+    job_id = Column(String, unique=True, index=True)
+    user_id = Column(String, index=True, nullable=True)
+    file_hash = Column(String, index=True, nullable=True)
+    dim = Column(Integer)
+    vector = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AudioFingerprint(Base):
+    """Perceptual fingerprint (uint32 codes stored as little-endian bytes) per analyzed file."""
+    __tablename__ = "audio_fingerprints"
+    file_hash = Column(String, primary_key=True)  # SHA-256 of the analyzed upload
+    duration = Column(Float)
+    codes = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class FingerprintCode(Base):
+    """Inverted index: sampled sub-fingerprint code -> file. Codes are stored as signed int32."""
+    __tablename__ = "fingerprint_codes"
+    code = Column(Integer, primary_key=True)
+    file_hash = Column(String, ForeignKey("audio_fingerprints.file_hash"), primary_key=True)
 
 class Certificate(Base):
     __tablename__ = "certificates"
@@ -178,6 +317,42 @@ def run_migrations():
                 conn.commit()
             except Exception:
                 pass  # Column already exists
+
+            # Progressive results published per pipeline layer
+            try:
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN partial_result JSON"))
+                conn.commit()
+            except Exception:
+                conn.rollback()  # Column already exists
+
+            # Per-job profiling summary
+            try:
+                conn.execute(text("ALTER TABLE jobs ADD COLUMN profile JSON"))
+                conn.commit()
+            except Exception:
+                conn.rollback()  # Column already exists
+
+            # History list summary columns + keyset pagination index
+            for ddl in (
+                "ALTER TABLE analysis_history ADD COLUMN main_genre TEXT",
+                "ALTER TABLE analysis_history ADD COLUMN bpm FLOAT",
+                "ALTER TABLE analysis_history ADD COLUMN musical_key TEXT",
+                "ALTER TABLE analysis_history ADD COLUMN mode TEXT",
+            ):
+                try:
+                    conn.execute(text(ddl))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()  # Column already exists
+            try:
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_analysis_history_user_created_id "
+                    "ON analysis_history (user_id, created_at, id)"
+                ))
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"History index migration skipped: {e}")
     except Exception as e:
         logger.error(f"Migration error: {e}")
 
@@ -71,7 +71,7 @@ def setup_app():
     """Initialize FastAPI app"""
     from app.routes import (
         proxy_router, spotify_router, lastfm_router, discogs_router,
-        audd_router, auth_router, history_router,
+        audd_router, auth_router, history_router, catalog_router,
         tagging_router, ddex_router, analysis_router, generative_router,
         health_router, mir_router, ai_proxy_router, cwr_router,
         system_router, certificate_router,
@@ -79,11 +79,13 @@ def setup_app():
         billing_router,
         acr_router,
         redeem_codes_router,
+        metrics_router,
     )
     from app.routes.fresh_analysis import router as fresh_router
     from app.routes.export import router as export_router
     from app.routes.tools import router as tools_router
     from app.startup import ensure_admin_user
+    from app.utils.warmup import warm_up
     
     app = FastAPI(
         title="Music Metadata Engine",
@@ -127,6 +129,7 @@ def setup_app():
     # Include routers
     app.include_router(proxy_router, prefix="/api")
     app.include_router(health_router, prefix="/api")
+    app.include_router(metrics_router, prefix="/api")
     app.include_router(mir_router, prefix="/api")
     app.include_router(spotify_router, prefix="/api")
     app.include_router(lastfm_router, prefix="/api")
@@ -134,6 +137,7 @@ def setup_app():
     app.include_router(audd_router, prefix="/api")
     app.include_router(auth_router, prefix="/api")
     app.include_router(history_router, prefix="/api")
+    app.include_router(catalog_router, prefix="/api")
     app.include_router(tagging_router, prefix="/api")
     app.include_router(analysis_router, prefix="/api")
     app.include_router(generative_router, prefix="/api")
@@ -170,6 +174,10 @@ def setup_app():
         
         # Clean old files on startup
         cleanup_old_files()
+
+        # Warm the analysis stack (imports, numba JIT, resident models) in the
+        # background so the first job doesn't pay for it; /api/ready waits for it
+        asyncio.create_task(warm_up())
         
         logger.info("✅ Application ready!")
     
@@ -223,6 +231,15 @@ async def health_check():
         "timestamp": datetime.utcnow()
     }
 
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the background warm-up has finished"""
+    from app.utils.warmup import readiness
+
+    status = readiness.status()
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=status)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
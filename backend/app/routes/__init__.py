@@ -1,23 +1,43 @@
 # routes package init
+#
+# Routers are imported on first access (PEP 562), so importing one route
+# module does not load every other one and its dependencies.
 
-from .proxy import router as proxy_router
-from .spotify import router as spotify_router
-from .lastfm import router as lastfm_router
-from .discogs import router as discogs_router
-from .audd import router as audd_router
-from .auth import router as auth_router
-from .history import router as history_router
-from .tagging import router as tagging_router
-from .ddex import router as ddex_router
-from .analysis import router as analysis_router
-from .health import router as health_router
-from .mir import router as mir_router
-from .generative import router as generative_router
-from .ai_proxy import router as ai_proxy_router
-from .cwr import router as cwr_router
-from .system import router as system_router
-from .certificate import router as certificate_router
-from .webhooks import router as webhooks_router
-from .billing import router as billing_router
-from .acr import router as acr_router
-from .redeem_codes import router as redeem_codes_router
+import importlib
+
+_ROUTERS = {
+    "proxy_router": ".proxy",
+    "spotify_router": ".spotify",
+    "lastfm_router": ".lastfm",
+    "discogs_router": ".discogs",
+    "audd_router": ".audd",
+    "auth_router": ".auth",
+    "history_router": ".history",
+    "catalog_router": ".catalog",
+    "tagging_router": ".tagging",
+    "ddex_router": ".ddex",
+    "analysis_router": ".analysis",
+    "health_router": ".health",
+    "mir_router": ".mir",
+    "generative_router": ".generative",
+    "ai_proxy_router": ".ai_proxy",
+    "cwr_router": ".cwr",
+    "system_router": ".system",
+    "certificate_router": ".certificate",
+    "webhooks_router": ".webhooks",
+    "billing_router": ".billing",
+    "acr_router": ".acr",
+    "redeem_codes_router": ".redeem_codes",
+    "metrics_router": ".metrics",
+}
+
+__all__ = list(_ROUTERS)
+
+
+def __getattr__(name):
+    module = _ROUTERS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    router = importlib.import_module(module, __name__).router
+    globals()[name] = router
+    return router
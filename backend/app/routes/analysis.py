@@ -2,8 +2,10 @@
 Analysis Routes - Full metadata pipeline with synchronized field schema
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, BackgroundTasks, Depends, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import os
 import uuid
@@ -12,10 +14,18 @@ import asyncio
 import json
 import shutil
 import time
+from types import SimpleNamespace
 from app.utils.websocket_manager import manager as ws_manager
+from app.utils.progress import TERMINAL_STATUSES, progress_reporter
+from app.utils.cancellation import JobCancelled, job_context, job_registry
+from app.utils.scheduler import analysis_scheduler
+from app.utils.hash_generator import hash_stage
+from app.utils.task_graph import Pipeline, Stage, file_key
 from fastapi import WebSocket, WebSocketDisconnect
-from app.db import SessionLocal, Job, AnalysisHistory
-from app.dependencies import get_user_and_check_quota
+from app.db import SessionLocal, Job, AnalysisHistory, CatalogTrack, TrackEmbedding, get_async_db
+from app.services.catalog import summary_fields
+from app.dependencies import get_current_user_optional, get_user_and_check_quota
+from app.routes.auth import get_current_user
 from app.types import User
 from app.services.metadata_enricher import MetadataEnricher
 from app.config import settings
@@ -80,6 +90,8 @@ ALLOWED_METADATA_KEYS = {
     "analysisVersion",
     "analysisTimestamp",
     "pipelineParams",
+    # Set when the result was reused for a near-duplicate upload
+    "matchedBy",
 }
 
 
@@ -199,6 +211,19 @@ def sanitize_metadata(metadata: dict) -> dict:
     return cleaned
 
 
+def partial_metadata(fields: dict) -> dict:
+    """
+    Schema-filtered view of a partial result: only ALLOWED_METADATA_KEYS that
+    are actually known, with none of sanitize_metadata's placeholder defaults
+    (a client must not render "Unknown" genre before the LLM layer has run).
+    """
+    return {k: v for k, v in fields.items() if k in ALLOWED_METADATA_KEYS and v not in (None, "", [], {})}
+
+
+# Progress reported when each layer's partial result is published
+PARTIAL_PROGRESS = {"dsp": 50, "llm": 75, "lyrics": 80, "groq": 83}
+
+
 # ── ANALYSIS JOB ──────────────────────────────────────────────────────────────
 
 async def process_analysis(
@@ -210,14 +235,216 @@ async def process_analysis(
     model_preference: str = "pro",
 
     time_budget_sec: int | None = None,
+    profile: bool = False,
 ):
+    """
+    Runs the analysis as its own task under a cancellation token, so
+    POST /job/{id}/cancel (or nobody watching the job) stops it between
+    stages, aborts in-flight LLM calls and skips storing + credit charge.
+    With profile=True the whole run is sampled (app.utils.profiler) and the
+    report is linked from the job.
+    """
+    profiler = None
+    if profile:
+        from app.utils.profiler import JobProfiler
+
+        profiler = JobProfiler(job_id)
+        profiler.start()
+
+    token = job_registry.register(job_id)
+    task = asyncio.create_task(
+        _run_analysis(job_id, file_path, is_pro_mode, transcribe, is_fresh, model_preference, time_budget_sec),
+        context=job_context(token),
+    )
+    token.task = task
+
+    watchdog = None
+    idle_limit = float(getattr(settings, "ANALYSIS_UNWATCHED_CANCEL_SECONDS", 0) or 0)
+    if idle_limit > 0:
+        watchdog = asyncio.create_task(_cancel_when_unwatched(job_id, token, idle_limit))
+
+    try:
+        await task
+    except (asyncio.CancelledError, JobCancelled):
+        if not token.cancelled:
+            # Shutdown / outer cancellation, not ours to swallow
+            task.cancel()
+            raise
+        await _mark_cancelled(job_id, token.reason or "cancelled")
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+        job_registry.discard(job_id)
+        if profiler is not None:
+            await _save_profile(job_id, profiler)
+
+
+async def _save_profile(job_id: str, profiler):
+    """Write the profile artifacts and link them from the job; never fails the job."""
+    try:
+        summary = await asyncio.to_thread(profiler.stop)
+    except Exception as e:
+        logger.warning(f"Profile of Job {job_id} could not be written: {e}")
+        summary = {"error": str(e)}
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job:
+            job.profile = summary
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Could not store profile summary for Job {job_id}: {e}")
+    finally:
+        db.close()
+
+
+async def _cancel_when_unwatched(job_id: str, token, idle_limit: float):
+    """Cancel the job once no WebSocket is open and nobody polled it for idle_limit seconds."""
+    interval = max(1.0, min(5.0, idle_limit / 2))
+    while not token.cancelled:
+        await asyncio.sleep(interval)
+        if ws_manager.active_connections.get(job_id):
+            token.touch()
+        elif time.monotonic() - token.last_seen > idle_limit:
+            job_registry.cancel(job_id, "unwatched")
+            return
+
+
+async def _mark_cancelled(job_id: str, reason: str):
+    progress_reporter.discard(job_id)
+    message = "Analysis cancelled by user." if reason == "user" else f"Analysis cancelled ({reason})."
     db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job and job.status not in ("completed", "error"):
+            job.status = "cancelled"
+            job.message = message
+            db.commit()
+    except Exception as e:
+        logger.warning(f"Could not mark Job {job_id} cancelled: {e}")
+    finally:
+        db.close()
+    await ws_manager.send_progress(job_id, message, progress=0, status="cancelled")
+
+
+# ── Pipeline ──────────────────────────────────────────────────────────────────
+# Stages of one upload; ctx carries job, file_path, transcribe, model_preference,
+# remaining() and publish_partial. _run_analysis starts hash and tags at once,
+# the fingerprint for the dedupe lookup, and "fresh" (Layers 1-3) and the Groq
+# branch only once the cache/fingerprint dedupe missed.
+
+
+def _read_tags(ctx):
+    from app.services.audio_analyzer import AdvancedAudioAnalyzer
+
+    return AdvancedAudioAnalyzer.read_metadata(ctx.file_path) or {}
+
+
+async def _fingerprint(ctx):
+    from app.services.fingerprint_engine import fingerprint_engine
+
+    return await fingerprint_engine.fingerprint_file(ctx.file_path)
+
+
+async def _fresh(ctx):
+    from app.services.fresh_track_analyzer import FreshTrackAnalyzer
+
+    analyzer_budget = max(15, int(ctx.remaining() - 2.0))
+    logger.info(f"Job {ctx.job.id}: Delegating to FreshTrackAnalyzer (budget {analyzer_budget}s)...")
+    return await FreshTrackAnalyzer().analyze_fresh_track(
+        file_path=ctx.file_path,
+        include_lyrics=ctx.transcribe,
+        model_preference=ctx.model_preference,
+        time_budget=analyzer_budget,
+        job_id=ctx.job.id,
+        on_partial=ctx.publish_partial,
+        # Interactive lane: ahead of batch/background work for the DSP layer
+        dsp_slot=analysis_scheduler.slot("interactive", user_id=ctx.job.user_id),
+    )
+
+
+async def _groq_analysis(ctx):
+    from app.services.audio_analyzer import FULL_ANALYSIS_PIPELINE
+
+    return await FULL_ANALYSIS_PIPELINE.run(SimpleNamespace(file_path=ctx.file_path, fast=False))
+
+
+def _groq_transcription(ctx):
+    from app.services.groq_whisper import GroqWhisperService
+
+    return GroqWhisperService.transcribe_audio(ctx.file_path).get("text", "")
+
+
+async def _groq_metadata(ctx, groq_analysis, transcription):
+    from app.services.groq_whisper import GroqWhisperService
+
+    metadata = await GroqWhisperService.generate_metadata(
+        audio_analysis=groq_analysis,
+        transcription=transcription,
+        existing_metadata=groq_analysis.get("existing_metadata"),
+    )
+    return GroqWhisperService.merge_dsp(metadata, groq_analysis)
+
+
+def _find_near_duplicate(fingerprint, file_hash: str):
+    """Inverted-index lookup (IN-queries + offset voting) on its own session; run in a worker thread."""
+    from app.services.fingerprint_index import find_near_duplicate
+
+    db = SessionLocal()
+    try:
+        return find_near_duplicate(db, fingerprint, exclude_hash=file_hash)
+    finally:
+        db.close()
+
+
+def _no_groq(ctx, **_inputs) -> bool:
+    return not settings.GROQ_API_KEY
+
+
+ANALYSIS_PIPELINE = Pipeline("analysis", [
+    hash_stage,
+    Stage("tags", _read_tags, cache_key=lambda ctx: file_key(ctx.file_path), cost=0.2,
+          optional=True, fallback=lambda ctx, error: {}, blocking=True),
+    Stage("fingerprint", _fingerprint, cost=2, skip=lambda ctx: not settings.FINGERPRINT_DEDUPE),
+    Stage("fresh", _fresh, cost=15),
+    Stage("groq_analysis", _groq_analysis, cost=10, skip=_no_groq),
+    Stage("transcription", _groq_transcription, cost=10, blocking=True,
+          skip=lambda ctx: _no_groq(ctx) or not ctx.transcribe),
+    Stage("groq_metadata", _groq_metadata, inputs=("groq_analysis", "transcription"), cost=5, skip=_no_groq),
+])
+
+
+async def _run_analysis(
+    job_id: str,
+    file_path: str,
+    is_pro_mode: bool,
+    transcribe: bool,
+    is_fresh: bool,
+    model_preference: str,
+    time_budget_sec: int | None,
+):
+    db = SessionLocal()
+    graph = None
     try:
         job = db.query(Job).filter(Job.id == job_id).first()
         if not job:
             logger.error(f"Background Job {job_id} not found in database.")
             return
 
+        def checkpoint():
+            """Stage boundary: stop if cancelled here or (via the jobs table) on another worker."""
+            token = job_registry.get(job_id)
+            if token is not None:
+                token.raise_if_cancelled()
+            status = db.query(Job.status).filter(Job.id == job_id).scalar()
+            if status == "cancelled":
+                if token is not None:
+                    token.cancel("user")
+                raise JobCancelled("user")
+
+        checkpoint()
+
         if time_budget_sec is None:
             time_budget_sec = getattr(settings, "ANALYSIS_MAX_SECONDS", 20)
         deadline = time.monotonic() + float(time_budget_sec)
@@ -225,14 +452,25 @@ async def process_analysis(
         def remaining() -> float:
             return max(0.0, deadline - time.monotonic())
 
-        job.status = "processing"
-        job.message = "Calculating digital fingerprint (SHA-256)..."
-        db.commit()
-        await ws_manager.send_progress(job_id, job.message, progress=5)
+        async def publish_partial(layer: str, fields: dict):
+            await progress_reporter.publish_partial(
+                db, job, layer, partial_metadata(fields), progress=PARTIAL_PROGRESS.get(layer, 0)
+            )
+
+        # Only the cheap reads start now (hash, tags); the fingerprint, DSP
+        # and the Groq branch wait for the dedupe decision below, a cache hit
+        # makes them pure waste (CPU, Groq quota)
+        graph = ANALYSIS_PIPELINE.graph(SimpleNamespace(
+            job=job, file_path=file_path, transcribe=transcribe, model_preference=model_preference,
+            remaining=remaining, publish_partial=publish_partial,
+        ))
+        graph.start("hash", "tags")
+
+        await progress_reporter.update(db, job, "Calculating digital fingerprint (SHA-256)...", progress=5)
 
         # SHA-256 fingerprint for caching
-        from app.utils.hash_generator import generate_file_hash
-        file_hash = generate_file_hash(file_path)
+        file_hash = await graph.get("hash")
+        checkpoint()
 
         # Cache check
         from app.utils.caching import cache
@@ -240,36 +478,68 @@ async def process_analysis(
         if cached_result:
             logger.info(f"Cache HIT for Job {job_id} (Hash: {file_hash[:16]}...)")
             job.result = sanitize_metadata(cached_result)
-            job.status = "completed"
-            job.message = "Analysis complete (Restored from cache)."
-            db.commit()
-            await ws_manager.send_progress(job_id, job.message, progress=100, status="completed")
+            await progress_reporter.update(
+                db, job, "Analysis complete (Restored from cache).", progress=100, status="completed"
+            )
+            try:
+                from app.services.similarity import copy_embedding_for_hash
+                if copy_embedding_for_hash(db, job_id, job.user_id, file_hash):
+                    db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Embedding copy failed for Job {job_id}: {e}")
             return
 
+        # Near-duplicate check: same audio re-encoded or re-tagged has a new
+        # SHA-256 but the same perceptual fingerprint
+        fingerprint = None
+        if settings.FINGERPRINT_DEDUPE:
+            try:
+                fingerprint = await graph.get("fingerprint")
+                match = await asyncio.to_thread(_find_near_duplicate, fingerprint, file_hash)
+                matched_result = cache.get(match["file_hash"]) if match else None
+                if matched_result:
+                    logger.info(
+                        f"Fingerprint MATCH for Job {job_id}: {match['file_hash'][:16]}... (BER {match['ber']:.3f})"
+                    )
+                    result = sanitize_metadata(dict(matched_result))
+                    result["sha256"] = file_hash
+                    result["matchedBy"] = {
+                        "method": "audio_fingerprint",
+                        "sha256": match["file_hash"],
+                        "bitErrorRate": match["ber"],
+                    }
+                    cache.set(file_hash, result)
+                    job.result = result
+                    await progress_reporter.update(
+                        db, job, "Analysis complete (Matched by audio fingerprint).", progress=100, status="completed"
+                    )
+                    try:
+                        from app.services.similarity import copy_embedding_for_hash
+                        if copy_embedding_for_hash(db, job_id, job.user_id, file_hash, source_hash=match["file_hash"]):
+                            db.commit()
+                    except Exception as e:
+                        db.rollback()
+                        logger.warning(f"Embedding copy failed for Job {job_id}: {e}")
+                    return
+            except Exception as e:
+                logger.warning(f"Fingerprint lookup failed for Job {job_id}: {e}")
+
+        checkpoint()
         logger.info(f"Job {job_id}: Fast Local Pipeline (budget {time_budget_sec}s)...")
-        job.message = f"Fast analysis mode (<= {time_budget_sec}s)..."
-        db.commit()
-        await ws_manager.send_progress(job_id, job.message, progress=20)
-
-        from app.services.fresh_track_analyzer import FreshTrackAnalyzer
-        analyzer = FreshTrackAnalyzer()
-        analyzer_budget = max(15, int(remaining() - 2.0))
-
-        logger.info(f"Job {job_id}: Delegating to FreshTrackAnalyzer (budget {analyzer_budget}s)...")
-
-        metadata = await analyzer.analyze_fresh_track(
-            file_path=file_path,
-            include_lyrics=transcribe,
-            model_preference=model_preference,
-            time_budget=analyzer_budget,
-            job_id=job_id,
-        )
+        await progress_reporter.update(db, job, f"Fast analysis mode (<= {time_budget_sec}s)...", progress=20)
+
+        # Cache miss: Layers 1-3 and, with budget to spare, the Groq branch
+        # (transcription + metadata) run side by side
+        run_groq = bool(settings.GROQ_API_KEY) and remaining() > 5
+        graph.start("fresh", *(("groq_metadata",) if run_groq else ()))
+        metadata = await graph.get("fresh")
 
+        checkpoint()
         try:
-            if settings.GROQ_API_KEY and remaining() > 5:
-                from app.services.groq_whisper import GroqWhisperService
-                gr = await GroqWhisperService.full_pipeline(file_path, transcribe=transcribe)
-                gm = gr.get("metadata", {})
+            if run_groq:
+                # Has been running alongside Layer 1; wait only for what is left of the budget
+                gm = await graph.get("groq_metadata", timeout=remaining() - 3)
                 if isinstance(gm, dict) and gm:
                     for k, v in gm.items():
                         if v not in (None, "", [], {}):
@@ -281,9 +551,14 @@ async def process_analysis(
                                 metadata["trackDescription"] = gd if len(gd) > len(md) else md
                             else:
                                 metadata[k] = metadata.get(k) or v
+                    await publish_partial("groq", metadata)
+        except asyncio.TimeoutError:
+            logger.warning(f"Job {job_id}: Groq pipeline not finished within the budget, continuing without it")
         except Exception as e:
             logger.warning(f"Groq merge failed: {e}")
 
+        checkpoint()
+
         # Extract _tech_meta before sanitize (not a metadata field)
         tech_meta = metadata.pop("_tech_meta", {})
 
@@ -299,8 +574,7 @@ async def process_analysis(
         # Read existing file tags and merge (file tags win for identity fields only)
         file_tag_fields = set()
         try:
-            from app.services.audio_analyzer import AdvancedAudioAnalyzer
-            existing = AdvancedAudioAnalyzer.read_metadata(file_path) or {}
+            existing = await graph.get("tags")
             for field in ("title", "artist", "album", "year", "isrc", "upc", "catalogNumber", "copyright", "publisher"):
                 if existing.get(field) and not metadata.get(field):
                     metadata[field] = existing[field]
@@ -308,9 +582,7 @@ async def process_analysis(
         except Exception as e:
             logger.warning(f"Could not read existing file tags: {e}")
 
-        job.message = "Sanitizing and validating metadata..."
-        db.commit()
-        await ws_manager.send_progress(job_id, job.message, progress=85)
+        await progress_reporter.update(db, job, "Sanitizing and validating metadata...", progress=85)
 
         from app.utils.provenance import build_provenance
         provenance = build_provenance(metadata, file_tag_fields, metadata.get("confidence"))
@@ -321,10 +593,13 @@ async def process_analysis(
         # Store result and cache
         cache.set(file_hash, final_metadata)
         job.result = final_metadata
-        job.status = "completed"
-        job.message = f"Analysis complete ({tech_meta.get('analysis_time', 0):.1f}s, {len([v for v in tech_meta.get('llm_sources', []) if v])} LLMs)."
-        db.commit()
-        await ws_manager.send_progress(job_id, job.message, progress=100, status="completed")
+        await progress_reporter.update(
+            db,
+            job,
+            f"Analysis complete ({tech_meta.get('analysis_time', 0):.1f}s, {len([v for v in tech_meta.get('llm_sources', []) if v])} LLMs).",
+            progress=100,
+            status="completed",
+        )
 
         # Decrement user credits after successful analysis
         try:
@@ -344,18 +619,49 @@ async def process_analysis(
                 metadata_json=final_metadata,
                 result=final_metadata,
                 created_at=datetime.utcnow(),
+                **summary_fields(final_metadata),
             )
 
             db.add(history)
             db.commit()
         except Exception as e:
             logger.warning(f"History save failed: {e}")
-
+        else:
+            try:
+                from app.services.catalog import index_history_entry
+                index_history_entry(db, history, job_id=job_id)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Catalog indexing failed for Job {job_id}: {e}")
+
+        embedding = tech_meta.get("embedding") if isinstance(tech_meta, dict) else None
+        if embedding:
+            try:
+                from app.services.similarity import save_embedding
+                save_embedding(db, job_id, job.user_id, file_hash, embedding)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Embedding save failed for Job {job_id}: {e}")
+
+        if fingerprint is not None:
+            try:
+                from app.services.fingerprint_index import store_fingerprint
+                if store_fingerprint(db, file_hash, fingerprint):
+                    db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Fingerprint save failed for Job {job_id}: {e}")
+
+    except JobCancelled:
+        raise
     except Exception as e:
         logger.error(f"Background analysis failed for Job {job_id}: {e}", exc_info=True)
         # str(e) is empty for some exception types (e.g. bare `raise SomeError()`),
         # which used to produce an unhelpful "Analysis failed: " with no detail.
         error_detail = str(e) or type(e).__name__
+        progress_reporter.discard(job_id)
         try:
             job = db.query(Job).filter(Job.id == job_id).first()
             if job:
@@ -367,6 +673,10 @@ async def process_analysis(
         except Exception:
             pass
     finally:
+        if graph is not None:
+            # Early return (cache hit), error or cancellation: stop stages still running
+            graph.cancel()
+            logger.info(f"Job {job_id} stage timings: {graph.timings()}")
         db.close()
         # The uploaded file at file_path lives in ./uploads, which (unlike
         # temp_uploads) is never swept and isn't in a mounted volume — it
@@ -388,11 +698,16 @@ async def generate_analysis(
     transcribe: str = Form("true"),
     is_fresh: str = Form("false"),
     model_preference: str = Form("flash"),
+    profile: str = Form("false"),
     current_user: User | None = Depends(get_user_and_check_quota),
     db: Session = Depends(get_db),
 ):
     user = current_user or {"role": "guest"}
 
+    profile_job = profile.lower() == "true"
+    if profile_job and not getattr(current_user, "is_superuser", False):
+        raise HTTPException(status_code=403, detail="Profiling is available to admins only")
+
     # Validate file type
     allowed_exts = {".mp3", ".wav", ".flac", ".m4a", ".aac", ".ogg"}
     ext = os.path.splitext(file.filename)[1].lower()
@@ -432,16 +747,18 @@ async def generate_analysis(
         is_fresh=is_fresh.lower() == "true",
         model_preference=model_preference,
         time_budget_sec=time_budget,
+        profile=profile_job,
     )
 
     return {"job_id": job_id, "status": "pending"}
 
 
 @router.get("/job/{job_id}")
-async def get_job_status(job_id: str, db: Session = Depends(get_db)):
-    job = db.query(Job).filter(Job.id == job_id).first()
+async def get_job_status(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(Job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    job_registry.touch(job_id)
 
     response = {
         "id": job.id,
@@ -450,17 +767,141 @@ async def get_job_status(job_id: str, db: Session = Depends(get_db)):
         "file_name": job.file_name,
     }
 
+    # Live progress coalesced in memory is newer than the last DB checkpoint
+    live = progress_reporter.get(job_id)
+    if live and job.status not in TERMINAL_STATUSES:
+        response["message"] = live["message"]
+        response["progress"] = live["progress"]
+
+    # Fields settled by the layers finished so far (DSP first, then LLM)
+    if job.status not in TERMINAL_STATUSES:
+        partial = (live or {}).get("partial_result") or job.partial_result
+        if partial:
+            response["partial_result"] = partial
+
     if job.status == "completed" and job.result:
         response["result"] = job.result
     elif job.status == "error":
         response["error"] = job.error
 
+    if job.profile:
+        # Downloads need an admin token (GET /analysis/job/{id}/profile)
+        response["profile"] = {
+            **job.profile,
+            "download": {kind: f"/analysis/job/{job.id}/profile?format={kind}" for kind in job.profile.get("artifacts", [])},
+        }
+
     return response
 
 
+@router.get("/job/{job_id}/profile")
+async def download_job_profile(
+    job_id: str,
+    kind: str = Query("pstats", alias="format", pattern="^(pstats|collapsed)$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Profile artifact of a profiled job: pstats (snakeviz, pstats) or collapsed stacks (flamegraphs)."""
+    from fastapi.responses import FileResponse
+    from app.utils.profiler import artifact_path
+
+    if not getattr(current_user, "is_superuser", False):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    job = await db.get(Job, job_id)
+    if not job or not job.profile or kind not in job.profile.get("artifacts", []):
+        raise HTTPException(status_code=404, detail="No profile for this job")
+    path = artifact_path(job_id, kind)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile artifact no longer available")
+    media_type = "application/octet-stream" if kind == "pstats" else "text/plain; charset=utf-8"
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+
+@router.post("/job/{job_id}/cancel")
+async def cancel_job(
+    job_id: str,
+    current_user: User | None = Depends(get_current_user_optional),
+    db: Session = Depends(get_db),
+):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.user_id and not (
+        current_user and (str(current_user.id) == job.user_id or getattr(current_user, "is_superuser", False))
+    ):
+        raise HTTPException(status_code=403, detail="Not allowed to cancel this job")
+    if job.status in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+
+    # Running here: the task is cancelled now. Running on another worker (or
+    # still queued): that worker sees the status at its next stage boundary.
+    job_registry.cancel(job_id, "user")
+    progress_reporter.discard(job_id)
+    job.status = "cancelled"
+    job.message = "Analysis cancelled by user."
+    db.commit()
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@router.get("/similar/{job_id}")
+async def get_similar_tracks(
+    job_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Sound-alikes for an analyzed track, ranked by cosine similarity of the
+    Layer 1 embedding. Searches the caller's own analyses (admins: all).
+    """
+    import numpy as np
+    from app.services.similarity import similarity_index
+
+    job = await db.get(Job, job_id)
+    is_admin = bool(getattr(current_user, "is_superuser", False))
+    if not job or (job.user_id != str(current_user.id) and not is_admin):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    emb = (
+        await db.execute(select(TrackEmbedding).where(TrackEmbedding.job_id == job_id))
+    ).scalar_one_or_none()
+    if not emb:
+        raise HTTPException(status_code=404, detail="No embedding for this job (analysis incomplete or predates similarity search)")
+
+    await similarity_index.sync(db)
+    hits = similarity_index.search(
+        np.frombuffer(emb.vector, dtype=np.float32),
+        k=limit,
+        owner=None if is_admin else str(current_user.id),
+        exclude=[job_id],
+    )
+
+    tracks = {}
+    if hits:
+        rows = (
+            await db.execute(select(CatalogTrack).where(CatalogTrack.job_id.in_([h[0] for h in hits])))
+        ).scalars().all()
+        tracks = {t.job_id: t for t in rows}
+
+    results = []
+    for hit_job_id, score in hits:
+        t = tracks.get(hit_job_id)
+        results.append({
+            "job_id": hit_job_id,
+            "score": round(score, 4),
+            "file_name": t.file_name if t else None,
+            "bpm": t.bpm if t else None,
+            "key": t.key if t else None,
+            "mode": t.mode if t else None,
+            "mainGenre": t.main_genre if t else None,
+        })
+    return {"job_id": job_id, "results": results}
+
+
 @router.websocket("/ws/{job_id}")
 async def analysis_websocket(websocket: WebSocket, job_id: str):
     await ws_manager.connect(websocket, job_id)
+    job_registry.touch(job_id)
     try:
         while True:
             await asyncio.sleep(30)  # Keep-alive ping
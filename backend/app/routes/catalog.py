@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Literal, Optional
+from app.db import get_async_db, CatalogTrackMood
+from app.routes.auth import get_current_user
+from app.services.catalog import build_search_query, serialize_track
+
+router = APIRouter(prefix="/catalog", tags=["catalog"])
+
+
+@router.get("/search")
+async def search_catalog(
+    bpm_min: Optional[float] = None,
+    bpm_max: Optional[float] = None,
+    key: Optional[str] = None,
+    mode: Optional[str] = None,
+    genre: Optional[str] = None,
+    mood: Optional[List[str]] = Query(None, description="Repeatable; all must match"),
+    energy: Optional[str] = None,
+    duration_min: Optional[float] = None,
+    duration_max: Optional[float] = None,
+    sort: Literal["created_at", "bpm", "duration", "file_name"] = "created_at",
+    order: Literal["asc", "desc"] = "desc",
+    all_users: bool = False,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Any = Depends(get_current_user),
+):
+    """
+    Filters and sorts analyzed tracks using the indexed catalog columns, e.g.
+    ?bpm_min=120&bpm_max=128&key=A&mode=Minor&mood=Dark. Admins can pass
+    all_users=true to search across every account.
+    """
+    scope = None if (all_users and getattr(current_user, "is_superuser", False)) else str(current_user.id)
+    stmt, count_stmt = build_search_query(
+        user_id=scope,
+        bpm_min=bpm_min,
+        bpm_max=bpm_max,
+        key=key,
+        mode=mode,
+        genre=genre,
+        moods=mood,
+        energy=energy,
+        duration_min=duration_min,
+        duration_max=duration_max,
+        sort=sort,
+        order=order,
+    )
+
+    total = (await db.execute(count_stmt)).scalar_one()
+    tracks = (await db.execute(stmt.offset(offset).limit(limit))).scalars().all()
+
+    moods_by_track = {t.id: [] for t in tracks}
+    if tracks:
+        mood_rows = await db.execute(
+            select(CatalogTrackMood.track_id, CatalogTrackMood.mood)
+            .where(CatalogTrackMood.track_id.in_(list(moods_by_track)))
+            .order_by(CatalogTrackMood.mood)
+        )
+        for track_id, m in mood_rows:
+            moods_by_track[track_id].append(m)
+
+    return {
+        "items": [serialize_track(t, moods_by_track[t.id]) for t in tracks],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+    }
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import os
 import logging
-import librosa
 import secrets
 
-from app.db import SessionLocal, Job, Certificate, VerificationEvent
+from app.db import SessionLocal, Job, Certificate, VerificationEvent, get_async_db
 from app.dependencies import get_user_and_check_quota
 from app.utils.hash_generator import generate_file_hash
 from app.services.certificate_pdf import generate_certificate_pdf, CERT_DIR
@@ -31,6 +32,8 @@ def _build_upload_path(job: Job) -> str:
 
 def _calculate_duration_seconds(file_path: str) -> float:
     try:
+        import librosa
+
         duration = librosa.get_duration(filename=file_path)
         return float(duration)
     except Exception as e:
@@ -297,30 +300,31 @@ async def list_certificates(
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
     current_user=Depends(get_user_and_check_quota),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Returns a paginated list of certificates for the current user.
     Admins receive all certificates.
     """
-    query = db.query(Certificate)
+    query = select(Certificate)
     # If user is not present, return empty
     if not current_user:
         return {"items": [], "count": 0}
     try:
         from app.admin_config import is_admin
         if not is_admin(getattr(current_user, "email", None)):
-            query = query.filter(Certificate.user_id == current_user.id)
+            query = query.where(Certificate.user_id == current_user.id)
     except Exception:
-        query = query.filter(Certificate.user_id == current_user.id)
+        query = query.where(Certificate.user_id == current_user.id)
 
-    count = query.count()
+    count = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
     items = (
-        query.order_by(Certificate.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+        await db.execute(
+            query.order_by(Certificate.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+    ).scalars().all()
     def _serialize(c: Certificate):
         return {
             "id": c.id,
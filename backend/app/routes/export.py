@@ -4,7 +4,8 @@ Export Routes - CSV, JSON, and other format exports
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse, Response
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any, List
 from datetime import datetime
 import csv
@@ -12,20 +13,12 @@ import json
 import io
 import logging
 
-from app.db import SessionLocal, Job
+from app.db import Job, get_async_db
 
 router = APIRouter(prefix="/export", tags=["export"])
 logger = logging.getLogger(__name__)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def metadata_to_csv_row(metadata: Dict[str, Any], filename: str, ipfs_hash: str = None, ipfs_url: str = None) -> Dict[str, str]:
     """
     Convert metadata dictionary to CSV row compatible with MP3Tag and DAWs.
@@ -102,14 +95,14 @@ def metadata_to_csv_row(metadata: Dict[str, Any], filename: str, ipfs_hash: str
 
 
 @router.get("/csv/{job_id}")
-async def export_csv(job_id: str, db: Session = Depends(get_db)):
+async def export_csv(job_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Export analysis results to CSV format (MP3Tag compatible).
     
     Returns CSV file for download.
     """
     try:
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = await db.get(Job, job_id)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
         
@@ -175,7 +168,7 @@ async def export_csv(job_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/json/{job_id}")
-async def export_json(job_id: str, pretty: bool = True, db: Session = Depends(get_db)):
+async def export_json(job_id: str, pretty: bool = True, db: AsyncSession = Depends(get_async_db)):
     """
     Export analysis results to JSON format.
     
@@ -186,7 +179,7 @@ async def export_json(job_id: str, pretty: bool = True, db: Session = Depends(ge
     Returns JSON file for download.
     """
     try:
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = await db.get(Job, job_id)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
         
@@ -229,7 +222,7 @@ async def export_json(job_id: str, pretty: bool = True, db: Session = Depends(ge
 
 
 @router.post("/batch/csv")
-async def export_batch_csv(job_ids: List[str], db: Session = Depends(get_db)):
+async def export_batch_csv(job_ids: List[str], db: AsyncSession = Depends(get_async_db)):
     """
     Export multiple analysis results to a single CSV file.
     
@@ -240,7 +233,7 @@ async def export_batch_csv(job_ids: List[str], db: Session = Depends(get_db)):
     """
     try:
         # Fetch all jobs
-        jobs = db.query(Job).filter(Job.id.in_(job_ids)).all()
+        jobs = (await db.execute(select(Job).where(Job.id.in_(job_ids)))).scalars().all()
         
         if not jobs:
             raise HTTPException(status_code=404, detail="No jobs found")
@@ -289,7 +282,7 @@ async def export_batch_csv(job_ids: List[str], db: Session = Depends(get_db)):
 
 
 @router.post("/batch/json")
-async def export_batch_json(job_ids: List[str], pretty: bool = True, db: Session = Depends(get_db)):
+async def export_batch_json(job_ids: List[str], pretty: bool = True, db: AsyncSession = Depends(get_async_db)):
     """
     Export multiple analysis results to a single JSON file.
     
@@ -301,7 +294,7 @@ async def export_batch_json(job_ids: List[str], pretty: bool = True, db: Session
     """
     try:
         # Fetch all jobs
-        jobs = db.query(Job).filter(Job.id.in_(job_ids)).all()
+        jobs = (await db.execute(select(Job).where(Job.id.in_(job_ids)))).scalars().all()
         
         if not jobs:
             raise HTTPException(status_code=404, detail="No jobs found")
@@ -346,12 +339,12 @@ async def export_batch_json(job_ids: List[str], pretty: bool = True, db: Session
         logger.error(f"Batch JSON export failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 @router.get("/ddex/{job_id}")
-async def export_ddex(job_id: str, db: Session = Depends(get_db)):
+async def export_ddex(job_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Export analysis results to DDEX ERN 4.3 XML format.
     """
     try:
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = await db.get(Job, job_id)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
         
@@ -402,12 +395,12 @@ async def export_ddex(job_id: str, db: Session = Depends(get_db)):
 
 
 @router.get("/cwr/{job_id}")
-async def export_cwr(job_id: str, db: Session = Depends(get_db)):
+async def export_cwr(job_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Export analysis results to CWR (Common Works Registration) V2.1 format.
     """
     try:
-        job = db.query(Job).filter(Job.id == job_id).first()
+        job = await db.get(Job, job_id)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
         
@@ -10,13 +10,21 @@ import tempfile
 import os
 import logging
 
-from ..services.fresh_track_analyzer import FreshTrackAnalyzer
 from ..config import settings
 
 router = APIRouter(prefix="/fresh", tags=["fresh-analysis"])
 logger = logging.getLogger(__name__)
 
-analyzer = FreshTrackAnalyzer()
+_analyzer = None
+
+
+def get_analyzer():
+    """FreshTrackAnalyzer created on first request (loads the librosa/LLM stack)"""
+    global _analyzer
+    if _analyzer is None:
+        from ..services.fresh_track_analyzer import FreshTrackAnalyzer
+        _analyzer = FreshTrackAnalyzer()
+    return _analyzer
 
 
 @router.post("/analyze")
@@ -64,7 +72,7 @@ async def analyze_fresh_track(
         logger.info(f"Analyzing fresh track: {file.filename}")
         
         # Run analysis
-        result = await analyzer.analyze_fresh_track(
+        result = await get_analyzer().analyze_fresh_track(
             tmp_path,
             include_lyrics=include_lyrics,
             time_budget=settings.ANALYSIS_MAX_SECONDS
@@ -1,12 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
 from pydantic import BaseModel, Field
-from typing import Dict, Any, List
+from typing import TYPE_CHECKING, Dict, Any, List
 import json
 import logging
 import random
 import base64
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
 import httpx
 import asyncio
 from urllib.parse import quote
@@ -15,6 +14,9 @@ from app.config import settings
 from app.dependencies import get_user_and_check_quota
 from app.services.groq_whisper import get_groq_client
 
+if TYPE_CHECKING:
+    from PIL import Image  # Pillow is imported where images are made, not at startup
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/generate", tags=["generative"])
@@ -131,7 +133,9 @@ class CoverGenerationService:
         artist: str,
         genre: str,
         retries: int = 3,
-    ) -> Image.Image | None:
+    ) -> "Image.Image | None":
+        from PIL import Image
+
         for attempt in range(retries):
             try:
                 prompt = await CoverGenerationService.generate_enhanced_prompt(
@@ -159,7 +163,9 @@ class CoverGenerationService:
         return None
 
     @staticmethod
-    def create_smart_gradient(genre: str, title: str) -> Image.Image:
+    def create_smart_gradient(genre: str, title: str) -> "Image.Image":
+        from PIL import Image
+
         genre_colors = {
             "metal": [(30, 0, 20), (120, 0, 0)],
             "rock": [(50, 25, 0), (150, 50, 0)],
@@ -229,7 +235,9 @@ async def generate_cover(request: CoverRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def _overlay_text_on_cover(image: Image.Image, title: str, artist: str) -> Image.Image:
+def _overlay_text_on_cover(image: "Image.Image", title: str, artist: str) -> "Image.Image":
+    from PIL import Image, ImageDraw, ImageFont
+
     width, height = image.size
     draw = ImageDraw.Draw(image, "RGBA")
 
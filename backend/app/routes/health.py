@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from app.config import settings
+from app.utils.model_registry import model_registry
 import os
 
 router = APIRouter(prefix="/health", tags=["health"])
@@ -20,6 +21,7 @@ async def diagnose_system():
             "SPOTIFY_CLIENT_ID": "Present" if settings.SPOTIFY_CLIENT_ID else "Missing",
         },
         "system": {"os": os.name, "cwd": os.getcwd()},
+        "models": model_registry.status(),
     }
     return checks
 
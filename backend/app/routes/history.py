@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends
+import base64
+import binascii
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, and_, or_
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from app.db import get_db, AnalysisHistory
+from typing import Dict, Any, Optional, Tuple
+from app.db import get_db, get_async_db, AnalysisHistory
 from app.routes.auth import get_current_user
+from app.services.catalog import index_history_entry, summary_fields
 from datetime import datetime
 
 router = APIRouter(prefix="/history", tags=["history"])
+logger = logging.getLogger(__name__)
 
 
 # Pydantic model for the request body
@@ -15,6 +22,20 @@ class HistoryCreate(BaseModel):
     result: Dict[str, Any]
 
 
+def encode_cursor(created_at: datetime, history_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{history_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, history_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), int(history_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.post("", response_model=None)
 async def add_history(
     history_data: HistoryCreate,
@@ -29,33 +50,102 @@ async def add_history(
         file_name=history_data.file_name,
         result=history_data.result,
         created_at=datetime.utcnow(),
+        **summary_fields(history_data.result),
     )
     db.add(history_entry)
     db.commit()
+    try:
+        index_history_entry(db, history_entry)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Catalog indexing failed for history {history_entry.id}: {e}")
     db.refresh(history_entry)
     return history_entry
 
 
-@router.get("", response_model=List[Dict[str, Any]])
+@router.get("")
 async def get_history(
-    db: Session = Depends(get_db), current_user: Any = Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Any = Depends(get_current_user),
 ):
     """
-    Retrieves all analysis records for the currently authenticated user.
+    Lists the current user's analyses, newest first, one page at a time.
+
+    Keyset pagination over (user_id, created_at, id): pass the returned
+    next_cursor to get the following page. Rows carry only the summary
+    columns; fetch GET /history/{id} for the full result.
     """
-    history_records = (
-        db.query(AnalysisHistory)
-        .filter(AnalysisHistory.user_id == str(current_user.id))
-        .order_by(AnalysisHistory.created_at.desc())
-        .all()
-    )
-    return [
-        {
-            "id": h.id,
-            "user_id": h.user_id,
-            "file_name": h.file_name,
-            "result": h.result or getattr(h, "metadata_json", None) or {},
-            "created_at": h.created_at.isoformat() if getattr(h, "created_at", None) else None,
-        }
-        for h in history_records
-    ]
+    stmt = select(
+        AnalysisHistory.id,
+        AnalysisHistory.file_name,
+        AnalysisHistory.file_hash,
+        AnalysisHistory.main_genre,
+        AnalysisHistory.bpm,
+        AnalysisHistory.musical_key,
+        AnalysisHistory.mode,
+        AnalysisHistory.created_at,
+    ).where(AnalysisHistory.user_id == str(current_user.id))
+
+    if cursor:
+        after_created, after_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                AnalysisHistory.created_at < after_created,
+                and_(AnalysisHistory.created_at == after_created, AnalysisHistory.id < after_id),
+            )
+        )
+
+    rows = (
+        await db.execute(
+            stmt.order_by(AnalysisHistory.created_at.desc(), AnalysisHistory.id.desc()).limit(limit + 1)
+        )
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if last.created_at is not None:
+            next_cursor = encode_cursor(last.created_at, last.id)
+
+    return {
+        "items": [
+            {
+                "id": r.id,
+                "file_name": r.file_name,
+                "file_hash": r.file_hash,
+                "mainGenre": r.main_genre,
+                "bpm": r.bpm,
+                "key": r.musical_key,
+                "mode": r.mode,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            }
+            for r in rows
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/{history_id}")
+async def get_history_item(
+    history_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Any = Depends(get_current_user),
+):
+    """
+    Returns one analysis record with its full result JSON.
+    """
+    h = await db.get(AnalysisHistory, history_id)
+    if not h or h.user_id != str(current_user.id):
+        raise HTTPException(status_code=404, detail="History entry not found")
+    return {
+        "id": h.id,
+        "user_id": h.user_id,
+        "file_name": h.file_name,
+        "file_hash": h.file_hash,
+        "result": h.result or getattr(h, "metadata_json", None) or {},
+        "created_at": h.created_at.isoformat() if getattr(h, "created_at", None) else None,
+    }
@@ -0,0 +1,115 @@
+"""
+Metrics Route - Prometheus scrape endpoint (GET /api/metrics)
+
+Latency histograms and counters are recorded where the work happens (see
+app.utils.metrics); the gauges and counters below read state the scheduler,
+batch pipeline, job registry, progress reporter and model registry already
+keep, at scrape time. Set METRICS_TOKEN to require "Authorization: Bearer
+<token>" from the scraper.
+"""
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import metrics
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _active_jobs():
+    from app.utils.cancellation import job_registry
+
+    return {(): len(job_registry.tokens)}
+
+
+def _cancelled_jobs():
+    from app.utils.cancellation import job_registry
+
+    return {(): job_registry.cancelled_total}
+
+
+def _scheduler(field: str):
+    def collect():
+        from app.utils.scheduler import analysis_scheduler
+
+        return {(lane,): n for lane, n in analysis_scheduler.status()[field].items()}
+
+    return collect
+
+
+def _scheduler_preempted():
+    from app.utils.scheduler import analysis_scheduler
+
+    return {(): analysis_scheduler.preempted}
+
+
+def _batch_stages(field: str):
+    def collect():
+        from app.services.batch_processor import batch_processor
+
+        return {(name,): stage.status()[field] for name, stage in batch_processor.stages.items()}
+
+    return collect
+
+
+def _batch_active():
+    from app.services.batch_processor import batch_processor
+
+    return {(): len(batch_processor.active_jobs)}
+
+
+def _batch_db_commits():
+    from app.services.batch_processor import batch_processor
+
+    return {(): batch_processor.db_commits}
+
+
+def _progress(field: str):
+    def collect():
+        from app.utils.progress import progress_reporter
+
+        return {(): getattr(progress_reporter, field)}
+
+    return collect
+
+
+def _models(field: str):
+    def collect():
+        from app.utils.model_registry import model_registry
+
+        return {(name,): getattr(entry, field) for name, entry in model_registry.entries.items()}
+
+    return collect
+
+
+metrics.gauge("active_jobs", "Analysis jobs running on this worker", collect=_active_jobs)
+metrics.counter("jobs_cancelled_total", "Jobs cancelled (user, unwatched, shutdown)", collect=_cancelled_jobs)
+metrics.gauge("scheduler_running", "Analysis slots in use by lane", ("lane",), collect=_scheduler("running"))
+metrics.gauge("scheduler_queued", "Jobs waiting for an analysis slot by lane", ("lane",), collect=_scheduler("queued"))
+metrics.counter("scheduler_granted_total", "Analysis slots granted by lane", ("lane",), collect=_scheduler("granted"))
+metrics.counter("scheduler_preempted_total", "Lower-lane jobs that yielded their slot", collect=_scheduler_preempted)
+metrics.gauge("batch_queue_depth", "Items waiting in each batch pipeline stage", ("stage",), collect=_batch_stages("queued"))
+metrics.gauge("batch_stage_busy", "Busy workers in each batch pipeline stage", ("stage",), collect=_batch_stages("busy"))
+metrics.counter("batch_stage_processed_total", "Items each batch stage finished", ("stage",), collect=_batch_stages("processed"))
+metrics.counter("batch_stage_failed_total", "Items each batch stage failed", ("stage",), collect=_batch_stages("failed"))
+metrics.gauge("batch_active_jobs", "Batch jobs in flight", collect=_batch_active)
+metrics.counter("batch_db_commits_total", "Grouped result commits of the batch writer", collect=_batch_db_commits)
+metrics.counter("progress_writes_total", "Job progress rows written", collect=_progress("writes"))
+metrics.counter("progress_coalesced_total", "Job progress updates folded into a later write", collect=_progress("coalesced"))
+metrics.gauge("model_resident_bytes", "Accounted memory of loaded models", ("model",), collect=_models("resident_bytes"))
+metrics.gauge("model_in_use", "Jobs currently holding a model", ("model",), collect=_models("in_use"))
+metrics.counter("model_loads_total", "Model loads (first use, warm-up, reload after eviction)", ("model",), collect=_models("loads"))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(authorization: Optional[str] = Header(None)):
+    token = os.getenv("METRICS_TOKEN")
+    if token and not hmac.compare_digest(authorization or "", f"Bearer {token}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
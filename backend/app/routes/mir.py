@@ -1,6 +1,7 @@
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, BackgroundTasks, Depends
 from fastapi.responses import JSONResponse, FileResponse
 from app.services.mir import MIRService
+from app.dependencies import get_current_user_optional
 import shutil
 import os
 import uuid
@@ -110,11 +111,17 @@ async def tag_and_download_track(
 @router.post("/batch_analyze")
 async def batch_analyze_tracks(
     background_tasks: BackgroundTasks,
-    files: list[UploadFile] = File(...)
+    files: list[UploadFile] = File(...),
+    priority: str = Form("batch"),
+    describe: bool = Form(False),
+    current_user=Depends(get_current_user_optional),
 ):
     """
     Batch analyze multiple audio files with optimized processing.
-    Files are processed concurrently using the BatchProcessor service.
+    Files are processed concurrently using the BatchProcessor service,
+    in the "batch" scheduler lane (or "background" for re-processing), so
+    interactive uploads keep priority over them. describe=true adds LLM
+    metadata per file.
     
     Returns job IDs that can be used to track progress.
     """
@@ -127,6 +134,9 @@ async def batch_analyze_tracks(
             status_code=503,
             content={"error": "MIR libraries not available"}
         )
+    if priority not in ("batch", "background"):
+        return JSONResponse(status_code=400, content={"error": "priority must be 'batch' or 'background'"})
+    user_id = str(current_user.id) if current_user else None
     
     db = SessionLocal()
     job_file_pairs = []
@@ -145,6 +155,7 @@ async def batch_analyze_tracks(
             # Create job record
             job = Job(
                 id=file_id,
+                user_id=user_id,
                 file_name=file.filename,
                 status="queued",
                 timestamp=datetime.now()
@@ -156,7 +167,7 @@ async def batch_analyze_tracks(
         
         # Process batch in background
         async def process_and_cleanup():
-            await batch_processor.process_batch(job_file_pairs)
+            await batch_processor.process_batch(job_file_pairs, lane=priority, user_id=user_id, describe=describe)
             # Cleanup files after processing
             for _, file_path in job_file_pairs:
                 if os.path.exists(file_path):
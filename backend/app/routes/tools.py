@@ -1,6 +1,8 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
 from fastapi.responses import FileResponse, JSONResponse
 from starlette.background import BackgroundTask
+from typing import List
+import asyncio
 import tempfile
 import os
 import shutil
@@ -10,7 +12,13 @@ from mutagen.id3 import ID3
 from mutagen.flac import FLAC
 from mutagen.wave import WAVE
 from app.utils.validator import MetadataValidator
-from app.db import SessionLocal, Job
+from app.db import SessionLocal, Job, User
+from app.dependencies import get_current_user_optional
+from app.routes.auth import get_current_user
+from app.services.fingerprint_engine import fingerprint_engine, find_duplicates
+from app.services.fingerprint_index import find_near_duplicate, store_fingerprint
+from app.utils.audio_fingerprint import encode_fingerprint, fingerprint_duration, fingerprint_to_bytes
+from app.utils.hash_generator import generate_file_hash
 import json
 import zipfile
 import io
@@ -134,42 +142,128 @@ async def convert_format(
         cleanup_file(output_path)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/tools/fingerprint")
-async def get_fingerprint(file: UploadFile = File(...)):
-    """
-    Generates a Chromaprint/AcoustID hash for fingerprinting.
-    """
-    suffix = os.path.splitext(file.filename)[1].lower()
+MAX_FINGERPRINT_BATCH = 50
+
+
+def _save_upload(file: UploadFile) -> str:
+    suffix = os.path.splitext(file.filename or "")[1].lower()
     fd, path = tempfile.mkstemp(suffix=suffix)
     os.close(fd)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(file.file, f)
+    return path
+
+
+def _fingerprint_payload(filename: str, file_hash: str, fp) -> dict:
+    return {
+        "filename": filename,
+        "sha256": file_hash,
+        "duration": round(fingerprint_duration(fp), 2),
+        "codes": int(len(fp)),
+        "fingerprint": encode_fingerprint(fp),
+        "format": "u32le-base64",
+        "fingerprint_short": fingerprint_to_bytes(fp)[:32].hex(),
+        "status": "generated",
+        "provider": "in-process",
+    }
 
+
+def _lookup_and_index(entries: list, index: bool) -> None:
+    """Catalog lookup (and optional indexing) for (payload, fp) pairs; sync DB work."""
+    db = SessionLocal()
     try:
-        with open(path, 'wb') as f:
-            shutil.copyfileobj(file.file, f)
+        for payload, fp in entries:
+            payload["match"] = find_near_duplicate(db, fp, exclude_hash=payload["sha256"])
+            if index:
+                payload["indexed"] = store_fingerprint(db, payload["sha256"], fp)
+        if index:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-        # Use fpcalc if available, or ffmpeg chromaprint
-        # Since we saw chromaprint in ffmpeg -version, we use ffmpeg to get it
-        cmd = [
-            'ffmpeg', '-i', path, 
-            '-f', 'chromaprint', 
-            '-'
-        ]
-        
-        process = subprocess.run(cmd, capture_output=True)
-        
-        # Result is binary data, converting to hex for JSON
-        fingerprint = process.stdout.hex() if process.stdout else "unknown"
-        
+
+def _require_index_access(index: bool, current_user) -> None:
+    # The index drives duplicate detection for every user's uploads
+    if index and not getattr(current_user, "is_superuser", False):
+        raise HTTPException(status_code=403, detail="Adding fingerprints to the index is available to admins only")
+
+
+@router.post("/tools/fingerprint")
+async def get_fingerprint(
+    file: UploadFile = File(...),
+    index: bool = Form(False),
+    current_user: User | None = Depends(get_current_user_optional),
+):
+    """
+    Generates a perceptual fingerprint for the file and looks it up in the
+    catalog index. index=true (admins only) also adds it to the index.
+    """
+    _require_index_access(index, current_user)
+    path = _save_upload(file)
+    try:
+        fp = await fingerprint_engine.fingerprint_file(path)
+        file_hash = await asyncio.to_thread(generate_file_hash, path)
+        payload = _fingerprint_payload(file.filename, file_hash, fp)
+        await asyncio.to_thread(_lookup_and_index, [(payload, fp)], index)
+        return payload
+    except Exception as e:
+        logger.error(f"Fingerprint failed for {file.filename}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
         cleanup_file(path)
+
+
+@router.post("/tools/fingerprint/batch")
+async def get_fingerprints_batch(
+    files: List[UploadFile] = File(...),
+    index: bool = Form(False),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Fingerprints many files in parallel, reports near-duplicates within the
+    batch and, per file, any match already in the catalog index. Requires a
+    signed-in user; index=true (admins only) also adds them to the index.
+    """
+    _require_index_access(index, current_user)
+    if len(files) > MAX_FINGERPRINT_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FINGERPRINT_BATCH} files per batch.")
+
+    paths = [_save_upload(f) for f in files]
+    try:
+        prints = await fingerprint_engine.fingerprint_files(paths)
+        results, entries, valid = [], [], []
+        for file, path, fp in zip(files, paths, prints):
+            if isinstance(fp, Exception):
+                logger.warning(f"Fingerprint failed for {file.filename}: {fp}")
+                results.append({"filename": file.filename, "status": "failed", "error": str(fp)})
+                valid.append(None)
+                continue
+            file_hash = await asyncio.to_thread(generate_file_hash, path)
+            payload = _fingerprint_payload(file.filename, file_hash, fp)
+            results.append(payload)
+            entries.append((payload, fp))
+            valid.append(fp)
+
+        if entries:
+            await asyncio.to_thread(_lookup_and_index, entries, index)
+        duplicates = await asyncio.to_thread(find_duplicates, valid)
         return {
-            "filename": file.filename,
-            "fingerprint_short": fingerprint[:64],
-            "status": "generated",
-            "provider": "ffmpeg-chromaprint"
+            "files": results,
+            "duplicates": [
+                {"a": files[d["a"]].filename, "b": files[d["b"]].filename, "ber": d["ber"]} for d in duplicates
+            ],
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        cleanup_file(path)
+        logger.error(f"Batch fingerprint failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for path in paths:
+            cleanup_file(path)
 
 @router.post("/tools/bulk-export")
 async def bulk_export(job_ids: str = Form(...)):
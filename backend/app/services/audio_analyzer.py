@@ -3,13 +3,22 @@ Advanced Audio Analysis Service
 Zero-cost local audio analysis using open-source libraries.
 """
 
+import asyncio
 import os
 import logging
 import numpy as np
-from typing import Dict, Any
+from types import SimpleNamespace
+from typing import Dict, Any, Optional
+
+from app.utils.model_registry import model_registry
+from app.utils.scheduler import preemption_point
+from app.utils.task_graph import Pipeline, Stage, file_key
 
 logger = logging.getLogger(__name__)
 
+# Longest span decoded into memory for whole-signal extractors
+MAX_DECODE_SECONDS = 600.0
+
 
 # === LAZY IMPORTS (to avoid startup crashes if lib missing) ===
 def get_librosa():
@@ -39,12 +48,6 @@ def get_tinytag():
     return TinyTag
 
 
-def get_spleeter():
-    from spleeter.separator import Separator
-
-    return Separator
-
-
 class AdvancedAudioAnalyzer:
     """
     Comprehensive audio analysis using local, zero-cost libraries.
@@ -80,43 +83,56 @@ class AdvancedAudioAnalyzer:
             import numpy as np
             logger.info(f"Using Essentia Standard for analysis (Fast Mode: {fast})...")
             
-            # Loader
-            loader = es.MonoLoader(filename=file_path)
-            audio = loader()
-            duration = len(audio) / 44100.0
-
-            # Rhythm
-            # We use "multifeature" (High Quality) but on a smart slice to meet 20s limit
-            # This ensures Professional Accuracy without timeouts
-            analysis_audio = audio
-            if fast and duration > 90:
-                # Smart Slicing: Analyze middle 90s for best BPM/Key detection
-                # This drastically reduces CPU time while keeping algorithm quality MAXED
-                mid_point = duration / 2
-                start_sample = int((mid_point - 45) * 44100)
-                end_sample = int((mid_point + 45) * 44100)
-                # Bounds check
-                start_sample = max(0, start_sample)
-                end_sample = min(len(audio), end_sample)
-                analysis_audio = audio[start_sample:end_sample]
-                logger.info(f"Smart Slicing active: Analyzing {len(analysis_audio)/44100:.1f}s segment")
-
-            rhythm_extractor = es.RhythmExtractor2013(method="multifeature")
-            bpm, ticks, confidence, estimates, bpm_intervals = rhythm_extractor(analysis_audio)
-
-            # Key
-            key_extractor = es.KeyExtractor()
-            key, scale, strength = key_extractor(analysis_audio)
-
-            # Extra metrics to avoid Librosa double-load
-            # Energy (RMS) - Calculate on full audio for accuracy, it's fast (numpy)
-            energy_mean = float(np.sqrt(np.mean(audio**2)))
-            
-            # Danceability - Calculate on slice (expensive)
-            danceability, _ = es.Danceability()(analysis_audio)
-            
-            # Zero Crossing Rate - Calculate on slice
-            zcr = es.ZeroCrossingRate()(analysis_audio)
+            from app.utils.audio_stream import AudioStream
+            from app.utils.stream_features import stream_rms
+            from app.utils.window_sampler import central_value, load_windows, map_windows, plan_windows, weighted_vote
+
+            # Fast mode: 3 x 30 s windows across the track (same 90 s budget
+            # as the old middle slice). Full mode: up to MAX_DECODE_SECONDS
+            # from the middle; a full-file MonoLoader of an hour-long mix is
+            # ~600 MB of float32.
+            duration = AudioStream(file_path).duration
+            if fast:
+                windows = plan_windows(duration, 3, 30.0)
+            else:
+                span = min(duration, MAX_DECODE_SECONDS)
+                windows = [(max(0.0, duration / 2 - span / 2) if duration > span else 0.0, span)]
+            segments, _ = load_windows(file_path, windows, sr=44100)
+            segments = [a for a in segments if len(a) > 44100 * 5] or segments
+            logger.info(f"Essentia: analyzing {len(segments)} window(s), {sum(map(len, segments))/44100:.1f}s")
+
+            def analyze_window(audio):
+                with essentia.borrow() as algos:
+                    bpm, _, _, _, _ = algos.rhythm(audio)
+                    key, scale, strength = algos.key(audio)
+                    danceability, _ = algos.danceability(audio)
+                    return {
+                        "bpm": float(bpm),
+                        "key": key,
+                        "scale": scale,
+                        "strength": float(strength),
+                        "danceability": float(danceability),
+                        "zcr": float(algos.zcr(audio)),
+                        "seconds": len(audio) / 44100.0,
+                    }
+
+            # Algorithm instances come from the resident pool, not rebuilt per call
+            with model_registry.use("essentia") as essentia:
+                per_window = map_windows(analyze_window, segments)
+
+            # BPM: the window value closest to the median (octave errors);
+            # key: strength- and length-weighted vote
+            bpms = [w["bpm"] for w in per_window]
+            bpm = central_value(bpms)
+            key, scale = weighted_vote(
+                [(w["key"], w["scale"]) for w in per_window], [w["strength"] * w["seconds"] for w in per_window]
+            )
+            total_seconds = sum(w["seconds"] for w in per_window) or 1.0
+            danceability = sum(w["danceability"] * w["seconds"] for w in per_window) / total_seconds
+            zcr = sum(w["zcr"] * w["seconds"] for w in per_window) / total_seconds
+
+            # Energy (RMS) - whole file, streamed in constant memory
+            energy_mean = stream_rms(file_path)
             
             # Essentia returns BPM as float, Key as string
             return {
@@ -128,6 +144,8 @@ class AdvancedAudioAnalyzer:
                 "danceability": danceability,
                 "duration": duration,
                 "zcr": zcr,
+                "bpm_windows": [round(b, 1) for b in bpms],
+                "key_windows": [f"{w['key']} {w['scale']}" for w in per_window],
                 "success": True
             }
         except Exception as e:
@@ -135,10 +153,14 @@ class AdvancedAudioAnalyzer:
             return {"success": False, "error": str(e)}
 
     @staticmethod
-    def analyze_core(file_path: str, fast: bool = False) -> Dict[str, Any]:
+    def analyze_core(file_path: str, fast: bool = False, audio=None) -> Dict[str, Any]:
         """
         Core analysis: BPM, Key, Spectral features, Duration.
         Priority: Essentia -> Librosa
+
+        `audio` is an optional pre-decoded (y, sr) mono excerpt from the start
+        of the file (the batch pipeline decodes in its own stage); without it
+        the first 20 s (fast) / 60 s are loaded here.
         """
         
         # 1. Try Essentia First (User Request)
@@ -170,11 +192,18 @@ class AdvancedAudioAnalyzer:
             }
         
         # 2. Run Librosa for spectral features and fallback
+        # (stage boundary: batch work yields here to waiting uploads)
+        preemption_point()
         librosa = get_librosa()
 
         try:
             # Load audio for Librosa (needed for spectral features anyway)
-            y, sr = librosa.load(file_path, duration=20 if fast else 60)
+            limit = 20 if fast else 60
+            if audio is not None:
+                y, sr = audio
+                y = y[:int(limit * sr)]
+            else:
+                y, sr = librosa.load(file_path, duration=limit)
             
             rms = librosa.feature.rms(y=y)
             energy_mean = float(np.mean(rms))
@@ -367,44 +396,27 @@ class AdvancedAudioAnalyzer:
     @staticmethod
     def analyze_loudness(file_path: str) -> Dict[str, Any]:
         """
-        Loudness analysis: LUFS, True Peak.
-        Uses: pyloudnorm, librosa (for reliable decoding)
+        Loudness analysis: EBU R128 integrated LUFS, LRA, true peak.
+        Streams the whole file through app.utils.loudness in constant memory.
         """
         try:
-            librosa = get_librosa()
-            pyln = get_pyloudnorm()
-
-            # Load 60s for a very accurate LUFS estimate without decoding the whole file
-            y, sr = librosa.load(file_path, duration=60, mono=False)
-            
-            # Reshape for pyloudnorm (Samples, Channels)
-            if y.ndim == 1:
-                data = y.reshape(-1, 1)
-            else:
-                data = y.T 
+            from app.utils.loudness import measure_file
 
-            meter = pyln.Meter(sr)
-            loudness = meter.integrated_loudness(data)
+            report = measure_file(file_path)
+            loudness = report["integrated_lufs"]
 
-            # True Peak
-            true_peak = float(np.max(np.abs(y)))
-            true_peak_db = 20 * np.log10(true_peak) if true_peak > 0 else -np.inf
-
-            # Loudness range (simplified dynamic range)
-            loudness_range = 0
-            if data.shape[0] > sr * 3:
-                 # Check first 30s for range if long enough
-                 segment = data[:sr * 30]
-                 loudness_range = 8.0 # fallback or implement range logic if needed
-            
             # Normalization recommendation
-            target_lufs = -14  
-            gain_needed = target_lufs - loudness if not np.isinf(loudness) else 0
+            target_lufs = -14
+            gain_needed = target_lufs - loudness if loudness is not None else 0
 
             return {
-                "lufs": round(float(loudness), 2) if not np.isinf(loudness) else None,
-                "true_peak_db": round(float(true_peak_db), 2) if not np.isinf(true_peak_db) else None,
-                "loudness_range_lu": round(float(loudness_range), 2),
+                "lufs": loudness,
+                "true_peak_db": report["true_peak_db"],
+                "sample_peak_db": report["sample_peak_db"],
+                "loudness_range_lu": report["loudness_range_lu"],
+                "short_term_max_lufs": report["short_term_max_lufs"],
+                "momentary_max_lufs": report["momentary_max_lufs"],
+                "short_term": report["short_term"],
                 "normalization": {
                     "target_lufs": target_lufs,
                     "gain_needed_db": round(float(gain_needed), 2),
@@ -423,6 +435,7 @@ class AdvancedAudioAnalyzer:
         """
         try:
             librosa = get_librosa()
+            from app.utils.window_sampler import load_windows, map_windows, plan_windows
 
             # 1. Get total duration first
             try:
@@ -433,29 +446,36 @@ class AdvancedAudioAnalyzer:
             except Exception:
                 total_duration = 180 # Fallback 3 mins
 
-            # 2. Smart Slicing: Analyze the middle part where vocals are most prominent
-            # We take 20 seconds from the middle
-            offset = max(0, (total_duration / 2) - 10)
-            
+            # 2. Four 5 s windows spread across the track (same 20 s of pYIN work
+            # as the old middle slice), so intros, verses and outros all count
+            windows = plan_windows(total_duration, 4, 5.0)
             try:
-                y, sr = librosa.load(file_path, sr=None, mono=True, offset=offset, duration=20)
+                segments, sr = load_windows(file_path, windows)
             except Exception as load_err:
-                 logger.warning(f"Librosa load failed, trying from start: {load_err}")
-                 y, sr = librosa.load(file_path, sr=None, mono=True, duration=20)
+                logger.warning(f"Windowed load failed, trying from start: {load_err}")
+                y, sr = librosa.load(file_path, sr=None, mono=True, duration=20)
+                segments = [y]
+            segments = [y for y in segments if len(y) >= 2048] or segments
 
-            # Estimate f0 using pYIN
+            # Estimate f0 using pYIN, one window per thread
             # Higher resolution for better vocal detection
-            f0, voiced_flag, voiced_probs = librosa.pyin(
-                y, 
-                fmin=librosa.note_to_hz('C2'), 
-                fmax=librosa.note_to_hz('C7'), 
-                sr=sr,
-                fill_na=None
-            )
-            
-            if f0 is None:
+            def window_f0(y):
+                f0, _, _ = librosa.pyin(
+                    y,
+                    fmin=librosa.note_to_hz('C2'),
+                    fmax=librosa.note_to_hz('C7'),
+                    sr=sr,
+                    fill_na=None
+                )
+                return f0
+
+            per_window = [f for f in map_windows(window_f0, segments) if f is not None and len(f)]
+            if not per_window:
                  return {"vocal_presence": 0, "message": "No pitch detected"}
-                 
+
+            f0 = np.concatenate(per_window)
+            presence_windows = [round(float(np.mean(~np.isnan(f))), 2) for f in per_window]
+            
             confident_freqs = f0[~np.isnan(f0)]
 
             if len(confident_freqs) > 0:
@@ -483,10 +503,12 @@ class AdvancedAudioAnalyzer:
                     "average_note": freq_to_note(avg_pitch),
                     "pitch_range_hz": round(pitch_range, 2),
                     "vocal_presence": vocal_presence,
+                    "vocal_presence_windows": presence_windows,
+                    "vocal_presence_std": round(float(np.std(presence_windows)), 3),
                     "is_vocal": vocal_presence > 0.05
                 }
             
-            return {"vocal_presence": 0, "message": "Instrumental/No clear pitch"}
+            return {"vocal_presence": 0, "vocal_presence_windows": presence_windows, "message": "Instrumental/No clear pitch"}
 
         except Exception as e:
             logger.error(f"Pitch analysis failed: {e}")
@@ -545,10 +567,12 @@ class AdvancedAudioAnalyzer:
         stems: 2 (vocals/accompaniment), 4 (vocals/drums/bass/other), 5 (vocals/drums/bass/piano/other)
         """
         try:
-            Separator = get_spleeter()
+            # The separator (and its TF graph) stays resident between calls
+            def separate():
+                with model_registry.use(f"spleeter-{stems}stems") as separator:
+                    separator.separate_to_file(file_path, output_dir)
 
-            separator = Separator(f"spleeter:{stems}stems")
-            separator.separate_to_file(file_path, output_dir)
+            await asyncio.to_thread(separate)
 
             # Return paths to separated files
             base_name = os.path.splitext(os.path.basename(file_path))[0]
@@ -568,65 +592,41 @@ class AdvancedAudioAnalyzer:
     @staticmethod
     def full_analysis(file_path: str, fast: bool = False) -> Dict[str, Any]:
         """
-        Run all available analyses and combine results.
+        Run all available analyses and combine results (FULL_ANALYSIS_PIPELINE;
+        the independent analyses run concurrently). A failed analysis is
+        reported as {"error": ...} under its key.
         """
-        results = {}
         file_name = os.path.basename(file_path)
         logger.info(f"--- [AudioAnalyzer] Starting analysis for file: {file_name} ---")
+        results = FULL_ANALYSIS_PIPELINE.run_sync(SimpleNamespace(file_path=file_path, fast=fast))
+        logger.info(f"--- [AudioAnalyzer] Finished all tasks for {file_name} ---")
+        return results
 
-        # Core analysis (always run)
-        try:
-            logger.info(f"[AudioAnalyzer] 1/4: Analyzing Core (BPM, Key, Structure)...")
-            results["core"] = AdvancedAudioAnalyzer.analyze_core(file_path, fast=fast)
-            logger.info(f"[AudioAnalyzer] 1/4: Done.")
-        except Exception as e:
-            logger.error(f"[AudioAnalyzer] 1/4: Failed: {e}")
-            results["core"] = {"error": str(e)}
 
-        if fast:
-            try:
-                logger.info(f"[AudioAnalyzer] 2/2: Reading ID3/Metadata tags...")
-                results["existing_metadata"] = AdvancedAudioAnalyzer.read_metadata(
-                    file_path
-                )
-                logger.info(f"[AudioAnalyzer] 2/2: Done.")
-            except Exception as e:
-                logger.error(f"[AudioAnalyzer] 2/2: Failed: {e}")
-                results["existing_metadata"] = {"error": str(e)}
+def _analysis_failed(ctx, error):
+    return {"error": str(error)}
 
-            logger.info(f"--- [AudioAnalyzer] Finished all tasks for {file_name} ---")
-            return results
 
-        # Loudness
-        try:
-            logger.info(f"[AudioAnalyzer] 2/4: Analyzing Loudness (LUFS)...")
-            results["loudness"] = AdvancedAudioAnalyzer.analyze_loudness(
-                file_path
-            )
-            logger.info(f"[AudioAnalyzer] 2/4: Done.")
-        except Exception as e:
-            logger.error(f"[AudioAnalyzer] 2/4: Failed: {e}")
-            results["loudness"] = {"error": str(e)}
+def _file_cache_key(ctx) -> Optional[str]:
+    return file_key(ctx.file_path)
 
-        # Pitch (optional, can be slow)
-        try:
-            logger.info(f"[AudioAnalyzer] 3/4: Analyzing Pitch (Vocal Presence)...")
-            results["pitch"] = AdvancedAudioAnalyzer.analyze_pitch(file_path)
-            logger.info(f"[AudioAnalyzer] 3/4: Done.")
-        except Exception as e:
-            logger.error(f"[AudioAnalyzer] 3/4: Failed: {e}")
-            results["pitch"] = {"error": str(e)}
 
-        # Existing metadata
-        try:
-            logger.info(f"[AudioAnalyzer] 4/4: Reading ID3/Metadata tags...")
-            results["existing_metadata"] = AdvancedAudioAnalyzer.read_metadata(
-                file_path
-            )
-            logger.info(f"[AudioAnalyzer] 4/4: Done.")
-        except Exception as e:
-            logger.error(f"[AudioAnalyzer] 4/4: Failed: {e}")
-            results["existing_metadata"] = {"error": str(e)}
+def _core_cache_key(ctx) -> Optional[str]:
+    key = file_key(ctx.file_path)
+    return key and f"{key}:{'fast' if ctx.fast else 'full'}"
 
-        logger.info(f"--- [AudioAnalyzer] Finished all tasks for {file_name} ---")
-        return results
+
+# core always; loudness and pitch only in full mode; existing file tags always
+FULL_ANALYSIS_PIPELINE = Pipeline("full_analysis", [
+    Stage("core", lambda ctx: AdvancedAudioAnalyzer.analyze_core(ctx.file_path, fast=ctx.fast),
+          cache_key=_core_cache_key,
+          cost=8, optional=True, fallback=_analysis_failed, blocking=True),
+    Stage("loudness", lambda ctx: AdvancedAudioAnalyzer.analyze_loudness(ctx.file_path),
+          cache_key=_file_cache_key, cost=3, optional=True, fallback=_analysis_failed,
+          skip=lambda ctx: ctx.fast, blocking=True),
+    Stage("pitch", lambda ctx: AdvancedAudioAnalyzer.analyze_pitch(ctx.file_path),
+          cache_key=_file_cache_key, cost=6, optional=True, fallback=_analysis_failed,
+          skip=lambda ctx: ctx.fast, blocking=True),
+    Stage("existing_metadata", lambda ctx: AdvancedAudioAnalyzer.read_metadata(ctx.file_path),
+          cache_key=_file_cache_key, cost=0.2, optional=True, fallback=_analysis_failed, blocking=True),
+])
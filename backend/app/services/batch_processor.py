@@ -1,137 +1,365 @@
 """
 Batch Processing Service using FastAPI BackgroundTasks.
-Provides a queue-based approach for processing multiple files efficiently.
+Runs batch files through a staged pipeline: decode -> features -> LLM -> DB.
+
+Each stage has its own bounded queue and worker count, so decoding the next
+file, extracting features, waiting on the LLM and writing results overlap;
+batch throughput is set by the slowest stage instead of the sum of all four.
+Full queues push back on the stage before them (and on process_batch).
 """
 import asyncio
 import logging
-from typing import List, Dict, Any
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
-from sqlalchemy.orm import Session
 from app.db import Job, SessionLocal
 from app.services.audio_analyzer import AdvancedAudioAnalyzer
+from app.utils.scheduler import analysis_scheduler
 import os
 
 logger = logging.getLogger(__name__)
 
+# Audio decoded for the feature stage (matches analyze_core's librosa load)
+DECODE_SR = 22050
+DECODE_SECONDS = 60.0
+
+
+@dataclass
+class BatchItem:
+    job_id: str
+    file_path: str
+    lane: str = "batch"
+    user_id: Optional[str] = None
+    describe: bool = False
+    future: Optional[asyncio.Future] = None
+    audio: Optional[Tuple[Any, int]] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[BaseException] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class StatusUpdate:
+    """A job status change with no result yet, committed by the writer with the next batch."""
+    job_id: str
+    status: str
+
+
+class Stage:
+    """Bounded queue + fixed worker pool + counters for one pipeline stage."""
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.busy = 0
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        done = self.processed + self.failed
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "workers": self.workers,
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_seconds": round(self.busy_seconds / done, 3) if done else 0.0,
+            "utilization": round(min(1.0, self.busy_seconds / (elapsed * self.workers)), 3),
+        }
+
+
 class BatchProcessor:
     """
-    Handles batch processing of audio files with proper queue management.
-    Uses asyncio for concurrent processing while respecting resource limits.
+    Handles batch processing of audio files as a staged pipeline.
+
+    Stages (workers are started lazily on the running event loop):
+        decode   - decode_workers threads read the audio the features need
+        features - max_concurrent CPU workers, each in a scheduler slot
+                   (batch/background lane, so uploads keep priority)
+        llm      - llm_concurrency async tasks (only for describe=True items)
+        write    - one writer committing job updates in batches of db_batch_size
+                   ("processing" when decode picks a file up, then the result)
     """
-    
-    def __init__(self, max_concurrent: int = 3):
+
+    def __init__(
+        self,
+        max_concurrent: int = 3,
+        decode_workers: int = 2,
+        llm_concurrency: int = 4,
+        queue_size: int = 8,
+        db_batch_size: int = 16,
+        db_flush_seconds: float = 0.5,
+    ):
         """
         Args:
-            max_concurrent: Maximum number of files to process simultaneously
+            max_concurrent: Feature-stage (CPU) workers
+            decode_workers: Decode-stage threads
+            llm_concurrency: Concurrent LLM requests
+            queue_size: Capacity of each inter-stage queue
+            db_batch_size: Max job updates per DB commit
+            db_flush_seconds: Max time an update waits for its batch to fill
         """
         self.max_concurrent = max_concurrent
-        self.processing_queue: List[str] = []
-        self.active_jobs: Dict[str, asyncio.Task] = {}
-    
-    async def process_file_job(self, job_id: str, file_path: str) -> Dict[str, Any]:
-        """
-        Process a single file and update the job status in the database.
-        
-        Args:
-            job_id: Database job ID
-            file_path: Path to audio file
-            
-        Returns:
-            Analysis results dictionary
-        """
+        self.decode_workers = decode_workers
+        self.llm_concurrency = llm_concurrency
+        self.queue_size = queue_size
+        self.db_batch_size = db_batch_size
+        self.db_flush_seconds = db_flush_seconds
+        self.active_jobs: Dict[str, BatchItem] = {}
+        self.stages: Dict[str, Stage] = {}
+        self.db_commits = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: List[asyncio.Task] = []
+
+    # ── Pipeline lifecycle ───────────────────────────────────────────────────
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        self._loop = loop
+        # Decoded audio waits in the features queue: keep that one short
+        self.stages = {
+            "decode": Stage("decode", self.decode_workers, self.queue_size),
+            "features": Stage("features", self.max_concurrent, self.max_concurrent),
+            "llm": Stage("llm", self.llm_concurrency, self.queue_size),
+            "write": Stage("write", 1, max(self.queue_size, self.db_batch_size * 2)),
+        }
+        self._workers = []
+        for name, run, nxt in (
+            ("decode", self._decode, "features"),
+            ("features", self._features, "llm"),
+            ("llm", self._describe, "write"),
+        ):
+            for _ in range(self.stages[name].workers):
+                self._workers.append(asyncio.create_task(self._worker(name, run, nxt)))
+        self._workers.append(asyncio.create_task(self._writer()))
+
+    async def _worker(self, name: str, run: Callable, nxt: str):
+        stage = self.stages[name]
+        while True:
+            item: BatchItem = await stage.queue.get()
+            if item.error is None:
+                stage.busy += 1
+                start = time.monotonic()
+                try:
+                    await run(item)
+                    stage.processed += 1
+                except Exception as e:
+                    logger.error(f"[BatchProcessor] Job {item.job_id} failed in {name}: {e}")
+                    item.error = e
+                    stage.failed += 1
+                finally:
+                    elapsed = time.monotonic() - start
+                    item.timings[name] = round(elapsed, 3)
+                    stage.busy_seconds += elapsed
+                    stage.busy -= 1
+            # Failed items skip straight to the writer
+            await self.stages["write" if item.error else nxt].queue.put(item)
+
+    async def close(self):
+        """Stop the stage workers (in-flight items are dropped)."""
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._workers = []
+
+    # ── Stages ───────────────────────────────────────────────────────────────
+
+    async def _decode(self, item: BatchItem):
+        from app.utils.audio_stream import AudioStream
+
+        # In flight from here on; pollers see it before the final result lands
+        await self.stages["write"].queue.put(StatusUpdate(item.job_id, "processing"))
+
+        def decode():
+            y = AudioStream(item.file_path, sr=DECODE_SR, mono=True, duration=DECODE_SECONDS).read()
+            return y, DECODE_SR
+
+        try:
+            item.audio = await asyncio.to_thread(decode)
+        except Exception as e:
+            # Not fatal: analyze_core falls back to loading the file itself
+            logger.warning(f"[BatchProcessor] Decode failed for job {item.job_id}, deferring to analyzer: {e}")
+
+    async def _features(self, item: BatchItem):
+        # analyze_core is blocking/CPU-bound: off the event loop, in a scheduler slot
+        try:
+            async with analysis_scheduler.slot(item.lane, user_id=item.user_id):
+                item.result = await asyncio.to_thread(
+                    AdvancedAudioAnalyzer.analyze_core, item.file_path, audio=item.audio
+                )
+        finally:
+            item.audio = None  # release the PCM as soon as features are done
+
+    async def _describe(self, item: BatchItem):
+        if not item.describe:
+            return
+        from app.services.groq_whisper import GroqWhisperService
+
+        if not GroqWhisperService.is_available():
+            return
+        try:
+            item.result["metadata"] = await GroqWhisperService.generate_metadata(audio_analysis={"core": item.result})
+        except Exception as e:
+            # The DSP result still stands without a description
+            logger.warning(f"[BatchProcessor] LLM metadata failed for job {item.job_id}: {e}")
+            item.result["metadata_error"] = str(e)
+
+    async def _writer(self):
+        stage = self.stages["write"]
+        while True:
+            batch = [await stage.queue.get()]
+            deadline = time.monotonic() + self.db_flush_seconds
+            while len(batch) < self.db_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(stage.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            finished = [item for item in batch if isinstance(item, BatchItem)]
+            stage.busy += 1
+            start = time.monotonic()
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+                stage.processed += len(finished)
+            except Exception as e:
+                logger.error(f"[BatchProcessor] Writing {len(batch)} job updates failed: {e}")
+                stage.failed += len(finished)
+                for item in finished:
+                    item.error = item.error or e
+            finally:
+                stage.busy_seconds += time.monotonic() - start
+                stage.busy -= 1
+
+            for item in finished:
+                self.active_jobs.pop(item.job_id, None)
+                if item.future is not None and not item.future.done():
+                    if item.error is not None:
+                        item.future.set_exception(item.error)
+                    else:
+                        item.future.set_result(item.result)
+
+    def _write_batch(self, batch: List[Any]):
+        """One session and one commit for the whole batch of job updates (applied in queue order)."""
         db = SessionLocal()
-        job = None
         try:
-            # Update job status to processing
-            job = db.query(Job).filter(Job.id == job_id).first()
-            if not job:
-                raise ValueError(f"Job {job_id} not found")
-            
-            job.status = "processing"
-            db.commit()
-            
-            logger.info(f"[BatchProcessor] Starting analysis for job {job_id}: {file_path}")
-            
-            # Run analysis (analyze_core is blocking/CPU-bound, run off the event loop)
-            result = await asyncio.to_thread(AdvancedAudioAnalyzer.analyze_core, file_path)
-            
-            # Update job with results
-            job.status = "completed"
-            job.result = result
-            job.timestamp = datetime.now()
+            jobs = {job.id: job for job in db.query(Job).filter(Job.id.in_({u.job_id for u in batch})).all()}
+            now = datetime.now()
+            for update in batch:
+                job = jobs.get(update.job_id)
+                if job is None:
+                    continue
+                if isinstance(update, StatusUpdate):
+                    job.status = update.status
+                    continue
+                if update.error is not None:
+                    job.status = "failed"
+                    job.result = {"error": str(update.error)}
+                else:
+                    job.status = "completed"
+                    job.result = update.result
+                job.timestamp = now
             db.commit()
-            
-            logger.info(f"[BatchProcessor] Completed job {job_id}")
-            return result
-            
-        except Exception as e:
-            logger.error(f"[BatchProcessor] Job {job_id} failed: {e}")
-            if job:
-                job.status = "failed"
-                job.result = {"error": str(e)}
-                db.commit()
-            raise
+            self.db_commits += 1
         finally:
             db.close()
-    
-    async def process_batch(self, job_file_pairs: List[tuple]) -> List[Dict[str, Any]]:
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    async def process_file_job(
+        self, job_id: str, file_path: str, lane: str = "batch", user_id: str = None
+    ) -> Dict[str, Any]:
         """
-        Process multiple files with concurrency control.
-        
+        Process a single file through the pipeline and return its result.
+
+        Raises:
+            The stage's exception if the file failed (the job is marked failed).
+        """
+        result = (await self.process_batch([(job_id, file_path)], lane=lane, user_id=user_id))[0]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def process_batch(
+        self, job_file_pairs: List[tuple], lane: str = "batch", user_id: str = None, describe: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Feed files into the pipeline and wait for all of them.
+
         Args:
             job_file_pairs: List of (job_id, file_path) tuples
-            
+            lane: Scheduler lane ("batch" or "background")
+            user_id: Owner of the batch
+            describe: Also generate LLM metadata for each file
+
         Returns:
-            List of results for each job
+            Result (or exception) for each job, in input order
         """
-        results = []
-        semaphore = asyncio.Semaphore(self.max_concurrent)
-        
-        async def process_with_limit(job_id: str, file_path: str):
-            async with semaphore:
-                return await self.process_file_job(job_id, file_path)
-        
-        # Create tasks for all jobs
-        tasks = [
-            process_with_limit(job_id, file_path)
-            for job_id, file_path in job_file_pairs
-        ]
-        
-        # Wait for all to complete
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Log any failures
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error(f"Batch job {job_file_pairs[i][0]} failed: {result}")
-        
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        items = []
+        for job_id, file_path in job_file_pairs:
+            item = BatchItem(job_id, file_path, lane=lane, user_id=user_id, describe=describe, future=loop.create_future())
+            self.active_jobs[job_id] = item
+            items.append(item)
+
+        logger.info(f"[BatchProcessor] Queued {len(items)} jobs ({lane} lane)")
+
+        async def feed():
+            # Blocks while the decode queue is full (backpressure)
+            for item in items:
+                await self.stages["decode"].queue.put(item)
+
+        feeder = asyncio.create_task(feed())
+        results = await asyncio.gather(*(item.future for item in items), return_exceptions=True)
+        await feeder
+
+        for (job_id, _), result in zip(job_file_pairs, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Batch job {job_id} failed: {result}")
         return results
-    
-    def queue_batch(self, job_ids: List[str]) -> None:
-        """
-        Add jobs to the processing queue.
-        
-        Args:
-            job_ids: List of job IDs to queue
-        """
-        self.processing_queue.extend(job_ids)
-        logger.info(f"[BatchProcessor] Queued {len(job_ids)} jobs. Total in queue: {len(self.processing_queue)}")
-    
+
     def get_queue_status(self) -> Dict[str, Any]:
         """
         Get current queue status.
-        
+
         Returns:
-            Dictionary with queue metrics
+            Dictionary with per-stage queue depth, busy workers, throughput
+            and utilization (the busiest stage is the bottleneck)
         """
+        stages = {name: stage.status() for name, stage in self.stages.items()}
         return {
-            "queued": len(self.processing_queue),
+            "queued": sum(s["queued"] for s in stages.values()),
             "active": len(self.active_jobs),
-            "max_concurrent": self.max_concurrent
+            "max_concurrent": self.max_concurrent,
+            "stages": stages,
+            "bottleneck": max(stages, key=lambda n: stages[n]["utilization"]) if stages else None,
+            "db_commits": self.db_commits,
+            "scheduler": analysis_scheduler.status(),
         }
 
 
 # Global instance
 # HF Pro can handle more (default to 6 if likely on high-end hardware, else 3)
 max_concurrent = int(os.getenv("BATCH_MAX_CONCURRENT", "3"))
-batch_processor = BatchProcessor(max_concurrent=max_concurrent)
+batch_processor = BatchProcessor(
+    max_concurrent=max_concurrent,
+    decode_workers=int(os.getenv("BATCH_DECODE_WORKERS", "2")),
+    llm_concurrency=int(os.getenv("BATCH_LLM_CONCURRENCY", "4")),
+    queue_size=int(os.getenv("BATCH_QUEUE_SIZE", "8")),
+    db_batch_size=int(os.getenv("BATCH_DB_BATCH_SIZE", "16")),
+)
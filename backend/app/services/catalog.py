@@ -0,0 +1,175 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, select, true
+
+from app.db import CatalogTrack, CatalogTrackMood
+
+logger = logging.getLogger(__name__)
+
+SORT_COLUMNS = {
+    "created_at": CatalogTrack.created_at,
+    "bpm": CatalogTrack.bpm,
+    "duration": CatalogTrack.duration,
+    "file_name": CatalogTrack.file_name,
+}
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, str) and ":" in value:
+        # "3:45" style durations
+        try:
+            minutes, seconds = value.split(":", 1)
+            return int(minutes) * 60 + float(seconds)
+        except ValueError:
+            return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_text(value: Any) -> Optional[str]:
+    return str(value).strip() if value not in (None, "") else None
+
+
+def catalog_fields(payload: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Normalizes an analysis result into catalog columns. Handles both the flat
+    metadata written by process_analysis and the {"metadata": {...}} envelope
+    posted to /history by the frontend.
+    """
+    data = payload or {}
+    if isinstance(data.get("metadata"), dict):
+        data = data["metadata"]
+
+    moods = data.get("moods") or []
+    if isinstance(moods, str):
+        moods = moods.split(",")
+    moods = sorted({m.strip().lower() for m in moods if isinstance(m, str) and m.strip()})
+    moods = [m for m in moods if m != "unspecified"]
+
+    return {
+        "bpm": _to_float(data.get("bpm")) or None,
+        "key": _to_text(data.get("key")),
+        "mode": _to_text(data.get("mode")),
+        "main_genre": _to_text(data.get("mainGenre")),
+        "energy_level": _to_text(data.get("energyLevel") or data.get("energy_level")),
+        "duration": _to_float(data.get("duration")) or None,
+        "moods": moods,
+    }
+
+
+def summary_fields(payload: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The subset of catalog_fields stored on AnalysisHistory for the list view."""
+    fields = catalog_fields(payload)
+    return {
+        "main_genre": fields["main_genre"],
+        "bpm": fields["bpm"],
+        "musical_key": fields["key"],
+        "mode": fields["mode"],
+    }
+
+
+def index_history_entry(db, history, job_id: Optional[str] = None) -> CatalogTrack:
+    """
+    Creates or refreshes the catalog row for an AnalysisHistory entry (sync
+    Session). The caller commits.
+    """
+    fields = catalog_fields(history.result or history.metadata_json)
+    moods = fields.pop("moods")
+
+    track = db.query(CatalogTrack).filter(CatalogTrack.history_id == history.id).first()
+    if track is None:
+        track = CatalogTrack(history_id=history.id)
+        db.add(track)
+
+    track.job_id = job_id or track.job_id
+    track.user_id = history.user_id
+    track.file_name = history.file_name
+    track.file_hash = history.file_hash
+    track.created_at = history.created_at
+    for column, value in fields.items():
+        setattr(track, column, value)
+    db.flush()
+
+    db.execute(delete(CatalogTrackMood).where(CatalogTrackMood.track_id == track.id))
+    db.add_all([CatalogTrackMood(track_id=track.id, mood=m) for m in moods])
+    return track
+
+
+def build_search_query(
+    user_id: Optional[str] = None,
+    bpm_min: Optional[float] = None,
+    bpm_max: Optional[float] = None,
+    key: Optional[str] = None,
+    mode: Optional[str] = None,
+    genre: Optional[str] = None,
+    moods: Optional[List[str]] = None,
+    energy: Optional[str] = None,
+    duration_min: Optional[float] = None,
+    duration_max: Optional[float] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+):
+    """
+    Returns (select, count_select) for a catalog search. All moods must match;
+    key, mode, genre, energy and moods compare case-insensitively.
+    user_id=None searches every user's tracks (admin use).
+    """
+    conditions = []
+    if user_id is not None:
+        conditions.append(CatalogTrack.user_id == user_id)
+    if bpm_min is not None:
+        conditions.append(CatalogTrack.bpm >= bpm_min)
+    if bpm_max is not None:
+        conditions.append(CatalogTrack.bpm <= bpm_max)
+    # Text columns keep the analysis' own casing ("Minor", "minor"); match
+    # them case-insensitively, like moods (stored lower-cased)
+    for column, value in (
+        (CatalogTrack.key, key),
+        (CatalogTrack.mode, mode),
+        (CatalogTrack.main_genre, genre),
+        (CatalogTrack.energy_level, energy),
+    ):
+        if value and value.strip():
+            conditions.append(func.lower(column) == value.strip().lower())
+    if duration_min is not None:
+        conditions.append(CatalogTrack.duration >= duration_min)
+    if duration_max is not None:
+        conditions.append(CatalogTrack.duration <= duration_max)
+    for mood in {m.strip().lower() for m in (moods or []) if m and m.strip()}:
+        conditions.append(
+            CatalogTrack.id.in_(select(CatalogTrackMood.track_id).where(CatalogTrackMood.mood == mood))
+        )
+
+    where = and_(true(), *conditions)
+    sort_col = SORT_COLUMNS.get(sort, CatalogTrack.created_at)
+    if order == "asc":
+        ordering = (sort_col.asc(), CatalogTrack.id.asc())
+    else:
+        ordering = (sort_col.desc(), CatalogTrack.id.desc())
+
+    stmt = select(CatalogTrack).where(where).order_by(*ordering)
+    count_stmt = select(func.count()).select_from(CatalogTrack).where(where)
+    return stmt, count_stmt
+
+
+def serialize_track(track: CatalogTrack, moods: List[str]) -> Dict[str, Any]:
+    return {
+        "id": track.id,
+        "history_id": track.history_id,
+        "job_id": track.job_id,
+        "file_name": track.file_name,
+        "file_hash": track.file_hash,
+        "bpm": track.bpm,
+        "key": track.key,
+        "mode": track.mode,
+        "mainGenre": track.main_genre,
+        "energyLevel": track.energy_level,
+        "duration": track.duration,
+        "moods": moods,
+        "created_at": track.created_at.isoformat() if track.created_at else None,
+    }
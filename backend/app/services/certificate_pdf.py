@@ -4,7 +4,6 @@ import logging
 from datetime import datetime
 from jinja2 import Environment, FileSystemLoader
 from markupsafe import Markup, escape
-from weasyprint import HTML
 
 logger = logging.getLogger(__name__)
 
@@ -94,7 +93,9 @@ def generate_certificate_pdf(certificate_id, file_name, sha256, metadata, verify
         
         html_content = template.render(**data)
         
-        # 3. Generate PDF
+        # 3. Generate PDF (WeasyPrint loads Pango/Cairo; imported on first use, not at startup)
+        from weasyprint import HTML
+
         HTML(string=html_content).write_pdf(output_path)
         
         logger.info(f"Certificate PDF generated successfully at {output_path}")
@@ -7,14 +7,22 @@ Layer 1: Deep Audio Feature Extraction
 Czas: 12-15s na i5 (bez GPU)
 """
 
+import asyncio
 import librosa
 import numpy as np
-from scipy import signal
-from typing import Dict, Any, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 import logging
 
+from app.utils.metrics import metrics
+from app.utils.stream_features import analyze_file_streaming
+from app.utils.window_sampler import aggregate_windows, central_value, load_windows, map_windows, plan_windows
+
 logger = logging.getLogger(__name__)
 
+FEATURE_SECONDS = metrics.histogram(
+    "feature_seconds", "Feature family computation time (shared stack blocks and per-window steps)", ("family",)
+)
+
 # Krumhansl-Schmuckler key profiles: typical pitch-class weight distribution
 # for a major/minor key, starting from the tonic. Standard reference values
 # from Krumhansl & Kessler (1982), used by most key-detection implementations
@@ -54,15 +62,28 @@ def _detect_key_from_chroma(chroma_mean: np.ndarray) -> Tuple[str, str, float]:
     return best_key, best_mode, float(best_corr)
 
 
+def _stacked_power_to_db(S: np.ndarray, ref_max: bool, amin: float = 1e-10, top_db: float = 80.0) -> np.ndarray:
+    """
+    librosa.power_to_db for each row of a (N, bands, frames) stack: ref=np.max
+    and the top_db floor are taken per window, not over the whole stack.
+    """
+    log_spec = 10.0 * np.log10(np.maximum(amin, S))
+    if ref_max:
+        log_spec -= 10.0 * np.log10(np.maximum(amin, S.max(axis=(-2, -1), keepdims=True)))
+    return np.maximum(log_spec, log_spec.max(axis=(-2, -1), keepdims=True) - top_db)
+
+
 class DeepAudioAnalyzer:
     """
     Rozszerzona analiza audio - 90+ cech
     vs poprzednie 30 cech = +10% accuracy
     """
     
-    def __init__(self):
+    def __init__(self, window_count: int = 6, window_seconds: float = 20.0):
         self.sr = 44100  # Sample rate
         self.hop_length = 512
+        self.window_count = window_count
+        self.window_seconds = window_seconds
         
     async def extract_all_features(self, file_path: str) -> Dict[str, Any]:
         """
@@ -70,36 +91,34 @@ class DeepAudioAnalyzer:
         Czas: 12-15s na i5
         """
         
+        full_track_task = None
         try:
-            # Optimization: Load audio at 22050Hz (sufficient for MIR) and limit to middle 2 minutes
+            # 22050 Hz is enough for MIR; instead of one 120 s slice, take
+            # window_count windows of window_seconds spread across the track
             self.sr = 22050
             duration = librosa.get_duration(path=file_path)
-            offset = 30.0 if duration > 60 else 0.0
-            duration_to_load = 120.0 if duration > 180 else None
-            
-            y, sr = librosa.load(file_path, sr=self.sr, mono=True, offset=offset, duration=duration_to_load)
-            
-            logger.info(f"Loaded audio (Optimized): {len(y)/sr:.1f}s @ {sr}Hz (Offset: {offset}s)")
-            
-            features = {}
-            
-            # ===== RHYTHM (10 features) =====
-            features['rhythm'] = self._extract_rhythm_features(y, sr)
-            
-            # ===== HARMONIC (15 features) =====
-            features['harmonic'] = self._extract_harmonic_features(y, sr)
-            
-            # ===== SPECTRAL (20 features) =====
-            features['spectral'] = self._extract_spectral_features(y, sr)
-            
-            # ===== TIMBRE (25 features) =====
-            features['timbre'] = self._extract_timbre_features(y, sr)
-            
-            # ===== ENERGY & DYNAMICS (12 features) =====
-            features['energy'] = self._extract_energy_features(y, sr)
-            
+            windows = plan_windows(duration, self.window_count, self.window_seconds)
+
+            # Whole track, streamed (constant memory), alongside the window analysis
+            full_track_task = asyncio.create_task(asyncio.to_thread(analyze_file_streaming, file_path))
+
+            segments, sr = await asyncio.to_thread(load_windows, file_path, windows, self.sr)
+            # Skip windows shorter than one FFT frame (end of file)
+            kept = [(w, y) for w, y in zip(windows, segments) if len(y) >= 2048] or list(zip(windows, segments))
+            windows, segments = [w for w, _ in kept], [y for _, y in kept]
+            logger.info(
+                f"Loaded {len(segments)} windows: {sum(len(y) for y in segments)/sr:.1f}s @ {sr}Hz "
+                f"across {duration:.1f}s"
+            )
+
+            # ===== RHYTHM / HARMONIC / SPECTRAL / TIMBRE / ENERGY per window =====
+            vocal_seconds = 15.0 / len(segments)
+            per_window = await asyncio.to_thread(self.extract_window_features_batch, segments, sr, vocal_seconds)
+            features, spread = aggregate_windows(per_window, weights=[len(y) for y in segments])
+            self._finalize_windows(features, per_window, windows, spread)
+
             # ===== STRUCTURE (8 features) =====
-            features['structure'] = self._extract_structure_features(y, sr)
+            features['structure'] = self._extract_structure_features(np.concatenate(segments), sr)
             
             # ===== METADATA =====
             features['meta'] = {
@@ -107,27 +126,174 @@ class DeepAudioAnalyzer:
                 'sample_rate': sr,
                 'total_features': 90
             }
+
+            # ===== FULL-TRACK (streamed) =====
+            try:
+                self._merge_full_track(features, await full_track_task)
+            except Exception as e:
+                logger.warning(f"Streaming full-track pass failed, keeping slice statistics: {e}")
             
             logger.info(f"Extracted {features['meta']['total_features']} audio features")
             
             return features
             
+        except asyncio.CancelledError:
+            # Job cancelled: the streaming thread stops by itself at its next token check
+            if full_track_task is not None:
+                full_track_task.cancel()
+            raise
         except Exception as e:
+            if full_track_task is not None:
+                full_track_task.cancel()
             logger.error(f"Feature extraction failed: {e}")
             raise
     
+    def _extract_window_features(self, y: np.ndarray, sr: int, vocal_seconds: float = 15.0) -> Dict[str, Any]:
+        """Everything except structure, for one contiguous window."""
+        return {
+            'rhythm': self._extract_rhythm_features(y, sr),
+            'harmonic': self._extract_harmonic_features(y, sr),
+            'spectral': self._extract_spectral_features(y, sr),
+            'timbre': self._extract_timbre_features(y, sr),
+            'energy': self._extract_energy_features(y, sr, vocal_seconds=vocal_seconds),
+        }
+
+    def extract_window_features_batch(
+        self, segments: Sequence[np.ndarray], sr: int, vocal_seconds: float = 15.0
+    ) -> List[Dict[str, Any]]:
+        """
+        _extract_window_features for N windows (one track's or several
+        tracks'), same dicts in the same order. Windows of equal length are
+        stacked and share one STFT: spectral stats, mel, MFCC, onset envelopes,
+        tempogram, RMS and ZCR are computed for the whole stack at once; beat
+        tracking, HPSS, CQT chroma and pYIN stay per window (in the pool).
+        Windows are never padded, since padding would change their features.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(segments)
+        groups: Dict[int, List[int]] = {}
+        for i, y in enumerate(segments):
+            groups.setdefault(len(y), []).append(i)
+        for indices in groups.values():
+            stack = np.stack([segments[i] for i in indices])
+            for i, features in zip(indices, self._extract_stacked_features(stack, sr, vocal_seconds)):
+                results[i] = features
+        return results
+
+    def _extract_stacked_features(self, Y: np.ndarray, sr: int, vocal_seconds: float) -> List[Dict[str, Any]]:
+        """Batched kernel over Y of shape (N, samples); see extract_window_features_batch."""
+        hop = self.hop_length
+
+        # One STFT (librosa's default parameters) instead of ~10 per window
+        with FEATURE_SECONDS.time(family="spectral"):
+            D = librosa.stft(Y, n_fft=2048, hop_length=hop)
+            S = np.abs(D)
+            spec_cent = librosa.feature.spectral_centroid(S=S, sr=sr)
+            spec_bw = librosa.feature.spectral_bandwidth(S=S, sr=sr)
+            spec_rolloff = librosa.feature.spectral_rolloff(S=S, sr=sr)
+            spec_contrast = librosa.feature.spectral_contrast(S=S, sr=sr)
+            spec_flatness = librosa.feature.spectral_flatness(S=S)
+
+            mel = librosa.feature.melspectrogram(S=S**2, sr=sr, n_mels=128)
+            mel_db_max = _stacked_power_to_db(mel, ref_max=True)   # spectral/energy (ref=np.max)
+            mel_db = _stacked_power_to_db(mel, ref_max=False)      # MFCC and onset (ref=1.0)
+        with FEATURE_SECONDS.time(family="timbre"):
+            mfcc = librosa.feature.mfcc(S=mel_db, n_mfcc=20)
+        with FEATURE_SECONDS.time(family="rhythm"):
+            # beat_track uses the median-aggregated envelope, the rest of rhythm the mean
+            oenv = librosa.onset.onset_strength(S=mel_db, sr=sr, hop_length=hop)
+            oenv_median = librosa.onset.onset_strength(S=mel_db, sr=sr, hop_length=hop, aggregate=np.median)
+            tempogram = librosa.feature.tempogram(onset_envelope=oenv, sr=sr, hop_length=hop)
+        with FEATURE_SECONDS.time(family="energy"):
+            rms = librosa.feature.rms(y=Y)
+            zcr = librosa.feature.zero_crossing_rate(Y)
+
+        def per_window(i: int) -> Dict[str, Any]:
+            # beat_track's dynamic programming, the HPSS medians, CQT and pYIN
+            # don't vectorize (chroma tuning is estimated per window)
+            with FEATURE_SECONDS.time(family="rhythm"):
+                tempo, beats = librosa.beat.beat_track(onset_envelope=oenv_median[i], sr=sr, hop_length=hop)
+            with FEATURE_SECONDS.time(family="harmonic"):
+                D_harmonic, D_percussive = librosa.decompose.hpss(D[i])
+                y_harmonic = librosa.istft(D_harmonic, hop_length=hop, dtype=Y.dtype, length=Y.shape[-1])
+                y_percussive = librosa.istft(D_percussive, hop_length=hop, dtype=Y.dtype, length=Y.shape[-1])
+                chroma_cqt = librosa.feature.chroma_cqt(y=y_harmonic, sr=sr)
+                chroma_stft = librosa.feature.chroma_stft(y=y_harmonic, sr=sr)
+                tonnetz = librosa.feature.tonnetz(chroma=chroma_cqt, sr=sr)
+            with FEATURE_SECONDS.time(family="vocal"):
+                vocal_score = self._vocal_presence(Y[i], sr, vocal_seconds, mel_db_max[i])
+            return {
+                'rhythm': self._rhythm_summary(tempo, beats, oenv[i], tempogram[i], sr),
+                'harmonic': self._harmonic_summary(y_harmonic, y_percussive, chroma_cqt, chroma_stft, tonnetz),
+                'spectral': self._spectral_summary(
+                    spec_cent[i], spec_bw[i], spec_rolloff[i], spec_contrast[i], spec_flatness[i], mel_db_max[i]
+                ),
+                'timbre': self._timbre_summary(mfcc[i]),
+                'energy': self._energy_summary(rms[i], zcr[i], mel_db_max[i], vocal_score),
+            }
+
+        return map_windows(per_window, list(range(len(Y))))
+
+    @staticmethod
+    def _finalize_windows(features: Dict[str, Any], per_window: list, windows: list, spread: Dict[str, Any]):
+        """
+        Track-level tempo/key from the windows: the window tempo closest to
+        the median (robust to an octave error in one window) and key from the averaged chroma, with
+        per-window values kept so changes are visible.
+        """
+        tempos = [w['rhythm']['tempo'] for w in per_window]
+        features['rhythm']['tempo'] = central_value(tempos)
+
+        key, mode, strength = _detect_key_from_chroma(np.asarray(features['harmonic']['chroma_cqt_mean']))
+        features['harmonic'].update({'key': key, 'mode': mode, 'key_strength': strength})
+
+        window_keys = [f"{w['harmonic']['key']} {w['harmonic']['mode']}" for w in per_window]
+        features['windows'] = {
+            'count': len(per_window),
+            'spans': [[offset, length] for offset, length in windows],
+            'tempo': [round(t, 2) for t in tempos],
+            'key': window_keys,
+            'tempo_changes': bool(len(tempos) > 1 and (max(tempos) - min(tempos)) > 0.08 * float(np.median(tempos))),
+            'key_changes': len(set(window_keys)) > 1,
+            'spread': spread,
+        }
+
+    @staticmethod
+    def _merge_full_track(features: Dict[str, Any], full: Dict[str, Any]):
+        """
+        Energy/spectral means and the onset statistics come from the whole
+        file instead of the 120 s slice; slice-only features stay as they are.
+        """
+        features['energy'].update(full['energy'])
+        features['spectral'].update(full['spectral'])
+        features['rhythm']['onset_strength_mean'] = full['rhythm']['onset_strength_mean']
+        features['rhythm']['onset_strength_std'] = full['rhythm']['onset_strength_std']
+        if full['rhythm'].get('tempo'):
+            features['rhythm']['tempo_full_track'] = full['rhythm']['tempo']
+        loudness = full['loudness']
+        features['loudness'] = {
+            'integrated_lufs': loudness['integrated_lufs'],
+            'loudness_range_lu': loudness['loudness_range_lu'],
+            'true_peak_db': loudness['true_peak_db'],
+            'short_term_max_lufs': loudness['short_term_max_lufs'],
+        }
+        features['meta']['coverage'] = 'full'
+
     def _extract_rhythm_features(self, y: np.ndarray, sr: int) -> Dict:
         """Rhythm & Tempo features (10)"""
         
         # Tempo & beats
         tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-        beat_times = librosa.frames_to_time(beats, sr=sr)
         
         # Onset envelope
         oenv = librosa.onset.onset_strength(y=y, sr=sr, hop_length=self.hop_length)
         
         # Tempogram
         tempogram = librosa.feature.tempogram(onset_envelope=oenv, sr=sr, hop_length=self.hop_length)
+        return self._rhythm_summary(tempo, beats, oenv, tempogram, sr)
+
+    @staticmethod
+    def _rhythm_summary(tempo, beats: np.ndarray, oenv: np.ndarray, tempogram: np.ndarray, sr: int) -> Dict:
+        beat_times = librosa.frames_to_time(beats, sr=sr)
 
         # Rhythmic complexity: coefficient of variation of onset strength
         # (bursty/syncopated onsets vs. steady) combined with beat-interval
@@ -167,9 +333,13 @@ class DeepAudioAnalyzer:
         chroma_cqt = librosa.feature.chroma_cqt(y=y_harmonic, sr=sr)
         chroma_stft = librosa.feature.chroma_stft(y=y_harmonic, sr=sr)
         
-        # Tonnetz
-        tonnetz = librosa.feature.tonnetz(y=y_harmonic, sr=sr)
-        
+        # Tonnetz (computes the same chroma_cqt, so pass it in)
+        tonnetz = librosa.feature.tonnetz(chroma=chroma_cqt, sr=sr)
+        return self._harmonic_summary(y_harmonic, y_percussive, chroma_cqt, chroma_stft, tonnetz)
+
+    @staticmethod
+    def _harmonic_summary(y_harmonic: np.ndarray, y_percussive: np.ndarray, chroma_cqt: np.ndarray,
+                          chroma_stft: np.ndarray, tonnetz: np.ndarray) -> Dict:
         # Harmonic change
         chroma_diff = np.diff(chroma_cqt, axis=1)
         harmonic_change_rate = np.mean(np.abs(chroma_diff))
@@ -205,7 +375,10 @@ class DeepAudioAnalyzer:
         # Mel spectrogram
         mel_spec = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=128)
         mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-        
+        return self._spectral_summary(spec_cent, spec_bw, spec_rolloff, spec_contrast, spec_flatness, mel_spec_db)
+
+    @staticmethod
+    def _spectral_summary(spec_cent, spec_bw, spec_rolloff, spec_contrast, spec_flatness, mel_spec_db) -> Dict:
         return {
             'centroid_mean': float(np.mean(spec_cent)),
             'centroid_std': float(np.std(spec_cent)),
@@ -232,6 +405,10 @@ class DeepAudioAnalyzer:
         
         # MFCC (20 coefficients)
         mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
+        return self._timbre_summary(mfcc)
+
+    @staticmethod
+    def _timbre_summary(mfcc: np.ndarray) -> Dict:
         mfcc_delta = librosa.feature.delta(mfcc)
         mfcc_delta2 = librosa.feature.delta(mfcc, order=2)
         
@@ -242,39 +419,26 @@ class DeepAudioAnalyzer:
             'mfcc_delta2_mean': mfcc_delta2.mean(axis=1).tolist(),
         }
     
-    def _extract_energy_features(self, y: np.ndarray, sr: int) -> Dict:
+    def _extract_energy_features(self, y: np.ndarray, sr: int, vocal_seconds: float = 15.0) -> Dict:
         """Energy & dynamics features (12)"""
         
         rms = librosa.feature.rms(y=y)
         zcr = librosa.feature.zero_crossing_rate(y)
         
-        # Dynamic range
-        dynamic_range = float(np.max(rms) - np.min(rms))
-        
         # Mel spectrogram for band energies
         mel_spec = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=128)
         mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
-        
-        # Energy per frequency band
-        freq_bands = [
-            (0, 25),      # Sub-bass
-            (25, 60),     # Bass
-            (60, 100),    # Midrange
-            (100, 110),   # Upper mid
-            (110, 128)    # Highs
-        ]
-        
-        band_energies = []
-        for low, high in freq_bands:
-            band_energy = float(np.mean(mel_spec_db[low:high]))
-            band_energies.append(band_energy)
-        
+        vocal_score = self._vocal_presence(y, sr, vocal_seconds, mel_spec_db)
+        return self._energy_summary(rms, zcr, mel_spec_db, vocal_score)
+
+    @staticmethod
+    def _vocal_presence(y: np.ndarray, sr: int, vocal_seconds: float, mel_spec_db: np.ndarray) -> float:
         # Improved Vocal Presence Detection using pYIN
-        # We analyze a 15s segment to keep processing within time limits
+        # We analyze a vocal_seconds segment to keep processing within time limits
         try:
             # Segment center for analysis
             center_idx = len(y) // 2
-            segment_len = int(15 * sr) # 15 seconds
+            segment_len = int(vocal_seconds * sr)
             start_idx = max(0, center_idx - segment_len // 2)
             end_idx = min(len(y), start_idx + segment_len)
             y_segment = y[start_idx:end_idx]
@@ -304,6 +468,27 @@ class DeepAudioAnalyzer:
             vocal_score = (vocal_energy - total_energy) / (abs(total_energy) + 1e-6)
             vocal_score = max(0, min(1, vocal_score * 5)) # Scale up
         
+        return vocal_score
+
+    @staticmethod
+    def _energy_summary(rms: np.ndarray, zcr: np.ndarray, mel_spec_db: np.ndarray, vocal_score: float) -> Dict:
+        # Dynamic range
+        dynamic_range = float(np.max(rms) - np.min(rms))
+        
+        # Energy per frequency band
+        freq_bands = [
+            (0, 25),      # Sub-bass
+            (25, 60),     # Bass
+            (60, 100),    # Midrange
+            (100, 110),   # Upper mid
+            (110, 128)    # Highs
+        ]
+        
+        band_energies = []
+        for low, high in freq_bands:
+            band_energy = float(np.mean(mel_spec_db[low:high]))
+            band_energies.append(band_energy)
+        
         return {
             'rms_mean': float(np.mean(rms)),
             'rms_std': float(np.std(rms)),
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.utils.audio_fingerprint import compare_fingerprints, compute_fingerprint, fingerprint_file, index_codes
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint_worker(file_path: str) -> bytes:
+    # Runs in a pool process; bytes pickle smaller/faster than an ndarray
+    return fingerprint_file(file_path).astype("<u4").tobytes()
+
+
+class FingerprintEngine:
+    """
+    In-process fingerprinting that never blocks the event loop.
+
+    Files are decoded and fingerprinted in a process pool (decode + FFT are
+    CPU-bound and would serialize on the GIL in threads). Already-decoded
+    PCM goes through a thread instead, to avoid pickling the samples.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or int(os.getenv("FINGERPRINT_WORKERS", "0")) or (os.cpu_count() or 2)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and
+            # DB pools is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def fingerprint_file(self, file_path: str) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        raw = await loop.run_in_executor(self._pool(), _fingerprint_worker, file_path)
+        return np.frombuffer(raw, dtype="<u4")
+
+    async def fingerprint_pcm(self, y: np.ndarray, sr: int) -> np.ndarray:
+        return await asyncio.to_thread(compute_fingerprint, y, sr)
+
+    async def fingerprint_files(self, file_paths: Sequence[str]) -> List[Union[np.ndarray, Exception]]:
+        """Fingerprints many files concurrently; failures come back as exceptions in place."""
+        return await asyncio.gather(*(self.fingerprint_file(p) for p in file_paths), return_exceptions=True)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def find_duplicates(prints: Sequence[Optional[np.ndarray]], max_ber: float = 0.30, min_overlap: float = 0.9) -> List[Dict]:
+    """
+    Near-duplicate pairs within one set of fingerprints. Same scheme as the
+    DB index: sampled codes are indexed, every code of the other print probes.
+    """
+    postings: Dict[int, List[int]] = {}
+    for i, fp in enumerate(prints):
+        if fp is not None and len(fp):
+            for code in index_codes(fp).tolist():
+                postings.setdefault(code, []).append(i)
+
+    pairs = []
+    for i, fp in enumerate(prints):
+        if fp is None or not len(fp):
+            continue
+        shared: Dict[int, int] = {}
+        for code in np.unique(fp).tolist():
+            for j in postings.get(code, ()):
+                if j > i:
+                    shared[j] = shared.get(j, 0) + 1
+        for j, count in shared.items():
+            if count < 3:
+                continue
+            score = compare_fingerprints(fp, prints[j])
+            if score and score["ber"] <= max_ber and score["overlap"] >= min_overlap:
+                pairs.append({"a": i, "b": j, "ber": round(score["ber"], 4)})
+    return sorted(pairs, key=lambda p: (p["a"], p["b"]))
+
+
+# Global engine
+fingerprint_engine = FingerprintEngine()
@@ -0,0 +1,88 @@
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+from sqlalchemy import func
+
+from app.db import AudioFingerprint, FingerprintCode
+from app.utils.audio_fingerprint import (
+    FP_HOP,
+    FP_SAMPLE_RATE,
+    compare_fingerprints,
+    fingerprint_duration,
+    fingerprint_from_bytes,
+    fingerprint_to_bytes,
+    index_codes,
+)
+
+logger = logging.getLogger(__name__)
+
+# A re-encode of the same master scores ~0.05-0.2 BER; unrelated audio ~0.5
+MATCH_MAX_BER = 0.30
+# Aligned part must cover most of both files (not a shared sample/intro)
+MATCH_MIN_OVERLAP = 0.9
+MIN_CODE_HITS = 3
+MAX_CANDIDATES = 5
+_IN_CHUNK = 500
+
+
+def _signed(codes: np.ndarray) -> list:
+    # Integer columns are signed 32-bit; store the same bits
+    return np.asarray(codes, dtype=np.uint32).view(np.int32).tolist()
+
+
+def store_fingerprint(db, file_hash: str, fp: np.ndarray) -> bool:
+    """Persist a fingerprint and its index codes (sync Session). The caller commits."""
+    if len(fp) == 0 or db.get(AudioFingerprint, file_hash) is not None:
+        return False
+    db.add(AudioFingerprint(file_hash=file_hash, duration=fingerprint_duration(fp), codes=fingerprint_to_bytes(fp)))
+    db.flush()
+    db.add_all([FingerprintCode(code=c, file_hash=file_hash) for c in _signed(index_codes(fp))])
+    return True
+
+
+def find_near_duplicate(db, fp: np.ndarray, exclude_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Looks up previously fingerprinted files that sound the same as `fp`.
+
+    Candidates come from the inverted index (shared exact codes), then each is
+    aligned and verified by bit error rate. Returns the best verified match
+    as {"file_hash", "ber", "overlap", "offset_sec"} or None.
+    """
+    if len(fp) == 0:
+        return None
+    codes = np.unique(fp)
+    codes = _signed(codes[(codes != 0) & (codes != 0xFFFFFFFF)])
+
+    hits: Dict[str, int] = {}
+    for i in range(0, len(codes), _IN_CHUNK):
+        rows = (
+            db.query(FingerprintCode.file_hash, func.count())
+            .filter(FingerprintCode.code.in_(codes[i:i + _IN_CHUNK]))
+            .group_by(FingerprintCode.file_hash)
+            .all()
+        )
+        for file_hash, count in rows:
+            hits[file_hash] = hits.get(file_hash, 0) + count
+    hits.pop(exclude_hash, None)
+
+    candidates = sorted(
+        (h for h, c in hits.items() if c >= MIN_CODE_HITS), key=lambda h: hits[h], reverse=True
+    )[:MAX_CANDIDATES]
+
+    best = None
+    for file_hash in candidates:
+        row = db.get(AudioFingerprint, file_hash)
+        if row is None:
+            continue
+        score = compare_fingerprints(fp, fingerprint_from_bytes(row.codes))
+        if not score or score["ber"] > MATCH_MAX_BER or score["overlap"] < MATCH_MIN_OVERLAP:
+            continue
+        if best is None or score["ber"] < best["ber"]:
+            best = {
+                "file_hash": file_hash,
+                "ber": round(score["ber"], 4),
+                "overlap": round(score["overlap"], 4),
+                "offset_sec": round(score["offset"] * FP_HOP / FP_SAMPLE_RATE, 3),
+            }
+    return best
@@ -10,15 +10,25 @@ Docker: LEKKI (~150MB total libs)
 """
 
 import asyncio
+import contextlib
 import time
-from typing import Dict, Any
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Optional
 import logging
 
 from .deep_audio_analyzer import DeepAudioAnalyzer
 from .llm_ensemble import LLMEnsemble
+from .transcription_engine import transcription_engine
+from ..utils.hash_generator import hash_stage
+from ..utils.task_graph import Pipeline, Stage, file_key
 
 logger = logging.getLogger(__name__)
 
+# Pola wyznaczane wyłącznie przez DSP (Layer 1) — publikowane zanim ruszy LLM
+DSP_FIELDS = ("bpm", "key", "mode", "duration", "structure", "sha256", "tempoCharacter", "hasVocals")
+
+PartialCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
 
 class FreshTrackAnalyzer:
     """
@@ -46,7 +56,9 @@ class FreshTrackAnalyzer:
         include_lyrics: bool = False,
         model_preference: str = "pro",
         time_budget: int = 120,
-        job_id: str = None
+        job_id: str = None,
+        on_partial: Optional[PartialCallback] = None,
+        dsp_slot: Optional[contextlib.AbstractAsyncContextManager] = None,
     ) -> Dict[str, Any]:
 
         """
@@ -56,6 +68,10 @@ class FreshTrackAnalyzer:
             file_path: Ścieżka do pliku MP3/WAV
             include_lyrics: Czy transkrybować lyrics (dodatkowe 8-10s + 40MB)
             time_budget: Max czas w sekundach (domyślnie 45s, ale może być 20s)
+            on_partial: async callback(layer, fields) wołany po każdej warstwie
+                z polami znanymi na tym etapie ("dsp", "llm", "lyrics")
+            dsp_slot: async context manager trzymany tylko na czas Layer 1
+                (slot CPU ze schedulera); warstwy LLM nie blokują CPU
         
         Returns:
             Pełna analiza z 90-95% accuracy
@@ -64,180 +80,227 @@ class FreshTrackAnalyzer:
         start_time = time.time()
         
         logger.info(f"Analyzing fresh track: {file_path} (Budget: {time_budget}s)")
+
+        ctx = SimpleNamespace(
+            analyzer=self,
+            file_path=file_path,
+            include_lyrics=include_lyrics,
+            model_preference=model_preference,
+            time_budget=time_budget,
+            job_id=job_id,
+            on_partial=on_partial,
+            dsp_slot=dsp_slot,
+            start_time=start_time,
+            remaining=lambda: time_budget - (time.time() - start_time),
+        )
+        # Warstwy jako DAG (FRESH_PIPELINE): LLM i lyrics startują równolegle
+        # zaraz po Layer 1, pomijane gdy zostało za mało budżetu
+        graph = FRESH_PIPELINE.graph(ctx, budget=ctx.remaining)
+        try:
+            final_result = (await graph.run("result"))["result"]
+        except Exception as e:
+            logger.error(f"Fresh track analysis failed: {e}")
+            raise
+
+        final_result['_tech_meta']['stages'] = graph.timings()
+        logger.info(f"Analysis completed in {final_result['_tech_meta']['analysis_time']:.1f}s")
+        return final_result
+
+    # ── Etapy pipeline'u ──────────────────────────────────────────────────────
+
+    async def _deep_features(self, ctx) -> Dict[str, Any]:
+        """LAYER 1: Deep Audio Features (12-15s)"""
+        logger.info("Layer 1: Extracting audio features...")
+        async with ctx.dsp_slot or contextlib.nullcontext():
+            return await self.audio_analyzer.extract_all_features(ctx.file_path)
+
+    async def _layer1(self, ctx, hash: str, features: Dict) -> Dict[str, Any]:
+        # Add hash to features for downstream use
+        features['meta']['sha256'] = hash
+        logger.info(f"Layer 1 completed in {time.time() - ctx.start_time:.1f}s")
+
+        dsp_fields = self._merge_results(features, {}, {})
+        await self._publish(ctx.on_partial, "dsp", {k: dsp_fields[k] for k in DSP_FIELDS})
+        return features
+
+    async def _llm_layer(self, ctx, layer1: Dict) -> Dict[str, Any]:
+        """LAYER 2: LLM Consensus (10-12s, 0 MB)"""
+        audio_features = layer1
+        layer2_start = time.time()
+        logger.info("Layer 2: LLM consensus classification...")
+        
+        # Dodaj szybkie heurystyki jako hint dla LLM
+        ml_hints = self._quick_heuristics(audio_features)
+        
+        # Dynamiczny timeout dla LLM
+        llm_timeout = max(5, ctx.remaining() - 1) # Zostaw 1s na merge
+        
+        # ── Streaming opisu w czasie rzeczywistym (równolegle z konsensusem) ──
+        stream_task = None
+        streamed_description = ""
+        if ctx.job_id:
+            stream_task = asyncio.create_task(
+                self.llm_ensemble.stream_description(
+                    audio_features,
+                    ml_hints,
+                    job_id=ctx.job_id,
+                    model_preference=ctx.model_preference,
+                )
+            )
+            logger.info(f"Description streaming started for job {ctx.job_id}")
         
         try:
-            # === LAYER 0: Identity & Integrity ===
-            from ..utils.hash_generator import generate_file_hash
-            file_hash = generate_file_hash(file_path)
-            
-            # === LAYER 1: Deep Audio Features (12-15s) ===
-            logger.info("Layer 1: Extracting audio features...")
-            audio_features = await self.audio_analyzer.extract_all_features(file_path)
-            
-            # Add hash to features for downstream use
-            audio_features['meta']['sha256'] = file_hash
-            
-            layer1_time = time.time() - start_time
+            llm_consensus = await asyncio.wait_for(
+                self.llm_ensemble.consensus_classification(
+                    audio_features,
+                    ml_hints,
+                    model_preference=ctx.model_preference,
+                    job_id=ctx.job_id or "fresh_analysis"
+                ),
+                timeout=llm_timeout
+            )
 
-            logger.info(f"Layer 1 completed in {layer1_time:.1f}s")
-            
-            # Check remaining budget
-            remaining = time_budget - (time.time() - start_time)
-            
-            # RELAXED LIMIT: Only skip if less than 3 seconds (was 5)
-            # This gives LLM a chance even in tight scenarios
-            if remaining < 3:
-                logger.warning(f"Time budget low ({remaining:.1f}s). Skipping LLM & Lyrics.")
-                llm_consensus = self.llm_ensemble._fallback_classification(audio_features)
-                lyrics_analysis = {}
-            else:
-                # === LAYER 2: LLM Consensus (10-12s, 0 MB) ===
-                logger.info("Layer 2: LLM consensus classification...")
-                
-                # Dodaj szybkie heurystyki jako hint dla LLM
-                ml_hints = self._quick_heuristics(audio_features)
-                
-                # Dynamiczny timeout dla LLM
-                llm_timeout = max(5, remaining - 1) # Zostaw 1s na merge
-                
-                # ── Streaming opisu w czasie rzeczywistym (równolegle z konsensusem) ──
-                stream_task = None
-                streamed_description = ""
-                if job_id:
-                    stream_task = asyncio.create_task(
-                        self.llm_ensemble.stream_description(
-                            audio_features,
-                            ml_hints,
-                            job_id=job_id,
-                            model_preference=model_preference,
-                        )
-                    )
-                    logger.info(f"Description streaming started for job {job_id}")
-                
-                try:
-                    llm_consensus = await asyncio.wait_for(
-                        self.llm_ensemble.consensus_classification(
-                            audio_features,
-                            ml_hints,
-                            model_preference=model_preference,
-                            job_id=job_id or "fresh_analysis"
-                        ),
-                        timeout=llm_timeout
-                    )
-
-                except asyncio.TimeoutError:
-                    logger.warning("LLM Ensemble timed out. Using fallback.")
-                    llm_consensus = self.llm_ensemble._fallback_classification(audio_features)
-                
-                # Zbierz strumieniowany opis i użyj, jeśli jest bogatszy
-                if stream_task:
-                    try:
-                        streamed_description = await asyncio.wait_for(stream_task, timeout=5.0)
-                    except (asyncio.TimeoutError, Exception) as e:
-                        logger.warning(f"Stream task collection failed: {e}")
-                        if not stream_task.done():
-                            stream_task.cancel()
-                
-                if streamed_description and len(streamed_description) > len(
-                    llm_consensus.get("trackDescription", "")
-                ):
-                    llm_consensus["trackDescription"] = streamed_description
-                    logger.info("Used streamed description (higher quality)")
-                
-                # ── Automatyczny re-run w trybie Pro przy niskiej pewności ──
-                CONFIDENCE_THRESHOLD = 0.70
-                consensus_confidence = float(llm_consensus.get("confidence", 0.75))
-                remaining_after_l2 = time_budget - (time.time() - start_time)
-                if (
-                    consensus_confidence < CONFIDENCE_THRESHOLD
-                    and model_preference == "flash"
-                    and remaining_after_l2 > 12
-                ):
-                    logger.info(
-                        f"Confidence {consensus_confidence:.2f} < {CONFIDENCE_THRESHOLD} — running Pro re-analysis pass"
-                    )
-                    pro_timeout = min(remaining_after_l2 - 2.0, 25.0)
-                    try:
-                        pro_consensus = await asyncio.wait_for(
-                            self.llm_ensemble.consensus_classification(
-                                audio_features,
-                                ml_hints,
-                                model_preference="pro",
-                            ),
-                            timeout=pro_timeout,
-                        )
-                        pro_confidence = float(pro_consensus.get("confidence", 0.0))
-                        if pro_confidence > consensus_confidence:
-                            if streamed_description and len(streamed_description) > len(
-                                pro_consensus.get("trackDescription", "")
-                            ):
-                                pro_consensus["trackDescription"] = streamed_description
-                            llm_consensus = pro_consensus
-                    except asyncio.TimeoutError:
-                        logger.warning("Pro re-analysis pass timed out — keeping Flash result")
-                    except Exception as e:
-                        logger.warning(f"Pro re-analysis pass failed: {e} — keeping Flash result")
-                
-                layer2_time = time.time() - start_time - layer1_time
-                logger.info(f"Layer 2 completed in {layer2_time:.1f}s")
-                
-                # === LAYER 3: Optional Lyrics (8-10s, adds 40MB to Docker) ===
-                lyrics_analysis = {}
-                
-                remaining = time_budget - (time.time() - start_time)
-                
-                # Only run lyrics if we have at least 10s left AND requested
-                if include_lyrics and remaining > 10:
-                    logger.info(f"Layer 3: Extracting lyrics (Budget remaining: {remaining:.1f}s)...")
-                    try:
-                        # Give it strict timeout
-                        lyrics_analysis = await asyncio.wait_for(
-                            self._extract_lyrics(file_path, audio_features),
-                            timeout=remaining - 1
-                        )
-                        layer3_time = time.time() - start_time - layer1_time - layer2_time
-                        logger.info(f"Layer 3 completed in {layer3_time:.1f}s")
-                    except asyncio.TimeoutError:
-                        logger.warning("Lyrics extraction timed out. Skipping.")
-                else:
-                    if include_lyrics:
-                        logger.info(f"Skipping lyrics due to low time budget ({remaining:.1f}s < 10s)")
-            
-            # === ENSEMBLE: Merge Results ===
-            final_result = self._merge_results(
-                audio_features,
-                llm_consensus,
-                lyrics_analysis
+        except asyncio.TimeoutError:
+            logger.warning("LLM Ensemble timed out. Using fallback.")
+            llm_consensus = self.llm_ensemble._fallback_classification(audio_features)
+        except BaseException:
+            # Anulowanie joba / błąd — nie zostawiamy osieroconego streamingu opisu
+            if stream_task and not stream_task.done():
+                stream_task.cancel()
+            raise
+        
+        # Zbierz strumieniowany opis i użyj, jeśli jest bogatszy
+        if stream_task:
+            try:
+                streamed_description = await asyncio.wait_for(stream_task, timeout=5.0)
+            except (asyncio.TimeoutError, Exception) as e:
+                logger.warning(f"Stream task collection failed: {e}")
+                if not stream_task.done():
+                    stream_task.cancel()
+        
+        if streamed_description and len(streamed_description) > len(
+            llm_consensus.get("trackDescription", "")
+        ):
+            llm_consensus["trackDescription"] = streamed_description
+            logger.info("Used streamed description (higher quality)")
+        
+        # ── Automatyczny re-run w trybie Pro przy niskiej pewności ──
+        CONFIDENCE_THRESHOLD = 0.70
+        consensus_confidence = float(llm_consensus.get("confidence", 0.75))
+        remaining_after_l2 = ctx.remaining()
+        if (
+            consensus_confidence < CONFIDENCE_THRESHOLD
+            and ctx.model_preference == "flash"
+            and remaining_after_l2 > 12
+        ):
+            logger.info(
+                f"Confidence {consensus_confidence:.2f} < {CONFIDENCE_THRESHOLD} — running Pro re-analysis pass"
             )
-            
-            total_time = time.time() - start_time
-            
-            # Use _tech_meta instead of meta to avoid conflicts with Metadata schema
-            final_result['_tech_meta']['analysis_time'] = round(total_time, 2)
-            final_result['_tech_meta']['target_met'] = total_time <= time_budget
+            pro_timeout = min(remaining_after_l2 - 2.0, 25.0)
             try:
-                from datetime import datetime
-                ts = datetime.utcnow().isoformat() + "Z"
-            except Exception:
-                ts = ""
-            final_result["analysisVersion"] = "2.1.0"
-            final_result["analysisTimestamp"] = ts
-            final_result["pipelineParams"] = {
-                "includeLyrics": bool(include_lyrics),
-                "modelPreference": str(model_preference),
-                "timeBudgetSec": int(time_budget),
-                "featureCount": int(audio_features.get("meta", {}).get("total_features", 0)),
-                "sampleRate": int(audio_features.get("meta", {}).get("sample_rate", 0)),
-            }
-            
-            logger.info(f"Analysis completed in {total_time:.1f}s")
-            
-            return final_result
-            
+                pro_consensus = await asyncio.wait_for(
+                    self.llm_ensemble.consensus_classification(
+                        audio_features,
+                        ml_hints,
+                        model_preference="pro",
+                    ),
+                    timeout=pro_timeout,
+                )
+                pro_confidence = float(pro_consensus.get("confidence", 0.0))
+                if pro_confidence > consensus_confidence:
+                    if streamed_description and len(streamed_description) > len(
+                        pro_consensus.get("trackDescription", "")
+                    ):
+                        pro_consensus["trackDescription"] = streamed_description
+                    llm_consensus = pro_consensus
+            except asyncio.TimeoutError:
+                logger.warning("Pro re-analysis pass timed out — keeping Flash result")
+            except Exception as e:
+                logger.warning(f"Pro re-analysis pass failed: {e} — keeping Flash result")
+        
+        logger.info(f"Layer 2 completed in {time.time() - layer2_start:.1f}s")
+
+        await self._publish(ctx.on_partial, "llm", self._classification_fields(audio_features, llm_consensus, {}))
+        return llm_consensus
+
+    async def _lyrics_layer(self, ctx, layer1: Dict) -> Dict[str, Any]:
+        """LAYER 3: Optional Lyrics (8-10s, adds 40MB to Docker)"""
+        remaining = ctx.remaining()
+        logger.info(f"Layer 3: Extracting lyrics (Budget remaining: {remaining:.1f}s)...")
+        layer3_start = time.time()
+        try:
+            # Give it strict timeout
+            lyrics_analysis = await asyncio.wait_for(
+                self._extract_lyrics(ctx.file_path, layer1),
+                timeout=remaining - 1
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Lyrics extraction timed out. Skipping.")
+            return {}
+        logger.info(f"Layer 3 completed in {time.time() - layer3_start:.1f}s")
+        return lyrics_analysis
+
+    async def _result(self, ctx, layer1: Dict, llm: Dict, lyrics: Dict) -> Dict[str, Any]:
+        """ENSEMBLE: Merge Results"""
+        audio_features, llm_consensus, lyrics_analysis = layer1, llm, lyrics
+        if lyrics_analysis.get('has_lyrics'):
+            await self._publish(
+                ctx.on_partial, "lyrics",
+                self._classification_fields(audio_features, llm_consensus, lyrics_analysis),
+            )
+
+        final_result = self._merge_results(
+            audio_features,
+            llm_consensus,
+            lyrics_analysis
+        )
+        
+        total_time = time.time() - ctx.start_time
+        
+        # Use _tech_meta instead of meta to avoid conflicts with Metadata schema
+        final_result['_tech_meta']['analysis_time'] = round(total_time, 2)
+        final_result['_tech_meta']['target_met'] = total_time <= ctx.time_budget
+
+        # Wektor podobieństwa (sound-alikes) z cech Layer 1
+        try:
+            from .similarity import track_embedding
+            embedding = track_embedding(audio_features)
+            if embedding is not None:
+                final_result['_tech_meta']['embedding'] = embedding.tolist()
         except Exception as e:
-            logger.error(f"Fresh track analysis failed: {e}")
-            raise
+            logger.warning(f"Embedding extraction failed: {e}")
+        try:
+            from datetime import datetime
+            ts = datetime.utcnow().isoformat() + "Z"
+        except Exception:
+            ts = ""
+        final_result["analysisVersion"] = "2.1.0"
+        final_result["analysisTimestamp"] = ts
+        final_result["pipelineParams"] = {
+            "includeLyrics": bool(ctx.include_lyrics),
+            "modelPreference": str(ctx.model_preference),
+            "timeBudgetSec": int(ctx.time_budget),
+            "featureCount": int(audio_features.get("meta", {}).get("total_features", 0)),
+            "sampleRate": int(audio_features.get("meta", {}).get("sample_rate", 0)),
+        }
+        return final_result
     
+    @staticmethod
+    async def _publish(on_partial: Optional[PartialCallback], layer: str, fields: Dict[str, Any]):
+        """Wyniki częściowe są best-effort — błąd publikacji nie przerywa analizy"""
+        if not on_partial:
+            return
+        try:
+            await on_partial(layer, fields)
+        except Exception as e:
+            logger.warning(f"Partial result publish failed ({layer}): {e}")
+
+    def _classification_fields(self, audio_features: Dict, llm_consensus: Dict, lyrics_analysis: Dict) -> Dict:
+        """Pola z LLM/lyrics (bez technicznych DSP, które wyszły już w warstwie "dsp")"""
+        merged = self._merge_results(audio_features, llm_consensus, lyrics_analysis)
+        merged.pop("_tech_meta", None)
+        return {k: v for k, v in merged.items() if k not in DSP_FIELDS and v not in (None, "", [], {})}
+
     def _quick_heuristics(self, audio_features: Dict) -> Dict:
         """
         Richer DSP-based heuristics as pre-classification hints for the LLM.
@@ -385,18 +448,9 @@ class FreshTrackAnalyzer:
             if not is_likely_vocal:
                 return {'has_lyrics': False, 'reason': 'instrumental_detected'}
             
-            # Whisper-tiny transcription
-            import whisper
-            
-            model = whisper.load_model("tiny")  # 39MB
-            
-            result = await asyncio.to_thread(
-                model.transcribe,
-                file_path,
-                language='en',
-                task='transcribe',
-                fp16=False  # CPU mode
-            )
+            # Whisper-tiny tylko na regionach wokalnych, w kawałkach równolegle
+            # (instancje modelu rezydentne w rejestrze, ładowane raz na worker)
+            result = await asyncio.to_thread(transcription_engine.transcribe, file_path, "local", "en")
             
             lyrics = result['text']
             
@@ -580,3 +634,23 @@ Return JSON:
         }
         
         return metadata
+
+
+# Layer 0 (hash) i Layer 1 (DSP) wspólne z innymi pipeline'ami przez cache etapów;
+# LLM i lyrics zależą tylko od Layer 1, więc biegną równolegle
+FRESH_PIPELINE = Pipeline("fresh_track", [
+    hash_stage,
+    Stage("features", lambda ctx: ctx.analyzer._deep_features(ctx),
+          cache_key=lambda ctx: file_key(ctx.file_path), cost=12),
+    Stage("layer1", lambda ctx, hash, features: ctx.analyzer._layer1(ctx, hash, features),
+          inputs=("hash", "features")),
+    # Poniżej ~3 s budżetu: od razu klasyfikacja heurystyczna zamiast LLM
+    Stage("llm", lambda ctx, layer1: ctx.analyzer._llm_layer(ctx, layer1), inputs=("layer1",),
+          cost=3, optional=True,
+          fallback=lambda ctx, error, layer1: ctx.analyzer.llm_ensemble._fallback_classification(layer1)),
+    Stage("lyrics", lambda ctx, layer1: ctx.analyzer._lyrics_layer(ctx, layer1), inputs=("layer1",),
+          cost=10, optional=True, fallback=lambda ctx, error, layer1: {},
+          skip=lambda ctx, layer1: not ctx.include_lyrics),
+    Stage("result", lambda ctx, layer1, llm, lyrics: ctx.analyzer._result(ctx, layer1, llm, lyrics),
+          inputs=("layer1", "llm", "lyrics")),
+])
@@ -5,11 +5,14 @@ Zero-cost AI for metadata generation using Groq LLM + Groq Cloud Whisper.
 
 import json
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, Optional
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+GROQ_TRANSCRIPTIONS_URL = f"{settings.GROQ_BASE_URL.rstrip('/')}/openai/v1/audio/transcriptions"
+GROQ_UPLOAD_LIMIT_MB = 24
+
 
 def get_groq_client():
     from groq import Groq
@@ -43,27 +46,40 @@ class GroqWhisperService:
     @staticmethod
     def transcribe_audio(file_path: str) -> Dict[str, Any]:
         try:
-            import os
-            client = get_groq_client()
-            file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-            if file_size_mb > 24:
-                logger.warning(f"File too large for Groq Whisper ({file_size_mb:.1f}MB)")
-                return {"text": "[File too large for transcription]", "language": "unknown"}
-
-            with open(file_path, "rb") as af:
-                transcription = client.audio.transcriptions.create(
-                    file=(os.path.basename(file_path), af.read()),
-                    model="whisper-large-v3",
-                    response_format="json",
-                )
+            from app.utils.audio_proxy import PROXY_BYTES_PER_SECOND, proxy_stream
+            from app.utils.audio_stream import AudioStream
+
+            proxy_mb = AudioStream(file_path).duration * PROXY_BYTES_PER_SECOND / (1024 * 1024)
+            if proxy_mb > GROQ_UPLOAD_LIMIT_MB:
+                # Even the proxy is over the upload limit (~1.7 h): vocal regions only, as concurrent chunks
+                from app.services.transcription_engine import transcription_engine
+
+                logger.info(f"Proxy too large for one Groq Whisper upload (~{proxy_mb:.1f}MB), transcribing in chunks")
+                result = transcription_engine.transcribe(file_path, backend="groq")
+                return {"text": result["text"], "language": result["language"]}
+
+            # 16 kHz mono Opus proxy encoded while it uploads, not the original read into memory
+            transcription = GroqWhisperService.transcribe_proxy(proxy_stream(file_path))
             return {
-                "text": transcription.text,
-                "language": getattr(transcription, "language", "unknown"),
+                "text": transcription.get("text", ""),
+                "language": transcription.get("language", "unknown"),
             }
         except Exception as e:
             logger.error(f"Groq Cloud transcription failed: {e}")
             return {"error": str(e), "text": ""}
 
+    @staticmethod
+    def transcribe_proxy(chunks: Iterable[bytes], language: Optional[str] = None) -> Dict[str, Any]:
+        """Stream an audio proxy (app.utils.audio_proxy) to Groq Cloud Whisper."""
+        from app.utils.audio_proxy import post_proxy
+
+        fields = {"model": "whisper-large-v3", "response_format": "json"}
+        if language:
+            fields["language"] = language
+        return post_proxy(
+            GROQ_TRANSCRIPTIONS_URL, {"Authorization": f"Bearer {settings.GROQ_API_KEY}"}, fields, chunks
+        )
+
     @staticmethod
     async def generate_metadata(
         audio_analysis: Dict[str, Any],
@@ -136,6 +152,7 @@ AUDIO FORENSICS:
 - Energy Level: {energy_level_str}  (RMS={energy_mean})
 - Integrated Loudness: {lufs_val} LUFS
 - True Peak: {loudness.get('true_peak_db', 'N/A')} dBTP
+- Loudness Range: {loudness.get('loudness_range_lu', 'N/A')} LU
 - Dynamic Range: {dynamic_range_str}
 - Spectral Centroid: {centroid_val} Hz  (brightness proxy)
 - Spectral Rolloff: {rolloff_val} Hz
@@ -285,7 +302,12 @@ Return ONLY valid JSON with ALL these fields:
             existing_metadata=audio_analysis.get("existing_metadata"),
         )
 
-        # Final merge of DSP values
+        GroqWhisperService.merge_dsp(metadata, audio_analysis)
+        return {"metadata": metadata, "analysis": audio_analysis, "transcription": transcription}
+
+    @staticmethod
+    def merge_dsp(metadata: Dict[str, Any], audio_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Final merge of DSP values: measured tempo/key/structure win over the LLM's."""
         if audio_analysis and "core" in audio_analysis:
             core = audio_analysis["core"]
             metadata["bpm"] = core.get("bpm", metadata.get("bpm"))
@@ -293,5 +315,4 @@ Return ONLY valid JSON with ALL these fields:
             metadata["mode"] = core.get("mode", metadata.get("mode"))
             metadata["duration"] = core.get("duration_seconds", metadata.get("duration"))
             metadata["structure"] = core.get("structure", metadata.get("structure", []))
-
-        return {"metadata": metadata, "analysis": audio_analysis, "transcription": transcription}
+        return metadata
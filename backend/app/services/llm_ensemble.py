@@ -14,10 +14,18 @@ from collections import Counter
 import numpy as np
 import logging
 import json
+import time
+from ..config import settings
 from .standards import MAIN_GENRES, SUB_GENRES, MOODS, INSTRUMENTATION, VOCAL_STYLES
+from ..utils.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+LLM_SECONDS = metrics.histogram(
+    "llm_request_seconds", "LLM provider classification calls, retries included", ("provider", "outcome")
+)
+FALLBACKS = metrics.counter("fallbacks_total", "Results produced by a fallback instead of the real path", ("kind",))
+
 MUSIC_EXPERT_SYSTEM_PROMPT = """You are a visionary A&R Executive and High-End Music Supervisor with 30+ years of experience in London, Los Angeles, and Berlin. 
 Your specialty is identifying the "DNA" of a track — not just its genre, but its emotional soul, production era, and commercial fingerprint.
 
@@ -90,6 +98,7 @@ class LLMEnsemble:
         """
         try:
             from app.utils.websocket_manager import manager as ws_manager
+            from app.utils.cancellation import raise_if_cancelled
             from groq import Groq
             import os
 
@@ -144,6 +153,7 @@ Rules:
             )
 
             for chunk in stream:
+                raise_if_cancelled()
                 token = chunk.choices[0].delta.content or ""
                 if token:
                     accumulated.append(token)
@@ -187,17 +197,17 @@ Rules:
         if model_preference == 'flash':
             logger.info("Fast Mode: Using Groq + Gemini (free chain)")
             tasks = [
-                self._groq_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT, model_preference=model_preference),
-                self._gemini_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT),
+                self._timed("groq", self._groq_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT, model_preference=model_preference)),
+                self._timed("gemini", self._gemini_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT)),
             ]
         else:
             tasks = [
-                self._groq_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT, model_preference=model_preference),
-                self._gemini_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT),
+                self._timed("groq", self._groq_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT, model_preference=model_preference)),
+                self._timed("gemini", self._gemini_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT)),
             ]
             if self.openrouter_key:
                 logger.info("Pro Mode: Using Groq + Gemini + OpenRouter (free chain)")
-                tasks.append(self._openrouter_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT))
+                tasks.append(self._timed("openrouter", self._openrouter_classify(user_prompt, system_prompt=MUSIC_EXPERT_SYSTEM_PROMPT)))
             else:
                 logger.info("Pro Mode: Using Groq + Gemini (OpenRouter key not configured)")
 
@@ -238,6 +248,24 @@ Rules:
 
         return final_result
     
+    @staticmethod
+    async def _timed(provider: str, call) -> Dict:
+        """Await one provider call, recording its latency by provider and outcome."""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await call
+            if result and not result.get('error'):
+                outcome = "ok"
+            elif result and result.get('error') == 'no_api_key':
+                outcome = "not_configured"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - start, provider=provider, outcome=outcome)
+
     def _build_enhanced_prompt(self, audio_features: Dict, ml_hints: Dict, job_id: str = "unknown") -> str:
         """Build a premium prompt with rich audio context and quality-focused output guidance."""
         import secrets
@@ -548,7 +576,7 @@ STRICT OPERATIONAL DIRECTIVES:
                 try:
                     async with httpx.AsyncClient(timeout=30.0) as client:
                         response = await client.post(
-                            "https://openrouter.ai/api/v1/chat/completions",
+                            f"{settings.OPENROUTER_BASE_URL.rstrip('/')}/chat/completions",
                             headers={
                                 "Authorization": f"Bearer {self.openrouter_key}",
                                 "Content-Type": "application/json",
@@ -586,7 +614,11 @@ STRICT OPERATIONAL DIRECTIVES:
         
         try:
             import google.generativeai as genai
-            genai.configure(api_key=self.gemini_key, transport="rest")
+            genai.configure(
+                api_key=self.gemini_key,
+                transport="rest",
+                client_options={"api_endpoint": settings.GEMINI_BASE_URL} if settings.GEMINI_BASE_URL else None,
+            )
             
             # Configure model with system instruction if possible or fallback.
             # Use the "latest" alias, not a pinned dated snapshot — a pinned
@@ -1018,6 +1050,7 @@ Analyze this track and return STRICT JSON:
         Gwarantuje brak "Unknown" tagów.
         """
         logger.warning("Using DSP-only fallback classification (no LLMs available)")
+        FALLBACKS.inc(kind="llm_heuristic")
         rhythm = audio_features.get('rhythm', {})
         energy = audio_features.get('energy', {})
         harmonic = audio_features.get('harmonic', {})
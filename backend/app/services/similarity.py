@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (feature group, key, slice) taken from DeepAudioAnalyzer.extract_all_features.
+# mfcc_mean[0] is overall loudness, not timbre, so it is dropped.
+EMBEDDING_BLOCKS = (
+    ("timbre", "mfcc_mean", slice(1, 20), False),
+    ("harmonic", "chroma_cqt_mean", slice(0, 12), True),
+    ("harmonic", "tonnetz_mean", slice(0, 6), False),
+    ("spectral", "contrast_mean", slice(0, 7), True),
+    ("spectral", "mel_mean", slice(0, 20), True),
+)
+EMBEDDING_DIM = 64
+
+
+def track_embedding(audio_features: Dict[str, Any]) -> Optional[np.ndarray]:
+    """
+    Builds a unit-length EMBEDDING_DIM vector from the per-track feature means.
+
+    Every block is (optionally) mean-centred and L2-normalized on its own, so
+    the 20-dim mel/MFCC blocks don't drown out the 6-dim tonnetz, and level
+    differences (dB offsets, chroma energy) cancel out. Cosine similarity is
+    then a plain dot product. Returns None if any block is missing.
+    """
+    parts = []
+    for group, key, sl, centre in EMBEDDING_BLOCKS:
+        values = (audio_features.get(group) or {}).get(key)
+        if values is None:
+            return None
+        block = np.asarray(values, dtype=np.float64)[sl]
+        if block.shape[0] != sl.stop - sl.start or not np.all(np.isfinite(block)):
+            return None
+        if centre:
+            block = block - block.mean()
+        norm = np.linalg.norm(block)
+        parts.append(block / norm if norm > 1e-9 else block)
+
+    vec = np.concatenate(parts)
+    norm = np.linalg.norm(vec)
+    if norm < 1e-9:
+        return None
+    return (vec / norm).astype(np.float32)
+
+
+class IVFIndex:
+    """
+    In-process inverted-file index over unit vectors (inner product).
+
+    Below exact_threshold vectors it searches by brute force. Above it,
+    vectors are clustered with spherical k-means into ~2*sqrt(N) lists and a
+    query only scans the nprobe lists whose centroids are closest, widening
+    the probe when an owner filter leaves too few candidates. Centroids are
+    retrained when the index has grown 4x since the last training.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, nprobe: int = 64, exact_threshold: int = 4096):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.exact_threshold = exact_threshold
+        self._vecs = np.empty((1024, dim), dtype=np.float32)
+        self._owners = np.empty(1024, dtype=np.int32)
+        self._keys: List[str] = []
+        self._owner_codes: Dict[Optional[str], int] = {None: -1}
+        # (centroids, member rows per list, cached arrays per list), swapped in
+        # as one object so a search never pairs new centroids with old lists
+        self._ivf: Optional[Tuple[np.ndarray, List[List[int]], List[Optional[np.ndarray]]]] = None
+        self.trained_size = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def nlist(self) -> int:
+        return len(self._ivf[1]) if self._ivf else 0
+
+    def _owner_code(self, owner: Optional[str]) -> int:
+        if owner not in self._owner_codes:
+            self._owner_codes[owner] = len(self._owner_codes)
+        return self._owner_codes[owner]
+
+    def add(self, keys: Sequence[str], owners: Sequence[Optional[str]], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        start, n = len(self._keys), vectors.shape[0]
+        if start + n > self._vecs.shape[0]:
+            capacity = max(start + n, 2 * self._vecs.shape[0])
+            self._vecs = np.resize(self._vecs, (capacity, self.dim))
+            self._owners = np.resize(self._owners, capacity)
+        self._vecs[start:start + n] = vectors
+        self._owners[start:start + n] = [self._owner_code(o) for o in owners]
+        self._keys.extend(keys)
+
+        if self._ivf is not None:
+            centroids, lists, arrays = self._ivf
+            for row, lst in zip(range(start, start + n), self._assign(vectors, centroids)):
+                lists[lst].append(row)
+                arrays[lst] = None
+
+    def needs_training(self) -> bool:
+        n = len(self)
+        if n < self.exact_threshold:
+            return False
+        return self._ivf is None or n >= 4 * self.trained_size
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        out = np.empty(vectors.shape[0], dtype=np.int64)
+        for i in range(0, vectors.shape[0], chunk):
+            out[i:i + chunk] = np.argmax(vectors[i:i + chunk] @ centroids.T, axis=1)
+        return out
+
+    def train(self, sample_size: int = 65536, iterations: int = 10, seed: int = 0):
+        n = len(self)
+        data = self._vecs[:n]
+        nlist = max(1, min(n // 32, int(2 * math.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample = data[rng.choice(n, size=min(n, sample_size), replace=False)]
+
+        centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] < 1e-9
+            # Re-seed empty clusters from random points
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        labels = self._assign(data, centroids)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(nlist + 1))
+        lists = [order[bounds[i]:bounds[i + 1]].tolist() for i in range(nlist)]
+        self._ivf = (centroids, lists, [None] * nlist)
+        self.trained_size = n
+        logger.info(f"Similarity index trained: {n} vectors, {nlist} lists")
+
+    @staticmethod
+    def _list_array(lists: List[List[int]], arrays: List[Optional[np.ndarray]], i: int) -> np.ndarray:
+        arr = arrays[i]
+        if arr is None:
+            arr = np.asarray(lists[i], dtype=np.int64)
+            arrays[i] = arr
+        return arr
+
+    def search(
+        self, query: np.ndarray, k: int = 10, owner: Optional[str] = None, exclude: Sequence[str] = ()
+    ) -> List[Tuple[str, float]]:
+        """Top-k (key, cosine) pairs. owner restricts results to one user's vectors."""
+        n = len(self)
+        if n == 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        owner_code = None
+        if owner is not None:
+            owner_code = self._owner_codes.get(owner)
+            if owner_code is None:
+                return []
+        want = k + len(exclude)
+
+        ivf = self._ivf
+        if ivf is None:
+            candidates = np.arange(n)
+        else:
+            centroids, lists, arrays = ivf
+            order = np.argsort(-(centroids @ query))
+            nprobe = min(self.nprobe, len(order))
+            while True:
+                candidates = np.concatenate([self._list_array(lists, arrays, i) for i in order[:nprobe]])
+                if owner_code is not None:
+                    candidates = candidates[self._owners[candidates] == owner_code]
+                if candidates.shape[0] >= want or nprobe >= len(order):
+                    break
+                nprobe = min(len(order), nprobe * 4)
+
+        if owner_code is not None and ivf is None:
+            candidates = candidates[self._owners[:n] == owner_code]
+        if candidates.shape[0] == 0:
+            return []
+
+        scores = self._vecs[candidates] @ query
+        top = min(want, scores.shape[0])
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+
+        excluded = set(exclude)
+        hits = []
+        for i in best:
+            key = self._keys[candidates[i]]
+            if key in excluded:
+                continue
+            hits.append((key, float(scores[i])))
+            if len(hits) == k:
+                break
+        return hits
+
+
+class SimilarityIndex:
+    """
+    Process-wide IVFIndex kept in sync with the track_embeddings table.
+
+    Rows are pulled incrementally by primary key before each query, so
+    embeddings written by any worker show up without a rebuild.
+    """
+
+    def __init__(self, batch_size: int = 20000):
+        self.index = IVFIndex()
+        self.batch_size = batch_size
+        self._last_id = 0
+        self._lock = asyncio.Lock()
+
+    async def sync(self, db):
+        """Load new embeddings (AsyncSession) and (re)train when due."""
+        from sqlalchemy import select
+        from app.db import TrackEmbedding
+
+        async with self._lock:
+            while True:
+                rows = (
+                    await db.execute(
+                        select(TrackEmbedding.id, TrackEmbedding.job_id, TrackEmbedding.user_id, TrackEmbedding.vector)
+                        .where(TrackEmbedding.id > self._last_id, TrackEmbedding.dim == EMBEDDING_DIM)
+                        .order_by(TrackEmbedding.id)
+                        .limit(self.batch_size)
+                    )
+                ).all()
+                if not rows:
+                    break
+                vectors = np.frombuffer(b"".join(r.vector for r in rows), dtype=np.float32)
+                self.index.add([r.job_id for r in rows], [r.user_id for r in rows], vectors)
+                self._last_id = rows[-1].id
+                if len(rows) < self.batch_size:
+                    break
+
+            if self.index.needs_training():
+                await asyncio.to_thread(self.index.train)
+
+    def search(self, query: np.ndarray, k: int = 10, owner: Optional[str] = None, exclude: Sequence[str] = ()):
+        return self.index.search(query, k=k, owner=owner, exclude=exclude)
+
+
+def save_embedding(db, job_id: str, user_id: Optional[str], file_hash: Optional[str], vector) -> None:
+    """Persists a track embedding (sync Session). The caller commits."""
+    from app.db import TrackEmbedding
+
+    vec = np.asarray(vector, dtype=np.float32)
+    db.add(TrackEmbedding(
+        job_id=job_id,
+        user_id=user_id,
+        file_hash=file_hash,
+        dim=int(vec.shape[0]),
+        vector=vec.tobytes(),
+    ))
+
+
+def copy_embedding_for_hash(
+    db, job_id: str, user_id: Optional[str], file_hash: str, source_hash: Optional[str] = None
+) -> bool:
+    """
+    Cache hits skip Layer 1; reuse the embedding stored for the same audio
+    (source_hash when the match was by fingerprint rather than SHA-256).
+    """
+    from app.db import TrackEmbedding
+
+    src = (
+        db.query(TrackEmbedding)
+        .filter(TrackEmbedding.file_hash == (source_hash or file_hash))
+        .order_by(TrackEmbedding.id.desc())
+        .first()
+    )
+    if src is None:
+        return False
+    db.add(TrackEmbedding(
+        job_id=job_id, user_id=user_id, file_hash=file_hash, dim=src.dim, vector=src.vector,
+    ))
+    return True
+
+
+# Global index
+similarity_index = SimilarityIndex()
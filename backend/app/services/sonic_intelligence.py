@@ -1,10 +1,12 @@
-import hashlib
 import logging
 from typing import Dict, Any, Optional
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
 import numpy as np
 
+from app.utils.hash_generator import hash_stage
+from app.utils.task_graph import Pipeline, Stage, file_key
+
 logger = logging.getLogger(__name__)
 
 # --- ZAAWANSOWANE MODELE DANYCH (PYDANTIC) ---
@@ -37,9 +39,12 @@ class SonicAnalyzer:
     def __init__(self, file_path: str):
         self.file_path = file_path
 
-    def _calculate_fingerprint(self) -> str:
-        with open(self.file_path, "rb") as f:
-            return hashlib.sha256(f.read()).hexdigest()
+    def _integrated_lufs(self) -> float:
+        """Full-track EBU R128 integrated loudness (streamed, constant memory)."""
+        from app.utils.loudness import measure_file
+
+        lufs = measure_file(self.file_path)["integrated_lufs"]
+        return lufs if lufs is not None else -70.0
 
     def _interpret_vibe(self, scale, dissonance, energy):
         """Logika interpretacyjna dla Szwadronu Hydra (Marketing)."""
@@ -48,66 +53,60 @@ class SonicAnalyzer:
         return "Energetic/Happy" if energy > 0.1 else "Chill/Calm"
 
     def run_deep_analysis(self) -> Dict[str, Any]:
-        """Executes full sonic test suite."""
-        try:
-            import essentia.standard as es
-            # Wczytujemy plik w formacie mono
-            loader = es.MonoLoader(filename=self.file_path)
-            audio = loader()
-            
-            # Optimization: Smart Slicing for long files (90s limit for analysis)
-            duration = len(audio) / 44100.0
-            if duration > 90:
-                mid_point = duration / 2
-                start_sample = int((mid_point - 45) * 44100)
-                end_sample = int((mid_point + 45) * 44100)
-                start_sample = max(0, start_sample)
-                end_sample = min(len(audio), end_sample)
-                audio = audio[start_sample:end_sample]
-                logger.info(f"SonicIntelligence: Smart Slicing active ({len(audio)/44100:.1f}s)")
-
-            # 1. Rytm i Tempo
-            rhythm_extractor = es.RhythmExtractor2013(method="multifeature")
-            bpm, _, _, _, _ = rhythm_extractor(audio)
-
-            # 2. Tonalność i Skala
-            key_extractor = es.KeyExtractor()
-            key, scale, _ = key_extractor(audio)
-
-            # 3. Głośność (LUFS)
-            loudness_stats = es.LoudnessEBUR128()(audio)
-            lufs = loudness_stats[2]
-
-            # 4. Charakterystyka taneczna
-            dance = es.Danceability()(audio)[0]
-            
-            # 6. Analiza Nastroju
-            # Cut to first 2048 samples for spectrum/dissonance snapshot (simplification)
-            # or better pass a frame. Logic from user snippet:
-            spectrum = es.Spectrum()(es.Windowing(type='hann')(audio[:2048]))
-            dissonance = es.Dissonance()(spectrum)
-            energy = es.RMS()(audio)
-            
-            vibe = self._interpret_vibe(scale, dissonance, energy)
-
-            return {
-                "bpm": round(bpm, 2),
-                "key": f"{key} {scale}",
-                "lufs": round(lufs, 2),
-                "danceability": round(dance, 2),
-                "mood_vibe": vibe,
-                "energy_level": round(energy, 4),
-                "fingerprint": self._calculate_fingerprint()
-            }
-
-        except ImportError as ie:
-            logger.warning("Essentia not found, using Librosa fallback for Sonic Intelligence.")
-            return self._run_librosa_fallback()
-        except Exception as e:
-            logger.error(f"Essentia analysis failed: {e}")
-            return self._run_librosa_fallback()
-
-    def _run_librosa_fallback(self) -> Dict[str, Any]:
+        """Executes full sonic test suite (SONIC_PIPELINE)."""
+        return SONIC_PIPELINE.run_sync(self, targets=("summary",))["summary"]
+
+    def _essentia_features(self) -> Dict[str, Any]:
+        import essentia.standard  # noqa: F401 — brak Essentii kończy się tu czytelnym błędem
+        from app.utils.audio_stream import AudioStream
+        from app.utils.model_registry import model_registry
+        from app.utils.window_sampler import central_value, load_windows, map_windows, plan_windows, weighted_vote
+
+        # 3 okna po 30 s rozłożone na cały utwór (ten sam budżet 90 s co
+        # dawny środkowy wycinek), analizowane równolegle
+        duration = AudioStream(self.file_path).duration
+        segments, _ = load_windows(self.file_path, plan_windows(duration, 3, 30.0), sr=44100)
+        segments = [a for a in segments if len(a) > 44100 * 5] or segments
+
+        # Instancje algorytmów z rezydentnej puli zamiast tworzenia na każde wywołanie
+        with model_registry.use("essentia") as pool:
+            def analyze_window(audio):
+                with pool.borrow() as algos:
+                    bpm, _, _, _, _ = algos.rhythm(audio)
+                    key, scale, strength = algos.key(audio)
+                    # Widmo ze środka okna zamiast pierwszych 2048 próbek (cisza na starcie)
+                    mid = max(0, len(audio) // 2 - 1024)
+                    spectrum = algos.spectrum(algos.window(audio[mid:mid + 2048]))
+                    return {
+                        "bpm": float(bpm),
+                        "key": (key, scale),
+                        "strength": float(strength) * len(audio),
+                        "dance": float(algos.danceability(audio)[0]),
+                        "dissonance": float(algos.dissonance(spectrum)),
+                        "rms_sq": float(algos.rms(audio)) ** 2,
+                        "n": len(audio),
+                    }
+
+            per_window = map_windows(analyze_window, segments)
+        total = sum(w["n"] for w in per_window) or 1
+
+        # 1. Rytm i Tempo
+        bpm = central_value([w["bpm"] for w in per_window])
+
+        # 2. Tonalność i Skala
+        key, scale = weighted_vote([w["key"] for w in per_window], [w["strength"] for w in per_window])
+
+        # 4. Charakterystyka taneczna
+        dance = sum(w["dance"] * w["n"] for w in per_window) / total
+
+        # 6. Analiza Nastroju
+        dissonance = sum(w["dissonance"] * w["n"] for w in per_window) / total
+        energy = (sum(w["rms_sq"] * w["n"] for w in per_window) / total) ** 0.5
+
+        return {"bpm": bpm, "key": key, "scale": scale, "danceability": dance,
+                "dissonance": dissonance, "energy": energy}
+
+    def _librosa_features(self) -> Dict[str, Any]:
         """Fallback implementation using Librosa to provide similar metrics."""
         import librosa
         y, sr = librosa.load(self.file_path, duration=60)
@@ -134,16 +133,41 @@ class SonicAnalyzer:
         pulse = librosa.beat.plp(onset_envelope=onset_env, sr=sr)
         danceability = float(np.mean(pulse))
         
-        # Vibe heuristic
-        dissonance_sim = 0.5 # Placeholder since librosa doesn't map 1:1 to dissonance
-        vibe = self._interpret_vibe(scale, dissonance_sim, energy_mean)
+        return {"bpm": bpm, "key": detected_key, "scale": scale, "danceability": danceability,
+                # Placeholder since librosa doesn't map 1:1 to dissonance
+                "dissonance": 0.5, "energy": energy_mean}
 
+    def _summary(self, features: Dict[str, Any], lufs: float, fingerprint: str) -> Dict[str, Any]:
+        vibe = self._interpret_vibe(features["scale"], features["dissonance"], features["energy"])
         return {
-            "bpm": round(bpm, 2),
-            "key": f"{detected_key} {scale}",
-            "lufs": -14.0, # Placeholder, needing pyloudnorm for true fallback
-            "danceability": round(danceability, 2),
+            "bpm": round(features["bpm"], 2),
+            "key": f"{features['key']} {features['scale']}",
+            "lufs": round(lufs, 2),
+            "danceability": round(features["danceability"], 2),
             "mood_vibe": vibe,
-            "energy_level": round(energy_mean, 4),
-            "fingerprint": self._calculate_fingerprint()
+            "energy_level": round(features["energy"], 4),
+            "fingerprint": fingerprint,
         }
+
+
+def _essentia_failed(analyzer: SonicAnalyzer, error: Exception) -> None:
+    if isinstance(error, ImportError):
+        logger.warning("Essentia not found, using Librosa fallback for Sonic Intelligence.")
+    else:
+        logger.error(f"Essentia analysis failed: {error}")
+    return None
+
+
+# Essentia na 3 oknach, LUFS całego pliku i SHA-256 równolegle; Librosa tylko
+# gdy Essentia zawiodła
+SONIC_PIPELINE = Pipeline("sonic_intelligence", [
+    Stage("essentia", lambda ctx: ctx._essentia_features(), cost=10, optional=True,
+          fallback=_essentia_failed, blocking=True),
+    Stage("lufs", lambda ctx: ctx._integrated_lufs(), cache_key=lambda ctx: file_key(ctx.file_path),
+          cost=3, blocking=True),
+    hash_stage,
+    Stage("librosa", lambda ctx, essentia: ctx._librosa_features(), inputs=("essentia",), cost=5,
+          skip=lambda ctx, essentia: essentia is not None, blocking=True),
+    Stage("summary", lambda ctx, essentia, librosa, lufs, hash: ctx._summary(essentia or librosa, lufs, hash),
+          inputs=("essentia", "librosa", "lufs", "hash")),
+])
@@ -0,0 +1,254 @@
+"""
+Chunked Transcription Engine
+Lyrics transcription that scales with vocal duration, not file length
+
+A streamed voice-activity pass maps the regions that plausibly hold vocals
+(loud enough and with most of their energy in the voice band); instrumental
+stretches and silence are never decoded for Whisper. Vocal regions are cut
+into overlapping chunks that are transcribed in parallel: local Whisper
+instances from the model registry, or concurrent Groq requests (each chunk
+a small 16 kHz Opus proxy, so no upload limit applies to the file). The
+chunk texts are stitched back together, dropping the words that both sides
+of an overlap transcribed.
+"""
+
+import logging
+import os
+import re
+from difflib import SequenceMatcher
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.metrics import metrics
+from app.utils.window_sampler import map_windows
+
+logger = logging.getLogger(__name__)
+
+WHISPER_SR = 16000
+
+# Voice-activity map: 0.5 s frames, a frame is "vocal" when it is within
+# VAD_RANGE_DB of the loud part of the track and VAD_BAND_MIN of its energy
+# lies in the voice band. Deliberately permissive: a false positive costs a
+# chunk of transcription, a miss loses lyrics.
+VAD_FRAME_SECONDS = 0.5
+VAD_RANGE_DB = 30.0
+VAD_BAND = (250.0, 4000.0)
+VAD_BAND_MIN = 0.35
+VAD_MERGE_GAP = 2.0     # regions closer than this are one region
+VAD_MIN_REGION = 1.0
+VAD_PAD = 0.5
+
+CHUNK_SECONDS = 30.0    # Whisper's native window
+CHUNK_OVERLAP = 2.0
+GROQ_CONCURRENCY = int(os.getenv("GROQ_TRANSCRIBE_CONCURRENCY", "4"))
+
+Region = Tuple[float, float]  # (start seconds, end seconds)
+
+TRANSCRIBE_SECONDS = metrics.histogram(
+    "transcription_seconds", "Transcription time by step (vad, chunk, total)", ("backend", "step")
+)
+
+
+def vocal_regions(file_path: str) -> Tuple[List[Region], float]:
+    """(vocal regions, duration) from one streamed pass at 16 kHz (constant memory)."""
+    from app.utils.audio_stream import AudioStream
+    from app.utils.cancellation import raise_if_cancelled
+
+    frame = int(VAD_FRAME_SECONDS * WHISPER_SR)
+    freqs = np.fft.rfftfreq(frame, 1.0 / WHISPER_SR)
+    band = (freqs >= VAD_BAND[0]) & (freqs <= VAD_BAND[1])
+    window = np.hanning(frame)
+
+    levels, ratios = [], []
+    stream = AudioStream(file_path, sr=WHISPER_SR, mono=True, frame_size=frame)
+    for i, y in enumerate(stream):
+        if i % 64 == 0:
+            raise_if_cancelled()
+        if len(y) < frame:
+            y = np.pad(y, (0, frame - len(y)))
+        power = np.abs(np.fft.rfft(y * window)) ** 2
+        levels.append(10 * np.log10(np.mean(y ** 2) + 1e-10))
+        ratios.append(power[band].sum() / (power.sum() + 1e-10))
+    duration = stream.duration
+    if not levels:
+        return [], duration
+
+    levels, ratios = np.asarray(levels), np.asarray(ratios)
+    active = (levels > np.percentile(levels, 95) - VAD_RANGE_DB) & (ratios >= VAD_BAND_MIN)
+    return _regions_from_frames(active, VAD_FRAME_SECONDS, duration), duration
+
+
+def _regions_from_frames(active: np.ndarray, hop: float, duration: float) -> List[Region]:
+    regions: List[List[float]] = []
+    for i in np.flatnonzero(active):
+        start, end = i * hop, (i + 1) * hop
+        if regions and start - regions[-1][1] < VAD_MERGE_GAP:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+    return [
+        (round(max(0.0, s - VAD_PAD), 3), round(min(duration, e + VAD_PAD), 3))
+        for s, e in regions if e - s >= VAD_MIN_REGION
+    ]
+
+
+def plan_chunks(regions: Sequence[Region], chunk_seconds: float = CHUNK_SECONDS,
+                overlap: float = CHUNK_OVERLAP) -> List[Tuple[int, float, float]]:
+    """(region index, offset, length) chunks covering every region; neighbours inside a region overlap."""
+    chunks = []
+    step = chunk_seconds - overlap
+    for r, (start, end) in enumerate(regions):
+        offset = start
+        while True:
+            length = min(chunk_seconds, end - offset)
+            chunks.append((r, round(offset, 3), round(length, 3)))
+            if offset + length >= end:
+                break
+            offset += step
+    return chunks
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch(texts: Sequence[str], regions: Sequence[int], max_overlap_words: int = 40) -> str:
+    """
+    Join chunk texts; consecutive chunks of one region overlap, so the
+    longest run of words shared by the end of one and the start of the next
+    is kept once. Chunks of different regions are separate lines.
+    """
+    lines: List[List[str]] = []
+    previous_region = None
+    for text, region in zip(texts, regions):
+        words = text.split()
+        if region != previous_region or not lines:
+            lines.append(words)
+        else:
+            current = lines[-1]
+            tail = [_normalize(w) for w in current[-max_overlap_words:]]
+            head = [_normalize(w) for w in words[:max_overlap_words]]
+            match = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+            # The shared run has to sit at the seam (a few garbled boundary words allowed)
+            if match.size >= 2 and match.a + match.size >= len(tail) - 3 and match.b <= 3:
+                keep = len(current) - len(tail) + match.a + match.size
+                lines[-1] = current[:keep] + words[match.b + match.size:]
+            else:
+                current.extend(words)
+        previous_region = region
+    return "\n".join(" ".join(words) for words in lines if words)
+
+
+class TranscriptionEngine:
+    def transcribe(self, file_path: str, backend: str = "local", language: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Transcribe the vocal regions of a file (blocking; run it in a thread).
+
+        Args:
+            file_path: Audio file
+            backend: "local" (Whisper instances from the model registry) or "groq"
+            language: Language hint (None lets Whisper detect it)
+
+        Returns:
+            text, language, duration, vocal_seconds and chunks (count)
+        """
+        if backend == "local":
+            run, workers = self._local_chunk(language), self._local_workers()
+        elif backend == "groq":
+            run, workers = self._groq_chunk(language), GROQ_CONCURRENCY
+        else:
+            raise ValueError(f"Unknown transcription backend: {backend}")
+
+        with TRANSCRIBE_SECONDS.time(backend=backend, step="total"):
+            return self._transcribe(file_path, backend, run, workers, language)
+
+    def _transcribe(
+        self,
+        file_path: str,
+        backend: str,
+        run: Callable[[np.ndarray], Tuple[str, Optional[str]]],
+        workers: int,
+        language: Optional[str],
+    ) -> Dict[str, Any]:
+        with TRANSCRIBE_SECONDS.time(backend=backend, step="vad"):
+            regions, duration = vocal_regions(file_path)
+        vocal_seconds = sum(end - start for start, end in regions)
+        logger.info(
+            f"[Transcription] {len(regions)} vocal region(s), {vocal_seconds:.1f}s of {duration:.1f}s ({backend})"
+        )
+        if not regions:
+            return {"text": "", "language": language or "unknown", "duration": duration,
+                    "vocal_seconds": 0.0, "chunks": 0}
+
+        chunks = plan_chunks(regions)
+
+        def timed(audio: np.ndarray):
+            with TRANSCRIBE_SECONDS.time(backend=backend, step="chunk"):
+                return run(audio)
+
+        results = self.transcribe_chunks(file_path, chunks, timed, workers)
+        languages = [lang for _, lang in results if lang]
+        return {
+            "text": stitch([text for text, _ in results], [r for r, _, _ in chunks]),
+            "language": language or (max(set(languages), key=languages.count) if languages else "unknown"),
+            "duration": duration,
+            "vocal_seconds": round(vocal_seconds, 2),
+            "chunks": len(chunks),
+        }
+
+    @staticmethod
+    def transcribe_chunks(
+        file_path: str,
+        chunks: Sequence[Tuple[int, float, float]],
+        run: Callable[[np.ndarray], Tuple[str, Optional[str]]],
+        workers: int,
+    ) -> List[Tuple[str, Optional[str]]]:
+        """run(audio) -> (text, language) for every chunk, in order; each chunk is decoded by its worker."""
+        from app.utils.audio_stream import AudioStream
+
+        def one(chunk):
+            _, offset, length = chunk
+            audio = AudioStream(file_path, sr=WHISPER_SR, mono=True, offset=offset, duration=length).read()
+            return run(audio)
+
+        # map_windows: thread pool + cancellation/preemption checks per chunk
+        return map_windows(one, list(chunks), max_workers=max(1, workers))
+
+    @staticmethod
+    def _local_workers() -> int:
+        from app.utils.model_registry import WHISPER_WORKERS
+
+        return WHISPER_WORKERS
+
+    @staticmethod
+    def _local_chunk(language: Optional[str]):
+        from app.utils.model_registry import model_registry
+
+        def run(audio: np.ndarray):
+            with model_registry.use("whisper-tiny") as pool, pool.borrow() as model:
+                result = model.transcribe(
+                    audio,
+                    language=language,
+                    task="transcribe",
+                    fp16=False,  # CPU mode
+                    condition_on_previous_text=False,  # chunks are independent
+                )
+            return result.get("text", "").strip(), result.get("language")
+
+        return run
+
+    @staticmethod
+    def _groq_chunk(language: Optional[str]):
+        from app.services.groq_whisper import GroqWhisperService
+        from app.utils.audio_proxy import encode_proxy_bytes
+
+        def run(audio: np.ndarray):
+            transcription = GroqWhisperService.transcribe_proxy([encode_proxy_bytes(audio)], language=language)
+            return transcription.get("text", "").strip(), transcription.get("language")
+
+        return run
+
+
+# Global instance
+transcription_engine = TranscriptionEngine()
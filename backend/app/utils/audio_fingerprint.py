@@ -0,0 +1,208 @@
+"""
+Perceptual Audio Fingerprint
+Robust to re-encoding, tag changes, gain and small offsets
+
+Sub-fingerprints follow Haitsma & Kalker: for every frame, 33 log-spaced
+bands between 300 and 2000 Hz give 32 bits, each bit the sign of the
+band-energy difference change between neighbouring bands and frames. A
+fingerprint is a uint32 array (one code per ~23 ms hop).
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FP_SAMPLE_RATE = 11025
+FP_FRAME = 2048
+FP_HOP = 256
+FP_BANDS = 33
+FP_FMIN = 300.0
+FP_FMAX = 2000.0
+# Decode at most this much audio; enough to tell masters apart
+FP_MAX_SECONDS = 600.0
+
+_bands_cache: Optional[Tuple[slice, np.ndarray]] = None
+_window: Optional[np.ndarray] = None
+
+
+def _bands() -> Tuple[slice, np.ndarray]:
+    """FFT bin range covering FP_FMIN..FP_FMAX and the (bins, FP_BANDS) summing matrix."""
+    global _bands_cache
+    if _bands_cache is None:
+        freqs = np.fft.rfftfreq(FP_FRAME, d=1.0 / FP_SAMPLE_RATE)
+        edges = np.geomspace(FP_FMIN, FP_FMAX, FP_BANDS + 1)
+        m = np.zeros((freqs.shape[0], FP_BANDS), dtype=np.float32)
+        for b in range(FP_BANDS):
+            m[(freqs >= edges[b]) & (freqs < edges[b + 1]), b] = 1.0
+        used = np.flatnonzero(m.any(axis=1))
+        bins = slice(int(used[0]), int(used[-1]) + 1)
+        _bands_cache = (bins, m[bins])
+    return _bands_cache
+
+
+def resample_to_fp_rate(y: np.ndarray, sr: int) -> np.ndarray:
+    """Mono float32 at FP_SAMPLE_RATE (soxr when available, polyphase otherwise)."""
+    if sr == FP_SAMPLE_RATE:
+        return y
+    try:
+        import soxr
+
+        return soxr.resample(y, sr, FP_SAMPLE_RATE).astype(np.float32, copy=False)
+    except ImportError:
+        from math import gcd
+        from scipy.signal import resample_poly
+
+        g = gcd(int(sr), FP_SAMPLE_RATE)
+        return resample_poly(y, FP_SAMPLE_RATE // g, int(sr) // g).astype(np.float32)
+
+
+def compute_fingerprint(y: np.ndarray, sr: int) -> np.ndarray:
+    """
+    Compute a fingerprint from decoded PCM.
+
+    Args:
+        y: Mono (or (channels, samples)) float audio
+        sr: Sample rate of y
+
+    Returns:
+        uint32 array of sub-fingerprints (empty for audio shorter than a frame)
+    """
+    from scipy import fft
+
+    global _window
+    y = np.asarray(y, dtype=np.float32)
+    if y.ndim > 1:
+        y = y.mean(axis=0)
+    y = np.ascontiguousarray(resample_to_fp_rate(y, sr))
+
+    n_frames = 1 + (len(y) - FP_FRAME) // FP_HOP if len(y) >= FP_FRAME else 0
+    if n_frames < 2:
+        return np.zeros(0, dtype=np.uint32)
+
+    if _window is None:
+        _window = np.hanning(FP_FRAME).astype(np.float32)
+    frames = np.lib.stride_tricks.as_strided(
+        y, shape=(n_frames, FP_FRAME), strides=(y.strides[0] * FP_HOP, y.strides[0]), writeable=False
+    )
+
+    bins, bands = _bands()
+    energy = np.empty((n_frames, FP_BANDS), dtype=np.float32)
+    # Chunked so long files don't materialize the full spectrogram
+    for i in range(0, n_frames, 1024):
+        spec = fft.rfft(frames[i:i + 1024] * _window, axis=1)[:, bins]
+        energy[i:i + 1024] = (spec.real ** 2 + spec.imag ** 2) @ bands
+
+    diff = energy[:, :-1] - energy[:, 1:]                 # (frames, 32)
+    bits = (diff[1:] - diff[:-1]) > 0                       # (frames-1, 32)
+    weights = (np.uint32(1) << np.arange(32, dtype=np.uint32))
+    return (bits.astype(np.uint32) * weights).sum(axis=1, dtype=np.uint64).astype(np.uint32)
+
+
+def fingerprint_file(file_path: str, max_seconds: float = FP_MAX_SECONDS) -> np.ndarray:
+    """
+    Decode and fingerprint an audio file. Decoding streams straight to mono
+    FP_SAMPLE_RATE, so only the downsampled signal is ever held in memory.
+    """
+    from app.utils.audio_stream import AudioStream
+
+    y = AudioStream(file_path, sr=FP_SAMPLE_RATE, mono=True, duration=max_seconds).read()
+    return compute_fingerprint(y, FP_SAMPLE_RATE)
+
+
+def fingerprint_duration(fp: np.ndarray) -> float:
+    return float(len(fp) * FP_HOP / FP_SAMPLE_RATE)
+
+
+def fingerprint_to_bytes(fp: np.ndarray) -> bytes:
+    """Compact stored form: little-endian uint32 codes (4 bytes per ~23 ms)."""
+    return np.asarray(fp, dtype="<u4").tobytes()
+
+
+def fingerprint_from_bytes(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype="<u4")
+
+
+def encode_fingerprint(fp: np.ndarray) -> str:
+    """Base64 of fingerprint_to_bytes, for JSON responses."""
+    import base64
+
+    return base64.b64encode(fingerprint_to_bytes(fp)).decode()
+
+
+def decode_fingerprint(text: str) -> np.ndarray:
+    import base64
+
+    return fingerprint_from_bytes(base64.b64decode(text))
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return np.unpackbits(x.view(np.uint8)).reshape(-1, 32).sum(axis=1)
+
+
+def bit_error_rate(a: np.ndarray, b: np.ndarray, offset: int = 0) -> Tuple[float, int]:
+    """
+    Fraction of differing bits where a[i] aligns with b[i - offset].
+
+    Returns:
+        (ber, overlapping frames); ber is 1.0 when nothing overlaps
+    """
+    start_a = max(0, offset)
+    start_b = max(0, -offset)
+    n = min(len(a) - start_a, len(b) - start_b)
+    if n <= 0:
+        return 1.0, 0
+    x = np.bitwise_xor(a[start_a:start_a + n], b[start_b:start_b + n])
+    return float(_popcount(x).sum()) / (32.0 * n), n
+
+
+def estimate_offset(a: np.ndarray, b: np.ndarray, max_codes: int = 4096) -> Optional[int]:
+    """
+    Most common alignment (a index - b index) among bit-identical codes,
+    or None if the two fingerprints share none.
+    """
+    positions: Dict[int, int] = {}
+    for j, code in enumerate(b[:max_codes * 4].tolist()):
+        if code not in (0, 0xFFFFFFFF):
+            positions.setdefault(code, j)
+    votes: Dict[int, int] = {}
+    for i, code in enumerate(a[:max_codes * 4].tolist()):
+        j = positions.get(code)
+        if j is not None:
+            votes[i - j] = votes.get(i - j, 0) + 1
+    if not votes:
+        return None
+    return max(votes.items(), key=lambda kv: kv[1])[0]
+
+
+def compare_fingerprints(a: np.ndarray, b: np.ndarray) -> Optional[Dict[str, float]]:
+    """
+    Align two fingerprints and score them.
+
+    Returns:
+        {"ber", "offset", "overlap"} where overlap is the aligned length over
+        the longer fingerprint, or None if no alignment was found
+    """
+    offset = estimate_offset(a, b)
+    if offset is None:
+        return None
+    best = None
+    for o in (offset - 1, offset, offset + 1):
+        ber, n = bit_error_rate(a, b, o)
+        if best is None or ber < best[0]:
+            best = (ber, o, n)
+    ber, o, n = best
+    return {"ber": ber, "offset": o, "overlap": n / max(len(a), len(b), 1)}
+
+
+def index_codes(fp: np.ndarray, stride: int = 8) -> np.ndarray:
+    """
+    Distinct codes stored in the inverted index: every `stride`-th frame,
+    skipping the degenerate all-zero/all-one codes silence produces.
+    """
+    codes = np.unique(fp[::stride])
+    return codes[(codes != 0) & (codes != 0xFFFFFFFF)]
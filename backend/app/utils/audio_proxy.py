@@ -0,0 +1,149 @@
+"""
+Audio Proxy
+16 kHz mono Opus proxy of a track for remote speech-to-text endpoints
+
+Speech models resample to 16 kHz mono anyway, so uploading the original (a
+60 MB WAV, a 320 kbps MP3) only costs bandwidth and memory and trips the
+providers' 25 MB upload limit. The proxy is encoded from decoded PCM frames
+as they arrive (~30 kbps, roughly 50x smaller than CD-quality WAV) and sent
+as a streaming multipart/form-data body, so neither the original nor the
+encoded proxy is ever held in memory as a whole.
+"""
+
+import io
+import logging
+import time
+import uuid
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from app.utils.cancellation import raise_if_cancelled
+
+logger = logging.getLogger(__name__)
+
+PROXY_SR = 16000
+PROXY_FILENAME = "proxy.ogg"
+PROXY_CONTENT_TYPE = "audio/ogg"
+# Upper estimate of the proxy rate, for deciding whether a file fits an upload limit
+PROXY_BYTES_PER_SECOND = 4000
+
+
+class _Sink:
+    """Write-only file object for libsndfile; encoded bytes are drained as they appear."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._buf += bytes(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # Ogg is written strictly forward; libsndfile only probes the position on open
+        if offset != 0 or (whence == io.SEEK_SET and self._pos):
+            raise io.UnsupportedOperation("proxy stream is not seekable")
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        return b""
+
+    def drain(self) -> bytes:
+        data, self._buf = bytes(self._buf), bytearray()
+        return data
+
+
+def encode_proxy(frames: Iterable[np.ndarray], sr: int = PROXY_SR) -> Iterator[bytes]:
+    """Ogg/Opus bytes for mono float32 frames at `sr`, yielded as they are encoded."""
+    import soundfile as sf
+
+    sink = _Sink()
+    with sf.SoundFile(sink, "w", samplerate=sr, channels=1, format="OGG", subtype="OPUS") as f:
+        for frame in frames:
+            raise_if_cancelled()
+            f.write(np.asarray(frame, dtype=np.float32))
+            data = sink.drain()
+            if data:
+                yield data
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+def encode_proxy_bytes(audio: np.ndarray, sr: int = PROXY_SR) -> bytes:
+    """Proxy of already-decoded (short) PCM, in memory."""
+    return b"".join(encode_proxy([audio], sr=sr))
+
+
+def proxy_stream(file_path: str, offset: float = 0.0, duration: Optional[float] = None) -> Iterator[bytes]:
+    """Decode (bounded frames) and encode a file's proxy on the fly."""
+    from app.utils.audio_stream import AudioStream
+
+    return encode_proxy(AudioStream(file_path, sr=PROXY_SR, mono=True, offset=offset, duration=duration))
+
+
+def multipart_stream(
+    fields: Dict[str, str],
+    file_field: str,
+    chunks: Iterable[bytes],
+    filename: str = PROXY_FILENAME,
+    content_type: str = PROXY_CONTENT_TYPE,
+) -> Tuple[str, Iterator[bytes]]:
+    """(Content-Type header, body iterator) of a multipart/form-data request whose file part streams `chunks`."""
+    boundary = uuid.uuid4().hex
+
+    def body():
+        for name, value in fields.items():
+            yield f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        yield (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        yield from chunks
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    return f"multipart/form-data; boundary={boundary}", body()
+
+
+def post_proxy(
+    url: str,
+    headers: Dict[str, str],
+    fields: Dict[str, str],
+    chunks: Iterable[bytes],
+    timeout: float = 300.0,
+    client: Optional[Any] = None,
+) -> Dict[str, Any]:
+    """
+    Stream a proxy to an OpenAI-compatible /audio/transcriptions endpoint
+    (chunked transfer encoding: the body is produced while it is sent).
+
+    Raises:
+        httpx.HTTPStatusError: The endpoint rejected the upload
+    """
+    import httpx
+
+    sent = 0
+
+    def counted(parts):
+        nonlocal sent
+        for part in parts:
+            sent += len(part)
+            yield part
+
+    content_type, body = multipart_stream(fields, "file", chunks)
+    start = time.monotonic()
+    owned = client is None
+    client = client or httpx.Client(timeout=timeout)
+    try:
+        response = client.post(url, content=counted(body), headers={**headers, "Content-Type": content_type})
+        response.raise_for_status()
+        logger.info(f"[AudioProxy] Uploaded {sent / 1024:.0f} kB proxy in {time.monotonic() - start:.1f}s")
+        return response.json()
+    finally:
+        if owned:
+            client.close()
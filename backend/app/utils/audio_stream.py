@@ -0,0 +1,224 @@
+"""
+Streaming Audio Decoder
+Constant-memory decode of arbitrarily long files into fixed-size frames
+
+Backends, in order: libsndfile (WAV/FLAC/OGG/AIFF, MP3 on >= 1.1) read in
+blocks, an ffmpeg pipe (f32le on stdout), then audioread. Optional
+downmix and streaming resampling (soxr) happen per frame, so peak memory
+is a few frames regardless of file length or sample rate.
+"""
+
+import json
+import logging
+import shutil
+import subprocess
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DECODE_SECONDS = metrics.histogram("audio_decode_seconds", "Bounded decodes into memory (AudioStream.read)")
+
+DEFAULT_FRAME_SECONDS = 2.0
+
+
+def _ffprobe(file_path: str) -> Optional[dict]:
+    if not shutil.which("ffprobe"):
+        return None
+    proc = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "a:0",
+            "-show_entries", "stream=sample_rate,channels:format=duration",
+            "-of", "json", file_path,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        return None
+    info = json.loads(proc.stdout or "{}")
+    streams = info.get("streams") or []
+    if not streams:
+        return None
+    return {
+        "sr": int(streams[0]["sample_rate"]),
+        "channels": int(streams[0]["channels"]),
+        "duration": float((info.get("format") or {}).get("duration") or 0.0),
+    }
+
+
+class AudioStream:
+    """
+    Iterates a file as float32 frames of exactly frame_size samples (the last
+    one may be shorter), shaped (samples, channels), or (samples,) when mono.
+
+    Args:
+        file_path: Audio file
+        sr: Output sample rate (None keeps the native rate)
+        mono: Downmix to one channel
+        frame_size: Samples per frame at the output rate
+            (default: DEFAULT_FRAME_SECONDS worth)
+        offset: Start position in seconds
+        duration: Maximum seconds to decode
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        sr: Optional[int] = None,
+        mono: bool = False,
+        frame_size: Optional[int] = None,
+        offset: float = 0.0,
+        duration: Optional[float] = None,
+    ):
+        self.file_path = file_path
+        self.mono = mono
+        self.offset = max(0.0, float(offset or 0.0))
+        self.max_duration = duration
+        self.backend = self._probe()
+        self.sr = int(sr or self.native_sr)
+        self.channels = 1 if mono else self.native_channels
+        self.frame_size = int(frame_size or round(DEFAULT_FRAME_SECONDS * self.sr))
+
+    def _probe(self) -> str:
+        try:
+            import soundfile as sf
+
+            info = sf.info(self.file_path)
+            self.native_sr, self.native_channels, self.total_duration = info.samplerate, info.channels, info.duration
+            return "soundfile"
+        except Exception:
+            pass
+        info = _ffprobe(self.file_path)
+        if info:
+            self.native_sr, self.native_channels, self.total_duration = info["sr"], info["channels"], info["duration"]
+            return "ffmpeg"
+        import audioread
+
+        with audioread.audio_open(self.file_path) as f:
+            self.native_sr, self.native_channels, self.total_duration = f.samplerate, f.channels, f.duration
+        return "audioread"
+
+    @property
+    def duration(self) -> float:
+        """Seconds this stream will yield (after offset/duration limits)."""
+        remaining = max(0.0, self.total_duration - self.offset)
+        return min(remaining, self.max_duration) if self.max_duration is not None else remaining
+
+    def _native_limit(self) -> Optional[int]:
+        return int(round(self.max_duration * self.native_sr)) if self.max_duration is not None else None
+
+    def _soundfile_blocks(self) -> Iterator[np.ndarray]:
+        import soundfile as sf
+
+        limit = self._native_limit()
+        blocksize = max(1, int(DEFAULT_FRAME_SECONDS * self.native_sr))
+        yield from sf.blocks(
+            self.file_path,
+            blocksize=blocksize,
+            start=int(round(self.offset * self.native_sr)),
+            frames=limit if limit is not None else -1,
+            dtype="float32",
+            always_2d=True,
+        )
+
+    def _ffmpeg_blocks(self) -> Iterator[np.ndarray]:
+        cmd = ["ffmpeg", "-v", "error", "-nostdin"]
+        if self.offset:
+            cmd += ["-ss", f"{self.offset:.3f}"]
+        cmd += ["-i", self.file_path]
+        if self.max_duration is not None:
+            cmd += ["-t", f"{self.max_duration:.3f}"]
+        cmd += ["-f", "f32le", "-acodec", "pcm_f32le", "-"]
+
+        channels = self.native_channels
+        chunk_bytes = int(DEFAULT_FRAME_SECONDS * self.native_sr) * channels * 4
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                buf = proc.stdout.read(chunk_bytes)
+                if not buf:
+                    break
+                usable = len(buf) - len(buf) % (channels * 4)
+                yield np.frombuffer(buf[:usable], dtype="<f4").reshape(-1, channels)
+        finally:
+            proc.kill()
+            proc.wait()
+
+    def _audioread_blocks(self) -> Iterator[np.ndarray]:
+        import audioread
+
+        skip = int(round(self.offset * self.native_sr))
+        left = self._native_limit()
+        with audioread.audio_open(self.file_path) as f:
+            for buf in f:
+                pcm = (np.frombuffer(buf, dtype="<i2").astype(np.float32) / 32768.0).reshape(-1, f.channels)
+                if skip:
+                    drop = min(skip, pcm.shape[0])
+                    pcm, skip = pcm[drop:], skip - drop
+                if left is not None:
+                    pcm = pcm[:left]
+                    left -= pcm.shape[0]
+                if pcm.shape[0]:
+                    yield pcm
+                if left is not None and left <= 0:
+                    break
+
+    def _decoded(self) -> Iterator[np.ndarray]:
+        blocks = {
+            "soundfile": self._soundfile_blocks,
+            "ffmpeg": self._ffmpeg_blocks,
+            "audioread": self._audioread_blocks,
+        }[self.backend]()
+
+        resampler = None
+        if self.sr != self.native_sr:
+            import soxr
+
+            resampler = soxr.ResampleStream(self.native_sr, self.sr, self.channels, dtype="float32")
+
+        for block in blocks:
+            block = np.asarray(block, dtype=np.float32)
+            if self.mono and block.shape[1] > 1:
+                block = block.mean(axis=1, keepdims=True)
+            if resampler is not None:
+                block = resampler.resample_chunk(block)
+                if block.ndim == 1:
+                    block = block[:, None]
+            if block.shape[0]:
+                yield block
+        if resampler is not None:
+            tail = resampler.resample_chunk(np.zeros((0, self.channels), dtype=np.float32), last=True)
+            if tail.shape[0]:
+                yield tail.reshape(-1, self.channels)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        pending: List[np.ndarray] = []
+        buffered = 0
+        for block in self._decoded():
+            pending.append(block)
+            buffered += block.shape[0]
+            if buffered < self.frame_size:
+                continue
+            data = np.concatenate(pending) if len(pending) > 1 else pending[0]
+            whole = data.shape[0] // self.frame_size * self.frame_size
+            for i in range(0, whole, self.frame_size):
+                yield self._shape(data[i:i + self.frame_size])
+            pending = [data[whole:]] if whole < data.shape[0] else []
+            buffered = data.shape[0] - whole
+        if buffered:
+            yield self._shape(np.concatenate(pending))
+
+    def _shape(self, frame: np.ndarray) -> np.ndarray:
+        return frame[:, 0] if self.mono else frame
+
+    def read(self) -> np.ndarray:
+        """Whole (limited) stream as one array; only for bounded durations."""
+        with DECODE_SECONDS.time():
+            frames = list(self)
+        if not frames:
+            return np.zeros(0 if self.mono else (0, self.channels), dtype=np.float32)
+        return np.concatenate(frames)
@@ -5,8 +5,13 @@ import os
 import logging
 from datetime import datetime
 
+from app.utils.metrics import metrics
+
 logger = logging.getLogger(__name__)
 
+CACHE_SECONDS = metrics.histogram("analysis_cache_seconds", "Analysis result cache operation latency", ("op",))
+CACHE_REQUESTS = metrics.counter("analysis_cache_requests_total", "Analysis result cache lookups", ("result",))
+
 class AnalysisCache:
     """
     Persistent cache for analysis results using SQLite.
@@ -37,15 +42,19 @@ class AnalysisCache:
         if not file_hash:
             return None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT result FROM cache WHERE hash = ?", (file_hash,))
-            row = cursor.fetchone()
-            conn.close()
+            with CACHE_SECONDS.time(op="get"):
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                cursor.execute("SELECT result FROM cache WHERE hash = ?", (file_hash,))
+                row = cursor.fetchone()
+                conn.close()
             if row:
                 logger.info(f"Cache hit for hash: {file_hash[:16]}...")
+                CACHE_REQUESTS.inc(result="hit")
                 return json.loads(row[0])
+            CACHE_REQUESTS.inc(result="miss")
         except Exception as e:
+            CACHE_REQUESTS.inc(result="error")
             logger.error(f"Failed to read from cache: {e}")
         return None
 
@@ -53,14 +62,15 @@ class AnalysisCache:
         if not file_hash or not result:
             return
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT OR REPLACE INTO cache (hash, result, timestamp) VALUES (?, ?, ?)",
-                (file_hash, json.dumps(result), datetime.utcnow())
-            )
-            conn.commit()
-            conn.close()
+            with CACHE_SECONDS.time(op="set"):
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT OR REPLACE INTO cache (hash, result, timestamp) VALUES (?, ?, ?)",
+                    (file_hash, json.dumps(result), datetime.utcnow())
+                )
+                conn.commit()
+                conn.close()
             logger.info(f"Cached result for hash: {file_hash[:16]}...")
         except Exception as e:
             logger.error(f"Failed to write to cache: {e}")
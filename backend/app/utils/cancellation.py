@@ -0,0 +1,117 @@
+"""
+Job Cancellation
+Cooperative cancellation tokens for background analysis jobs
+
+Each running job gets a CancellationToken in the JobRegistry. Cancelling it
+(API call, or nobody watching the job for a while) cancels the job's asyncio
+task, which propagates into awaited LLM calls and executor futures, and sets
+the token, which thread-side work (decode, DSP windows, streaming LLM loops)
+checks between frames via raise_if_cancelled(). The token travels in a
+ContextVar, so asyncio.to_thread and create_task pick it up automatically.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised at a stage boundary once the job's token has been cancelled."""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancellationToken:
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.reason: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.last_seen = time.monotonic()
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Set the token and cancel the job task. Returns False if already cancelled."""
+        if self._event.is_set():
+            return False
+        self.reason = reason
+        self._event.set()
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        return True
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled(self.reason or "cancelled")
+
+    def touch(self):
+        """A client looked at the job (poll or open WebSocket)."""
+        self.last_seen = time.monotonic()
+
+
+_current: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar("job_token", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current.get()
+
+
+def job_context(token: CancellationToken) -> contextvars.Context:
+    """A copy of the current context with `token` installed, for create_task(context=...)."""
+    ctx = contextvars.copy_context()
+    ctx.run(_current.set, token)
+    return ctx
+
+
+def raise_if_cancelled():
+    """Checkpoint for code running on behalf of a job; a no-op outside one."""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+class JobRegistry:
+    """Tokens of the jobs running on this worker."""
+
+    def __init__(self):
+        self.tokens: Dict[str, CancellationToken] = {}
+        self.cancelled_total = 0
+
+    def register(self, job_id: str) -> CancellationToken:
+        token = self.tokens.get(job_id)
+        if token is None:
+            token = self.tokens[job_id] = CancellationToken(job_id)
+        return token
+
+    def get(self, job_id: str) -> Optional[CancellationToken]:
+        return self.tokens.get(job_id)
+
+    def touch(self, job_id: str):
+        token = self.tokens.get(job_id)
+        if token is not None:
+            token.touch()
+
+    def cancel(self, job_id: str, reason: str = "cancelled") -> bool:
+        token = self.tokens.get(job_id)
+        if token is None or not token.cancel(reason):
+            return False
+        self.cancelled_total += 1
+        logger.info(f"Job {job_id} cancelled ({reason})")
+        return True
+
+    def discard(self, job_id: str):
+        self.tokens.pop(job_id, None)
+
+
+# Global registry
+job_registry = JobRegistry()
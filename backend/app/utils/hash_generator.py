@@ -7,16 +7,18 @@ import hashlib
 import logging
 from typing import Optional
 
+from app.utils.task_graph import Stage, file_key
+
 logger = logging.getLogger(__name__)
 
 
-def generate_file_hash(file_path: str, chunk_size: int = 8192) -> str:
+def generate_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
     """
     Generate SHA-256 hash for a file.
     
     Args:
         file_path: Path to the audio file
-        chunk_size: Size of chunks to read (default: 8KB)
+        chunk_size: Size of chunks to read (default: 1 MiB)
     
     Returns:
         64-character hexadecimal SHA-256 hash
@@ -85,3 +87,14 @@ def generate_hash_from_bytes(data: bytes) -> str:
         64-character hexadecimal SHA-256 hash
     """
     return hashlib.sha256(data).hexdigest()
+
+
+# Pipeline stage shared by the analysis pipelines: SHA-256 of ctx.file_path,
+# memoized per file version so a file flowing through several pipelines is read once
+hash_stage = Stage(
+    "hash",
+    lambda ctx: generate_file_hash(ctx.file_path),
+    cache_key=lambda ctx: file_key(ctx.file_path),
+    cost=0.5,
+    blocking=True,
+)
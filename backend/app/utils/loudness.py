@@ -0,0 +1,238 @@
+"""
+Streaming EBU R128 Loudness Meter
+ITU-R BS.1770-4 / EBU Tech 3341-3342, computed block by block
+
+Audio is fed in chunks of any size; filter and oversampler state carry over
+between chunks, and only one mean-square value per 100 ms per channel is
+kept, so a 10-minute 96 kHz file is measured in constant memory.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+from scipy import signal
+from scipy.ndimage import maximum_filter1d
+
+logger = logging.getLogger(__name__)
+
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE_INTEGRATED = -10.0
+RELATIVE_GATE_LRA = -20.0
+STEP_SECONDS = 0.1          # 75% overlap for 400 ms blocks, 3 s windows slide by 100 ms too
+MOMENTARY_STEPS = 4         # 400 ms
+SHORT_TERM_STEPS = 30       # 3 s
+
+
+def _k_weighting(sr: int) -> np.ndarray:
+    """BS.1770 pre-filter (high shelf) + RLB high-pass as one SOS, for any rate."""
+    # High shelf
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sr)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [
+        (vh + vb * k / q + k * k) / a0,
+        2 * (k * k - vh) / a0,
+        (vh - vb * k / q + k * k) / a0,
+        1.0,
+        2 * (k * k - 1) / a0,
+        (1 - k / q + k * k) / a0,
+    ]
+    # High pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sr)
+    a0 = 1 + k / q + k * k
+    highpass = [1.0, -2.0, 1.0, 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf, highpass])
+
+
+def _channel_weights(channels: int) -> np.ndarray:
+    # L, R, C, LFE, Ls, Rs; LFE is excluded from the measurement
+    if channels == 6:
+        return np.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+    return np.ones(channels)
+
+
+def _to_lufs(power) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return -0.691 + 10 * np.log10(power)
+
+
+class LoudnessMeter:
+    """
+    Usage:
+        meter = LoudnessMeter(sr, channels)
+        for chunk in blocks:            # (samples,) or (samples, channels)
+            meter.process(chunk)
+        report = meter.result()
+    """
+
+    def __init__(self, sr: int, channels: int = 1, oversample: Optional[int] = None, taps_per_phase: int = 12):
+        self.sr = int(sr)
+        self.channels = int(channels)
+        self.step = int(round(self.sr * STEP_SECONDS))
+        self.weights = _channel_weights(self.channels)
+
+        self._sos = _k_weighting(self.sr)
+        self._zi = np.zeros((self._sos.shape[0], 2, self.channels))
+        self._acc = np.zeros(self.channels)     # partial 100 ms sum of squares
+        self._acc_n = 0
+        self._steps = []                         # per-step weighted mean square (channel-summed)
+        self.samples = 0
+
+        # True peak: polyphase FIR, >= 192 kHz effective rate (BS.1770-4 Annex 2)
+        self.oversample = oversample or max(1, int(np.ceil(192000 / self.sr)))
+        self._sample_peak = 0.0
+        self._true_peak = 0.0
+        if self.oversample > 1:
+            n = self.oversample * taps_per_phase
+            h = signal.firwin(n, 1.0 / self.oversample, window=("kaiser", 8.0)) * self.oversample
+            self._phases = np.stack([h[p::self.oversample] for p in range(self.oversample)])
+            self._kernel = np.ascontiguousarray(self._phases[:, ::-1].T, dtype=np.float32)  # (taps, phases)
+            self._gain = float(np.abs(self._phases).sum(axis=1).max())
+            self._tp_history = np.zeros((taps_per_phase - 1, self.channels))
+
+    def process(self, chunk: np.ndarray):
+        x = np.asarray(chunk, dtype=np.float64)
+        if x.ndim == 1:
+            x = x[:, None]
+        if x.shape[0] == 0:
+            return
+        self.samples += x.shape[0]
+
+        self._update_peaks(x)
+
+        y, self._zi = signal.sosfilt(self._sos, x, axis=0, zi=self._zi)
+        sq = y * y
+
+        # Finish the pending step, then whole steps vectorized, then keep the tail
+        i = 0
+        if self._acc_n:
+            take = min(self.step - self._acc_n, sq.shape[0])
+            self._acc += sq[:take].sum(axis=0)
+            self._acc_n += take
+            i = take
+            if self._acc_n == self.step:
+                self._steps.append(float(self._acc @ self.weights) / self.step)
+                self._acc[:] = 0
+                self._acc_n = 0
+        whole = (sq.shape[0] - i) // self.step
+        if whole:
+            block = sq[i:i + whole * self.step].reshape(whole, self.step, self.channels)
+            self._steps.extend((block.mean(axis=1) @ self.weights).tolist())
+            i += whole * self.step
+        if i < sq.shape[0]:
+            self._acc += sq[i:].sum(axis=0)
+            self._acc_n += sq.shape[0] - i
+
+    def _update_peaks(self, x: np.ndarray):
+        # Column-wise maximum; reducing over a 2-wide axis is ~7x slower
+        level = np.maximum.reduce(list(np.abs(x).T))
+        self._sample_peak = max(self._sample_peak, float(level.max()))
+        if self.oversample == 1:
+            self._true_peak = self._sample_peak
+            return
+        taps = self._phases.shape[1]
+        ext = np.concatenate([self._tp_history, x]).astype(np.float32)
+        level = np.concatenate([np.maximum.reduce(list(np.abs(self._tp_history).T)), level])
+        self._tp_history = ext[-(taps - 1):]
+
+        # Window i feeds every phase output i; |output| <= gain * max|window|,
+        # so only windows that could beat the running peak are evaluated.
+        # The samples themselves are points of the waveform, but the
+        # interpolation filter's ripple can put its phase-0 output slightly
+        # below them (a lone click): the true peak is never below the sample peak
+        windows = np.lib.stride_tricks.sliding_window_view(ext, taps, axis=0)   # (n, channels, taps)
+        half = taps // 2
+        local = maximum_filter1d(level, taps)[half:half + windows.shape[0]]
+        loudest = int(np.argmax(local))
+        peak = max(self._true_peak, self._sample_peak, float(np.abs(windows[loudest] @ self._kernel).max()))
+        candidates = np.flatnonzero(local * self._gain > peak)
+        if candidates.shape[0]:
+            peak = max(peak, float(np.abs(windows[candidates] @ self._kernel).max()))
+        self._true_peak = peak
+
+    def _windows(self, steps: int) -> np.ndarray:
+        """Mean square of every `steps`-long window, hopping one step."""
+        p = np.asarray(self._steps)
+        if p.shape[0] < steps:
+            return np.zeros(0)
+        c = np.concatenate([[0.0], np.cumsum(p)])
+        return (c[steps:] - c[:-steps]) / steps
+
+    def momentary(self) -> np.ndarray:
+        """Momentary loudness (400 ms) every 100 ms, LUFS."""
+        return _to_lufs(self._windows(MOMENTARY_STEPS))
+
+    def short_term(self) -> np.ndarray:
+        """Short-term loudness (3 s) every 100 ms, LUFS."""
+        return _to_lufs(self._windows(SHORT_TERM_STEPS))
+
+    def integrated(self) -> float:
+        power = self._windows(MOMENTARY_STEPS)
+        power = power[_to_lufs(power) > ABSOLUTE_GATE]
+        if power.shape[0] == 0:
+            return float("-inf")
+        gate = _to_lufs(power.mean()) + RELATIVE_GATE_INTEGRATED
+        power = power[_to_lufs(power) > gate]
+        return float(_to_lufs(power.mean()))
+
+    def loudness_range(self) -> float:
+        """EBU Tech 3342 LRA: 10th-95th percentile spread of gated short-term loudness."""
+        power = self._windows(SHORT_TERM_STEPS)
+        power = power[_to_lufs(power) > ABSOLUTE_GATE]
+        if power.shape[0] == 0:
+            return 0.0
+        gate = _to_lufs(power.mean()) + RELATIVE_GATE_LRA
+        st = _to_lufs(power)
+        st = st[st > gate]
+        if st.shape[0] == 0:
+            return 0.0
+        low, high = np.percentile(st, [10, 95])
+        return float(high - low)
+
+    @staticmethod
+    def _db(value: float) -> Optional[float]:
+        return round(float(20 * np.log10(value)), 2) if value > 0 else None
+
+    @staticmethod
+    def _finite(value: float, digits: int = 2) -> Optional[float]:
+        return round(float(value), digits) if np.isfinite(value) else None
+
+    def result(self, series_step: float = 1.0) -> Dict[str, Any]:
+        """
+        Summary plus short-term/momentary series decimated to one value per
+        series_step seconds (None where the signal is below the absolute gate).
+        """
+        every = max(1, int(round(series_step / STEP_SECONDS)))
+        momentary = self.momentary()
+        short_term = self.short_term()
+
+        def series(values: np.ndarray):
+            return [self._finite(v, 1) if v > ABSOLUTE_GATE else None for v in values[::every].tolist()]
+
+        return {
+            "integrated_lufs": self._finite(self.integrated()),
+            "loudness_range_lu": round(self.loudness_range(), 2),
+            "true_peak_db": self._db(self._true_peak),
+            "sample_peak_db": self._db(self._sample_peak),
+            "momentary_max_lufs": self._finite(momentary.max()) if momentary.shape[0] else None,
+            "short_term_max_lufs": self._finite(short_term.max()) if short_term.shape[0] else None,
+            "duration": round(self.samples / self.sr, 2),
+            "series_step": every * STEP_SECONDS,
+            "short_term": series(short_term),
+            "momentary": series(momentary),
+        }
+
+
+def measure_file(file_path: str, series_step: float = 1.0) -> Dict[str, Any]:
+    """Full-track loudness report for a file, in constant memory."""
+    from app.utils.audio_stream import AudioStream
+
+    stream = AudioStream(file_path)
+    meter = LoudnessMeter(stream.sr, stream.channels)
+    for frame in stream:
+        meter.process(frame)
+    return meter.result(series_step=series_step)
@@ -0,0 +1,308 @@
+"""
+Model Registry
+Process-wide cache of the heavy models (Whisper, Spleeter, Essentia)
+
+Models are registered by name with a loader and loaded lazily on first use
+(or by warm_up() when the worker starts), then stay resident so a job no
+longer pays the multi-second load. Every loaded entry is accounted: the
+process RSS growth while it loaded, or its declared size where RSS can't be
+read. When the total goes over the budget, the least recently used entries
+that no job is currently using are unloaded.
+
+Exclusive entries (Spleeter keeps per-call state on the separator) are used
+by one job at a time. Whisper and the Essentia algorithms are stateful too,
+but are needed in parallel, so their entries are InstancePools that lend
+each worker its own instance.
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def _rss_bytes() -> Optional[int]:
+    """Current resident set size (Linux); None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class ModelEntry:
+    """One registered model and its load/usage bookkeeping."""
+
+    def __init__(self, name: str, loader: Callable[[], Any], size_mb: float, exclusive: bool):
+        self.name = name
+        self.loader = loader
+        self.size_mb = size_mb
+        self.exclusive = exclusive
+        self.value: Any = None
+        self.loaded = False
+        self.size_bytes = 0
+        self.loads = 0
+        self.hits = 0
+        self.load_seconds = 0.0
+        self.last_used = 0.0
+        self.in_use = 0
+        self.load_lock = threading.Lock()
+        self.use_lock = threading.Lock()
+
+    @property
+    def resident_bytes(self) -> int:
+        """Measured size of one instance times the instances a pool has created."""
+        return self.size_bytes * getattr(self.value, "created", 1) if self.loaded else 0
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "size_mb": round(self.resident_bytes / MB, 1),
+            "instances": getattr(self.value, "created", 1) if self.loaded else 0,
+            "loads": self.loads,
+            "hits": self.hits,
+            "in_use": self.in_use,
+            "last_load_seconds": round(self.load_seconds, 3),
+            "idle_seconds": round(time.monotonic() - self.last_used, 1) if self.loaded else None,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, budget_mb: float = 0, measure_rss: bool = True):
+        """
+        Args:
+            budget_mb: Memory budget for all loaded models (0 = unlimited)
+            measure_rss: Account RSS growth during load instead of declared sizes
+        """
+        self.budget_bytes = int(budget_mb * MB)
+        self.measure_rss = measure_rss
+        self.entries: Dict[str, ModelEntry] = {}
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    # ── Public API ────────────────────────────────────────────────────────────
+
+    def register(self, name: str, loader: Callable[[], Any], size_mb: float = 0, exclusive: bool = False):
+        """Declare a model; nothing is loaded until it is first used."""
+        with self._lock:
+            if name in self.entries and self.entries[name].loaded:
+                raise ValueError(f"Model {name} is loaded and can't be re-registered")
+            self.entries[name] = ModelEntry(name, loader, size_mb, exclusive)
+
+    def get(self, name: str) -> Any:
+        """The resident model, loading it on first use."""
+        entry = self._entry(name)
+        self._ensure_loaded(entry)
+        return entry.value
+
+    @contextmanager
+    def use(self, name: str):
+        """Hold the model for the body: it can't be unloaded meanwhile, and exclusive models are serialized."""
+        entry = self._entry(name)
+        with self._lock:
+            entry.in_use += 1
+        try:
+            self._ensure_loaded(entry)
+            if entry.exclusive:
+                with entry.use_lock:
+                    yield entry.value
+            else:
+                yield entry.value
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+            self._evict()
+
+    def warm_up(self, names: Iterable[str]) -> Dict[str, str]:
+        """Load the given models now (worker start); failures are reported, not raised."""
+        report = {}
+        for name in names:
+            try:
+                self.get(name)
+                report[name] = "ok"
+            except Exception as e:
+                logger.warning(f"[ModelRegistry] Warm-up of {name} failed: {e}")
+                report[name] = f"error: {e}"
+        return report
+
+    def unload(self, name: str) -> bool:
+        entry = self._entry(name)
+        with self._lock:
+            if not entry.loaded or entry.in_use:
+                return False
+            self._drop(entry)
+        gc.collect()
+        return True
+
+    def resident_bytes(self) -> int:
+        return sum(e.resident_bytes for e in self.entries.values())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "budget_mb": round(self.budget_bytes / MB, 1),
+            "resident_mb": round(self.resident_bytes() / MB, 1),
+            "evictions": self.evictions,
+            "models": {name: entry.status() for name, entry in self.entries.items()},
+        }
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _entry(self, name: str) -> ModelEntry:
+        try:
+            return self.entries[name]
+        except KeyError:
+            raise KeyError(f"Unknown model: {name}") from None
+
+    def _ensure_loaded(self, entry: ModelEntry):
+        if not entry.loaded:
+            # One loader per model; concurrent first users wait for it
+            with entry.load_lock:
+                if not entry.loaded:
+                    self._load(entry)
+                    self._evict(keep=entry)
+                    return
+        with self._lock:
+            entry.hits += 1
+            entry.last_used = time.monotonic()
+
+    def _load(self, entry: ModelEntry):
+        logger.info(f"[ModelRegistry] Loading {entry.name}...")
+        before = _rss_bytes() if self.measure_rss else None
+        start = time.monotonic()
+        value = entry.loader()
+        entry.load_seconds = time.monotonic() - start
+        after = _rss_bytes() if before is not None else None
+        # RSS growth also catches native allocations (torch/TF); it is only
+        # approximate while other threads allocate, hence the declared size as floor
+        measured = (after - before) if after is not None else 0
+        with self._lock:
+            entry.value = value
+            entry.size_bytes = max(measured, int(entry.size_mb * MB))
+            entry.loaded = True
+            entry.loads += 1
+            entry.last_used = time.monotonic()
+        logger.info(
+            f"[ModelRegistry] {entry.name} loaded in {entry.load_seconds:.1f}s "
+            f"(~{entry.size_bytes / MB:.0f} MB, {self.resident_bytes() / MB:.0f} MB resident)"
+        )
+
+    def _drop(self, entry: ModelEntry):
+        entry.value = None
+        entry.loaded = False
+        entry.size_bytes = 0
+
+    def _evict(self, keep: Optional[ModelEntry] = None):
+        if not self.budget_bytes:
+            return
+        dropped: List[str] = []
+        with self._lock:
+            while self.resident_bytes() > self.budget_bytes:
+                idle = [e for e in self.entries.values() if e.loaded and not e.in_use and e is not keep]
+                if not idle:
+                    break
+                victim = min(idle, key=lambda e: e.last_used)
+                self._drop(victim)
+                self.evictions += 1
+                dropped.append(victim.name)
+        if dropped:
+            logger.info(f"[ModelRegistry] Over budget, unloaded LRU models: {', '.join(dropped)}")
+            gc.collect()
+
+
+class InstancePool:
+    """
+    Reusable instances of a stateful model. Each concurrent user borrows its
+    own; instances are created on demand (up to max_instances, after which
+    borrowers wait) and go back to the pool afterwards. The first one is
+    created with the pool, so registry warm-up and accounting cover it.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_instances: int = 0, reset: Optional[Callable[[Any], None]] = None):
+        self.factory = factory
+        self.max_instances = max(0, int(max_instances))
+        self.reset = reset
+        self._free: List[Any] = [factory()]
+        self._cond = threading.Condition()
+        self.created = 1
+
+    @contextmanager
+    def borrow(self):
+        with self._cond:
+            while not self._free and self.max_instances and self.created >= self.max_instances:
+                self._cond.wait()
+            instance = self._free.pop() if self._free else None
+            if instance is None:
+                self.created += 1
+        if instance is None:
+            try:
+                instance = self.factory()
+            except Exception:
+                with self._cond:
+                    self.created -= 1
+                    self._cond.notify()
+                raise
+        try:
+            yield instance
+        finally:
+            if self.reset is not None:
+                self.reset(instance)
+            with self._cond:
+                self._free.append(instance)
+                self._cond.notify()
+
+
+def _essentia_algorithms() -> SimpleNamespace:
+    import essentia.standard as es
+
+    return SimpleNamespace(
+        rhythm=es.RhythmExtractor2013(method="multifeature"),
+        key=es.KeyExtractor(),
+        danceability=es.Danceability(),
+        dissonance=es.Dissonance(),
+        spectrum=es.Spectrum(),
+        window=es.Windowing(type="hann"),
+        zcr=es.ZeroCrossingRate(),
+        rms=es.RMS(),
+    )
+
+
+def _reset_essentia(algos: SimpleNamespace):
+    for algo in vars(algos).values():
+        algo.reset()
+
+
+def _load_whisper(size: str):
+    import whisper
+
+    return whisper.load_model(size)
+
+
+def _load_spleeter(stems: int):
+    from spleeter.separator import Separator
+
+    return Separator(f"spleeter:{stems}stems")
+
+
+# Global registry (MODEL_MEMORY_BUDGET_MB=0 disables LRU unloading)
+model_registry = ModelRegistry(budget_mb=float(os.getenv("MODEL_MEMORY_BUDGET_MB", "2048")))
+# Whisper keeps decoding hooks on the model, so parallel transcription needs one instance per worker
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "0")) or min(2, os.cpu_count() or 1)
+model_registry.register(
+    "whisper-tiny", lambda: InstancePool(lambda: _load_whisper("tiny"), max_instances=WHISPER_WORKERS), size_mb=150
+)
+for _stems, _size in ((2, 300), (4, 600), (5, 750)):
+    model_registry.register(f"spleeter-{_stems}stems", lambda n=_stems: _load_spleeter(n), size_mb=_size, exclusive=True)
+# Essentia algorithms are stateful: one set per concurrently analyzed window
+model_registry.register("essentia", lambda: InstancePool(_essentia_algorithms, reset=_reset_essentia), size_mb=20)
+
+# Loaded at worker start so the first job doesn't pay for them
+WARMUP_MODELS = [m.strip() for m in os.getenv("MODEL_WARMUP", "whisper-tiny,essentia").split(",") if m.strip()]
@@ -0,0 +1,179 @@
+"""
+Job Profiler
+Opt-in sampling profiler around one analysis job
+
+A daemon thread samples the Python stack of every thread in the process
+(default every 10 ms) while the job runs, so the DSP work in executor
+threads is covered along with the event loop, and the production input
+never leaves the server. Idle threads (waiting on a lock, a queue or the
+selector) are not counted. The samples are written as two artifacts:
+
+- <job>.pstats: pstats/snakeviz-compatible statistics (self/cumulative
+  seconds estimated from the sample counts)
+- <job>.collapsed.txt: collapsed stacks ("thread;frame;frame count") for
+  flamegraph.pl, speedscope or inferno
+
+Stacks of other jobs running at the same time are included too; the
+summary records how many were active so the reader can judge the noise.
+"""
+
+import logging
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "10")) / 1000.0
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))
+ARTIFACTS = {"pstats": ".pstats", "collapsed": ".collapsed.txt"}
+
+Func = Tuple[str, int, str]  # pstats key: (file, first line, function)
+
+# Leaf frames of threads that are waiting, not working
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),  # executor thread blocked on its work queue
+}
+
+
+def artifact_path(job_id: str, kind: str, directory: Optional[str] = None) -> str:
+    return os.path.join(directory or PROFILE_DIR, f"{job_id}{ARTIFACTS[kind]}")
+
+
+def _label(func: Func) -> str:
+    filename, line, name = func
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+
+class JobProfiler:
+    def __init__(self, job_id: str, interval: float = PROFILE_INTERVAL, directory: Optional[str] = None,
+                 max_seconds: float = PROFILE_MAX_SECONDS):
+        self.job_id = job_id
+        self.interval = max(0.001, interval)
+        self.directory = directory or PROFILE_DIR
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()  # (thread, (root func, ..., leaf func)) -> samples
+        self.samples = 0
+        self.idle_samples = 0
+        self.concurrent_jobs = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+
+    def start(self):
+        from app.utils.cancellation import job_registry
+
+        self.concurrent_jobs = max(0, len(job_registry.tokens) - 1)
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._sample_loop, name=f"profiler-{self.job_id[:8]}", daemon=True)
+        self._thread.start()
+        logger.info(f"[Profiler] Sampling job {self.job_id} every {self.interval * 1000:.0f} ms")
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop sampling and write the artifacts; returns the summary stored on the Job row."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._elapsed = time.monotonic() - self._started
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(artifact_path(self.job_id, "pstats", self.directory), "wb") as f:
+            marshal.dump(self.pstats(), f)
+        with open(artifact_path(self.job_id, "collapsed", self.directory), "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+
+        summary = {
+            "mode": "sampling",
+            "interval_ms": round(self.interval * 1000, 2),
+            "duration_seconds": round(self._elapsed, 3),
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "concurrent_jobs": self.concurrent_jobs,
+            "top": self.top(),
+            "artifacts": sorted(ARTIFACTS),
+        }
+        logger.info(f"[Profiler] Job {self.job_id}: {self.samples} samples written to {self.directory}")
+        return summary
+
+    # ── Output formats ────────────────────────────────────────────────────────
+
+    def collapsed(self) -> str:
+        lines = [
+            ";".join([thread] + [_label(func) for func in stack]) + f" {count}"
+            for (thread, stack), count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def pstats(self) -> Dict[Func, tuple]:
+        """
+        Samples as the dict pstats.Stats loads: func -> (cc, nc, tt, ct, callers),
+        callers: caller -> (cc, nc, tt, ct). Call counts are sample counts.
+        """
+        own: Counter = Counter()
+        total: Counter = Counter()
+        edges: Dict[Func, Dict[Func, List[float]]] = defaultdict(lambda: defaultdict(lambda: [0, 0.0, 0.0]))
+        for (_, stack), count in self.stacks.items():
+            own[stack[-1]] += count
+            seen = set()
+            for i, func in enumerate(stack):
+                first = func not in seen
+                seen.add(func)
+                if first:
+                    total[func] += count
+                if i:
+                    edge = edges[func][stack[i - 1]]
+                    edge[0] += count
+                    edge[2] += count * self.interval if first else 0.0
+                    if i == len(stack) - 1:
+                        edge[1] += count * self.interval
+        stats = {}
+        for func, samples in total.items():
+            callers = {caller: (n, n, tt, ct) for caller, (n, tt, ct) in edges[func].items()}
+            stats[func] = (samples, samples, own[func] * self.interval, samples * self.interval, callers)
+        return stats
+
+    def top(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Functions with the most self time (where the samples landed)."""
+        own: Counter = Counter()
+        for (_, stack), count in self.stacks.items():
+            own[stack[-1]] += count
+        return [
+            {"function": _label(func), "self_seconds": round(count * self.interval, 3),
+             "share": round(count / self.samples, 3) if self.samples else 0.0}
+            for func, count in own.most_common(limit)
+        ]
+
+    # ── Sampling ──────────────────────────────────────────────────────────────
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if time.monotonic() - self._started > self.max_seconds:
+                logger.warning(f"[Profiler] Job {self.job_id}: stopped sampling after {self.max_seconds:.0f}s")
+                return
+            names = {t.ident: re.sub(r"_\d+$", "", t.name) for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if (os.path.basename(stack[0][0]), stack[0][2]) in _IDLE_LEAVES:
+                    self.idle_samples += 1
+                    continue
+                stack.reverse()
+                self.stacks[(names.get(ident, f"thread-{ident}"), tuple(stack))] += 1
+                self.samples += 1
@@ -0,0 +1,96 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.utils.websocket_manager import manager as ws_manager
+
+logger = logging.getLogger(__name__)
+
+# Terminal / lifecycle states are always written to the jobs table; plain
+# "processing" milestones only every CHECKPOINT_INTERVAL seconds.
+CHECKPOINT_INTERVAL = 10.0
+
+# A job in one of these states gets a final write and no live entry
+TERMINAL_STATUSES = ("completed", "error", "cancelled")
+
+
+class ProgressReporter:
+    """
+    Coalesces analysis progress updates.
+
+    Every update is broadcast over WebSocket and kept in memory (so polling
+    clients on this worker still see the live message), but the jobs table is
+    only written on a status transition or when the last write for that job is
+    older than checkpoint_interval. Polling from another worker falls back to
+    the last checkpoint, which is at most checkpoint_interval stale.
+    """
+
+    def __init__(self, checkpoint_interval: float = CHECKPOINT_INTERVAL):
+        self.checkpoint_interval = checkpoint_interval
+        # job_id -> {"message", "progress", "status", "partial_result"?}
+        self.live: Dict[str, Dict[str, Any]] = {}
+        self._last_persist: Dict[str, float] = {}
+        self.writes = 0
+        self.coalesced = 0
+
+    async def update(self, db, job, message: str, progress: int = 0, status: str = "processing"):
+        """
+        Record a progress milestone for `job`. Any pending ORM changes on the
+        job (e.g. job.result) are committed together with a persisted update.
+        """
+        job_id = job.id
+        now = time.monotonic()
+        transition = job.status != status
+        due = now - self._last_persist.get(job_id, 0.0) >= self.checkpoint_interval
+
+        if transition or due or status in TERMINAL_STATUSES:
+            job.status = status
+            job.message = message
+            db.commit()
+            self._last_persist[job_id] = now
+            self.writes += 1
+        else:
+            self.coalesced += 1
+
+        if status in TERMINAL_STATUSES:
+            self.discard(job_id)
+        else:
+            entry = {"message": message, "progress": progress, "status": status}
+            partial = getattr(job, "partial_result", None)
+            if partial:
+                entry["partial_result"] = partial
+            self.live[job_id] = entry
+
+        await ws_manager.send_progress(job_id, message, progress=progress, status=status)
+
+    async def publish_partial(self, db, job, layer: str, fields: Dict[str, Any], progress: int = 0):
+        """
+        Merge the fields a pipeline layer has settled into job.partial_result
+        and broadcast them. Layer completions are a handful per job, so each
+        one is persisted: polling clients on any worker see it immediately.
+        """
+        if not fields:
+            return
+        merged = dict(job.partial_result or {})
+        merged.update(fields)
+        job.partial_result = merged  # new object so the JSON column is flagged dirty
+        db.commit()
+        self.writes += 1
+        self._last_persist[job.id] = time.monotonic()
+
+        entry = self.live.setdefault(job.id, {"message": job.message, "progress": progress, "status": job.status})
+        entry["progress"] = max(entry.get("progress") or 0, progress)
+        entry["partial_result"] = merged
+
+        await ws_manager.send_partial_result(job.id, layer, fields, progress=progress)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.live.get(job_id)
+
+    def discard(self, job_id: str):
+        self.live.pop(job_id, None)
+        self._last_persist.pop(job_id, None)
+
+
+# Global reporter
+progress_reporter = ProgressReporter()
@@ -0,0 +1,248 @@
+"""
+Analysis Scheduler
+Priority lanes and per-user fair sharing of the analysis CPU slots
+
+Lanes, highest first: "interactive" (/analysis/generate), "batch"
+(/mir/batch_analyze) and "background" (re-processing). Interactive work is
+granted a free slot before anything else and may keep `interactive_reserved`
+slots that the other lanes never take. Batch and background split what is
+left by lane weight, and inside a lane users are served by least weighted
+usage (virtual time), so one 200-file batch cannot starve another user's.
+
+Lower-lane work is preempted at stage boundaries: preemption_point() (or
+Lease.checkpoint()) hands the slot to a waiting interactive job and blocks
+until the scheduler grants it back. The current lease travels in a
+ContextVar, so DSP code running under asyncio.to_thread can call it.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LANES = ("interactive", "batch", "background")
+# Share of the non-reserved slots when both lower lanes are busy
+LANE_WEIGHTS = {"batch": 4.0, "background": 1.0}
+
+
+class Lease:
+    """One granted (or pending) slot. Use via AnalysisScheduler.slot()."""
+
+    def __init__(self, scheduler: "AnalysisScheduler", lane: str, user: str, weight: float):
+        self.scheduler = scheduler
+        self.lane = lane
+        self.user = user
+        self.weight = weight
+        self.enqueued_at = time.monotonic()
+        self.granted_at: Optional[float] = None
+        self.waited = 0.0
+        self.preemptions = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._held = asyncio.Event()
+
+    @property
+    def held(self) -> bool:
+        return self._held.is_set()
+
+    async def checkpoint(self):
+        """Stage boundary: give the slot to waiting interactive work, then wait for it back."""
+        if self.held and self.scheduler._should_yield(self):
+            self.preemptions += 1
+            self.scheduler.preempted += 1
+            logger.info(f"[Scheduler] {self.lane} job of {self.user} yields its slot at a stage boundary")
+            self.scheduler._release(self, requeue=True)
+        if not self.held:
+            await self._held.wait()
+
+    def checkpoint_sync(self):
+        """checkpoint() for worker threads; blocks the thread while preempted."""
+        if self.loop is None or (self.held and not self.scheduler._should_yield(self)):
+            return
+        try:
+            asyncio.get_running_loop()
+            return  # on the event loop thread: blocking here would deadlock
+        except RuntimeError:
+            pass
+        asyncio.run_coroutine_threadsafe(self.checkpoint(), self.loop).result()
+
+
+_current: contextvars.ContextVar[Optional[Lease]] = contextvars.ContextVar("analysis_lease", default=None)
+
+
+def current_lease() -> Optional[Lease]:
+    return _current.get()
+
+
+def preemption_point():
+    """Stage boundary for thread-side work; a no-op outside a scheduled job."""
+    lease = _current.get()
+    if lease is not None:
+        lease.checkpoint_sync()
+
+
+class AnalysisScheduler:
+    def __init__(self, slots: int, interactive_reserved: int = 0):
+        self.slots = max(1, int(slots))
+        self.interactive_reserved = max(0, min(int(interactive_reserved), self.slots - 1))
+        self.running: List[Lease] = []
+        # lane -> user -> FIFO of pending leases
+        self.queues: Dict[str, Dict[str, Deque[Lease]]] = {lane: {} for lane in LANES}
+        self.user_vtime: Dict[str, Dict[str, float]] = {lane: {} for lane in LANES}
+        self.lane_vtime: Dict[str, float] = {lane: 0.0 for lane in LANES}
+        self.granted = {lane: 0 for lane in LANES}
+        self.wait_total = {lane: 0.0 for lane in LANES}
+        self.wait_max = {lane: 0.0 for lane in LANES}
+        self.preempted = 0
+
+    # ── Public API ────────────────────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def slot(self, lane: str = "interactive", user_id: Optional[str] = None, weight: float = 1.0):
+        """Hold one analysis slot for the body; the lease is installed for preemption_point()."""
+        lease = await self.acquire(lane, user_id, weight)
+        ctx = _current.set(lease)
+        try:
+            yield lease
+        finally:
+            _current.reset(ctx)
+            self._release(lease)
+
+    async def acquire(self, lane: str = "interactive", user_id: Optional[str] = None, weight: float = 1.0) -> Lease:
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+        lease = Lease(self, lane, str(user_id or "anonymous"), max(float(weight), 1e-6))
+        lease.loop = asyncio.get_running_loop()
+        self._enqueue(lease)
+        self._dispatch()
+        try:
+            await lease._held.wait()
+        except asyncio.CancelledError:
+            if lease.held:
+                self._release(lease)
+            else:
+                self._dequeue(lease)
+            raise
+        return lease
+
+    def status(self) -> Dict[str, Any]:
+        running = {lane: 0 for lane in LANES}
+        for lease in self.running:
+            running[lease.lane] += 1
+        return {
+            "slots": self.slots,
+            "interactive_reserved": self.interactive_reserved,
+            "running": running,
+            "queued": {lane: sum(len(q) for q in self.queues[lane].values()) for lane in LANES},
+            "granted": dict(self.granted),
+            "preempted": self.preempted,
+            "avg_wait_seconds": {
+                lane: round(self.wait_total[lane] / self.granted[lane], 3) if self.granted[lane] else 0.0
+                for lane in LANES
+            },
+            "max_wait_seconds": {lane: round(v, 3) for lane, v in self.wait_max.items()},
+        }
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _enqueue(self, lease: Lease, front: bool = False):
+        users = self.queues[lease.lane]
+        if lease.lane != "interactive" and not users and not any(l.lane == lease.lane for l in self.running):
+            # A lane waking up competes from the busy lane's level, so time
+            # spent idle doesn't bank credit for a burst
+            busy = [self.lane_vtime[lane] for lane in ("batch", "background")
+                    if lane != lease.lane and (self._queued(lane) or any(l.lane == lane for l in self.running))]
+            if busy:
+                self.lane_vtime[lease.lane] = max(self.lane_vtime[lease.lane], min(busy))
+        vtimes = self.user_vtime[lease.lane]
+        if lease.user not in users:
+            # Likewise a user (re)joining the lane starts at its current minimum
+            active = [vtimes.get(u, 0.0) for u in users] + [vtimes.get(l.user, 0.0) for l in self.running if l.lane == lease.lane]
+            if active:
+                vtimes[lease.user] = max(vtimes.get(lease.user, 0.0), min(active))
+            users[lease.user] = deque()
+        if front:
+            users[lease.user].appendleft(lease)
+        else:
+            users[lease.user].append(lease)
+
+    def _dequeue(self, lease: Lease):
+        queue = self.queues[lease.lane].get(lease.user)
+        if queue and lease in queue:
+            queue.remove(lease)
+            if not queue:
+                del self.queues[lease.lane][lease.user]
+
+    def _queued(self, lane: str) -> bool:
+        return any(self.queues[lane].values())
+
+    def _lower_lane_cap(self) -> int:
+        return self.slots - self.interactive_reserved
+
+    def _should_yield(self, lease: Lease) -> bool:
+        return lease.lane != "interactive" and self._queued("interactive") and len(self.running) >= self.slots
+
+    def _pick(self, lane: str) -> Lease:
+        users = self.queues[lane]
+        vtimes = self.user_vtime[lane]
+        user = min(users, key=lambda u: vtimes.get(u, 0.0))
+        lease = users[user].popleft()
+        if not users[user]:
+            del users[user]
+        return lease
+
+    def _dispatch(self):
+        while len(self.running) < self.slots:
+            if self._queued("interactive"):
+                lane = "interactive"
+            else:
+                lower = sum(1 for l in self.running if l.lane != "interactive")
+                candidates = [lane for lane in ("batch", "background") if self._queued(lane)]
+                if not candidates or lower >= self._lower_lane_cap():
+                    return
+                lane = min(candidates, key=lambda name: self.lane_vtime[name])
+            self._grant(self._pick(lane))
+
+    def _grant(self, lease: Lease):
+        now = time.monotonic()
+        wait = now - lease.enqueued_at
+        lease.waited += wait
+        lease.granted_at = now
+        self.running.append(lease)
+        self.granted[lease.lane] += 1
+        self.wait_total[lease.lane] += wait
+        self.wait_max[lease.lane] = max(self.wait_max[lease.lane], wait)
+        lease._held.set()
+
+    def _release(self, lease: Lease, requeue: bool = False):
+        if lease in self.running:
+            self.running.remove(lease)
+            used = time.monotonic() - (lease.granted_at or time.monotonic())
+            vtimes = self.user_vtime[lease.lane]
+            vtimes[lease.user] = vtimes.get(lease.user, 0.0) + used / lease.weight
+            self.lane_vtime[lease.lane] += used / LANE_WEIGHTS.get(lease.lane, 1.0)
+        lease._held.clear()
+        if requeue:
+            lease.enqueued_at = time.monotonic()
+            self._enqueue(lease, front=True)
+        self._dispatch()
+
+
+def _default_slots() -> int:
+    try:
+        return int(os.getenv("ANALYSIS_SLOTS", "0")) or (os.cpu_count() or 2)
+    except ValueError:
+        return os.cpu_count() or 2
+
+
+# Global scheduler: one slot per core by default, one kept for uploads when there are several
+_slots = _default_slots()
+analysis_scheduler = AnalysisScheduler(
+    slots=_slots,
+    interactive_reserved=int(os.getenv("ANALYSIS_INTERACTIVE_RESERVED", "1" if _slots > 1 else "0")),
+)
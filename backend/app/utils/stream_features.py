@@ -0,0 +1,248 @@
+"""
+Streaming Feature Extraction
+Full-track RMS, loudness, spectral statistics and onset envelope from
+AudioStream frames, in one pass and fixed memory
+
+Frame-level definitions follow librosa (n_fft 2048, hop 512, Hann window,
+center=False), so the summary values are drop-in replacements for the
+librosa.feature.* means DeepAudioAnalyzer computes on a loaded slice.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.cancellation import raise_if_cancelled
+from app.utils.loudness import LoudnessMeter
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_SR = 22050
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+ROLL_PERCENT = 0.85
+TOP_DB = 80.0
+AMIN = 1e-10
+TEMPOGRAM_WIN = 384         # librosa default (~8.9 s of onset frames)
+
+
+class RunningStats:
+    """Count/mean/std/min/max over batches of values without keeping them."""
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def update(self, values: np.ndarray):
+        if values.size == 0:
+            return
+        values = values.astype(np.float64, copy=False)
+        self.n += values.size
+        self.total += float(values.sum())
+        self.total_sq += float(np.dot(values, values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else 0.0
+
+    @property
+    def std(self) -> float:
+        if not self.n:
+            return 0.0
+        return float(np.sqrt(max(0.0, self.total_sq / self.n - self.mean ** 2)))
+
+
+class StreamingFeatures:
+    """
+    Usage:
+        stream = AudioStream(path)
+        features = StreamingFeatures(stream.sr, stream.channels)
+        for frame in stream:
+            features.process(frame)
+        summary = features.result()
+
+    Loudness is measured on the native-rate, multi-channel signal; everything
+    else on a mono ANALYSIS_SR copy resampled on the fly. Only the onset
+    envelope grows with duration (~170 bytes/s).
+    """
+
+    def __init__(self, sr: int, channels: int = 1):
+        import librosa
+
+        self.sr = int(sr)
+        self.loudness = LoudnessMeter(self.sr, channels)
+        self._resampler = None
+        if self.sr != ANALYSIS_SR:
+            import soxr
+
+            self._resampler = soxr.ResampleStream(self.sr, ANALYSIS_SR, 1, dtype="float32")
+
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._window = librosa.filters.get_window("hann", N_FFT, fftbins=True).astype(np.float32)
+        self._freqs = np.fft.rfftfreq(N_FFT, d=1.0 / ANALYSIS_SR).astype(np.float32)
+        self._mel = librosa.filters.mel(sr=ANALYSIS_SR, n_fft=N_FFT, n_mels=N_MELS).astype(np.float32)
+        self._prev_mel_db: Optional[np.ndarray] = None
+        self._mel_db_max = float("-inf")
+
+        self.stats = {name: RunningStats() for name in ("rms", "zcr", "centroid", "bandwidth", "rolloff", "flatness")}
+        self._onset: List[np.ndarray] = []
+        self.samples = 0
+
+    def process(self, frame: np.ndarray):
+        x = np.asarray(frame, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[:, None]
+        if x.shape[0] == 0:
+            return
+        self.samples += x.shape[0]
+        self.loudness.process(x)
+
+        mono = x.mean(axis=1) if x.shape[1] > 1 else x[:, 0]
+        if self._resampler is not None:
+            mono = self._resampler.resample_chunk(mono)
+        self._analyze(mono)
+
+    def finish(self):
+        """Flush the resampler tail; call once after the last frame."""
+        if self._resampler is not None:
+            self._analyze(self._resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+            self._resampler = None
+
+    def _analyze(self, y: np.ndarray):
+        buf = np.concatenate([self._carry, y]) if self._carry.size else np.ascontiguousarray(y, dtype=np.float32)
+        if buf.shape[0] < N_FFT:
+            self._carry = buf
+            return
+        n = 1 + (buf.shape[0] - N_FFT) // HOP_LENGTH
+        frames = np.lib.stride_tricks.as_strided(
+            buf, shape=(n, N_FFT), strides=(buf.strides[0] * HOP_LENGTH, buf.strides[0]), writeable=False
+        )
+        self._carry = buf[n * HOP_LENGTH:].copy()
+
+        # Time domain
+        self.stats["rms"].update(np.sqrt(np.mean(frames * frames, axis=1)))
+        signs = np.signbit(frames)
+        self.stats["zcr"].update(np.mean(signs[:, 1:] != signs[:, :-1], axis=1))
+
+        # Spectral
+        S = np.abs(np.fft.rfft(frames * self._window, axis=1)).astype(np.float32)
+        total = S.sum(axis=1) + AMIN
+        centroid = (S @ self._freqs) / total
+        self.stats["centroid"].update(centroid)
+        dev = (self._freqs[None, :] - centroid[:, None]) ** 2
+        self.stats["bandwidth"].update(np.sqrt(np.sum((S / total[:, None]) * dev, axis=1)))
+        cum = np.cumsum(S, axis=1)
+        idx = np.argmax(cum >= ROLL_PERCENT * cum[:, -1:], axis=1)
+        self.stats["rolloff"].update(self._freqs[idx])
+        power = np.maximum(S * S, AMIN)
+        self.stats["flatness"].update(np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1))
+
+        # Onset envelope: spectral flux of the log-mel spectrogram (lag 1).
+        # top_db is applied against the running maximum, not the global one.
+        mel_db = 10.0 * np.log10(np.maximum(power @ self._mel.T, AMIN))
+        self._mel_db_max = max(self._mel_db_max, float(mel_db.max()))
+        mel_db = np.maximum(mel_db, self._mel_db_max - TOP_DB)
+        prev = self._prev_mel_db if self._prev_mel_db is not None else mel_db[:1]
+        flux = np.diff(np.concatenate([prev, mel_db]), axis=0)
+        self._onset.append(np.maximum(0.0, flux).mean(axis=1).astype(np.float32))
+        self._prev_mel_db = mel_db[-1:]
+
+    @property
+    def onset_envelope(self) -> np.ndarray:
+        return np.concatenate(self._onset) if self._onset else np.zeros(0, dtype=np.float32)
+
+    @staticmethod
+    def _mean_tempogram(oenv: np.ndarray, segment: int = 4096) -> Optional[np.ndarray]:
+        """
+        Track-average autocorrelation tempogram, built segment by segment:
+        a whole-track tempogram is win_length x frames and would cost ~1 GB
+        for a 20-minute file.
+        """
+        import librosa
+
+        win = TEMPOGRAM_WIN
+        if oenv.size <= win:
+            if oenv.size < 8:
+                return None
+            return librosa.feature.tempogram(
+                onset_envelope=oenv, sr=ANALYSIS_SR, hop_length=HOP_LENGTH, win_length=win
+            ).mean(axis=1, keepdims=True)
+        total, count = np.zeros(win), 0
+        for start in range(0, oenv.size - win + 1, segment):
+            tg = librosa.feature.tempogram(
+                onset_envelope=oenv[start:start + segment + win - 1],
+                sr=ANALYSIS_SR,
+                hop_length=HOP_LENGTH,
+                win_length=win,
+                center=False,
+            )
+            total += tg.sum(axis=1)
+            count += tg.shape[1]
+        return (total / max(count, 1))[:, None]
+
+    def result(self) -> Dict[str, Any]:
+        import librosa
+
+        self.finish()
+        rms, zcr = self.stats["rms"], self.stats["zcr"]
+        spectral = {
+            f"{name}_{stat}": round(getattr(self.stats[name], stat), 6)
+            for name in ("centroid", "bandwidth", "rolloff", "flatness")
+            for stat in ("mean", "std")
+        }
+
+        oenv = self.onset_envelope
+        rhythm: Dict[str, Any] = {"onset_strength_mean": 0.0, "onset_strength_std": 0.0, "tempo": None}
+        if oenv.size:
+            rhythm["onset_strength_mean"] = float(oenv.mean())
+            rhythm["onset_strength_std"] = float(oenv.std())
+        tg = self._mean_tempogram(oenv)
+        if tg is not None:
+            tempo = librosa.feature.tempo(tg=tg, sr=ANALYSIS_SR, hop_length=HOP_LENGTH)
+            rhythm["tempo"] = round(float(np.atleast_1d(tempo)[0]), 2)
+
+        loudness = self.loudness.result()
+        return {
+            "duration": round(self.samples / self.sr, 2),
+            "energy": {
+                "rms_mean": rms.mean,
+                "rms_std": rms.std,
+                "rms_max": rms.max if rms.n else 0.0,
+                "dynamic_range": (rms.max - rms.min) if rms.n else 0.0,
+                "zcr_mean": zcr.mean,
+                "zcr_std": zcr.std,
+            },
+            "spectral": spectral,
+            "rhythm": rhythm,
+            "loudness": {k: v for k, v in loudness.items() if k not in ("momentary",)},
+        }
+
+
+def analyze_file_streaming(file_path: str) -> Dict[str, Any]:
+    """One decode pass over the whole file; memory does not depend on its length."""
+    from app.utils.audio_stream import AudioStream
+
+    stream = AudioStream(file_path)
+    features = StreamingFeatures(stream.sr, stream.channels)
+    for frame in stream:
+        raise_if_cancelled()
+        features.process(frame)
+    return features.result()
+
+
+def stream_rms(file_path: str) -> float:
+    """Whole-file RMS of the mono downmix, streamed."""
+    from app.utils.audio_stream import AudioStream
+
+    total, n = 0.0, 0
+    for frame in AudioStream(file_path, mono=True):
+        total += float(np.dot(frame, frame))
+        n += frame.shape[0]
+    return float(np.sqrt(total / n)) if n else 0.0
@@ -0,0 +1,378 @@
+"""
+Task Graph
+Dependency-graph executor for the stages of one analysis
+
+Each node is an async function of its dependencies' results. A started node
+runs as soon as all of its inputs exist, so independent stages (hashing, tag
+reading, transcription, DSP) overlap and the critical path is the longest
+chain instead of the sum of all stages. Nodes start either eagerly
+(start()) or on demand when someone first asks for their result (get()),
+which lets the caller gate expensive stages on an earlier decision, e.g. no
+DSP for a cache hit.
+
+Node tasks are created from the caller's context, so the job's cancellation
+token reaches them; cancel() stops whatever is still running.
+
+Pipelines are declared on top of it: a Pipeline is a list of Stages, each
+naming its inputs and saying whether it can be memoized (cache_key), what
+it roughly costs, whether it is optional (failure -> fallback instead of
+failing the run) and when to skip it. The analysis entry points are such
+declarations; sequencing, overlap, budget checks, error fallbacks and
+memoization all happen here, once.
+"""
+
+import asyncio
+import contextvars
+import copy
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from app.utils.cancellation import JobCancelled
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = metrics.histogram(
+    "stage_seconds", "Run time of pipeline stages that executed", ("pipeline", "stage", "outcome")
+)
+STAGE_RUNS = metrics.counter(
+    "stage_runs_total", "Pipeline stage executions by outcome (ran, cached, skipped, fallback, error)",
+    ("pipeline", "stage", "outcome"),
+)
+FALLBACKS = metrics.counter("fallbacks_total", "Results produced by a fallback instead of the real path", ("kind",))
+
+
+class Node:
+    def __init__(self, name: str, fn: Callable[..., Awaitable[Any]], deps: Sequence[str], cost: float = 0.0):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.cost = cost
+        self.outcome: Optional[str] = None  # set by pipeline stages: ran, cached, skipped, fallback
+        self.task: Optional[asyncio.Task] = None
+        self.created_at: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def status(self) -> str:
+        if self.task is None:
+            return "idle"
+        if not self.task.done():
+            return "running" if self.started_at is not None else "waiting"
+        if self.task.cancelled():
+            return "cancelled"
+        return "failed" if self.task.exception() is not None else "done"
+
+
+class TaskGraph:
+    def __init__(self, name: str = "graph"):
+        self.name = name
+        self.nodes: Dict[str, Node] = {}
+        self.created_at = time.monotonic()
+
+    def add(self, name: str, fn: Callable[..., Awaitable[Any]], deps: Sequence[str] = (), cost: float = 0.0) -> "TaskGraph":
+        """fn(**{dep: result}) runs once every dep has a result; a failed dep fails the node."""
+        if name in self.nodes:
+            raise ValueError(f"Duplicate node: {name}")
+        missing = [dep for dep in deps if dep not in self.nodes]
+        if missing:
+            raise ValueError(f"Node {name} depends on unknown node(s): {', '.join(missing)}")
+        self.nodes[name] = Node(name, fn, deps, cost)
+        return self
+
+    def start(self, *names: str):
+        """Launch the given nodes (all if none given) and everything they depend on."""
+        for name in names or tuple(self.nodes):
+            self._task(name)
+
+    async def get(self, name: str, timeout: Optional[float] = None) -> Any:
+        """
+        Result of a node, starting it if needed.
+
+        Raises:
+            The node's (or a dependency's) exception; asyncio.TimeoutError
+            after `timeout` seconds, in which case the node keeps running.
+        """
+        task = self._task(name)
+        if timeout is None:
+            return await asyncio.shield(task)
+        return await asyncio.wait_for(asyncio.shield(task), max(0.0, timeout))
+
+    async def run(self, *names: str) -> Dict[str, Any]:
+        """
+        Start every node, most expensive first, and wait for the given ones
+        (all if none given); on error or cancellation the rest is cancelled.
+        """
+        for node in sorted(self.nodes.values(), key=lambda n: -n.cost):
+            self._task(node.name)
+        targets = names or tuple(self.nodes)
+        try:
+            results = await asyncio.gather(*(self.get(name) for name in targets))
+        except BaseException:
+            self.cancel()
+            raise
+        return dict(zip(targets, results))
+
+    def done(self, name: str) -> bool:
+        task = self.nodes[name].task
+        return task is not None and task.done()
+
+    def cancel(self, *names: str):
+        """Cancel the given running nodes (all if none given)."""
+        for name in names or tuple(self.nodes):
+            task = self.nodes[name].task
+            if task is not None and not task.done():
+                task.cancel()
+
+    def timings(self) -> Dict[str, Dict[str, Any]]:
+        """Per node: status, seconds waiting for inputs, seconds running, start offset from graph creation."""
+        report = {}
+        for name, node in self.nodes.items():
+            entry: Dict[str, Any] = {"status": node.status}
+            if node.outcome is not None:
+                entry["outcome"] = node.outcome
+            if node.started_at is not None:
+                entry["start"] = round(node.started_at - self.created_at, 3)
+                entry["waited"] = round(node.started_at - node.created_at, 3)
+                entry["seconds"] = round((node.finished_at or time.monotonic()) - node.started_at, 3)
+            report[name] = entry
+        return report
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _task(self, name: str) -> asyncio.Task:
+        node = self.nodes[name]
+        if node.task is None:
+            for dep in node.deps:
+                self._task(dep)
+            node.created_at = time.monotonic()
+            node.task = asyncio.create_task(self._run(node), name=f"{self.name}:{name}")
+            # A node nobody awaits (e.g. after an early return) must not log "exception never retrieved"
+            node.task.add_done_callback(self._consume)
+        return node.task
+
+    @staticmethod
+    def _consume(task: asyncio.Task):
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, node: Node) -> Any:
+        inputs = {}
+        for dep in node.deps:
+            inputs[dep] = await asyncio.shield(self.nodes[dep].task)
+        node.started_at = time.monotonic()
+        try:
+            return await node.fn(**inputs)
+        finally:
+            node.finished_at = time.monotonic()
+
+
+# ── Declarative pipelines ─────────────────────────────────────────────────────
+
+
+def file_key(file_path: str) -> Optional[str]:
+    """Cache key of one version of a file (path, size, mtime); None if it can't be read."""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(file_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class StageCache:
+    """In-process LRU memo of cacheable stage results, keyed by (stage name, cache key)."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = self._entries[key]
+        # Callers mutate results (merge steps); the memo keeps its own copy
+        return True, copy.deepcopy(value)
+
+    def set(self, key: Tuple[str, str], value: Any):
+        if self.max_entries <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        inputs: Sequence[str] = (),
+        cache_key: Optional[Callable[..., str]] = None,
+        cost: float = 0.0,
+        optional: bool = False,
+        fallback: Optional[Callable[..., Any]] = None,
+        skip: Optional[Callable[..., bool]] = None,
+        blocking: bool = False,
+    ):
+        """
+        Args:
+            name: Stage name, also the keyword its result is passed under to dependents
+            fn: fn(ctx, **inputs); a coroutine function, or a plain one run in a thread (blocking=True)
+            inputs: Stages whose results fn needs (declared earlier in the pipeline)
+            cache_key: cache_key(ctx, **inputs) -> str memoizes the result in-process
+                (None: not this time); the same stage name and key must mean the
+                same result, across pipelines
+            cost: Estimated seconds; expensive stages start first, and an optional
+                stage is skipped when less of the run's budget is left
+            optional: A failure gives the fallback result instead of failing the run
+            fallback: fallback(ctx, error, **inputs) -> result of a failed optional or a
+                skipped stage (error is None for a skip); None if not given
+            skip: skip(ctx, **inputs) -> True to not run the stage
+            blocking: fn is synchronous (CPU or file I/O)
+        """
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.cache_key = cache_key
+        self.cost = cost
+        self.optional = optional
+        self.fallback = fallback
+        self.skip = skip
+        self.blocking = blocking
+
+
+class Pipeline:
+    def __init__(self, name: str, stages: Iterable[Stage]):
+        self.name = name
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Pipeline {name}: duplicate stage {stage.name}")
+            missing = [i for i in stage.inputs if i not in self.stages]
+            if missing:
+                raise ValueError(f"Pipeline {name}: stage {stage.name} needs undeclared input(s): {', '.join(missing)}")
+            self.stages[stage.name] = stage
+
+    def graph(self, ctx: Any, budget: Optional[Callable[[], float]] = None) -> TaskGraph:
+        """
+        One run of the pipeline for `ctx` (the per-run parameters stages read)
+        as a TaskGraph; nothing starts until the caller start()s, get()s or run()s it.
+
+        Args:
+            budget: Seconds left for the run, checked before each optional stage
+        """
+        graph = TaskGraph(self.name)
+        for stage in self.stages.values():
+            graph.add(stage.name, self._node(graph, stage, ctx, budget), deps=stage.inputs, cost=stage.cost)
+        return graph
+
+    async def run(
+        self, ctx: Any, budget: Optional[Callable[[], float]] = None, targets: Sequence[str] = ()
+    ) -> Dict[str, Any]:
+        """Results by stage name (skipped stages left out) of the targets (all if none given)."""
+        graph = self.graph(ctx, budget)
+        results = await graph.run(*targets)
+        logger.debug(f"[{self.name}] stage timings: {graph.timings()}")
+        return {name: value for name, value in results.items() if graph.nodes[name].outcome != "skipped"}
+
+    def run_sync(self, ctx: Any, budget: Optional[Callable[[], float]] = None, targets: Sequence[str] = ()) -> Dict[str, Any]:
+        """
+        run() for synchronous callers. In a worker thread it gets an event
+        loop of its own; called from code running on an event loop (a sync
+        analyzer method used directly in a coroutine) it runs on a helper
+        thread instead, since asyncio.run() can't nest. Either way the caller
+        blocks until the results are in, and the job's context (cancellation
+        token, scheduler slot) carries over.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run(ctx, budget, targets))
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"pipeline-{self.name}") as pool:
+            return pool.submit(context.run, asyncio.run, self.run(ctx, budget, targets)).result()
+
+    def _node(self, graph: TaskGraph, stage: Stage, ctx: Any, budget: Optional[Callable[[], float]]):
+        async def node(**inputs):
+            record = graph.nodes[stage.name]
+
+            def outcome(name: str, started: Optional[float] = None):
+                record.outcome = name
+                STAGE_RUNS.inc(pipeline=self.name, stage=stage.name, outcome=name)
+                if started is not None:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, pipeline=self.name, stage=stage.name, outcome=name)
+
+            def fall_back(error: Optional[BaseException]):
+                return stage.fallback(ctx, error, **inputs) if stage.fallback else None
+
+            if stage.skip is not None and stage.skip(ctx, **inputs):
+                outcome("skipped")
+                return fall_back(None)
+            if stage.optional and budget is not None and budget() < stage.cost:
+                logger.info(f"[{self.name}] Skipping {stage.name}: {budget():.1f}s left, needs ~{stage.cost:.0f}s")
+                outcome("skipped")
+                return fall_back(None)
+
+            key = stage.cache_key(ctx, **inputs) if stage.cache_key is not None else None
+            if key is not None:
+                key = (stage.name, key)
+                hit, value = stage_cache.get(key)
+                if hit:
+                    outcome("cached")
+                    return value
+
+            started = time.perf_counter()
+            try:
+                if stage.blocking:
+                    value = await asyncio.to_thread(stage.fn, ctx, **inputs)
+                else:
+                    value = stage.fn(ctx, **inputs)
+                    if inspect.isawaitable(value):
+                        value = await value
+            except Exception as e:
+                if not stage.optional or isinstance(e, JobCancelled):
+                    outcome("error", started)
+                    raise
+                logger.warning(f"[{self.name}] Optional stage {stage.name} failed: {e}")
+                outcome("fallback", started)
+                FALLBACKS.inc(kind=f"{self.name}.{stage.name}")
+                return fall_back(e)
+
+            outcome("ran", started)
+            if key is not None:
+                stage_cache.set(key, value)
+            return value
+
+        return node
+
+
+# Global memo of cacheable stage results (STAGE_CACHE_ENTRIES=0 disables it)
+stage_cache = StageCache(max_entries=int(os.getenv("STAGE_CACHE_ENTRIES", "256")))
+metrics.counter(
+    "stage_cache_requests_total", "Stage memo lookups", ("result",),
+    collect=lambda: {("hit",): stage_cache.hits, ("miss",): stage_cache.misses},
+)
@@ -0,0 +1,132 @@
+"""
+Warm-up
+Background warm-up of the analysis stack and the readiness state behind GET /api/ready
+
+Startup only mounts the routes: librosa's submodules, scipy, numba, the LLM
+clients and the resident models load on first use. Right after startup
+warm_up() does that first use in the background: it imports the modules a
+job needs, runs the Layer 1 feature extraction once on a short synthetic
+track (numba compiles its kernels here, several seconds on the first call)
+and loads the MODEL_WARMUP models. /api/health (liveness) answers at once;
+/api/ready answers 503 until the warm-up has finished, so a rolling deploy
+or autoscaler sends traffic only to warm workers.
+
+A failed step does not keep the worker out of rotation: it is logged and
+reported (degraded), and the first job loads what is missing as before.
+Set WARMUP_ANALYSIS=false to skip the feature pass (ready right after the
+imports and models).
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ANALYSIS = os.getenv("WARMUP_ANALYSIS", "true").lower() == "true"
+WARMUP_SECONDS = 12.0  # synthetic track length: one analysis window plus the streamed pass
+
+# Modules a job imports on its way through the pipeline
+WARMUP_IMPORTS = (
+    "app.services.fresh_track_analyzer",
+    "app.services.audio_analyzer",
+    "app.services.llm_ensemble",
+    "app.services.transcription_engine",
+    "groq",
+)
+
+Step = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+class Readiness:
+    def __init__(self):
+        self.state = "pending"  # pending -> warming -> ready
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def run(self, steps: Sequence[Step]):
+        """Run the warm-up steps in order; the worker is ready afterwards whatever they returned."""
+        self.state = "warming"
+        self._started = time.monotonic()
+        for name, step in steps:
+            t0 = time.perf_counter()
+            try:
+                await step()
+                self.steps[name] = {"status": "ok"}
+            except Exception as e:
+                logger.warning(f"[Warmup] {name} failed: {e}")
+                self.steps[name] = {"status": "error", "error": str(e)[:200]}
+            self.steps[name]["seconds"] = round(time.perf_counter() - t0, 3)
+        self._finished = time.monotonic()
+        self.state = "ready"
+        logger.info(f"[Warmup] Ready after {self._finished - self._started:.1f}s: {self.steps}")
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self._started is not None:
+            elapsed = round((self._finished or time.monotonic()) - self._started, 3)
+        return {
+            "status": self.state,
+            "degraded": any(s["status"] != "ok" for s in self.steps.values()),
+            "seconds": elapsed,
+            "steps": dict(self.steps),
+        }
+
+
+def _import_modules():
+    for module in WARMUP_IMPORTS:
+        importlib.import_module(module)
+
+
+async def _analysis_pass():
+    import numpy as np
+    import soundfile as sf
+
+    from app.services.deep_audio_analyzer import DeepAudioAnalyzer
+
+    # A-minor chord with a kick every 0.5 s: enough for beat, chroma and pitch code paths
+    sr = 22050
+    t = np.arange(int(WARMUP_SECONDS * sr)) / sr
+    y = sum(0.2 * np.sin(2 * np.pi * f * t) for f in (220.0, 261.63, 329.63))
+    y += 0.5 * np.sin(2 * np.pi * 60.0 * t) * np.exp(-(t % 0.5) * 30.0)
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        await asyncio.to_thread(sf.write, path, (0.5 * y).astype(np.float32), sr)
+        await DeepAudioAnalyzer().extract_all_features(path)
+    finally:
+        os.remove(path)
+
+
+def _load_models():
+    from app.utils.model_registry import WARMUP_MODELS, model_registry
+
+    report = model_registry.warm_up(WARMUP_MODELS)
+    failed = {name: result for name, result in report.items() if result != "ok"}
+    if failed:
+        raise RuntimeError(f"models not loaded: {failed}")
+
+
+def default_steps() -> List[Step]:
+    steps: List[Step] = [("imports", lambda: asyncio.to_thread(_import_modules))]
+    if WARMUP_ANALYSIS:
+        steps.append(("analysis", _analysis_pass))
+    steps.append(("models", lambda: asyncio.to_thread(_load_models)))
+    return steps
+
+
+async def warm_up():
+    await readiness.run(default_steps())
+
+
+# Global instance
+readiness = Readiness()
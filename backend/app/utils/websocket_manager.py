@@ -84,5 +84,33 @@ class ConnectionManager:
         for conn in disconnected:
             self.disconnect(conn, job_id)
 
+    async def send_partial_result(self, job_id: str, layer: str, fields: dict, progress: int = 0):
+        """
+        Publishes the metadata fields a pipeline layer has settled (e.g. bpm/key
+        after DSP) before the job completes. Payload type = 'partial_result';
+        `fields` holds only the keys known so far and later layers may refine them.
+        """
+        if job_id not in self.active_connections:
+            return
+
+        payload = {
+            "job_id": job_id,
+            "type": "partial_result",
+            "layer": layer,
+            "progress": progress,
+            "fields": fields,
+        }
+
+        disconnected = []
+        for connection in self.active_connections[job_id]:
+            try:
+                await connection.send_json(payload)
+            except Exception as e:
+                logger.warning(f"Partial result send failed for job {job_id}: {e}")
+                disconnected.append(connection)
+
+        for conn in disconnected:
+            self.disconnect(conn, job_id)
+
 # Global manager
 manager = ConnectionManager()
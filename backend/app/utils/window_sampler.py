@@ -0,0 +1,139 @@
+"""
+Multi-Window Sampler
+K short windows spread across a track instead of one long middle slice
+
+Tempo/key changes, intros and outros fall inside some window, while the
+total decoded (and analyzed) audio stays at K x window seconds. Windows are
+decoded with bounded AudioStream reads, analyzed in parallel, and
+aggregated into the single-window result shape, plus the per-window spread.
+"""
+
+import logging
+import math
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from numbers import Number
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.cancellation import current_token, raise_if_cancelled
+from app.utils.scheduler import current_lease
+
+logger = logging.getLogger(__name__)
+
+Window = Tuple[float, float]  # (offset seconds, length seconds)
+
+
+def plan_windows(duration: float, count: int, window_seconds: float) -> List[Window]:
+    """
+    `count` windows of `window_seconds`, centred at (i + 0.5) / count of the
+    track. Tracks no longer than count * window_seconds are tiled end to end
+    instead, so short material is covered completely.
+    """
+    if duration <= 0:
+        return [(0.0, window_seconds)]
+    if duration <= count * window_seconds:
+        n = max(1, math.ceil(duration / window_seconds))
+        length = duration / n
+        return [(round(i * length, 3), round(length, 3)) for i in range(n)]
+    windows = []
+    for i in range(count):
+        centre = duration * (i + 0.5) / count
+        offset = min(max(0.0, centre - window_seconds / 2), duration - window_seconds)
+        windows.append((round(offset, 3), window_seconds))
+    return windows
+
+
+def load_windows(file_path: str, windows: Sequence[Window], sr: Optional[int] = None) -> Tuple[List[np.ndarray], int]:
+    """Mono float32 audio for each window (bounded reads, never the whole file)."""
+    from app.utils.audio_stream import AudioStream
+
+    segments, rate = [], sr
+    for offset, length in windows:
+        raise_if_cancelled()
+        stream = AudioStream(file_path, sr=sr, mono=True, offset=offset, duration=length)
+        rate = stream.sr
+        segments.append(stream.read())
+    return segments, rate
+
+
+def map_windows(fn: Callable[[np.ndarray], Any], segments: Sequence[np.ndarray], max_workers: Optional[int] = None) -> List[Any]:
+    """
+    fn over every segment in a thread pool (numpy/librosa release the GIL);
+    order is kept. Each window start is a stage boundary: windows not yet
+    started are skipped once the calling job is cancelled, and a lower-lane
+    job hands its slot to waiting interactive work. Pool threads don't
+    inherit the caller's context, so token and lease are captured here.
+    """
+    token = current_token()
+    lease = current_lease()
+
+    def run(segment):
+        if token is not None:
+            token.raise_if_cancelled()
+        if lease is not None:
+            lease.checkpoint_sync()
+        return fn(segment)
+
+    if len(segments) <= 1:
+        return [run(s) for s in segments]
+    workers = max_workers or min(len(segments), os.cpu_count() or 2)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, segments))
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+def aggregate_windows(results: Sequence[Dict[str, Any]], weights: Optional[Sequence[float]] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Merges per-window feature dicts into one of the same shape.
+
+    Numbers and equal-length numeric lists are weighted means, strings and
+    booleans a weighted vote, anything else is taken from the heaviest
+    window. Returns (aggregate, spread) where spread mirrors the nesting
+    and holds the weighted standard deviation of every scalar feature.
+    """
+    w = np.asarray(weights if weights is not None else [1.0] * len(results), dtype=np.float64)
+    w = w / w.sum() if w.sum() > 0 else np.full(len(results), 1.0 / max(len(results), 1))
+    heaviest = int(np.argmax(w))
+
+    merged: Dict[str, Any] = {}
+    spread: Dict[str, Any] = {}
+    for key, first in results[heaviest].items():
+        values = [r.get(key) for r in results]
+        if any(v is None for v in values):
+            merged[key] = first
+        elif all(isinstance(v, dict) for v in values):
+            merged[key], sub = aggregate_windows(values, w)
+            if sub:
+                spread[key] = sub
+        elif all(_is_number(v) for v in values):
+            arr = np.asarray(values, dtype=np.float64)
+            mean = float(np.dot(w, arr))
+            merged[key] = int(round(mean)) if all(isinstance(v, int) for v in values) else mean
+            spread[key] = float(np.sqrt(np.dot(w, (arr - mean) ** 2)))
+        elif all(isinstance(v, (list, tuple)) and v and all(_is_number(x) for x in v) for v in values) \
+                and len({len(v) for v in values}) == 1:
+            merged[key] = (w @ np.asarray(values, dtype=np.float64)).tolist()
+        elif all(isinstance(v, (str, bool)) for v in values):
+            merged[key] = weighted_vote(values, w)
+        else:
+            merged[key] = first
+    return merged, spread
+
+
+def central_value(values: Sequence[float]) -> float:
+    """The observed value closest to the median (an octave error in one window can't pull it)."""
+    median = float(np.median(values))
+    return float(min(values, key=lambda v: abs(v - median)))
+
+
+def weighted_vote(labels: Sequence[Any], weights: Sequence[float]) -> Any:
+    votes: Counter = Counter()
+    for label, weight in zip(labels, weights):
+        votes[label] += weight
+    return votes.most_common(1)[0][0]
@@ -0,0 +1,63 @@
+"""
+Builds catalog_tracks / catalog_track_moods rows for analysis_history
+entries written before the catalog existed (or whose indexing failed).
+
+Usage:
+    python scripts/backfill_catalog.py [--batch-size 500] [--reindex]
+
+Walks analysis_history in id order, one batch per transaction, so it can be
+run against a live database and resumed. --reindex rebuilds rows that are
+already in the catalog too. Prints a JSON summary.
+"""
+import argparse
+import json
+import os
+import sys
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(here_dir, ".."))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--reindex", action="store_true")
+    args = parser.parse_args()
+
+    from app.db import SessionLocal, AnalysisHistory, CatalogTrack
+    from app.services.catalog import index_history_entry
+
+    scanned = indexed = failed = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            query = db.query(AnalysisHistory).filter(AnalysisHistory.id > last_id)
+            if not args.reindex:
+                query = query.outerjoin(
+                    CatalogTrack, CatalogTrack.history_id == AnalysisHistory.id
+                ).filter(CatalogTrack.id.is_(None))
+            rows = query.order_by(AnalysisHistory.id).limit(args.batch_size).all()
+            if not rows:
+                break
+            for h in rows:
+                scanned += 1
+                try:
+                    with db.begin_nested():
+                        index_history_entry(db, h)
+                    indexed += 1
+                except Exception:
+                    failed += 1
+            last_id = rows[-1].id
+            db.commit()
+            db.expunge_all()
+    finally:
+        db.close()
+
+    print(json.dumps({"scanned": scanned, "indexed": indexed, "failed": failed}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Fills the analysis_history summary columns (main_genre, bpm, musical_key,
+mode) for rows written before they existed, so the paginated history list
+shows genre/BPM/key for old analyses too.
+
+Usage:
+    python scripts/backfill_history_summary.py [--batch-size 500]
+
+Walks the table in id order, batch by batch, and prints a JSON summary.
+"""
+import argparse
+import json
+import os
+import sys
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(here_dir, ".."))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    from app.db import SessionLocal, AnalysisHistory
+    from app.services.catalog import summary_fields
+
+    scanned = updated = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = (
+                db.query(AnalysisHistory)
+                .filter(AnalysisHistory.id > last_id)
+                .order_by(AnalysisHistory.id)
+                .limit(args.batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for h in rows:
+                scanned += 1
+                if any(getattr(h, col) is not None for col in ("main_genre", "bpm", "musical_key", "mode")):
+                    continue
+                fields = summary_fields(h.result or h.metadata_json)
+                if any(v is not None for v in fields.values()):
+                    for col, value in fields.items():
+                        setattr(h, col, value)
+                    updated += 1
+            last_id = rows[-1].id
+            db.commit()
+            db.expunge_all()
+    finally:
+        db.close()
+
+    print(json.dumps({"scanned": scanned, "updated": updated}))
+
+
+if __name__ == "__main__":
+    main()
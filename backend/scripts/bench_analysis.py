@@ -0,0 +1,419 @@
+"""
+Benchmark: analysis pipeline on a deterministic synthetic corpus.
+
+Generates click tracks at known BPMs, chord progressions in known keys and
+noise beds at several durations, sample rates and codecs (WAV, FLAC, Ogg
+Vorbis, MP3 via libsndfile), then times each analysis entry point on every
+file:
+
+    hash            generate_file_hash
+    tags            AdvancedAudioAnalyzer.read_metadata
+    deep_features   DeepAudioAnalyzer.extract_all_features
+    full_analysis   AdvancedAudioAnalyzer.full_analysis
+    sonic           SonicAnalyzer.run_deep_analysis
+    tagging         FreshTrackAnalyzer.analyze_fresh_track (LLM tagging with
+                    stub providers; no network, no API keys)
+
+The stub providers answer with the DSP heuristic classification after
+--llm-latency-ms, so the prompt building, voting and merge code runs as in
+production. Stage caches are cleared before every call.
+
+Usage:
+    python scripts/bench_analysis.py [--targets hash,deep_features,...] [--repeat 3]
+                                     [--durations 30,180] [--corpus DIR]
+                                     [--output report.json] [--baseline previous.json] [--strict]
+
+Prints (and optionally writes) a JSON report: per target throughput (files/s,
+audio seconds per second), latency p50/p90/p99, peak RSS, tempo/key accuracy
+where the target reports them, and with --baseline the ratio to a previous
+report, for comparison across commits. A target whose estimates can't be
+read, or whose tempo/key accuracy is exactly 0, is listed under "warnings"
+(and on stderr); --strict turns those into exit status 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(here_dir, ".."))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+FORMATS = {"wav": "PCM_16", "flac": "PCM_16", "ogg": "VORBIS", "mp3": "MPEG_LAYER_III"}
+SAMPLE_RATES = (44100, 48000, 22050)
+TARGETS = ("hash", "tags", "deep_features", "full_analysis", "sonic", "tagging")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+# ── Corpus ────────────────────────────────────────────────────────────────────
+
+
+def corpus_specs(durations):
+    """The corpus as a list of specs; the same arguments always give the same files."""
+    specs = []
+    clicks = (80, 100, 128, 140, 174)
+    keys = (("C", "major"), ("A", "minor"), ("F#", "major"), ("D#", "minor"), ("G", "major"))
+    formats = list(FORMATS)
+    i = 0
+    for duration in durations:
+        for bpm in clicks:
+            specs.append({"kind": "click", "bpm": bpm})
+        for tonic, mode in keys:
+            specs.append({"kind": "chords", "key": f"{tonic} {mode}", "bpm": 96})
+        specs.append({"kind": "noise"})
+        for spec in specs[i:]:
+            spec.update({
+                "duration": float(duration),
+                "sr": SAMPLE_RATES[i % len(SAMPLE_RATES)],
+                "format": formats[i % len(formats)],
+                "seed": i,
+            })
+            spec["name"] = f"{i:03d}_{spec['kind']}_{int(duration)}s_{spec['sr']}.{spec['format']}"
+            i += 1
+    return specs
+
+
+def synthesize(spec):
+    import numpy as np
+
+    rng = np.random.default_rng(spec["seed"])
+    sr, n = spec["sr"], int(spec["duration"] * spec["sr"])
+    t = np.arange(n) / sr
+    if spec["kind"] == "click":
+        y = 0.01 * rng.standard_normal(n)
+        period = 60.0 / spec["bpm"]
+        click = np.exp(-np.arange(int(0.03 * sr)) / (0.004 * sr)) * np.sin(2 * np.pi * 1500 * np.arange(int(0.03 * sr)) / sr)
+        for beat, start in enumerate(np.arange(0.0, spec["duration"], period)):
+            s = int(start * sr)
+            seg = click[: n - s] * (1.0 if beat % 4 == 0 else 0.6)
+            y[s:s + len(seg)] += seg
+    elif spec["kind"] == "chords":
+        tonic, mode = spec["key"].split()
+        root = NOTE_NAMES.index(tonic)
+        third = 3 if mode == "minor" else 4
+        # i/I - iv/IV - v/V - i/I, one chord per bar
+        degrees = [(0, third, 7), (5, 5 + third, 12), (7, 7 + 4, 14), (0, third, 7)]
+        bar = 4 * 60.0 / spec["bpm"]
+        y = np.zeros(n)
+        for b, start in enumerate(np.arange(0.0, spec["duration"], bar)):
+            s, e = int(start * sr), min(n, int((start + bar) * sr))
+            tt = t[s:e] - start
+            envelope = np.minimum(1.0, tt / 0.02) * np.exp(-tt / (bar * 0.8))
+            for semitone in degrees[b % len(degrees)]:
+                freq = 261.63 * 2 ** ((root + semitone - 12) / 12.0)
+                for h, amp in ((1, 1.0), (2, 0.4), (3, 0.2)):
+                    y[s:e] += 0.08 * amp * envelope * np.sin(2 * np.pi * freq * h * tt)
+        y += 0.003 * rng.standard_normal(n)
+    else:
+        # Pink-ish noise bed (1/f shaped white noise)
+        spectrum = np.fft.rfft(rng.standard_normal(n))
+        spectrum /= np.sqrt(np.maximum(np.fft.rfftfreq(n, 1.0 / sr), 20.0))
+        y = np.fft.irfft(spectrum, n)
+        y *= 0.2 / (np.max(np.abs(y)) + 1e-9)
+    y = 0.9 * y / (np.max(np.abs(y)) + 1e-9)
+    return np.stack([y, y], axis=1).astype(np.float32)
+
+
+def build_corpus(directory, durations):
+    import soundfile as sf
+
+    os.makedirs(directory, exist_ok=True)
+    specs = corpus_specs(durations)
+    for spec in specs:
+        spec["path"] = os.path.join(directory, spec["name"])
+        if not os.path.exists(spec["path"]):
+            sf.write(spec["path"], synthesize(spec), spec["sr"], subtype=FORMATS[spec["format"]])
+    return specs
+
+
+# ── Stub LLM providers ────────────────────────────────────────────────────────
+
+
+def install_stub_llms(latency_ms):
+    """Replace the LLMEnsemble provider calls (classification, streaming, lyrics) for this process."""
+    from app.services.fresh_track_analyzer import FreshTrackAnalyzer
+    from app.services.llm_ensemble import LLMEnsemble
+
+    async def classify(self, context, system_prompt=None, **_kwargs):
+        await asyncio.sleep(latency_ms / 1000.0)
+        # The heuristic answer has the provider response shape; the prompt
+        # carries no features the stub can parse back, so use neutral ones
+        return dict(self._fallback_classification({}), confidence=0.8)
+
+    async def describe(self, *_args, **_kwargs):
+        await asyncio.sleep(latency_ms / 1000.0)
+        return ""
+
+    async def lyrics(self, _lyrics):
+        return {}
+
+    for name in ("_groq_classify", "_gemini_classify", "_openrouter_classify"):
+        setattr(LLMEnsemble, name, classify)
+    LLMEnsemble.stream_description = describe
+    FreshTrackAnalyzer._analyze_lyrics_with_llm = lyrics
+
+
+# ── Targets ───────────────────────────────────────────────────────────────────
+
+
+def make_target(name):
+    """name -> (run(path) -> result, estimates(result) -> (bpm, "key mode") or None)."""
+    if name == "hash":
+        from app.utils.hash_generator import generate_file_hash
+
+        return generate_file_hash, None
+    if name == "tags":
+        from app.services.audio_analyzer import AdvancedAudioAnalyzer
+
+        return AdvancedAudioAnalyzer.read_metadata, None
+    if name == "deep_features":
+        from app.services.deep_audio_analyzer import DeepAudioAnalyzer
+
+        analyzer = DeepAudioAnalyzer()
+        return (
+            lambda path: asyncio.run(analyzer.extract_all_features(path)),
+            lambda r: (r["rhythm"]["tempo"], f"{r['harmonic']['key']} {r['harmonic']['mode']}"),
+        )
+    if name == "full_analysis":
+        from app.services.audio_analyzer import AdvancedAudioAnalyzer
+
+        return (
+            AdvancedAudioAnalyzer.full_analysis,
+            lambda r: (r["core"].get("bpm"), f"{r['core'].get('key')} {r['core'].get('mode')}"),
+        )
+    if name == "sonic":
+        from app.services.sonic_intelligence import SonicAnalyzer
+
+        return lambda path: SonicAnalyzer(path).run_deep_analysis(), lambda r: (r["bpm"], r["key"])
+    if name == "tagging":
+        from app.services.fresh_track_analyzer import FreshTrackAnalyzer
+
+        return (
+            lambda path: asyncio.run(FreshTrackAnalyzer().analyze_fresh_track(path, model_preference="flash")),
+            None,
+        )
+    raise ValueError(f"Unknown target: {name}")
+
+
+def tempo_ok(estimate, truth, tolerance=0.04):
+    """Within tolerance of the true BPM, or of half/double it (octave errors)."""
+    try:
+        estimate = float(estimate)
+    except (TypeError, ValueError):
+        return False
+    return any(abs(estimate - truth * f) <= tolerance * truth * f for f in (0.5, 1.0, 2.0))
+
+
+class RssSampler:
+    """Peak resident set size while a target runs (/proc on Linux, ru_maxrss elsewhere)."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+
+def bench_target(name, specs, repeat, warmup):
+    from app.utils.task_graph import stage_cache
+
+    run, estimates = make_target(name)
+    for spec in specs[:warmup]:
+        stage_cache.clear()
+        run(spec["path"])
+
+    latencies, errors, audio_seconds = [], 0, 0.0
+    checked = tempo_hits = key_hits = key_checked = estimate_errors = 0
+    started = time.perf_counter()
+    with RssSampler() as rss:
+        for _ in range(repeat):
+            for spec in specs:
+                stage_cache.clear()
+                t0 = time.perf_counter()
+                try:
+                    result = run(spec["path"])
+                except Exception as e:
+                    errors += 1
+                    print(f"[{name}] {spec['name']}: {type(e).__name__}: {e}", file=sys.stderr)
+                    continue
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+                audio_seconds += spec["duration"]
+                if estimates is None or spec["kind"] == "noise":
+                    continue
+                try:
+                    bpm, key = estimates(result)
+                except (KeyError, TypeError) as e:
+                    bpm, key = None, f"{type(e).__name__}: {e}"
+                if bpm is None or "None" in str(key).split():
+                    # A wrong field name would otherwise score as a 0.0 accuracy
+                    estimate_errors += 1
+                    print(f"[{name}] {spec['name']}: no tempo/key estimate ({bpm!r}, {key!r})", file=sys.stderr)
+                    continue
+                checked += 1
+                tempo_hits += tempo_ok(bpm, spec["bpm"]) if spec["kind"] == "click" else 0
+                if spec["kind"] == "chords":
+                    key_checked += 1
+                    key_hits += str(key).lower() == spec["key"].lower()
+    wall = time.perf_counter() - started
+    clicks = sum(1 for s in specs if s["kind"] == "click") * repeat
+
+    report = {
+        "runs": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "files_per_second": round(len(latencies) / wall, 3) if wall else 0.0,
+        "audio_seconds_per_second": round(audio_seconds / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p90_ms": round(percentile(latencies, 90), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2) if latencies else 0.0,
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+    }
+    if checked:
+        report["tempo_accuracy"] = round(tempo_hits / clicks, 3) if clicks else None
+        report["key_accuracy"] = round(key_hits / key_checked, 3) if key_checked else None
+    if estimates is not None:
+        report["estimate_errors"] = estimate_errors
+    return report
+
+
+def accuracy_warnings(report):
+    """Targets whose estimates could not be read or scored exactly 0 on the corpus."""
+    warnings = []
+    for name, target in report["targets"].items():
+        if target.get("estimate_errors"):
+            warnings.append(f"{name}: {target['estimate_errors']} results without a tempo/key estimate")
+        for field in ("tempo_accuracy", "key_accuracy"):
+            if target.get(field) == 0.0:
+                warnings.append(f"{name}: {field} is 0.0 (analyzer or estimates accessor broken)")
+    return warnings
+
+
+def compare(report, baseline):
+    """Ratios against a previous report (>1 means more of it now)."""
+    deltas = {}
+    for name, current in report["targets"].items():
+        previous = baseline.get("targets", {}).get(name)
+        if not previous:
+            continue
+        deltas[name] = {
+            field: round(current[field] / previous[field], 3)
+            for field in ("p50_ms", "p99_ms", "files_per_second", "peak_rss_mb")
+            if previous.get(field)
+        }
+    return {"commit": baseline.get("commit"), "ratios": deltas}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=backend_dir, capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", default=",".join(TARGETS))
+    parser.add_argument("--durations", default="30,180", help="seconds; each duration gets the full set of signals")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="files run before timing (imports, numba JIT)")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "mme_bench_corpus"))
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--strict", action="store_true", help="exit 1 when the report has accuracy warnings")
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))} (choose from {', '.join(TARGETS)})")
+
+    import librosa
+    import numpy as np
+
+    specs = build_corpus(args.corpus, [float(d) for d in args.durations.split(",")])
+    install_stub_llms(args.llm_latency_ms)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "cpus": os.cpu_count(),
+        "corpus": {
+            "files": len(specs),
+            "audio_seconds": sum(s["duration"] for s in specs),
+            "formats": sorted({s["format"] for s in specs}),
+            "sample_rates": sorted({s["sr"] for s in specs}),
+        },
+        "repeat": args.repeat,
+        "llm_latency_ms": args.llm_latency_ms,
+        "targets": {},
+    }
+    for name in targets:
+        print(f"[bench] {name} ...", file=sys.stderr)
+        report["targets"][name] = bench_target(name, specs, args.repeat, args.warmup)
+    report["peak_rss_mb"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1
+    )
+    report["warnings"] = accuracy_warnings(report)
+    for warning in report["warnings"]:
+        print(f"[bench] WARNING {warning}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["baseline"] = compare(report, json.load(f))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.strict and report["warnings"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
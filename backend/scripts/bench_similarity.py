@@ -0,0 +1,83 @@
+"""
+Benchmark: IVF similarity index at catalog scale.
+
+Generates N clustered unit vectors (EMBEDDING_DIM), trains the index,
+then measures single-query latency and recall@k against brute force.
+
+Usage:
+    python scripts/bench_similarity.py [--n 1000000] [--queries 200] [--k 10] [--nprobe 64]
+
+Prints a JSON report (build seconds, p50/p95/p99 query ms, recall@k).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(here_dir, ".."))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=64)
+    parser.add_argument("--clusters", type=int, default=500, help="synthetic 'genre' clusters")
+    args = parser.parse_args()
+
+    import numpy as np
+    from app.services.similarity import EMBEDDING_DIM, IVFIndex
+
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(args.clusters, EMBEDDING_DIM)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    vecs = np.empty((args.n, EMBEDDING_DIM), dtype=np.float32)
+    for i in range(0, args.n, 100_000):
+        m = min(100_000, args.n - i)
+        block = centres[rng.integers(0, args.clusters, m)] + 0.2 * rng.normal(size=(m, EMBEDDING_DIM)).astype(np.float32)
+        vecs[i:i + m] = block / np.linalg.norm(block, axis=1, keepdims=True)
+
+    index = IVFIndex(nprobe=args.nprobe)
+    t0 = time.perf_counter()
+    index.add([str(i) for i in range(args.n)], [None] * args.n, vecs)
+    add_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    if index.needs_training():
+        index.train()
+    train_s = time.perf_counter() - t0
+
+    latencies, recalls = [], []
+    for q in rng.choice(args.n, args.queries, replace=False):
+        t0 = time.perf_counter()
+        hits = index.search(vecs[q], k=args.k)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        truth = set(np.argpartition(-(vecs @ vecs[q]), args.k)[:args.k].astype(str))
+        recalls.append(len(truth & {h[0] for h in hits}) / args.k)
+
+    print(json.dumps({
+        "n": args.n,
+        "dim": EMBEDDING_DIM,
+        "lists": index.nlist,
+        "nprobe": args.nprobe,
+        "add_seconds": round(add_s, 2),
+        "train_seconds": round(train_s, 2),
+        "query_p50_ms": round(percentile(latencies, 50), 3),
+        "query_p95_ms": round(percentile(latencies, 95), 3),
+        "query_p99_ms": round(percentile(latencies, 99), 3),
+        f"recall_at_{args.k}": round(float(np.mean(recalls)), 4),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
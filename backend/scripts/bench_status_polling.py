@@ -0,0 +1,181 @@
+"""
+Benchmark: GET /analysis/job/{id} latency under concurrent analysis load.
+
+Compares the old handler shape (async def + synchronous SessionLocal query,
+which blocks the event loop for every DB round trip) against the async
+session path now used by get_job_status. Writer threads simulate running
+analyses committing progress messages and large results into the same DB.
+
+Usage:
+    python scripts/bench_status_polling.py [--rate 200] [--writers 8] [--seconds 10]
+                                           [--database-url postgresql://...]
+
+Defaults to a throwaway SQLite file. Point --database-url at a scratch
+Postgres to measure the asyncpg path production actually runs — the jobs
+table there gets benchmark rows inserted.
+
+Prints a JSON report with p50/p95/p99 latency (ms) for each mode.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(here_dir, ".."))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def summarize(latencies_ms):
+    return {
+        "requests": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+
+def writer_loop(job_ids, stop: threading.Event):
+    """Simulates process_analysis: progress commits plus a large result write."""
+    from app.db import SessionLocal, Job
+
+    payload = {"trackDescription": "x" * 4000, "keywords": ["k"] * 50}
+    i = 0
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            job = db.query(Job).filter(Job.id == job_ids[i % len(job_ids)]).first()
+            job.message = f"progress {i}"
+            job.result = payload
+            db.commit()
+        finally:
+            db.close()
+        i += 1
+        time.sleep(0.005)
+
+
+async def sync_status(job_id: str):
+    """The pre-async handler body: blocking query inside an async def."""
+    from app.db import SessionLocal, Job
+
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        return {"id": job.id, "status": job.status, "message": job.message}
+    finally:
+        db.close()
+
+
+async def async_status(job_id: str):
+    from app.db import AsyncSessionLocal
+    from app.routes.analysis import get_job_status
+
+    async with AsyncSessionLocal() as db:
+        return await get_job_status(job_id, db=db)
+
+
+async def run_mode(handler, job_ids, rate: float, seconds: float):
+    """Open-loop load: requests arrive on a fixed schedule, and latency is
+    measured from the scheduled arrival, so time spent waiting for a blocked
+    event loop is counted (a closed-loop poller would hide it)."""
+    latencies = []
+    tasks = []
+    interval = 1.0 / rate
+
+    async def one(n: int, arrival: float):
+        await handler(job_ids[n % len(job_ids)])
+        latencies.append((time.perf_counter() - arrival) * 1000.0)
+
+    # Open pool connections before the clock starts.
+    await asyncio.gather(*(handler(jid) for jid in job_ids[:10]))
+
+    start = time.perf_counter()
+    n = 0
+    while n * interval < seconds:
+        arrival = start + n * interval
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(n, arrival)))
+        n += 1
+
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=200.0, help="status requests per second")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmp_db = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        tmp_db.close()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp_db.name}"
+
+    from app.db import SessionLocal, AsyncSessionLocal, Job
+    import app.routes.analysis  # noqa: F401 — keep the import cost out of the timed window
+
+    if AsyncSessionLocal is None:
+        print(json.dumps({"error": "Async database driver not installed (pip install aiosqlite asyncpg)"}))
+        sys.exit(1)
+
+    job_ids = [str(uuid.uuid4()) for _ in range(max(args.writers, 1) * 4)]
+    db = SessionLocal()
+    try:
+        for jid in job_ids:
+            db.add(Job(id=jid, file_name="bench.wav", status="processing", message="queued"))
+        db.commit()
+    finally:
+        db.close()
+
+    report = {
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "rate_rps": args.rate,
+        "writers": args.writers,
+        "seconds": args.seconds,
+    }
+    for name, handler in (("sync_session", sync_status), ("async_session", async_status)):
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=writer_loop, args=(job_ids, stop), daemon=True)
+            for _ in range(args.writers)
+        ]
+        for t in threads:
+            t.start()
+        try:
+            latencies = asyncio.run(run_mode(handler, job_ids, args.rate, args.seconds))
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+        report[name] = summarize(latencies)
+
+    print(json.dumps(report, indent=2))
+    if tmp_db:
+        os.unlink(tmp_db.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Fake LLM provider server for offline load tests.
+
+Speaks the parts of the provider APIs the analysis pipeline calls, with
+configurable latency and failure rates:
+
+    POST /openai/v1/chat/completions       Groq (OpenAI-compatible, incl. stream=true)
+    POST /openai/v1/audio/transcriptions   Groq Whisper
+    POST /api/v1/chat/completions          OpenRouter
+    POST /v1beta/models/{model}:generateContent   Gemini (REST)
+
+Answers are valid classification JSON drawn from the app's tag vocabulary,
+so the ensemble votes, validates and merges them as it would real ones.
+Point the backend at it with:
+
+    GROQ_BASE_URL=http://127.0.0.1:8090
+    OPENROUTER_BASE_URL=http://127.0.0.1:8090/api/v1
+    GEMINI_BASE_URL=http://127.0.0.1:8090
+    GROQ_API_KEY=fake GEMINI_API_KEY=fake OPENROUTER_API_KEY=fake
+
+Usage:
+    python scripts/fake_llm_server.py [--port 8090] [--latency-ms 800] [--sigma 0.4]
+                                      [--error-rate 0.02] [--rate-limit-rate 0.05]
+                                      [--hang-rate 0] [--provider gemini:latency_ms=2000,error_rate=0.1]
+
+Latency is log-normal around --latency-ms (spread --sigma). A failed call is
+a 500, a rate-limited one a 429, a hung one sleeps for --hang-seconds (so
+client timeouts and the analysis budget are exercised). The settings can be
+changed while it runs (POST /_config with {"groq": {"error_rate": 0.5}} or
+{"*": {...}}) and GET /_stats returns call counts by provider and outcome.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(here_dir, ".."))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.standards import INSTRUMENTATION, MAIN_GENRES, MOODS, SUB_GENRES
+
+PROVIDERS = ("groq", "openrouter", "gemini", "whisper")
+FIELDS = {"latency_ms": float, "sigma": float, "error_rate": float, "rate_limit_rate": float,
+          "hang_rate": float, "hang_seconds": float}
+
+app = FastAPI(title="Fake LLM providers")
+config = {name: {} for name in PROVIDERS}
+stats = Counter()
+rng = random.Random(0)
+
+
+def parse_overrides(text):
+    """"gemini:latency_ms=2000,error_rate=0.1" -> ("gemini", {...})"""
+    name, _, pairs = text.partition(":")
+    if name not in PROVIDERS:
+        raise argparse.ArgumentTypeError(f"unknown provider {name!r} (choose from {', '.join(PROVIDERS)})")
+    values = {}
+    for pair in filter(None, pairs.split(",")):
+        key, _, value = pair.partition("=")
+        if key not in FIELDS:
+            raise argparse.ArgumentTypeError(f"unknown setting {key!r} (choose from {', '.join(FIELDS)})")
+        values[key] = FIELDS[key](value)
+    return name, values
+
+
+async def simulate(provider):
+    """Wait like the provider would; returns an error response or None to answer normally."""
+    cfg = config[provider]
+    roll = rng.random()
+    if roll < cfg["hang_rate"]:
+        stats[(provider, "hang")] += 1
+        await asyncio.sleep(cfg["hang_seconds"])
+        return JSONResponse({"error": {"message": "upstream timeout"}}, status_code=504)
+    median = cfg["latency_ms"] / 1000.0
+    await asyncio.sleep(median * math.exp(rng.gauss(0.0, cfg["sigma"])) if median > 0 else 0)
+    roll -= cfg["hang_rate"]
+    if roll < cfg["rate_limit_rate"]:
+        stats[(provider, "429")] += 1
+        return JSONResponse({"error": {"message": "Rate limit reached", "type": "rate_limit"}}, status_code=429,
+                            headers={"retry-after": "1"})
+    roll -= cfg["rate_limit_rate"]
+    if roll < cfg["error_rate"]:
+        stats[(provider, "500")] += 1
+        return JSONResponse({"error": {"message": "Internal server error"}}, status_code=500)
+    stats[(provider, "ok")] += 1
+    return None
+
+
+def classification():
+    genre = rng.choice(MAIN_GENRES)
+    moods = rng.sample(MOODS, 3)
+    return {
+        "mainGenre": genre,
+        "additionalGenres": rng.sample(SUB_GENRES, 2),
+        "moods": moods,
+        "mainInstrument": rng.choice(INSTRUMENTATION),
+        "instrumentation": rng.sample(INSTRUMENTATION, 3),
+        "vocalStyle": {"gender": "Instrumental", "timbre": "none", "delivery": "none", "emotionalTone": "none"},
+        "keywords": ["synthetic", "load test", genre.lower(), moods[0].lower(), "benchmark"],
+        "useCases": ["Advertising", "Film trailer", "Background playlist"],
+        "mood_vibe": f"{moods[0]} and {moods[1].lower()} with a steady pulse",
+        "energy_level": rng.choice(["Low", "Medium", "High"]),
+        "musicalEra": "Modern",
+        "productionQuality": "Professional",
+        "dynamics": "Moderate",
+        "targetAudience": "General",
+        "trackDescription": (
+            f"A {moods[0].lower()} {genre} piece generated by the fake provider server. " * 8
+        ).strip(),
+        "similar_artists": [],
+        "themes": ["placeholder"],
+        "language": "en",
+        "explicit": False,
+        "confidence": round(rng.uniform(0.7, 0.95), 2),
+    }
+
+
+def chat_response(model):
+    return {
+        "id": f"chatcmpl-{rng.getrandbits(48):x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": json.dumps(classification())}}],
+        "usage": {"prompt_tokens": 900, "completion_tokens": 400, "total_tokens": 1300},
+    }
+
+
+async def chat_stream(model):
+    words = classification()["trackDescription"].split(" ")
+    for i, word in enumerate(words):
+        chunk = {
+            "id": "chatcmpl-stream", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                         "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(0.005)
+    yield "data: [DONE]\n\n"
+
+
+async def chat(provider, request):
+    body = await request.json()
+    error = await simulate(provider)
+    if error is not None:
+        return error
+    model = body.get("model", "fake")
+    if body.get("stream"):
+        return StreamingResponse(chat_stream(model), media_type="text/event-stream")
+    return chat_response(model)
+
+
+@app.post("/openai/v1/chat/completions")
+async def groq_chat(request: Request):
+    return await chat("groq", request)
+
+
+@app.post("/api/v1/chat/completions")
+async def openrouter_chat(request: Request):
+    return await chat("openrouter", request)
+
+
+@app.post("/openai/v1/audio/transcriptions")
+async def groq_transcriptions(request: Request):
+    await request.body()
+    error = await simulate("whisper")
+    if error is not None:
+        return error
+    return {"text": "la la la synthetic lyrics for the load test " * 3, "language": "en"}
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def gemini_generate(model: str, request: Request):
+    await request.body()
+    error = await simulate("gemini")
+    if error is not None:
+        return error
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": json.dumps(classification())}]},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {"promptTokenCount": 900, "candidatesTokenCount": 400, "totalTokenCount": 1300},
+        "modelVersion": model,
+    }
+
+
+@app.post("/_config")
+async def update_config(request: Request):
+    for name, values in (await request.json()).items():
+        for provider in (PROVIDERS if name == "*" else (name,)):
+            config[provider].update({k: FIELDS[k](v) for k, v in values.items() if k in FIELDS})
+    return config
+
+
+@app.get("/_stats")
+async def get_stats():
+    result = {}
+    for (provider, outcome), n in sorted(stats.items()):
+        result.setdefault(provider, {})[outcome] = n
+    return {"config": config, "calls": result}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median provider latency")
+    parser.add_argument("--sigma", type=float, default=0.4, help="log-normal spread of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=60.0)
+    parser.add_argument("--provider", action="append", type=parse_overrides, default=[],
+                        help="per-provider overrides, e.g. gemini:latency_ms=2000,error_rate=0.1")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng.seed(args.seed)
+    for name in PROVIDERS:
+        config[name] = {"latency_ms": args.latency_ms, "sigma": args.sigma, "error_rate": args.error_rate,
+                        "rate_limit_rate": args.rate_limit_rate, "hang_rate": args.hang_rate,
+                        "hang_seconds": args.hang_seconds}
+    for name, values in args.provider:
+        config[name].update(values)
+
+    import uvicorn
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Fingerprints every audio file under a directory and reports near-duplicates,
+both against the catalog fingerprint index and within the run itself.
+
+Usage:
+    python scripts/fingerprint_catalog.py /path/to/library [--index] [--workers N] [--batch-size 256]
+
+Decoding and fingerprinting run in the FingerprintEngine process pool; no
+ffmpeg process is spawned per file. --index stores new fingerprints so later
+uploads are matched against them. Prints a JSON summary with throughput.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(here_dir, ".."))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+AUDIO_EXTENSIONS = {".wav", ".flac", ".mp3", ".ogg", ".aiff", ".aif", ".m4a"}
+
+
+def iter_audio_files(root: str):
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                yield os.path.join(dirpath, name)
+
+
+async def run(args) -> dict:
+    from app.db import SessionLocal
+    from app.services.fingerprint_engine import FingerprintEngine, find_duplicates
+    from app.services.fingerprint_index import find_near_duplicate, store_fingerprint
+    from app.utils.hash_generator import generate_file_hash
+
+    engine = FingerprintEngine(max_workers=args.workers)
+    paths = list(iter_audio_files(args.root))
+    prints, catalog_matches, failures = [], [], []
+    indexed = 0
+    started = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        for i in range(0, len(paths), args.batch_size):
+            batch = paths[i:i + args.batch_size]
+            results = await engine.fingerprint_files(batch)
+            hashes = await asyncio.gather(*(asyncio.to_thread(generate_file_hash, p) for p in batch))
+            for path, file_hash, fp in zip(batch, hashes, results):
+                if isinstance(fp, Exception):
+                    failures.append({"path": path, "error": str(fp)})
+                    prints.append(None)
+                    continue
+                prints.append(fp)
+                match = find_near_duplicate(db, fp, exclude_hash=file_hash)
+                if match:
+                    catalog_matches.append({"path": path, "sha256": file_hash, **match})
+                if args.index and store_fingerprint(db, file_hash, fp):
+                    indexed += 1
+            if args.index:
+                db.commit()
+    finally:
+        db.close()
+        engine.shutdown()
+
+    fingerprint_seconds = time.perf_counter() - started
+    duplicates = find_duplicates(prints)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "files": len(paths),
+        "failed": failures,
+        "indexed": indexed,
+        "catalog_matches": catalog_matches,
+        "duplicates": [{"a": paths[d["a"]], "b": paths[d["b"]], "ber": d["ber"]} for d in duplicates],
+        "seconds": round(elapsed, 2),
+        "files_per_second": round(len(paths) / fingerprint_seconds, 1) if fingerprint_seconds > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("root")
+    parser.add_argument("--index", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
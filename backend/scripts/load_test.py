@@ -0,0 +1,291 @@
+"""
+Load test: concurrent /analysis/generate jobs against a running node.
+
+Each level of --concurrency keeps that many jobs in flight until --jobs
+have finished. A job uploads a synthetic track (the bench_analysis corpus
+signals, re-seeded per job so the SHA-256 cache never hits), follows its
+progress over the job WebSocket (polling GET /analysis/job/{id} as a
+fallback) and records:
+
+    latency          submit -> completed/error, as the user sees it
+    first partial    submit -> first partial_result (DSP fields)
+    budget miss      latency above --budget (the node's ANALYSIS_MAX_SECONDS)
+    fallback         completed with 0 LLMs (DSP heuristic classification)
+
+For offline runs start scripts/fake_llm_server.py and point the node at it
+(see its docstring); with --fake-server the provider call counts of every
+level are included. Run the node with FINGERPRINT_DEDUPE=false, otherwise
+the synthetic tracks match each other by audio fingerprint.
+
+Usage:
+    python scripts/load_test.py --email admin@example.com --password ... \\
+        [--base-url http://127.0.0.1:8000] [--concurrency 1,2,4,8] [--jobs 16]
+        [--duration 60] [--budget 180] [--fake-server http://127.0.0.1:8090]
+        [--output report.json]
+
+Prints a JSON report per level (latency p50/p90/p99, throughput, budget-miss
+and fallback rates) and the highest level whose budget-miss rate stayed
+within --target-miss-rate.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import time
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.abspath(os.path.join(here_dir, ".."))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+if here_dir not in sys.path:
+    sys.path.insert(0, here_dir)
+
+from bench_analysis import FORMATS, corpus_specs, percentile, synthesize  # noqa: E402
+
+TERMINAL = ("completed", "error", "cancelled")
+WS_QUIET_SECONDS = 5.0   # poll the status when the socket has been quiet this long
+POLL_SECONDS = 1.0       # status polling without a socket
+
+
+def upload_bytes(spec):
+    import soundfile as sf
+
+    buf = io.BytesIO()
+    sf.write(buf, synthesize(spec), spec["sr"], format=spec["format"].upper(), subtype=FORMATS[spec["format"]])
+    return buf.getvalue()
+
+
+def parse_completion(message):
+    """'Analysis complete (12.3s, 2 LLMs).' -> (server seconds, LLM count); cache/fingerprint hits -> (None, None)."""
+    match = re.search(r"\(([\d.]+)s, (\d+) LLMs\)", message or "")
+    return (float(match.group(1)), int(match.group(2))) if match else (None, None)
+
+
+class Driver:
+    def __init__(self, args, session, headers):
+        self.args = args
+        self.session = session
+        self.headers = headers
+        self.api = args.base_url.rstrip("/") + "/api"
+        self.ws = re.sub(r"^http", "ws", self.api)
+
+    async def run_job(self, spec):
+        data = await asyncio.to_thread(upload_bytes, spec)
+        import aiohttp
+
+        form = aiohttp.FormData()
+        form.add_field("file", data, filename=spec["name"], content_type="application/octet-stream")
+        form.add_field("transcribe", str(self.args.transcribe).lower())
+        form.add_field("model_preference", self.args.model_preference)
+
+        started = time.perf_counter()
+        record = {"file": spec["name"], "status": "error"}
+        async with self.session.post(f"{self.api}/analysis/generate", data=form, headers=self.headers) as resp:
+            if resp.status != 200:
+                record["error"] = f"HTTP {resp.status}: {(await resp.text())[:200]}"
+                return record
+            job_id = (await resp.json())["job_id"]
+        record["submit_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+
+        deadline = started + self.args.job_timeout
+        status, message = await self.follow(job_id, started, deadline, record)
+        record["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        record["status"] = status or "timeout"
+        if status == "completed":
+            record["server_seconds"], record["llms"] = parse_completion(message)
+            record["cache_hit"] = record["llms"] is None
+        else:
+            record["error"] = message
+        return record
+
+    async def follow(self, job_id, started, deadline, record):
+        """Wait for a terminal status: WebSocket pushes, with a status poll on every quiet stretch."""
+        import aiohttp
+
+        try:
+            async with self.session.ws_connect(f"{self.ws}/analysis/ws/{job_id}", heartbeat=30) as ws:
+                # The job may have finished before the socket was registered
+                status, message = await self.poll(job_id)
+                while status not in TERMINAL and time.perf_counter() < deadline:
+                    try:
+                        msg = await ws.receive(timeout=WS_QUIET_SECONDS)
+                    except asyncio.TimeoutError:
+                        status, message = await self.poll(job_id)
+                        continue
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        break  # closed: fall through to polling
+                    payload = json.loads(msg.data)
+                    if payload.get("type") == "partial_result" and "first_partial_ms" not in record:
+                        record["first_partial_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+                    elif payload.get("type") == "progress" and payload.get("status") in TERMINAL:
+                        status, message = payload["status"], payload.get("message")
+                if status in TERMINAL:
+                    return status, message
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            record["ws_error"] = str(e)[:200]
+
+        while time.perf_counter() < deadline:
+            status, message = await self.poll(job_id)
+            if status in TERMINAL:
+                return status, message
+            await asyncio.sleep(POLL_SECONDS)
+        return None, "timed out waiting for the job"
+
+    async def poll(self, job_id):
+        async with self.session.get(f"{self.api}/analysis/job/{job_id}", headers=self.headers) as resp:
+            if resp.status != 200:
+                return None, f"HTTP {resp.status}"
+            body = await resp.json()
+        return body.get("status"), body.get("message") if body.get("status") != "error" else body.get("error")
+
+    async def fake_stats(self):
+        if not self.args.fake_server:
+            return None
+        async with self.session.get(self.args.fake_server.rstrip("/") + "/_stats") as resp:
+            return (await resp.json())["calls"]
+
+    async def run_level(self, concurrency, level):
+        specs = corpus_specs([self.args.duration])
+        queue = asyncio.Queue()
+        for i in range(self.args.jobs):
+            spec = dict(specs[i % len(specs)])
+            spec["seed"] = self.args.seed + level * 100_000 + i  # unique bytes per job and run
+            spec["name"] = f"load_{level}_{i:04d}.{spec['format']}"
+            queue.put_nowait(spec)
+
+        records = []
+
+        async def worker():
+            while not queue.empty():
+                spec = queue.get_nowait()
+                try:
+                    records.append(await self.run_job(spec))
+                except Exception as e:
+                    records.append({"file": spec["name"], "status": "error", "error": f"{type(e).__name__}: {e}"})
+
+        before = await self.fake_stats()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+        after = await self.fake_stats()
+
+        report = summarize(records, wall, self.args.budget)
+        report["concurrency"] = concurrency
+        if before is not None:
+            report["provider_calls"] = {
+                provider: {k: n - before.get(provider, {}).get(k, 0) for k, n in outcomes.items()}
+                for provider, outcomes in after.items()
+            }
+        if self.args.verbose:
+            report["jobs_detail"] = records
+        return report
+
+
+def summarize(records, wall, budget):
+    completed = [r for r in records if r["status"] == "completed"]
+    analysed = [r for r in completed if not r.get("cache_hit")]
+    latencies = [r["latency_ms"] for r in records if "latency_ms" in r]
+    partials = [r["first_partial_ms"] for r in records if "first_partial_ms" in r]
+    finished = [r for r in records if "latency_ms" in r]
+    errors = {}
+    for r in records:
+        if r["status"] != "completed":
+            key = (r.get("error") or r["status"])[:80]
+            errors[key] = errors.get(key, 0) + 1
+    return {
+        "jobs": len(records),
+        "completed": len(completed),
+        "failed": len(records) - len(completed),
+        "cache_hits": len(completed) - len(analysed),
+        "wall_seconds": round(wall, 1),
+        "jobs_per_minute": round(len(completed) / wall * 60.0, 2) if wall else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 50), 1),
+        "latency_p90_ms": round(percentile(latencies, 90), 1),
+        "latency_p99_ms": round(percentile(latencies, 99), 1),
+        "latency_max_ms": round(max(latencies), 1) if latencies else 0.0,
+        "first_partial_p50_ms": round(percentile(partials, 50), 1),
+        "first_partial_p90_ms": round(percentile(partials, 90), 1),
+        # A job that failed or never finished missed the budget too
+        "budget_miss_rate": round(
+            sum(1 for r in records if r["status"] != "completed" or r["latency_ms"] > budget * 1000.0)
+            / len(records), 3) if records else 0.0,
+        "fallback_rate": round(sum(1 for r in analysed if r["llms"] == 0) / len(analysed), 3) if analysed else 0.0,
+        "mean_llms": round(sum(r["llms"] for r in analysed) / len(analysed), 2) if analysed else 0.0,
+        "submit_p50_ms": round(percentile([r["submit_ms"] for r in finished], 50), 1),
+        "ws_fallbacks": sum(1 for r in records if "ws_error" in r),
+        "errors": errors,
+    }
+
+
+async def login(session, args):
+    if args.token:
+        return {"Authorization": f"Bearer {args.token}"}
+    async with session.post(
+        args.base_url.rstrip("/") + "/api/auth/login", json={"email": args.email, "password": args.password}
+    ) as resp:
+        if resp.status != 200:
+            raise SystemExit(f"Login failed: HTTP {resp.status} {await resp.text()}")
+        return {"Authorization": f"Bearer {(await resp.json())['access_token']}"}
+
+
+async def run(args):
+    import aiohttp
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    report = {"base_url": args.base_url, "budget_seconds": args.budget, "duration_seconds": args.duration,
+              "jobs_per_level": args.jobs, "seed": args.seed, "levels": []}
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        driver = Driver(args, session, await login(session, args))
+        for level, concurrency in enumerate(levels):
+            print(f"[load] concurrency {concurrency} ...", file=sys.stderr)
+            result = await driver.run_level(concurrency, level)
+            report["levels"].append(result)
+            print(f"[load] concurrency {concurrency}: p50 {result['latency_p50_ms']:.0f} ms, "
+                  f"miss {result['budget_miss_rate']:.0%}, fallback {result['fallback_rate']:.0%}", file=sys.stderr)
+            if result["budget_miss_rate"] > args.stop_miss_rate:
+                print(f"[load] budget-miss rate above {args.stop_miss_rate:.0%}, stopping", file=sys.stderr)
+                break
+    sustained = [r["concurrency"] for r in report["levels"] if r["budget_miss_rate"] <= args.target_miss_rate]
+    report["sustained_concurrency"] = max(sustained) if sustained else 0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", help="bearer token (instead of --email/--password)")
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="levels, run in order")
+    parser.add_argument("--jobs", type=int, default=16, help="jobs per level")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of audio per upload")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("ANALYSIS_MAX_SECONDS", "180")))
+    parser.add_argument("--job-timeout", type=float, default=None, help="give up on a job after (default 2x budget + 60)")
+    parser.add_argument("--transcribe", action="store_true")
+    parser.add_argument("--model-preference", default="flash", choices=("flash", "pro"))
+    parser.add_argument("--target-miss-rate", type=float, default=0.05)
+    parser.add_argument("--stop-miss-rate", type=float, default=0.5, help="skip higher levels above this")
+    parser.add_argument("--fake-server", help="fake_llm_server.py URL, for provider call counts per level")
+    parser.add_argument("--seed", type=int, default=int(time.time()))
+    parser.add_argument("--verbose", action="store_true", help="include every job in the report")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    if not args.token and not (args.email and args.password):
+        parser.error("--token or --email/--password required")
+    if args.job_timeout is None:
+        args.job_timeout = 2 * args.budget + 60
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
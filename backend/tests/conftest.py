@@ -0,0 +1,72 @@
+"""Shared fixtures for the route tests that run a real router against their
+own file-based SQLite DB via dependency overrides."""
+import sys
+import types
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def route_client(tmp_path, monkeypatch):
+    """Factory: route_client(routes, seed=None, user=None) -> TestClient.
+
+    `routes` is the router module; its own get_db/get_async_db/get_current_user
+    are overridden, since test_async_db reloads app.db and the router keeps the
+    objects it was built with. `seed(db)` fills the sync session before the
+    commit; `user` defaults to a non-superuser "u1".
+    """
+    pytest.importorskip("aiosqlite")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.orm import sessionmaker
+
+    # Routes that reach certificate -> weasyprint (needs system Pango); only for these tests
+    weasyprint_stub = types.ModuleType("weasyprint")
+    weasyprint_stub.HTML = lambda *a, **k: None
+    monkeypatch.setitem(sys.modules, "weasyprint", weasyprint_stub)
+
+    engines = []
+
+    def build(routes, seed=None, user=None):
+        from app.db import Base
+
+        path = tmp_path / f"{routes.__name__.rsplit('.', 1)[-1]}.db"
+        engine = create_engine(f"sqlite:///{path}")
+        engines.append(engine)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        if seed is not None:
+            db = Session()
+            seed(db)
+            db.commit()
+            db.close()
+
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+        async def override_async_db():
+            async with AsyncSession() as s:
+                yield s
+
+        def override_db():
+            s = Session()
+            try:
+                yield s
+            finally:
+                s.close()
+
+        app = FastAPI()
+        app.include_router(routes.router, prefix="/api")
+        app.dependency_overrides[routes.get_async_db] = override_async_db
+        if hasattr(routes, "get_db"):
+            app.dependency_overrides[routes.get_db] = override_db
+        current_user = user or SimpleNamespace(id="u1", is_superuser=False)
+        app.dependency_overrides[routes.get_current_user] = lambda: current_user
+        return TestClient(app)
+
+    yield build
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,108 @@
+"""_run_analysis runs only the cheap reads (hash, tags) before the dedupe
+decision: a cache hit starts no fingerprint, DSP, transcription or Groq
+stage; a miss with budget left runs Layers 1-3 and the Groq branch; the
+fingerprint index lookup runs in a worker thread, not on the loop. Stage
+functions are replaced by recorders, the job lives in its own SQLite DB."""
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.db import Base, Job
+from app.routes import analysis
+from app.services import fingerprint_index
+from app.utils import caching
+
+GATED = ("fingerprint", "fresh", "groq_analysis", "transcription", "groq_metadata")
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(analysis, "SessionLocal", Session)
+
+    async def fake_send(*_args, **_kwargs):
+        pass
+
+    monkeypatch.setattr(analysis.ws_manager, "send_progress", fake_send)
+    monkeypatch.setattr(settings, "GROQ_API_KEY", "test-key")
+
+    db = Session()
+    db.add(Job(id="j1", file_name="track.wav", status="pending"))
+    db.commit()
+    db.close()
+
+    upload = tmp_path / "track.wav"
+    upload.write_bytes(b"RIFF" + bytes(64))
+    return Session, str(upload)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    called = []
+    results = {"fresh": lambda: {"mainGenre": "Techno", "_tech_meta": {}}, "groq_metadata": lambda: {"bpm": 120}}
+
+    def recorder(name):
+        def run(ctx, **_inputs):
+            called.append(name)
+            return results.get(name, dict)()
+        return run
+
+    for name in GATED:
+        monkeypatch.setattr(analysis.ANALYSIS_PIPELINE.stages[name], "fn", recorder(name))
+    return called
+
+
+async def test_cache_hit_starts_no_expensive_stage(job, calls, monkeypatch):
+    Session, upload = job
+    monkeypatch.setattr(caching.cache, "get", lambda file_hash: {"mainGenre": "Jazz"})
+
+    await analysis._run_analysis("j1", upload, False, True, False, "flash", 30)
+
+    db = Session()
+    stored = db.query(Job).filter(Job.id == "j1").first()
+    assert stored.status == "completed" and stored.result["mainGenre"] == "Jazz"
+    db.close()
+    assert calls == []
+
+
+async def test_cache_miss_runs_dsp_and_groq_branch(job, calls, monkeypatch):
+    Session, upload = job
+    monkeypatch.setattr(caching.cache, "get", lambda file_hash: None)
+    monkeypatch.setattr(caching.cache, "set", lambda file_hash, result: None)
+    monkeypatch.setattr(settings, "FINGERPRINT_DEDUPE", False)
+
+    await analysis._run_analysis("j1", upload, False, True, False, "flash", 30)
+
+    db = Session()
+    stored = db.query(Job).filter(Job.id == "j1").first()
+    assert stored.status == "completed" and stored.result["bpm"] == 120
+    db.close()
+    assert sorted(calls) == ["fresh", "groq_analysis", "groq_metadata", "transcription"]
+
+
+async def test_fingerprint_lookup_runs_off_the_event_loop(job, calls, monkeypatch):
+    Session, upload = job
+    lookups = []
+
+    def fake_find(db, fp, exclude_hash=None):
+        lookups.append(threading.get_ident())
+        return {"file_hash": "b" * 64, "ber": 0.1}
+
+    monkeypatch.setattr(fingerprint_index, "find_near_duplicate", fake_find)
+    monkeypatch.setattr(caching.cache, "get", lambda file_hash: {"mainGenre": "Ambient"} if file_hash == "b" * 64 else None)
+    monkeypatch.setattr(caching.cache, "set", lambda file_hash, result: None)
+    monkeypatch.setattr(settings, "FINGERPRINT_DEDUPE", True)
+
+    await analysis._run_analysis("j1", upload, False, True, False, "flash", 30)
+
+    db = Session()
+    stored = db.query(Job).filter(Job.id == "j1").first()
+    assert stored.result["matchedBy"]["sha256"] == "b" * 64
+    db.close()
+    assert lookups and lookups[0] != threading.get_ident()
+    assert calls == ["fingerprint"]
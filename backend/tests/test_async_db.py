@@ -0,0 +1,55 @@
+"""Async session layer in app.db: URL mapping onto the asyncio drivers and a
+real round trip through AsyncSessionLocal against a file-based SQLite DB
+(same pool/driver combination the read endpoints use in dev)."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.db as db
+from app.db import Base, Job, to_async_url
+
+
+@pytest.mark.parametrize("sync_url,expected", [
+    ("sqlite:///./music_metadata.db", "sqlite+aiosqlite:///./music_metadata.db"),
+    ("sqlite:////data/music_metadata.db", "sqlite+aiosqlite:////data/music_metadata.db"),
+    ("postgresql://u:p@db:5432/x", "postgresql+asyncpg://u:p@db:5432/x"),
+    ("postgresql+psycopg2://u:p@db/x", "postgresql+asyncpg://u:p@db/x"),
+    ("postgres://u:p@db/x", "postgresql+asyncpg://u:p@db/x"),
+])
+def test_to_async_url(sync_url, expected):
+    assert to_async_url(sync_url) == expected
+
+
+@pytest.mark.asyncio
+async def test_async_session_reads_rows_written_by_sync_session(tmp_path, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    # Engines of its own on tmp_path, the way app.db builds them from DATABASE_URL
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(to_async_url(url))
+    monkeypatch.setattr(db, "AsyncSessionLocal",
+                        async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False))
+
+    session = sessionmaker(bind=engine)()
+    try:
+        session.add(Job(id="job-async", file_name="a.wav", status="completed",
+                        result={"bpm": 120}, timestamp=datetime.utcnow()))
+        session.commit()
+    finally:
+        session.close()
+
+    try:
+        agen = db.get_async_db()
+        async_session = await agen.__anext__()
+        job = await async_session.get(Job, "job-async")
+        assert job.status == "completed"
+        assert job.result == {"bpm": 120}
+        await agen.aclose()
+    finally:
+        await async_engine.dispose()
+        engine.dispose()
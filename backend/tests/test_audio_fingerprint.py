@@ -0,0 +1,130 @@
+"""Perceptual fingerprint + inverted index used to reuse results for
+re-encoded / re-tagged uploads: a degraded, shifted copy of a track must
+match it, a different track must not. Only admins may add to the shared index
+through the tools routes, and the batch route needs a signed-in user."""
+import numpy as np
+import pytest
+from scipy.signal import butter, sosfilt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.services.fingerprint_engine import FingerprintEngine, find_duplicates
+from app.services.fingerprint_index import find_near_duplicate, store_fingerprint
+from app.utils.audio_fingerprint import (
+    compare_fingerprints,
+    compute_fingerprint,
+    decode_fingerprint,
+    encode_fingerprint,
+)
+
+SR = 44100
+
+
+def _track(seed, seconds=40):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SR * 0.5)) / SR
+    notes = []
+    for _ in range(seconds * 2):
+        f = 110 * 2 ** (rng.integers(0, 36) / 12)
+        seg = sum(np.sin(2 * np.pi * f * h * t) / h for h in range(1, 6)) * np.exp(-3 * t)
+        notes.append(seg + 0.3 * rng.normal(size=t.shape) * np.exp(-30 * t))
+    return (0.3 * np.concatenate(notes)).astype(np.float32)
+
+
+def _reencoded(y):
+    """Encoder-like damage: delay, gain, low-pass, noise floor, 22.05 kHz."""
+    sos = butter(8, 4000, fs=SR, output="sos")
+    out = np.concatenate([np.zeros(1105, np.float32), 0.7 * sosfilt(sos, y)])
+    out = out + 0.003 * np.random.default_rng(9).normal(size=out.shape)
+    return out[::2].astype(np.float32), SR // 2
+
+
+@pytest.fixture(scope="module")
+def prints():
+    original = _track(1)
+    return {
+        "original": compute_fingerprint(original, SR),
+        "reencoded": compute_fingerprint(*_reencoded(original)),
+        "other": compute_fingerprint(_track(2), SR),
+    }
+
+
+def test_fingerprint_survives_reencode(prints):
+    same = compare_fingerprints(prints["reencoded"], prints["original"])
+    assert same["ber"] < 0.3 and same["overlap"] > 0.95
+
+    different = compare_fingerprints(prints["other"], prints["original"])
+    assert different is None or different["ber"] > 0.4
+
+
+def test_compact_form_roundtrip(prints):
+    assert np.array_equal(decode_fingerprint(encode_fingerprint(prints["original"])), prints["original"])
+
+
+def test_index_finds_near_duplicate_only(prints, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fp.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    assert store_fingerprint(db, "sha-original", prints["original"])
+    assert store_fingerprint(db, "sha-other", prints["other"])
+    assert not store_fingerprint(db, "sha-original", prints["original"])
+    db.commit()
+
+    match = find_near_duplicate(db, prints["reencoded"], exclude_hash="sha-new")
+    assert match["file_hash"] == "sha-original"
+    assert abs(match["offset_sec"]) < 0.1
+
+    assert find_near_duplicate(db, prints["original"], exclude_hash="sha-original") is None
+    db.close()
+    engine.dispose()
+
+
+def test_find_duplicates_within_batch(prints):
+    batch = [prints["original"], None, prints["other"], prints["reencoded"]]
+    pairs = find_duplicates(batch)
+    assert [(p["a"], p["b"]) for p in pairs] == [(0, 3)]
+
+
+def test_engine_fingerprints_files_off_loop(tmp_path):
+    import asyncio
+    import soundfile as sf
+
+    path = tmp_path / "a.wav"
+    y = _track(3, seconds=10)
+    sf.write(str(path), y, SR)
+
+    engine = FingerprintEngine(max_workers=1)
+    try:
+        from_file, missing = asyncio.run(engine.fingerprint_files([str(path), str(tmp_path / "missing.wav")]))
+    finally:
+        engine.shutdown()
+    assert isinstance(missing, Exception)
+    assert compare_fingerprints(from_file, compute_fingerprint(y, SR))["ber"] < 0.05
+
+
+def test_routes_keep_the_shared_index_admin_only():
+    from types import SimpleNamespace
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.dependencies import get_current_user_optional
+    from app.routes.auth import get_current_user
+    from app.routes.tools import router
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    upload = {"file": ("a.wav", b"RIFF", "audio/wav")}
+    user = SimpleNamespace(id="u1", is_superuser=False)
+
+    client = TestClient(app)
+    assert client.post("/api/tools/fingerprint/batch", files=[("files", upload["file"])]).status_code == 401
+
+    app.dependency_overrides[get_current_user_optional] = lambda: None
+    assert client.post("/api/tools/fingerprint", files=upload, data={"index": "true"}).status_code == 403
+
+    app.dependency_overrides[get_current_user] = lambda: user
+    response = client.post("/api/tools/fingerprint/batch", files=[("files", upload["file"])], data={"index": "true"})
+    assert response.status_code == 403
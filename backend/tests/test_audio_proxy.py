@@ -0,0 +1,57 @@
+"""Audio proxy: the 16 kHz Opus proxy must be produced incrementally from
+decoded frames, be far smaller than the original, decode back to the same
+duration, and reach the endpoint as a well-formed streamed multipart body."""
+import io
+
+import httpx
+import numpy as np
+import pytest
+import soundfile as sf
+
+from app.utils.audio_proxy import PROXY_BYTES_PER_SECOND, PROXY_SR, encode_proxy, post_proxy, proxy_stream
+
+
+def _wav(tmp_path, seconds=30, sr=44100):
+    t = np.arange(seconds * sr) / sr
+    y = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * np.random.default_rng(0).normal(size=t.size)
+    path = tmp_path / "original.wav"
+    sf.write(str(path), np.stack([y, y], axis=1).astype(np.float32), sr)
+    return path
+
+
+def test_proxy_is_streamed_small_and_decodable(tmp_path):
+    path = _wav(tmp_path)
+    pieces = list(proxy_stream(str(path)))
+    proxy = b"".join(pieces)
+
+    assert len(pieces) > 2  # bytes come out while decoding, not at the end
+    assert len(proxy) * 20 < path.stat().st_size
+    assert len(proxy) < 30 * PROXY_BYTES_PER_SECOND
+    audio, sr = sf.read(io.BytesIO(proxy))
+    assert sr == PROXY_SR
+    assert len(audio) / sr == pytest.approx(30.0, abs=0.1)
+
+
+def test_post_proxy_sends_streamed_multipart():
+    received = {}
+
+    def handler(request: httpx.Request):
+        received["headers"] = request.headers
+        received["body"] = request.read()
+        return httpx.Response(200, json={"text": "hello"})
+
+    chunks = encode_proxy([np.zeros(PROXY_SR, dtype=np.float32)] * 3)
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        result = post_proxy("https://speech.test/v1/audio/transcriptions", {"Authorization": "Bearer k"},
+                            {"model": "whisper-large-v3"}, chunks, client=client)
+
+    assert result == {"text": "hello"}
+    headers, body = received["headers"], received["body"]
+    assert "content-length" not in headers  # chunked: size unknown up front
+    boundary = headers["content-type"].split("boundary=")[1].encode()
+    parts = body.split(b"--" + boundary)
+    assert b'name="model"\r\n\r\nwhisper-large-v3\r\n' in parts[1]
+    assert b'name="file"; filename="proxy.ogg"' in parts[2]
+    audio, sr = sf.read(io.BytesIO(parts[2].split(b"\r\n\r\n", 1)[1][:-2]))
+    assert (sr, len(audio)) == (PROXY_SR, 3 * PROXY_SR)
+    assert parts[3] == b"--\r\n"
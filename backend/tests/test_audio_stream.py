@@ -0,0 +1,66 @@
+"""Streaming decode + streaming features: frames must be fixed-size and
+sample-exact against a whole-file read, and the one-pass statistics must
+match librosa's whole-array features, so long files can be analyzed end to
+end without loading them."""
+import librosa
+import numpy as np
+import pytest
+import soundfile as sf
+
+from app.utils.audio_stream import AudioStream
+from app.utils.stream_features import StreamingFeatures, analyze_file_streaming, stream_rms
+
+SR = 48000
+
+
+@pytest.fixture(scope="module")
+def wav(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    t = np.arange(SR * 20) / SR
+    pulse = (np.sin(2 * np.pi * 2 * t) > 0.95).astype(np.float32)
+    left = 0.3 * np.sin(2 * np.pi * 330 * t) + 0.2 * rng.normal(size=t.shape) * pulse
+    x = np.stack([left, 0.8 * left], axis=1).astype(np.float32)
+    path = tmp_path_factory.mktemp("audio") / "clip.wav"
+    sf.write(str(path), x, SR, subtype="FLOAT")
+    return str(path), x
+
+
+def test_frames_are_fixed_size_and_exact(wav):
+    path, x = wav
+    frames = list(AudioStream(path, frame_size=10000))
+    assert all(f.shape == (10000, 2) for f in frames[:-1])
+    assert np.array_equal(np.concatenate(frames), x)
+
+    window = AudioStream(path, offset=5.0, duration=2.5).read()
+    assert np.array_equal(window, x[5 * SR:int(7.5 * SR)])
+
+
+def test_resampled_mono_stream_matches_length(wav):
+    path, x = wav
+    stream = AudioStream(path, sr=22050, mono=True, frame_size=4096)
+    frames = list(stream)
+    assert all(f.shape == (4096,) for f in frames[:-1])
+    assert abs(sum(len(f) for f in frames) - len(x) * 22050 // SR) <= 1
+    assert stream.duration == pytest.approx(20.0)
+
+
+def test_streaming_features_match_librosa(wav):
+    path, x = wav
+    report = analyze_file_streaming(path)
+    y = librosa.resample(x.mean(axis=1), orig_sr=SR, target_sr=22050)
+
+    rms = librosa.feature.rms(y=y, center=False)
+    centroid = librosa.feature.spectral_centroid(y=y, sr=22050, center=False)
+    assert report["energy"]["rms_mean"] == pytest.approx(float(rms.mean()), rel=0.01)
+    assert report["spectral"]["centroid_mean"] == pytest.approx(float(centroid.mean()), rel=0.02)
+    assert report["rhythm"]["tempo"] == pytest.approx(120, rel=0.05)
+    assert report["duration"] == 20.0
+    assert stream_rms(path) == pytest.approx(float(np.sqrt(np.mean(x.mean(axis=1) ** 2))), rel=1e-4)
+
+
+def test_segmented_tempogram_matches_whole(wav):
+    rng = np.random.default_rng(1)
+    oenv = (rng.random(3000) < 0.05).astype(np.float32) + 0.1
+    whole = librosa.feature.tempogram(onset_envelope=oenv, sr=22050, hop_length=512, center=False).mean(axis=1)
+    segmented = StreamingFeatures._mean_tempogram(oenv, segment=700)[:, 0]
+    assert np.allclose(whole, segmented, atol=1e-6)
@@ -0,0 +1,121 @@
+"""Batch pipeline: files flow through decode, features and a batched DB
+writer, a failing file must not take the batch down, and get_queue_status
+must report real per-stage counters; a file is "processing" from decode on."""
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, Job
+from app.services import batch_processor as bp
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'batch.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(bp, "SessionLocal", factory)
+    return factory
+
+
+def _files(tmp_path, n):
+    pairs = []
+    for i in range(n):
+        path = tmp_path / f"track{i}.wav"
+        sf.write(str(path), np.zeros(8000, dtype=np.float32), 8000)
+        pairs.append((f"job{i}", str(path)))
+    return pairs
+
+
+@pytest.mark.asyncio
+async def test_pipeline_batches_writes_and_isolates_failures(tmp_path, session_factory, monkeypatch):
+    def fake_core(file_path, fast=False, audio=None):
+        time.sleep(0.05)
+        if file_path.endswith("track3.wav"):
+            raise ValueError("corrupt file")
+        y, sr = audio
+        return {"bpm": 120.0, "samples": len(y), "sr": sr}
+
+    monkeypatch.setattr(bp.AdvancedAudioAnalyzer, "analyze_core", staticmethod(fake_core))
+    pairs = _files(tmp_path, 6)
+    db = session_factory()
+    db.add_all([Job(id=job_id, file_name=job_id, status="queued") for job_id, _ in pairs])
+    db.commit()
+
+    processor = bp.BatchProcessor(max_concurrent=1, decode_workers=1, queue_size=2, db_batch_size=4, db_flush_seconds=0.2)
+    results = await processor.process_batch(pairs)
+    await processor.close()
+
+    assert isinstance(results[3], ValueError)
+    assert [r["samples"] for i, r in enumerate(results) if i != 3] == [int(8000 * 22050 / 8000)] * 5
+
+    db.expire_all()
+    statuses = {job.id: job.status for job in db.query(Job).all()}
+    assert statuses.pop("job3") == "failed"
+    assert set(statuses.values()) == {"completed"}
+    assert processor.db_commits < len(pairs)
+
+    status = processor.get_queue_status()
+    assert status["active"] == 0
+    assert status["stages"]["decode"]["processed"] == 6
+    assert status["stages"]["features"]["processed"] == 5
+    assert status["stages"]["features"]["failed"] == 1
+    assert status["stages"]["write"]["processed"] == 6
+    assert status["bottleneck"] == "features"
+
+
+@pytest.mark.asyncio
+async def test_process_file_job_raises_on_failure(tmp_path, session_factory, monkeypatch):
+    def broken(file_path, fast=False, audio=None):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(bp.AdvancedAudioAnalyzer, "analyze_core", staticmethod(broken))
+    (job_id, path), = _files(tmp_path, 1)
+    db = session_factory()
+    db.add(Job(id=job_id, file_name=job_id, status="queued"))
+    db.commit()
+
+    processor = bp.BatchProcessor(max_concurrent=1, db_flush_seconds=0.01)
+    with pytest.raises(RuntimeError):
+        await processor.process_file_job(job_id, path)
+    await processor.close()
+    db.expire_all()
+    assert db.get(Job, job_id).status == "failed"
+
+
+@pytest.mark.asyncio
+async def test_files_in_flight_are_marked_processing(tmp_path, session_factory, monkeypatch):
+    import asyncio
+    import threading
+
+    release = threading.Event()
+
+    def slow_core(file_path, fast=False, audio=None):
+        release.wait(5)
+        return {"bpm": 120.0}
+
+    monkeypatch.setattr(bp.AdvancedAudioAnalyzer, "analyze_core", staticmethod(slow_core))
+    (job_id, path), = _files(tmp_path, 1)
+    db = session_factory()
+    db.add(Job(id=job_id, file_name=job_id, status="queued"))
+    db.commit()
+
+    processor = bp.BatchProcessor(max_concurrent=1, db_flush_seconds=0.01)
+    task = asyncio.create_task(processor.process_file_job(job_id, path))
+    try:
+        for _ in range(200):
+            db.expire_all()
+            if db.get(Job, job_id).status == "processing":
+                break
+            await asyncio.sleep(0.01)
+        assert db.get(Job, job_id).status == "processing"
+    finally:
+        release.set()
+    assert (await task)["bpm"] == 120.0
+    await processor.close()
+    db.expire_all()
+    assert db.get(Job, job_id).status == "completed"
@@ -0,0 +1,63 @@
+"""Job cancellation: cancelling a token must cancel the job task (and so its
+in-flight awaits), be visible to thread-side work through the context, and
+stop DSP loops at their next checkpoint instead of running to completion."""
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.utils.cancellation import JobCancelled, JobRegistry, job_context, raise_if_cancelled
+from app.utils.window_sampler import map_windows
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_task_and_inflight_awaits():
+    registry = JobRegistry()
+    token = registry.register("j1")
+    started, inner_cancelled = asyncio.Event(), asyncio.Event()
+
+    async def llm_call():
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            inner_cancelled.set()
+            raise
+
+    async def job():
+        await asyncio.gather(llm_call(), llm_call())
+
+    token.task = asyncio.create_task(job(), context=job_context(token))
+    await started.wait()
+
+    assert registry.cancel("j1", "user") is True
+    assert registry.cancel("j1", "user") is False
+    with pytest.raises(asyncio.CancelledError):
+        await token.task
+    assert inner_cancelled.is_set()
+    assert token.reason == "user"
+    assert registry.cancelled_total == 1
+
+
+@pytest.mark.asyncio
+async def test_token_reaches_threads_and_skips_remaining_windows():
+    registry = JobRegistry()
+    token = registry.register("j2")
+    done = []
+
+    def analyze(segment):
+        done.append(len(segment))
+        token.cancel("user")  # cancelled while the first window runs
+        return len(segment)
+
+    async def job():
+        return await asyncio.to_thread(map_windows, analyze, [np.zeros(i + 1) for i in range(6)], 1)
+
+    with pytest.raises(JobCancelled):
+        await asyncio.create_task(job(), context=job_context(token))
+    assert done == [1]
+
+
+def test_checkpoint_is_noop_outside_a_job():
+    raise_if_cancelled()
+    assert map_windows(len, [np.zeros(3), np.zeros(4)]) == [3, 4]
@@ -0,0 +1,98 @@
+"""Catalog projection: analysis results are normalized into indexed
+catalog_tracks/catalog_track_moods rows and searched in SQL through
+GET /catalog/search, with text filters matched case-insensitively."""
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, AnalysisHistory, CatalogTrack, CatalogTrackMood
+from app.routes import catalog as catalog_routes
+from app.services.catalog import catalog_fields, index_history_entry
+
+TRACKS = [
+    # file, bpm, key, mode, genre, moods, duration
+    ("dark_a.wav", 124, "A", "Minor", "Techno", ["Dark", "Driving"], 300),
+    ("dark_b.wav", 127.5, "A", "Minor", "Techno", ["Dark"], 420),
+    ("bright.wav", 125, "A", "Major", "House", ["Uplifting"], 360),
+    ("slow.wav", 90, "A", "Minor", "Ambient", ["Dark"], 500),
+    ("fast.wav", 140, "A", "Minor", "Techno", ["Dark"], 280),
+]
+
+
+def _seed(db):
+    base = datetime(2025, 1, 1)
+    for i, (name, bpm, key, mode, genre, moods, duration) in enumerate(TRACKS):
+        h = AnalysisHistory(user_id="u1", file_name=name, created_at=base + timedelta(minutes=i),
+                            result={"bpm": bpm, "key": key, "mode": mode, "mainGenre": genre,
+                                    "moods": moods, "energyLevel": "High", "duration": duration})
+        db.add(h)
+        db.flush()
+        index_history_entry(db, h, job_id=f"job-{i}")
+    other = AnalysisHistory(user_id="u2", file_name="theirs.wav", created_at=base,
+                            result={"bpm": 125, "key": "A", "mode": "Minor", "moods": ["Dark"]})
+    db.add(other)
+    db.flush()
+    index_history_entry(db, other)
+
+
+@pytest.fixture
+def client(route_client):
+    return route_client(catalog_routes, seed=_seed)
+
+
+def test_bpm_key_mode_mood_filter(client):
+    body = client.get("/api/catalog/search", params={
+        "bpm_min": 120, "bpm_max": 128, "key": "A", "mode": "Minor", "mood": "dark", "sort": "bpm", "order": "asc",
+    }).json()
+    assert body["total"] == 2
+    assert [t["file_name"] for t in body["items"]] == ["dark_a.wav", "dark_b.wav"]
+    assert body["items"][0]["moods"] == ["dark", "driving"]
+    assert body["items"][0]["job_id"] == "job-0"
+
+
+def test_text_filters_ignore_case(client):
+    body = client.get("/api/catalog/search", params={
+        "key": "a", "mode": "minor", "genre": "techno", "energy": "HIGH", "mood": "DARK",
+    }).json()
+    assert sorted(t["file_name"] for t in body["items"]) == ["dark_a.wav", "dark_b.wav", "fast.wav"]
+    assert body["items"][0]["mode"] == "Minor"
+
+
+def test_all_moods_must_match_and_scope_is_own_tracks(client):
+    body = client.get("/api/catalog/search", params=[("mood", "Dark"), ("mood", "Driving")]).json()
+    assert [t["file_name"] for t in body["items"]] == ["dark_a.wav"]
+
+    body = client.get("/api/catalog/search", params={"all_users": "true"}).json()
+    assert "theirs.wav" not in [t["file_name"] for t in body["items"]]
+
+
+def test_reindex_replaces_moods(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reindex.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    h = AnalysisHistory(user_id="u1", file_name="x.wav", result={"moods": ["Calm"]})
+    db.add(h)
+    db.flush()
+    index_history_entry(db, h)
+    h.result = {"moods": ["Tense"], "bpm": "100"}
+    track = index_history_entry(db, h)
+    db.commit()
+    assert db.query(CatalogTrack).count() == 1
+    assert track.bpm == 100.0
+    assert [m.mood for m in db.query(CatalogTrackMood).all()] == ["tense"]
+    db.close()
+    engine.dispose()
+
+
+def test_catalog_fields_normalizes_envelope_and_durations():
+    fields = catalog_fields({"metadata": {"moods": ["Dark", " dark ", "Unspecified"], "duration": "3:30",
+                                          "energy_level": "Low", "bpm": 0}})
+    assert fields["moods"] == ["dark"]
+    assert fields["duration"] == 210.0
+    assert fields["energy_level"] == "Low"
+    assert fields["bpm"] is None
@@ -0,0 +1,46 @@
+"""Batched feature kernel: extract_window_features_batch() must return, for
+every window and in input order, the same feature dict as the single-window
+path, including when windows of different lengths are mixed in one call."""
+import numpy as np
+import pytest
+
+from app.services.deep_audio_analyzer import DeepAudioAnalyzer
+
+SAMPLE_RATE = 22050
+
+
+def _window(freq, bpm, seconds, seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    clicks = (np.sin(2 * np.pi * bpm / 60 * t) > 0.98) * rng.normal(size=t.size)
+    y = 0.3 * np.sin(2 * np.pi * freq * t) + 0.2 * np.sin(3 * np.pi * freq * t) + 0.3 * clicks
+    return (y + 0.01 * rng.normal(size=t.size)).astype(np.float32)
+
+
+def _flatten(value, path=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f"{path}.{key}")
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from _flatten(item, f"{path}[{i}]")
+    else:
+        yield path, value
+
+
+def test_batch_matches_single_window_path():
+    analyzer = DeepAudioAnalyzer()
+    segments = [_window(220, 120, 4.0, 0), _window(330, 95, 3.0, 1), _window(262, 140, 4.0, 2)]
+
+    batch = analyzer.extract_window_features_batch(segments, SAMPLE_RATE, vocal_seconds=1.0)
+    single = [analyzer._extract_window_features(y, SAMPLE_RATE, vocal_seconds=1.0) for y in segments]
+
+    assert len(batch) == len(segments)
+    for got, expected in zip(batch, single):
+        got, expected = dict(_flatten(got)), dict(_flatten(expected))
+        assert got.keys() == expected.keys()
+        for path, value in expected.items():
+            if isinstance(value, float):
+                assert got[path] == pytest.approx(value, rel=1e-5, abs=1e-6), path
+            else:
+                assert got[path] == value, path
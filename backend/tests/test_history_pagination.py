@@ -0,0 +1,65 @@
+"""GET /history is keyset-paginated over (user_id, created_at, id) and
+returns only summary columns; the full result comes from GET /history/{id}.
+Runs the real router against its own file-based SQLite DB via dependency
+overrides, so it doesn't care which DATABASE_URL app.db was imported with."""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from app.db import AnalysisHistory
+from app.routes import history as history_routes
+from app.services.catalog import summary_fields
+
+
+def _seed(db):
+    base = datetime(2025, 1, 1)
+    # 7 rows for u1 (two share a timestamp to exercise the id tie-break), 1 for u2
+    for i, minutes in enumerate([0, 1, 2, 2, 3, 4, 5]):
+        result = {"mainGenre": "Techno", "bpm": 120 + i, "key": "A", "mode": "Minor", "lyrics": "x" * 1000}
+        db.add(AnalysisHistory(user_id="u1", file_name=f"t{i}.wav", file_hash=f"h{i}",
+                               result=result, created_at=base + timedelta(minutes=minutes),
+                               **summary_fields(result)))
+    db.add(AnalysisHistory(user_id="u2", file_name="other.wav", result={}, created_at=base))
+
+
+@pytest.fixture
+def client(route_client):
+    return route_client(history_routes, seed=_seed, user=SimpleNamespace(id="u1"))
+
+
+def test_pages_cover_all_rows_once_in_order(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/history", params=params).json()
+        assert len(body["items"]) <= 3
+        seen.extend(body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert [i["file_name"] for i in seen] == ["t6.wav", "t5.wav", "t4.wav", "t3.wav", "t2.wav", "t1.wav", "t0.wav"]
+    assert "result" not in seen[0]
+    assert seen[0]["mainGenre"] == "Techno" and seen[0]["bpm"] == 126.0 and seen[0]["key"] == "A"
+
+
+def test_detail_returns_full_result_for_owner_only(client):
+    first = client.get("/api/history", params={"limit": 1}).json()["items"][0]
+    detail = client.get(f"/api/history/{first['id']}").json()
+    assert detail["result"]["lyrics"] == "x" * 1000
+
+    assert client.get("/api/history/8").status_code == 404  # u2's row
+
+
+def test_bad_cursor_is_rejected(client):
+    assert client.get("/api/history", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_summary_fields_reads_frontend_envelope():
+    fields = summary_fields({"metadata": {"mainGenre": "Pop", "bpm": "98", "key": "C"}, "inputType": "file"})
+    assert fields == {"main_genre": "Pop", "bpm": 98.0, "musical_key": "C", "mode": None}
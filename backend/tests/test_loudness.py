@@ -0,0 +1,71 @@
+"""Streaming EBU R128 meter: chunked measurement must match a whole-buffer
+reference (pyloudnorm), LRA must reflect real level changes, and true peak
+must catch inter-sample overs that the sample peak misses (and never read
+below the sample peak)."""
+import numpy as np
+import pyloudnorm as pyln
+import soundfile as sf
+
+from app.utils.loudness import LoudnessMeter, measure_file
+
+SR = 48000
+
+
+def _program(seconds=60):
+    """Sine + noise alternating between two levels 20 dB apart every 10 s."""
+    rng = np.random.default_rng(0)
+    t = np.arange(SR * seconds) / SR
+    env = np.where((t % 20) < 10, 1.0, 0.1)
+    return np.stack([0.3 * np.sin(2 * np.pi * 440 * t) * env, 0.2 * rng.normal(size=t.shape) * env], axis=1)
+
+
+def _measure(x, chunk):
+    meter = LoudnessMeter(SR, x.shape[1] if x.ndim > 1 else 1)
+    for i in range(0, len(x), chunk):
+        meter.process(x[i:i + chunk])
+    return meter.result()
+
+
+def test_integrated_matches_reference_for_any_chunking():
+    x = _program()
+    reference = pyln.Meter(SR).integrated_loudness(x)
+    small, large = _measure(x, 1237), _measure(x, SR * 7)
+    assert abs(small["integrated_lufs"] - reference) < 0.1
+    assert small["integrated_lufs"] == large["integrated_lufs"]
+    assert small["short_term"] == large["short_term"]
+
+
+def test_loudness_range_tracks_level_changes():
+    stepped = _measure(_program(), SR)
+    assert 17 < stepped["loudness_range_lu"] < 21
+
+    rng = np.random.default_rng(1)
+    flat = _measure(0.1 * rng.normal(size=(SR * 30, 2)), SR)
+    assert flat["loudness_range_lu"] < 1
+
+
+def test_true_peak_catches_intersample_over():
+    # fs/4 sine at 45 degrees: samples sit at +-0.707, the waveform peaks at 1.0
+    x = np.sin(2 * np.pi * (SR / 4) * np.arange(SR) / SR + np.pi / 4)
+    report = _measure(x, 777)
+    assert abs(report["sample_peak_db"] + 3.01) < 0.05
+    assert abs(report["true_peak_db"]) < 0.2
+
+
+def test_true_peak_never_below_sample_peak():
+    # Isolated clicks over a noise floor: the oversampler's phase-0 output
+    # lands a fraction of a dB under the click itself
+    rng = np.random.default_rng(0)
+    x = 0.01 * rng.normal(size=(SR, 2))
+    x[1000, 0], x[2000, 1] = 0.5, -0.3
+    report = _measure(x, 4096)
+    assert report["true_peak_db"] >= report["sample_peak_db"]
+
+
+def test_measure_file_streams_from_disk(tmp_path):
+    path = tmp_path / "program.wav"
+    x = _program(30)
+    sf.write(str(path), x, SR, subtype="FLOAT")
+    report = measure_file(str(path))
+    assert report["duration"] == 30.0
+    assert report["integrated_lufs"] == _measure(x.astype(np.float32), SR * 2)["integrated_lufs"]
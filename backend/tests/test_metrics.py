@@ -0,0 +1,67 @@
+"""Metrics registry: Prometheus text rendering of counters, collect-time
+gauges and cumulative histogram buckets, idempotent declaration, and the
+per-stage timings pipelines record into the global registry."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.metrics import MetricsRegistry, metrics
+from app.utils.task_graph import Pipeline, Stage
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry(prefix="t_")
+    hits = registry.counter("cache_requests_total", "Cache lookups", ("result",))
+    registry.gauge("queue_depth", "Queued items", ("lane",), collect=lambda: {("batch",): 3, ("interactive",): 0})
+    latency = registry.histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1.0))
+
+    hits.inc(result="hit")
+    hits.inc(2, result="miss")
+    latency.observe(0.05, stage="dsp")
+    latency.observe(0.5, stage="dsp")
+    latency.observe(3.0, stage="dsp")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE t_cache_requests_total counter" in lines
+    assert 't_cache_requests_total{result="hit"} 1' in lines
+    assert 't_cache_requests_total{result="miss"} 2' in lines
+    assert 't_queue_depth{lane="batch"} 3' in lines
+    assert 't_stage_seconds_bucket{stage="dsp",le="0.1"} 1' in lines
+    assert 't_stage_seconds_bucket{stage="dsp",le="1.0"} 2' in lines
+    assert 't_stage_seconds_bucket{stage="dsp",le="+Inf"} 3' in lines
+    assert 't_stage_seconds_sum{stage="dsp"} 3.55' in lines
+    assert 't_stage_seconds_count{stage="dsp"} 3' in lines
+
+
+def test_declaration_is_idempotent_and_checked():
+    registry = MetricsRegistry()
+    first = registry.counter("fallbacks_total", "Fallbacks", ("kind",))
+    assert registry.counter("fallbacks_total", "Fallbacks", ("kind",)) is first
+    with pytest.raises(ValueError):
+        registry.gauge("fallbacks_total", "Fallbacks", ("kind",))
+    with pytest.raises(ValueError):
+        first.inc(stage="x")
+
+
+def test_failing_collector_does_not_break_scrape():
+    registry = MetricsRegistry()
+    registry.gauge("broken", "Raises", collect=lambda: 1 / 0)
+    registry.counter("ok_total", "Fine").inc()
+    assert "ok_total 1" in registry.render().splitlines()
+
+
+async def test_pipeline_stages_are_timed():
+    def flaky(ctx):
+        raise RuntimeError("provider down")
+
+    pipeline = Pipeline("metrics_test", [
+        Stage("decode", lambda ctx: 1),
+        Stage("llm", flaky, optional=True, fallback=lambda ctx, error: {}),
+    ])
+    await pipeline.run(SimpleNamespace())
+
+    runs = metrics.get("stage_runs_total")
+    assert runs.value(pipeline="metrics_test", stage="decode", outcome="ran") == 1
+    assert runs.value(pipeline="metrics_test", stage="llm", outcome="fallback") == 1
+    assert metrics.get("stage_seconds").count(pipeline="metrics_test", stage="decode", outcome="ran") == 1
+    assert metrics.get("fallbacks_total").value(kind="metrics_test.llm") == 1
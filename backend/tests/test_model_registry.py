@@ -0,0 +1,58 @@
+"""Model registry: a model is loaded once however many jobs ask for it at
+the same time, and going over the memory budget unloads the least recently
+used model that no job is holding."""
+import threading
+import time
+
+from app.utils.model_registry import ModelRegistry
+
+
+def test_concurrent_first_use_loads_once():
+    registry = ModelRegistry(measure_rss=False)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return object()
+
+    registry.register("whisper", loader, size_mb=10)
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(registry.get("whisper"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(loads) == 1
+    assert len({id(model) for model in got}) == 1
+    assert registry.status()["models"]["whisper"]["hits"] == 3
+
+
+def test_lru_unload_skips_models_in_use():
+    registry = ModelRegistry(budget_mb=250, measure_rss=False)
+    for name in ("a", "b", "c"):
+        registry.register(name, object, size_mb=100)
+
+    registry.get("a")
+    registry.get("b")
+    registry.get("a")  # b is now least recently used
+    registry.get("c")
+    assert {n for n, m in registry.status()["models"].items() if m["loaded"]} == {"a", "c"}
+
+    with registry.use("a"):
+        registry.get("b")  # c is LRU and idle; a is held
+        assert registry.entries["a"].loaded and not registry.entries["c"].loaded
+    assert registry.evictions == 2
+    assert registry.resident_bytes() <= 250 * 1024 * 1024
+
+
+def test_warm_up_reports_failures():
+    registry = ModelRegistry(measure_rss=False)
+    registry.register("ok", object)
+    registry.register("missing", lambda: __import__("not_installed_model_lib"))
+
+    report = registry.warm_up(["ok", "missing"])
+    assert report["ok"] == "ok"
+    assert report["missing"].startswith("error")
+    assert registry.entries["ok"].loaded and not registry.entries["missing"].loaded
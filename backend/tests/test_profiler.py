@@ -0,0 +1,46 @@
+"""Job profiler: samples of a busy worker thread end up in both artifacts
+(a pstats file the stdlib can load and collapsed stacks for flamegraphs),
+idle threads are not counted, and the summary names the hot function."""
+import io
+import pstats
+import threading
+import time
+
+from app.utils.profiler import JobProfiler, artifact_path
+
+
+def _hot_loop(seconds):
+    end = time.monotonic() + seconds
+    total = 0
+    while time.monotonic() < end:
+        total += sum(i * i for i in range(500))
+    return total
+
+
+def test_profile_artifacts(tmp_path):
+    idle = threading.Event()
+    sleeper = threading.Thread(target=idle.wait, name="idle-waiter", daemon=True)
+    sleeper.start()
+
+    profiler = JobProfiler("job-1", interval=0.005, directory=str(tmp_path))
+    profiler.start()
+    worker = threading.Thread(target=_hot_loop, args=(0.4,), name="ThreadPoolExecutor-0_0")
+    worker.start()
+    worker.join()
+    summary = profiler.stop()
+    idle.set()
+
+    assert summary["samples"] > 10
+    assert summary["idle_samples"] > 0
+    assert any("_hot_loop" in entry["function"] or "<genexpr>" in entry["function"] for entry in summary["top"])
+
+    collapsed = (tmp_path / "job-1.collapsed.txt").read_text().splitlines()
+    assert collapsed and all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed)
+    assert any(line.startswith("ThreadPoolExecutor-0;") and "_hot_loop (test_profiler.py" in line for line in collapsed)
+    assert not any(line.startswith("idle-waiter") for line in collapsed)
+
+    stats = pstats.Stats(artifact_path("job-1", "pstats", str(tmp_path)), stream=io.StringIO())
+    hot = [func for func in stats.stats if func[2] == "_hot_loop"]
+    assert hot
+    _, samples, _, cumulative, _ = stats.stats[hot[0]]
+    assert samples > 10 and cumulative > 0
@@ -0,0 +1,110 @@
+"""ProgressReporter must broadcast every milestone but only commit status
+transitions and periodic checkpoints, instead of one DB write per message."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import progress as progress_mod
+from app.utils.progress import ProgressReporter
+
+
+class _FakeDB:
+    def __init__(self):
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    messages = []
+
+    async def fake_send(job_id, message, progress=0, status="processing"):
+        messages.append((job_id, message, progress, status))
+
+    monkeypatch.setattr(progress_mod.ws_manager, "send_progress", fake_send)
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_milestones_are_coalesced_between_transitions(sent):
+    reporter = ProgressReporter(checkpoint_interval=3600)
+    db = _FakeDB()
+    job = SimpleNamespace(id="j1", status="pending", message=None)
+
+    await reporter.update(db, job, "start", progress=5)        # pending -> processing
+    await reporter.update(db, job, "layer 1", progress=20)
+    await reporter.update(db, job, "layer 2", progress=60)
+    await reporter.update(db, job, "sanitize", progress=85)
+
+    assert db.commits == 1
+    assert job.message == "start"
+    assert reporter.get("j1") == {"message": "sanitize", "progress": 85, "status": "processing"}
+    assert [m[1] for m in sent] == ["start", "layer 1", "layer 2", "sanitize"]
+
+    await reporter.update(db, job, "done", progress=100, status="completed")
+
+    assert db.commits == 2
+    assert (job.status, job.message) == ("completed", "done")
+    assert reporter.get("j1") is None
+
+
+@pytest.mark.asyncio
+async def test_cancelled_is_terminal(sent):
+    reporter = ProgressReporter(checkpoint_interval=3600)
+    db = _FakeDB()
+    job = SimpleNamespace(id="j3", status="cancelled", message=None)
+
+    reporter.live["j3"] = {"message": "layer 1", "progress": 20, "status": "processing"}
+    await reporter.update(db, job, "Analysis cancelled.", status="cancelled")
+
+    assert db.commits == 1  # forced flush, although the status did not change
+    assert reporter.get("j3") is None
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_persists_after_interval(sent, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(progress_mod.time, "monotonic", lambda: clock[0])
+    reporter = ProgressReporter(checkpoint_interval=10)
+    db = _FakeDB()
+    job = SimpleNamespace(id="j2", status="pending", message=None)
+
+    await reporter.update(db, job, "a")
+    clock[0] += 5
+    await reporter.update(db, job, "b")
+    clock[0] += 6
+    await reporter.update(db, job, "c")
+
+    assert db.commits == 2
+    assert job.message == "c"
+
+
+@pytest.mark.asyncio
+async def test_partial_results_merge_persist_and_broadcast(sent, monkeypatch):
+    partials = []
+
+    async def fake_partial(job_id, layer, fields, progress=0):
+        partials.append((layer, fields, progress))
+
+    monkeypatch.setattr(progress_mod.ws_manager, "send_partial_result", fake_partial)
+    reporter = ProgressReporter(checkpoint_interval=3600)
+    db = _FakeDB()
+    job = SimpleNamespace(id="j3", status="pending", message=None, partial_result=None)
+
+    await reporter.update(db, job, "start", progress=20)
+    await reporter.publish_partial(db, job, "dsp", {"bpm": 120.0, "key": "A"}, progress=50)
+    await reporter.publish_partial(db, job, "llm", {"mainGenre": "House", "key": "A"}, progress=75)
+    await reporter.publish_partial(db, job, "noop", {}, progress=80)
+
+    assert db.commits == 3
+    assert job.partial_result == {"bpm": 120.0, "key": "A", "mainGenre": "House"}
+    assert reporter.get("j3")["partial_result"] == job.partial_result
+    assert reporter.get("j3")["progress"] == 75
+    assert [p[0] for p in partials] == ["dsp", "llm"]
+    assert partials[1][1] == {"mainGenre": "House", "key": "A"}
+
+    # Later coalesced milestones keep the partial visible to pollers
+    await reporter.update(db, job, "sanitize", progress=85)
+    assert reporter.get("j3")["partial_result"]["mainGenre"] == "House"
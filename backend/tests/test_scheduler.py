@@ -0,0 +1,84 @@
+"""Analysis scheduler: interactive work must be served ahead of batch work,
+users inside a lane must share fairly, a reserved slot must stay free for
+uploads, and batch work must hand its slot over at a stage boundary."""
+import asyncio
+import time
+
+import pytest
+
+from app.utils.scheduler import AnalysisScheduler, preemption_point
+
+
+async def _hold(scheduler, lane, user, log, seconds=0.01):
+    async with scheduler.slot(lane, user_id=user):
+        log.append((lane, user))
+        await asyncio.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_interactive_jumps_the_batch_queue():
+    scheduler = AnalysisScheduler(slots=1)
+    log = []
+    tasks = [asyncio.create_task(_hold(scheduler, "batch", "bulk", log)) for _ in range(3)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(_hold(scheduler, "interactive", "u1", log)))
+    await asyncio.gather(*tasks)
+
+    assert log[0] == ("batch", "bulk")
+    assert log[1] == ("interactive", "u1")
+    assert scheduler.status()["granted"] == {"interactive": 1, "batch": 3, "background": 0}
+
+
+@pytest.mark.asyncio
+async def test_users_share_a_lane_fairly():
+    scheduler = AnalysisScheduler(slots=1)
+    log = []
+    tasks = [asyncio.create_task(_hold(scheduler, "batch", "big", log)) for _ in range(4)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(_hold(scheduler, "batch", "small", log)))
+    await asyncio.gather(*tasks)
+
+    # "small" arrived after four "big" files but is served second, not last
+    assert [user for _, user in log].index("small") == 1
+
+
+@pytest.mark.asyncio
+async def test_reserved_slot_is_kept_for_interactive():
+    scheduler = AnalysisScheduler(slots=2, interactive_reserved=1)
+    running = []
+
+    async def batch():
+        async with scheduler.slot("batch"):
+            running.append(len(scheduler.running))
+            await asyncio.sleep(0.02)
+
+    await asyncio.gather(batch(), batch())
+    assert running == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_batch_yields_at_stage_boundary():
+    scheduler = AnalysisScheduler(slots=1)
+    events = []
+
+    def batch_stages():
+        events.append("batch stage 1")
+        while not scheduler.status()["queued"]["interactive"]:
+            time.sleep(0.001)
+        preemption_point()
+        events.append("batch stage 2")
+
+    async def batch():
+        async with scheduler.slot("batch", user_id="bulk") as lease:
+            await asyncio.to_thread(batch_stages)
+        return lease.preemptions
+
+    async def interactive():
+        await asyncio.sleep(0.01)
+        async with scheduler.slot("interactive", user_id="u1"):
+            events.append("interactive")
+
+    preemptions, _ = await asyncio.gather(batch(), interactive())
+    assert events == ["batch stage 1", "interactive", "batch stage 2"]
+    assert preemptions == 1
+    assert scheduler.status()["preempted"] == 1
@@ -0,0 +1,103 @@
+"""Track embeddings built from DeepAudioAnalyzer feature means, and the
+in-process IVF index that serves /analysis/similar: exactness below the
+training threshold, recall against brute force above it, and owner scoping."""
+import numpy as np
+import pytest
+
+from app.services.similarity import EMBEDDING_DIM, IVFIndex, track_embedding
+
+
+def _features(rng, offset_db=0.0):
+    return {
+        "timbre": {"mfcc_mean": rng.normal(size=20).tolist()},
+        "harmonic": {"chroma_cqt_mean": rng.random(12).tolist(), "tonnetz_mean": rng.normal(size=6).tolist()},
+        "spectral": {
+            "contrast_mean": (rng.random(7) * 30).tolist(),
+            "mel_mean": (rng.normal(size=20) * 10 - 40 + offset_db).tolist(),
+        },
+    }
+
+
+def test_embedding_is_unit_length_and_level_invariant():
+    feats = _features(np.random.default_rng(1))
+    vec = track_embedding(feats)
+    assert vec.shape == (EMBEDDING_DIM,) and vec.dtype == np.float32
+    assert np.linalg.norm(vec) == pytest.approx(1.0, abs=1e-5)
+
+    louder = dict(feats, spectral=dict(feats["spectral"], mel_mean=[v + 6 for v in feats["spectral"]["mel_mean"]]))
+    louder["timbre"] = {"mfcc_mean": [feats["timbre"]["mfcc_mean"][0] + 50] + feats["timbre"]["mfcc_mean"][1:]}
+    assert np.allclose(track_embedding(louder), vec, atol=1e-5)
+
+
+def test_embedding_missing_block_returns_none():
+    feats = _features(np.random.default_rng(2))
+    del feats["harmonic"]["tonnetz_mean"]
+    assert track_embedding(feats) is None
+
+
+def _unit(rng, n):
+    v = rng.normal(size=(n, EMBEDDING_DIM)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_exact_mode_matches_brute_force_and_excludes_self():
+    rng = np.random.default_rng(3)
+    vecs = _unit(rng, 500)
+    index = IVFIndex()
+    index.add([f"j{i}" for i in range(500)], ["u"] * 500, vecs)
+
+    hits = index.search(vecs[7], k=5, exclude=["j7"])
+    expected = [f"j{i}" for i in np.argsort(-(vecs @ vecs[7])) if i != 7][:5]
+    assert [h[0] for h in hits] == expected
+
+
+def test_ivf_recall_and_owner_filter():
+    rng = np.random.default_rng(4)
+    # Clustered data, like real catalogs (genres), so IVF has structure to exploit
+    centres = _unit(rng, 40)
+    vecs = centres[rng.integers(0, 40, 20000)] + 0.15 * rng.normal(size=(20000, EMBEDDING_DIM)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    owners = ["a" if i % 10 else "b" for i in range(20000)]
+
+    index = IVFIndex(exact_threshold=4096)
+    index.add([str(i) for i in range(20000)], owners, vecs)
+    assert index.needs_training()
+    index.train()
+    assert not index.needs_training()
+
+    # Vectors added after training land in the lists too
+    extra = _unit(rng, 1)
+    index.add(["new"], ["a"], extra)
+    assert index.search(extra[0], k=1)[0][0] == "new"
+
+    recalls = []
+    for q in rng.choice(20000, 50, replace=False):
+        truth = set(np.argsort(-(vecs @ vecs[q]))[:10].astype(str))
+        got = {h[0] for h in index.search(vecs[q], k=10)}
+        recalls.append(len(truth & got) / 10)
+    assert np.mean(recalls) >= 0.9
+
+    hits = index.search(vecs[0], k=10, owner="b")
+    assert len(hits) == 10 and all(int(k) % 10 == 0 for k, _ in hits)
+    assert index.search(vecs[0], k=10, owner="nobody") == []
+
+
+def test_similar_endpoint_ranks_own_tracks(route_client, monkeypatch):
+    from app.db import Job
+    from app.routes import analysis as analysis_routes
+    from app.services import similarity as similarity_mod
+
+    def seed(db):
+        rng = np.random.default_rng(5)
+        base = _unit(rng, 1)[0]
+        for i, (user, noise) in enumerate([("u1", 0.0), ("u1", 0.1), ("u1", 1.0), ("u2", 0.01)]):
+            vec = base + noise * _unit(rng, 1)[0]
+            db.add(Job(id=f"job{i}", user_id=user, file_name=f"{i}.wav", status="completed"))
+            similarity_mod.save_embedding(db, f"job{i}", user, f"h{i}", vec / np.linalg.norm(vec))
+
+    monkeypatch.setattr(similarity_mod, "similarity_index", similarity_mod.SimilarityIndex())
+    client = route_client(analysis_routes, seed=seed)
+
+    body = client.get("/api/analysis/similar/job0").json()
+    assert [r["job_id"] for r in body["results"]] == ["job1", "job2"]
+    assert client.get("/api/analysis/similar/job3").status_code == 404  # another user's job
@@ -0,0 +1,173 @@
+"""Task graph: started nodes run as soon as their inputs exist (independent
+stages overlap), unstarted ones only when first asked for, failures reach
+dependents, and a timed-out get() leaves the node running until cancel().
+Pipelines on top of it: memoized stages run once per cache key, optional
+stages fall back on failure or when the budget is short, skip policies hold."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.task_graph import Pipeline, Stage, TaskGraph, stage_cache
+
+
+def _sleeper(seconds, value, log=None):
+    async def run(**inputs):
+        if log is not None:
+            log.append(value)
+        await asyncio.sleep(seconds)
+        return (value, inputs) if inputs else value
+    return run
+
+
+async def test_independent_nodes_overlap():
+    graph = TaskGraph()
+    graph.add("dsp", _sleeper(0.2, "dsp"))
+    graph.add("llm", _sleeper(0.1, "llm"), deps=("dsp",))
+    graph.add("transcription", _sleeper(0.25, "lyrics"))
+    graph.start()
+
+    start = time.monotonic()
+    merged, lyrics = await asyncio.gather(graph.get("llm"), graph.get("transcription"))
+    elapsed = time.monotonic() - start
+
+    assert merged == ("llm", {"dsp": "dsp"})
+    assert lyrics == "lyrics"
+    # max(dsp + llm, transcription), not the sum of all three
+    assert elapsed < 0.45
+    assert graph.timings()["llm"]["waited"] >= 0.15
+
+
+async def test_unstarted_node_runs_on_demand_only():
+    log = []
+    graph = TaskGraph()
+    graph.add("hash", _sleeper(0, "hash", log))
+    graph.add("fresh", _sleeper(0, "fresh", log))
+    graph.start("hash")
+
+    assert await graph.get("hash") == "hash"
+    assert log == ["hash"]
+    assert graph.timings()["fresh"] == {"status": "idle"}
+    assert await graph.get("fresh") == "fresh"
+
+
+async def test_failure_propagates_to_dependents():
+    async def boom():
+        raise RuntimeError("decode failed")
+
+    graph = TaskGraph()
+    graph.add("analysis", boom)
+    graph.add("metadata", _sleeper(0, "metadata"), deps=("analysis",))
+
+    with pytest.raises(RuntimeError, match="decode failed"):
+        await graph.get("metadata")
+    assert graph.timings()["analysis"]["status"] == "failed"
+
+
+async def test_timeout_keeps_node_running_until_cancelled():
+    graph = TaskGraph()
+    graph.add("slow", _sleeper(5, "slow"))
+
+    with pytest.raises(asyncio.TimeoutError):
+        await graph.get("slow", timeout=0.05)
+    assert graph.timings()["slow"]["status"] == "running"
+
+    graph.cancel()
+    await asyncio.sleep(0)
+    assert graph.timings()["slow"]["status"] == "cancelled"
+
+
+def test_unknown_dependency_rejected():
+    graph = TaskGraph()
+    with pytest.raises(ValueError):
+        graph.add("metadata", _sleeper(0, "x"), deps=("analysis",))
+
+
+# ── Declarative pipelines ─────────────────────────────────────────────────────
+
+async def test_pipeline_memoizes_cacheable_stages():
+    calls = []
+
+    def decode(ctx):
+        calls.append(ctx.path)
+        return {"samples": [1, 2, 3]}
+
+    pipeline = Pipeline("memo", [
+        Stage("decode", decode, cache_key=lambda ctx: ctx.path, blocking=True),
+        Stage("total", lambda ctx, decode: sum(decode["samples"]), inputs=("decode",)),
+    ])
+    stage_cache.clear()
+
+    first = await pipeline.run(SimpleNamespace(path="a.wav"))
+    first["decode"]["samples"].append(99)  # callers may mutate results
+    graph = pipeline.graph(SimpleNamespace(path="a.wav"))
+    second = await graph.run()
+
+    assert calls == ["a.wav"]
+    assert second == {"decode": {"samples": [1, 2, 3]}, "total": 6}
+    assert graph.timings()["decode"]["outcome"] == "cached"
+
+
+async def test_optional_stage_failure_and_skips_use_fallback():
+    def llm(ctx, features):
+        raise RuntimeError("provider down")
+
+    pipeline = Pipeline("policies", [
+        Stage("features", lambda ctx: {"tempo": 120}),
+        Stage("llm", llm, inputs=("features",), optional=True, blocking=True,
+              fallback=lambda ctx, error, features: {"genre": "heuristic", "error": str(error)}),
+        Stage("lyrics", lambda ctx, features: "la la", inputs=("features",), cost=10, optional=True,
+              fallback=lambda ctx, error, features: {}),
+        Stage("stems", lambda ctx: "stems", skip=lambda ctx: not ctx.stems),
+        Stage("result", lambda ctx, llm, lyrics: (llm, lyrics), inputs=("llm", "lyrics")),
+    ])
+
+    graph = pipeline.graph(SimpleNamespace(stems=False), budget=lambda: 5.0)
+    results = await graph.run()
+    timings = graph.timings()
+
+    assert results["result"] == ({"genre": "heuristic", "error": "provider down"}, {})
+    assert timings["llm"]["outcome"] == "fallback"
+    assert timings["lyrics"]["outcome"] == "skipped"  # needs ~10s, 5s left
+    assert timings["stems"]["outcome"] == "skipped"
+    assert "stems" not in await pipeline.run(SimpleNamespace(stems=False))
+
+
+async def test_required_stage_failure_fails_the_run():
+    def decode(ctx):
+        raise ValueError("corrupt file")
+
+    pipeline = Pipeline("required", [
+        Stage("decode", decode, blocking=True),
+        Stage("features", lambda ctx, decode: decode, inputs=("decode",)),
+    ])
+    with pytest.raises(ValueError, match="corrupt file"):
+        await pipeline.run(SimpleNamespace())
+
+
+def test_pipeline_rejects_undeclared_inputs():
+    with pytest.raises(ValueError):
+        Pipeline("broken", [Stage("llm", lambda ctx, features: None, inputs=("features",))])
+
+
+async def test_run_sync_works_inside_a_running_loop():
+    from app.utils.cancellation import CancellationToken, current_token, job_context
+
+    seen = []
+
+    def decode(ctx):
+        seen.append(current_token())
+        return "ok"
+
+    pipeline = Pipeline("sync", [Stage("decode", decode, blocking=True)])
+    # Called on the loop: no nested asyncio.run, the job's token still reaches the stage
+    assert pipeline.run_sync(SimpleNamespace()) == {"decode": "ok"}
+    token = CancellationToken("job-sync")
+    assert job_context(token).run(pipeline.run_sync, SimpleNamespace()) == {"decode": "ok"}
+    assert seen == [None, token]
+
+
+def test_run_sync_without_a_loop():
+    pipeline = Pipeline("sync", [Stage("a", lambda ctx: 1), Stage("b", lambda ctx, a: a + 1, inputs=("a",))])
+    assert pipeline.run_sync(SimpleNamespace()) == {"a": 1, "b": 2}
@@ -0,0 +1,50 @@
+"""Chunked transcription: the voice-activity map must skip silence and
+non-vocal material, chunks must cover every vocal region with overlap, and
+stitching must keep each overlapped word once (but not merge separate
+regions)."""
+import numpy as np
+import pytest
+import soundfile as sf
+
+from app.services.transcription_engine import WHISPER_SR, TranscriptionEngine, plan_chunks, stitch, vocal_regions
+
+
+def test_vocal_regions_skip_silence_and_rumble(tmp_path):
+    t = np.arange(10 * WHISPER_SR) / WHISPER_SR
+    voice = 0.3 * np.sin(2 * np.pi * 440 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    rumble = 0.3 * np.sin(2 * np.pi * 50 * t)
+    silence = np.zeros(10 * WHISPER_SR)
+    path = tmp_path / "song.wav"
+    sf.write(str(path), np.concatenate([silence, voice, rumble, voice]).astype(np.float32), WHISPER_SR)
+
+    regions, duration = vocal_regions(str(path))
+    assert duration == pytest.approx(40.0)
+    assert len(regions) == 2
+    assert regions[0] == pytest.approx((9.5, 20.5), abs=0.6)
+    assert regions[1] == pytest.approx((29.5, 40.0), abs=0.6)
+
+
+def test_chunks_cover_regions_with_overlap():
+    chunks = plan_chunks([(0.0, 70.0), (100.0, 110.0)], chunk_seconds=30.0, overlap=2.0)
+    assert chunks == [(0, 0.0, 30.0), (0, 28.0, 30.0), (0, 56.0, 14.0), (1, 100.0, 10.0)]
+
+
+def test_stitch_drops_overlap_but_keeps_regions_apart():
+    texts = ["one two three four five", "Four five, six seven", "seven eight"]
+    assert stitch(texts, [0, 0, 1]) == "one two three four five six seven\nseven eight"
+    # No shared run at the seam: nothing is dropped
+    assert stitch(["a b c", "d e f"], [0, 0]) == "a b c d e f"
+
+
+def test_parallel_chunks_stitch_to_the_timeline(tmp_path):
+    path = tmp_path / "long.wav"
+    sf.write(str(path), np.zeros(70 * WHISPER_SR, dtype=np.float32), WHISPER_SR)
+    chunks = plan_chunks([(0.0, 70.0)], chunk_seconds=10.0, overlap=2.0)
+
+    results = TranscriptionEngine.transcribe_chunks(
+        str(path), chunks, lambda audio: (str(len(audio)), None), workers=3
+    )
+    assert [int(text) for text, _ in results] == [int(length * WHISPER_SR) for _, _, length in chunks]
+
+    words = [" ".join(f"w{s}" for s in range(int(o), int(o + l))) for _, o, l in chunks]
+    assert stitch(words, [0] * len(chunks)) == " ".join(f"w{s}" for s in range(70))
@@ -0,0 +1,54 @@
+"""Multi-window sampling: windows must cover short tracks completely and
+spread evenly over long ones, and the aggregate must keep the single-window
+result shape while exposing the per-window spread (tempo/key changes)."""
+import numpy as np
+import pytest
+import soundfile as sf
+
+from app.utils.window_sampler import aggregate_windows, central_value, load_windows, plan_windows, weighted_vote
+
+
+def test_short_track_is_tiled_end_to_end():
+    windows = plan_windows(50.0, 6, 20.0)
+    assert len(windows) == 3
+    assert windows[0][0] == 0.0
+    assert sum(length for _, length in windows) == pytest.approx(50.0, abs=0.01)
+
+
+def test_long_track_windows_are_spread_and_in_bounds():
+    windows = plan_windows(600.0, 6, 20.0)
+    assert len(windows) == 6
+    offsets = [offset for offset, _ in windows]
+    assert offsets == sorted(offsets)
+    assert offsets[0] == pytest.approx(40.0)
+    assert all(0 <= offset and offset + length <= 600.0 for offset, length in windows)
+
+
+def test_aggregate_keeps_shape_and_reports_spread():
+    results = [
+        {"tempo": 100.0, "key": "C", "energy": {"rms": 0.1}, "chroma": [1.0, 0.0]},
+        {"tempo": 140.0, "key": "C", "energy": {"rms": 0.3}, "chroma": [0.0, 1.0]},
+        {"tempo": 140.0, "key": "G", "energy": {"rms": 0.3}, "chroma": [0.0, 1.0]},
+    ]
+    merged, spread = aggregate_windows(results, [2.0, 1.0, 1.0])
+    assert merged["tempo"] == pytest.approx(120.0)
+    assert merged["key"] == "C"
+    assert merged["energy"]["rms"] == pytest.approx(0.2)
+    assert merged["chroma"] == pytest.approx([0.5, 0.5])
+    assert spread["tempo"] == pytest.approx(20.0)
+    assert spread["energy"]["rms"] == pytest.approx(0.1)
+
+
+def test_central_value_and_vote():
+    assert central_value([120.0, 121.0, 240.0, 119.0]) in (120.0, 121.0)
+    assert weighted_vote(["A", "B", "B"], [5.0, 1.0, 1.0]) == "A"
+
+
+def test_load_windows_reads_each_span(tmp_path):
+    sr = 8000
+    x = np.repeat(np.arange(10, dtype=np.float32), sr)
+    path = tmp_path / "steps.wav"
+    sf.write(str(path), x, sr, subtype="FLOAT")
+    segments, rate = load_windows(str(path), [(1.0, 1.0), (7.0, 1.0)])
+    assert rate == sr
+    assert [float(s.mean()) for s in segments] == [1.0, 7.0]
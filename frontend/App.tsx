@@ -1,7 +1,7 @@
 
 import React, { useState, useEffect, lazy, Suspense } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { generateMetadata } from './services/geminiService';
+import { generateMetadata, cancelAnalysisJob } from './services/geminiService';
 import { Metadata, AnalysisRecord, BatchItem } from './types';
 import Header from './components/Header';
 import InputSection from './components/InputSection';
@@ -191,7 +191,12 @@ const AppContent: React.FC = () => {
                     (msg) => {
                         setBatch(prev => prev.map(b => b.id === item.id ? { ...b, message: msg } : b));
                     },
-                    isFresh
+                    isFresh,
+                    undefined,
+                    (fields) => {
+                        // DSP fields settle before the LLM layer; show them on the queue item meanwhile
+                        setBatch(prev => prev.map(b => b.id === item.id ? { ...b, metadata: { ...b.metadata, ...fields } as Metadata } : b));
+                    }
                 );
 
                 const results = responseData.metadata;
@@ -288,11 +293,24 @@ const AppContent: React.FC = () => {
         setBatch(prev => prev.map(item => item.id === id ? { ...item, status: 'pending', error: undefined, message: undefined } : item));
     };
 
-    const handleViewHistoryItem = (record: AnalysisRecord) => {
-        const existingInBatch = batch.find(b => b.id === record.id);
+    const handleCancel = async (id: string) => {
+        const item = batch.find(b => b.id === id);
+        if (!item?.jobId) return;
+        // The poll loop in generateMetadata sees the 'cancelled' status and fails the item
+        if (await cancelAnalysisJob(item.jobId)) {
+            setBatch(prev => prev.map(b => b.id === id ? { ...b, message: 'Cancelling...' } : b));
+        } else {
+            showToast("Could not cancel the analysis.", 'error');
+        }
+    };
+
+    const handleViewHistoryItem = async (summary: AnalysisRecord) => {
+        const existingInBatch = batch.find(b => b.id === summary.id);
         if (existingInBatch) {
             setActiveAnalysisId(existingInBatch.id);
         } else {
+            // History list only carries summary fields; load the full record
+            const record = (user?.id && await db.fetchHistoryItem(summary.id)) || summary;
             const newItem: BatchItem = {
                 id: record.id,
                 file: new File([], record.input.fileName || 'historical-file'),
@@ -373,6 +391,7 @@ const AppContent: React.FC = () => {
                                                 isProcessingBatch={isProcessingBatch}
                                                 onViewResults={handleViewResults}
                                                 onRetry={handleRetry}
+                                                onCancel={handleCancel}
                                                 onExportBatch={handleExportBatch}
                                                 showToast={showToast}
                                                 isFresh={isFresh}
@@ -8,6 +8,7 @@ interface BatchQueueItemProps {
     item: BatchItem;
     onRemove: (id: string) => void;
     onRetry: (id: string) => void;
+    onCancel: (id: string) => void;
     onViewResults: (id: string) => void;
     isProcessingBatch: boolean;
     onDragStart: (e: React.DragEvent, id: string) => void;
@@ -35,7 +36,7 @@ const StatusIndicator: React.FC<{ status: BatchItem['status'], message?: string
     }
 };
 
-const BatchQueueItem: React.FC<BatchQueueItemProps> = ({ item, onRemove, onRetry, onViewResults, isProcessingBatch, onDragStart, onDragOver, onDrop }) => {
+const BatchQueueItem: React.FC<BatchQueueItemProps> = ({ item, onRemove, onRetry, onCancel, onViewResults, isProcessingBatch, onDragStart, onDragOver, onDrop }) => {
     return (
         <div
             className="bg-slate-100 dark:bg-slate-800/50 p-3 rounded-lg flex items-center gap-4 transition-all hover:scale-[1.01] hover:shadow-md cursor-grab active:cursor-grabbing border-2 border-transparent"
@@ -49,6 +50,11 @@ const BatchQueueItem: React.FC<BatchQueueItemProps> = ({ item, onRemove, onRetry
             <div className="flex-grow min-w-0 pointer-events-none">
                 <p className="font-semibold text-sm truncate text-light-text dark:text-dark-text" title={item.file.name}>{item.file.name}</p>
                 <StatusIndicator status={item.status} message={item.message} />
+                {item.status === 'processing' && item.metadata?.bpm && (
+                    <p className="text-xs text-slate-500 truncate mt-0.5">
+                        {Math.round(item.metadata.bpm)} BPM{item.metadata.key ? ` · ${item.metadata.key} ${item.metadata.mode ?? ''}` : ''}
+                    </p>
+                )}
                 {item.status === 'error' && item.error && (
                     <p className="text-xs text-red-400 truncate mt-0.5" title={item.error}>
                         {item.error}
@@ -61,6 +67,11 @@ const BatchQueueItem: React.FC<BatchQueueItemProps> = ({ item, onRemove, onRetry
                         <BarChart className="w-4 h-4" /> View
                     </Button>
                 )}
+                {item.status === 'processing' && item.jobId && (
+                    <Button onClick={() => onCancel(item.id)} variant="secondary" size="sm">
+                        <XCircle className="w-4 h-4" /> Cancel
+                    </Button>
+                )}
                 {item.status === 'error' && (
                     <Button onClick={() => onRetry(item.id)} variant="secondary" size="sm" disabled={isProcessingBatch}>
                         <RefreshCw className="w-4 h-4" /> Retry
@@ -20,6 +20,7 @@ describe('InputSection Component', () => {
         isProcessingBatch: false,
         onViewResults: vi.fn(),
         onRetry: vi.fn(),
+        onCancel: vi.fn(),
         onExportBatch: vi.fn(),
         showToast: vi.fn(),
         userTier: 'starter' as const,
@@ -18,10 +18,11 @@ interface InputSectionProps {
     isFresh: boolean;
     setIsFresh: (isFresh: boolean) => void;
     onRetry: (id: string) => void;
+    onCancel: (id: string) => void;
 }
 
 const InputSection: React.FC<InputSectionProps> = ({
-    batch, setBatch, onAnalyze, isProMode, setIsProMode, isProcessingBatch, onViewResults, onRetry, onExportBatch, showToast, isFresh, setIsFresh
+    batch, setBatch, onAnalyze, isProMode, setIsProMode, isProcessingBatch, onViewResults, onRetry, onCancel, onExportBatch, showToast, isFresh, setIsFresh
 }) => {
     const [isDragging, setIsDragging] = useState(false);
     const dragCounter = useRef(0);
@@ -200,6 +201,7 @@ const InputSection: React.FC<InputSectionProps> = ({
                                 item={item}
                                 onRemove={() => setBatch(b => b.filter(i => i.id !== item.id))}
                                 onRetry={onRetry}
+                                onCancel={onCancel}
                                 onViewResults={onViewResults}
                                 isProcessingBatch={isProcessingBatch}
                                 onDragStart={() => { }}
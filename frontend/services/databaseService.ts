@@ -2,6 +2,7 @@
 import { AnalysisRecord } from '../types';
 
 const API_BASE = '/api';
+const HISTORY_PAGE_SIZE = 200; // server maximum
 
 const getHeaders = () => {
     const token = localStorage.getItem('hrl_sso_token_v3') || localStorage.getItem('access_token');
@@ -14,42 +15,79 @@ const getHeaders = () => {
 export const db = {
     // --- HISTORY ---
     fetchHistory: async (userId: string): Promise<AnalysisRecord[]> => {
+        // The list is keyset-paginated; follow next_cursor so older analyses
+        // stay reachable. Rows are slim summaries (a few hundred bytes each),
+        // the full result is loaded on demand via fetchHistoryItem.
+        const records: AnalysisRecord[] = [];
+        let cursor: string | null = null;
         try {
-            const response = await fetch(`${API_BASE}/history`, {
-                headers: getHeaders()
-            });
-            
-            if (!response.ok) {
-                console.error('Error fetching history:', response.status, response.statusText);
-                return [];
-            }
+            do {
+                const params = new URLSearchParams({ limit: String(HISTORY_PAGE_SIZE) });
+                if (cursor) params.set('cursor', cursor);
+                const response = await fetch(`${API_BASE}/history?${params}`, {
+                    headers: getHeaders()
+                });
 
-            const contentType = response.headers.get('content-type') || '';
-            if (!contentType.includes('application/json')) {
-                console.error('Error fetching history: expected JSON, got', contentType);
-                return [];
-            }
+                if (!response.ok) {
+                    console.error('Error fetching history:', response.status, response.statusText);
+                    break;
+                }
 
-            const data = await response.json();
+                const contentType = response.headers.get('content-type') || '';
+                if (!contentType.includes('application/json')) {
+                    console.error('Error fetching history: expected JSON, got', contentType);
+                    break;
+                }
 
-            // Map database columns to app types
-            return data.map((row: any) => {
-                const resultData = row.result || {};
-                // Return mapped object
-                return {
-                    id: row.id,
-                    metadata: resultData.metadata || {},
-                    inputType: resultData.inputType || 'file',
-                    input: {
-                        fileName: row.file_name,
-                        // description/link mapping if needed
-                    },
-                    createdAt: row.created_at
-                };
-            });
+                const data = await response.json();
+                for (const row of data.items || []) {
+                    records.push({
+                        id: String(row.id),
+                        metadata: {
+                            mainGenre: row.mainGenre || '',
+                            bpm: row.bpm ?? undefined,
+                            key: row.key || '',
+                            mode: row.mode || '',
+                        } as AnalysisRecord['metadata'],
+                        inputType: 'file' as const,
+                        input: {
+                            fileName: row.file_name,
+                        },
+                        createdAt: row.created_at,
+                    });
+                }
+                cursor = data.next_cursor || null;
+            } while (cursor);
         } catch (error) {
             console.error('Error fetching history:', error);
-            return [];
+        }
+        return records;
+    },
+
+    fetchHistoryItem: async (id: string): Promise<AnalysisRecord | null> => {
+        try {
+            const response = await fetch(`${API_BASE}/history/${id}`, {
+                headers: getHeaders()
+            });
+            if (!response.ok) {
+                console.error('Error fetching history item:', response.status, response.statusText);
+                return null;
+            }
+            const row = await response.json();
+            const resultData = row.result || {};
+            return {
+                id: String(row.id),
+                // Records posted by the frontend wrap metadata; server-side analyses store it flat
+                metadata: resultData.metadata || resultData,
+                inputType: resultData.inputType || 'file',
+                input: {
+                    fileName: row.file_name,
+                },
+                createdAt: row.created_at,
+            };
+        } catch (error) {
+            console.error('Error fetching history item:', error);
+            return null;
         }
     },
 
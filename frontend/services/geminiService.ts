@@ -102,6 +102,7 @@ export const generateMetadata = async (
     onProgressUpdate?: (message: string) => void,
     isFresh: boolean = false,
     onStreamToken?: (token: string, field: string) => void,  // real-time streaming callback
+    onPartialResult?: (fields: Partial<Metadata>, layer: string) => void,  // fields settled per pipeline layer
 ): Promise<{ metadata: Metadata; audioFeatures: AudioFeatures | null }> => {
     let dspFeatures: AudioFeatures | null = null;
     let fileHash: string | undefined = undefined;
@@ -166,6 +167,9 @@ export const generateMetadata = async (
                     if (d.type === 'stream_token' && onStreamToken) {
                         // Real-time description token — append to live preview
                         onStreamToken(d.token ?? '', d.field ?? 'trackDescription');
+                    } else if (d.type === 'partial_result') {
+                        // DSP fields (bpm/key/duration...) arrive before the LLM layer finishes
+                        if (onPartialResult && d.fields) onPartialResult(d.fields, d.layer ?? '');
                     } else if (d.message && onProgressUpdate) {
                         onProgressUpdate(d.message);
                     }
@@ -192,6 +196,7 @@ export const generateMetadata = async (
                     console.log(`[geminiService] Job ${activeJobId} status: ${job.status}`);
 
                     if (job.message && onProgressUpdate) onProgressUpdate(job.message);
+                    if (job.partial_result && onPartialResult) onPartialResult(job.partial_result, 'poll');
 
                     if (job.status === 'completed' && job.result) {
                         const aiData = job.result;
@@ -217,6 +222,10 @@ export const generateMetadata = async (
                     if (job.status === 'error') {
                         throw new Error(`Analysis background error: ${job.error}`);
                     }
+
+                    if (job.status === 'cancelled') {
+                        throw new Error('Analysis cancelled.');
+                    }
                 }
 
                 if (!finalMetadata) {
@@ -239,6 +248,18 @@ export const generateMetadata = async (
 };
 
 
+/** Stops a running backend analysis (frees its worker and skips the credit charge). */
+export const cancelAnalysisJob = async (jobId: string): Promise<boolean> => {
+    try {
+        const response = await fetchWithRetry(getFullUrl(`/analysis/job/${jobId}/cancel`), { method: 'POST' }, 1);
+        return response.ok;
+    } catch (e) {
+        console.warn('[geminiService] Cancel failed:', e);
+        return false;
+    }
+};
+
+
 export const refineMetadataField = async (
     currentMetadata: Metadata,
     field: keyof Metadata,
@@ -107,6 +107,7 @@ export interface AnalysisRecord {
         description?: string;
     };
     jobId?: string;
+    createdAt?: string; // ISO timestamp of the stored analysis
 }
 
 export interface BatchItem {